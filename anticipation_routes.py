@@ -23,6 +23,8 @@ import sqlite3
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify, g
 
+from request_tracing import sqlite_factory
+
 # Flask Blueprint
 anticipation_bp = Blueprint('anticipation', __name__, url_prefix='/api/anticipation')
 
@@ -74,7 +76,7 @@ DATABASE = 'radim_brain.db'
 
 def get_db():
     if 'db' not in g:
-        g.db = sqlite3.connect(DATABASE)
+        g.db = sqlite3.connect(DATABASE, factory=sqlite_factory())
         g.db.row_factory = sqlite3.Row
     return g.db
 
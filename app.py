@@ -15,6 +15,7 @@ import json
 import uuid
 import sqlite3
 import requests
+import io
 import base64
 from datetime import datetime
 from functools import wraps
@@ -26,11 +27,24 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import Radim WhatsApp Orchestrator
-from radim_orchestrator import radim_bp
+from radim_orchestrator import radim_bp, detect_intent
 
 # 🎭 Import Orchestrator Blueprint
 from orchestrator_blueprint import orchestrator_bp
 
+from prompt_coalescing import PromptCoalescer, is_coalescable, reusable_intent
+from context_builder import ContextBuilder, SqliteSummaryStore, summary_block
+from llm_gateway import LLM, GEMINI_MODEL, CLAUDE_HAIKU_MODEL
+from llm_scheduler import lane_for_intent
+from llm_metrics import metrics_bp, METRICS
+from request_tracing import TRACER, sqlite_factory, instrument_socketio
+from profiler import profiler_bp, WATCHDOG, HEARTBEAT
+from tts_engine import TTS, TTSError, DNS_CACHE, negotiate_format
+from phrase_bank import PHRASE_BANK
+from audio_transport import audio_response, EXPOSE_HEADERS, stats as transport_stats
+from stt_stream import STT_STREAMS, init_socketio as init_stt_stream
+from voice_transcode import VOICE_TRANSCODER, OPUS_CONTENT_TYPE
+
 # Import Memory & Learning routes
 try:
     from memory_routes import memory_bp
@@ -102,6 +116,9 @@ if PREDICT_AVAILABLE:
 if DASHBOARD_AVAILABLE:
     app.register_blueprint(dashboard_bp)
     print("✅ Dashboard routes registered: /api/dashboard/*")
+
+# 📈 Register LLM Metrics Blueprint (/metrics pro Prometheus)
+app.register_blueprint(metrics_bp)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'radim-secret-key-2025')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
 
@@ -126,6 +143,7 @@ CORS(app,
      resources={r"/*": {"origins": "*"}},
      supports_credentials=False,
      allow_headers=["Content-Type", "Authorization"],
+     expose_headers=EXPOSE_HEADERS,
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
 # Socket.IO
@@ -137,6 +155,18 @@ socketio = SocketIO(
     ping_interval=25
 )
 
+# 🧭 Request ID, spany (SQLite/HTTP/emit), nejpomalejší požadavky
+TRACER.init_app(app)
+instrument_socketio(socketio)
+
+# 🔬 Sampling profiler + detektor blokování hubu (admin), heartbeat jitter
+app.register_blueprint(profiler_bp)
+WATCHDOG.start()
+HEARTBEAT.instrument()
+
+# 🔊 DNS cache v procesu (po monkey_patch - obaluje zelený resolver)
+DNS_CACHE.install()
+
 # ============================================
 # KONFIGURACE
 # ============================================
@@ -176,7 +206,7 @@ app.register_blueprint(soul_bp)
 print("✅ Soul routes registered: /api/soul/*")
 
 # 🎙️ Import Voice Runtime routes - Stavový automat
-from voice_runtime_routes import voice_runtime_bp
+from voice_runtime_routes import voice_runtime_bp, init_socketio as init_voice_turn
 app.register_blueprint(voice_runtime_bp)
 print("✅ Voice Runtime routes registered: /api/voice/*")
 
@@ -196,6 +226,28 @@ if MEMORY_AVAILABLE:
 AZURE_TTS_KEY = os.environ.get('AZURE_TTS_KEY', 'JikrPUH2HODm8u5cj4ozmOGWCgQd2XeCasMt9kW09lc0mM59PwYyJQQJ99BIAC5RqLJXJ3w3AAAYACOGgKKC')
 # Try eastus - Heroku has DNS timeout on EU regions
 AZURE_TTS_REGION = os.environ.get('AZURE_TTS_REGION', 'eastus')
+AZURE_TTS_BASE_URL = os.environ.get(
+    'AZURE_TTS_BASE_URL', f"https://{AZURE_TTS_REGION}.tts.speech.microsoft.com").rstrip('/')
+
+# 🔊 Předehřát TTS spojení na pozadí (jen explicitně nastavené klíče)
+from speech_routes import AZURE_TTS_BASE_URL as SPEECH_TTS_BASE_URL
+TTS.prewarm([(AZURE_TTS_BASE_URL, os.environ.get('AZURE_TTS_KEY')),
+             (SPEECH_TTS_BASE_URL, os.environ.get('AZURE_SPEECH_KEY'))])
+
+def azure_proxy_ssml(text, voice, rate, pitch):
+    """SSML pro /api/azure/tts"""
+    return f"""<speak version='1.0' xml:lang='cs-CZ'>
+            <voice name='{voice}'>
+                <prosody rate='{rate}' pitch='{pitch}'>
+                    {text}
+                </prosody>
+            </voice>
+        </speak>"""
+
+# 🗣️ Předrenderované konstantní věty - Antonín s výchozí prosody proxy
+PHRASE_BANK.profile('azure.proxy', azure_proxy_ssml,
+                    [{'voice': 'cs-CZ-AntoninNeural', 'rate': '0.85', 'pitch': '+0Hz'}],
+                    lambda: (AZURE_TTS_BASE_URL, AZURE_TTS_KEY))
 
 @app.route('/api/azure/tts', methods=['OPTIONS'])
 def azure_tts_preflight():
@@ -220,43 +272,27 @@ def azure_tts_proxy():
         if not text:
             return jsonify({'error': 'Text is required'}), 400
         
-        # Build SSML
-        ssml = f"""<speak version='1.0' xml:lang='cs-CZ'>
-            <voice name='{voice}'>
-                <prosody rate='{rate}' pitch='{pitch}'>
-                    {text}
-                </prosody>
-            </voice>
-        </speak>"""
-        
-        # Call Azure TTS API
-        url = f"https://{AZURE_TTS_REGION}.tts.speech.microsoft.com/cognitiveservices/v1"
-        headers = {
-            'Ocp-Apim-Subscription-Key': AZURE_TTS_KEY,
-            'Content-Type': 'application/ssml+xml',
-            'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3'
-        }
-        
+        # Formát: parametr format nebo Accept (audio/webm, audio/ogg, audio/mpeg)
         try:
-            response = requests.post(url, headers=headers, data=ssml.encode('utf-8'), timeout=60)
-        except requests.exceptions.Timeout:
-            return jsonify({'error': 'Azure TTS API timeout - try again'}), 504
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Azure TTS API connection error: {str(e)}'}), 503
-        
-        if response.status_code == 200:
-            from flask import Response
-            return Response(
-                response.content,
-                mimetype='audio/mpeg',
-                headers={
-                    'X-Voice-Name': voice,
-                    'X-Voice-Rate': rate,
-                    'Cache-Control': 'no-cache'
-                }
-            )
-        else:
-            return jsonify({'error': f'Azure TTS error: {response.status_code}'}), response.status_code
+            fmt = negotiate_format(data.get('format'), request.headers.get('Accept'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Předrenderovaná konstantní věta (phrase_bank), jinak Azure TTS API
+        # přes sdílené keep-alive spojení (tts_engine)
+        result = PHRASE_BANK.lookup(text, azure_proxy_ssml, output_format=fmt, voice=voice, rate=rate, pitch=pitch)
+        if result is None:
+            try:
+                result = TTS.synthesize(azure_proxy_ssml(text, voice, rate, pitch), AZURE_TTS_BASE_URL,
+                                        AZURE_TTS_KEY, output_format=fmt, timeout=60)
+            except TTSError as e:
+                if e.timeout:
+                    return jsonify({'error': 'Azure TTS API timeout - try again'}), 504
+                if e.status is None:
+                    return jsonify({'error': f'Azure TTS API connection error: {str(e)}'}), 503
+                return jsonify({'error': f'Azure TTS error: {e.status}'}), e.status
+        
+        return audio_response(result, format=fmt, voice=voice, rate=rate)
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -265,6 +301,11 @@ def azure_tts_proxy():
 # ELEVENLABS TTS PROXY
 # ============================================
 ELEVENLABS_API_KEY = os.environ.get('ELEVENLABS_API_KEY', '')
+ELEVENLABS_BASE_URL = os.environ.get('ELEVENLABS_BASE_URL', 'https://api.elevenlabs.io').rstrip('/')
+# Formát (tts_engine) -> ElevenLabs output_format; Opus/WebM se mapuje
+# na nejmenší MP3 (odpověď nese skutečný Content-Type audio/mpeg)
+ELEVENLABS_OUTPUT_FORMATS = {'mp3': 'mp3_44100_128', 'mp3-64': 'mp3_44100_64', 'mp3-32': 'mp3_22050_32',
+                             'opus': 'mp3_22050_32', 'webm': 'mp3_22050_32'}
 
 @app.route('/api/elevenlabs/tts', methods=['OPTIONS'])
 def elevenlabs_tts_preflight():
@@ -290,8 +331,13 @@ def elevenlabs_tts_proxy():
         if not ELEVENLABS_API_KEY:
             return jsonify({'error': 'ElevenLabs API key not configured'}), 500
         
+        try:
+            fmt = negotiate_format(data.get('format'), request.headers.get('Accept'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Call ElevenLabs API
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+        url = f"{ELEVENLABS_BASE_URL}/v1/text-to-speech/{voice_id}?output_format={ELEVENLABS_OUTPUT_FORMATS[fmt]}"
         headers = {
             'xi-api-key': ELEVENLABS_API_KEY,
             'Content-Type': 'application/json'
@@ -319,7 +365,8 @@ def elevenlabs_tts_proxy():
                 mimetype='audio/mpeg',
                 headers={
                     'X-Voice-ID': voice_id,
-                    'Cache-Control': 'no-cache'
+                    'Cache-Control': 'no-cache',
+                    'Vary': 'Accept'
                 }
             )
         else:
@@ -337,7 +384,10 @@ def tts_health():
         'endpoints': {
             'azure': '/api/azure/tts',
             'elevenlabs': '/api/elevenlabs/tts'
-        }
+        },
+        'engine': TTS.stats(),
+        'phrase_bank': PHRASE_BANK.stats(),
+        'transport': transport_stats()
     })
 
 # ============================================
@@ -347,7 +397,7 @@ DATABASE = os.environ.get('DATABASE_PATH', 'radim_chat.db')
 
 def get_db():
     if 'db' not in g:
-        g.db = sqlite3.connect(DATABASE)
+        g.db = sqlite3.connect(DATABASE, factory=sqlite_factory())
         g.db.row_factory = sqlite3.Row
     return g.db
 
@@ -426,9 +476,20 @@ def init_db():
             size INTEGER,
             duration REAL,
             thumbnail_url TEXT,
+            status TEXT DEFAULT 'ready',
+            opus_url TEXT,
+            peaks TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
 
+        -- Klouzavé shrnutí starších zpráv pro AI kontext
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            conversation_id TEXT PRIMARY KEY,
+            summary TEXT DEFAULT '',
+            summarized_until TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
         -- Push subscriptions
         CREATE TABLE IF NOT EXISTS push_subscriptions (
             id TEXT PRIMARY KEY,
@@ -459,6 +520,13 @@ def init_db():
         CREATE INDEX IF NOT EXISTS idx_push_user ON push_subscriptions(user_id);
     ''')
     
+    # Starší databáze: sloupce pro převod hlasových zpráv
+    for column in ("status TEXT DEFAULT 'ready'", 'opus_url TEXT', 'peaks TEXT'):
+        try:
+            db.execute(f'ALTER TABLE chat_media ADD COLUMN {column}')
+        except sqlite3.OperationalError:
+            pass
+    
     # Radim AI assistant
     db.execute('''
         INSERT OR REPLACE INTO chat_users (id, name, role, online, settings)
@@ -505,116 +573,88 @@ Témata, se kterými pomáháš:
 
 Vždy odpovídej krátce (max 2-3 věty) pokud není potřeba více."""
 
-def call_gemini_ai(messages, context=None, image=None):
-    """Volání Gemini AI pro Radima"""
-    if not GEMINI_API_KEY:
-        return None
+def conversation_lane(messages):
+    """Pruh plánovače a uživatel podle poslední zprávy uživatele"""
+    for msg in reversed(messages):
+        if msg.get('sender_id') != 'radim':
+            return lane_for_intent(detect_intent(msg.get('content') or '')), msg.get('sender_id')
+    return 'interactive', None
+
+def call_gemini_ai(messages, context=None, image=None, summary=''):
+    """Volání Gemini AI pro Radima (messages už jsou v rozpočtu tokenů)"""
+    # Připrav konverzaci - stabilní začátek (system + shrnutí), pak nové zprávy
+    conversation_text = ""
+    for msg in messages:
+        role = "Uživatel" if msg.get('sender_id') != 'radim' else "Radim"
+        conversation_text += f"{role}: {msg.get('content', '')}\n"
     
-    try:
-        # Připrav konverzaci
-        conversation_text = ""
-        for msg in messages[-10:]:  # Posledních 10 zpráv pro kontext
-            role = "Uživatel" if msg.get('sender_id') != 'radim' else "Radim"
-            conversation_text += f"{role}: {msg.get('content', '')}\n"
-        
-        prompt = f"{RADIM_SYSTEM_PROMPT}\n\nKonverzace:\n{conversation_text}\nRadim:"
-        
-        # Build parts - text and optionally image
-        parts = [{"text": prompt}]
-        
-        if image:
-            # Extract base64 data from data URL
-            if image.startswith("data:"):
-                image = image.split(",")[1]
-            parts.insert(0, {
-                "inline_data": {
-                    "mime_type": "image/jpeg",
-                    "data": image
-                }
-            })
-        
-        response = requests.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            json={
-                "contents": [{"parts": parts}],
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "maxOutputTokens": 200,
-                    "topP": 0.9
-                },
-                "safetySettings": [
-                    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
-                ]
-            },
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if 'candidates' in data and data['candidates']:
-                return data['candidates'][0]['content']['parts'][0]['text'].strip()
-        
-        print(f"Gemini error: {response.status_code} - {response.text}")
-        return None
-        
-    except Exception as e:
-        print(f"Gemini AI error: {e}")
-        return None
-
-def call_claude_ai(messages, context=None):
+    prompt = f"{RADIM_SYSTEM_PROMPT}{summary_block(summary)}\n\nKonverzace:\n{conversation_text}\nRadim:"
+    
+    lane, user_id = conversation_lane(messages)
+    result = LLM.generate(
+        'gemini', GEMINI_MODEL, prompt=prompt, images=[image] if image else None,
+        max_tokens=200, temperature=0.7, top_p=0.9, relaxed_safety=True, timeout=30,
+        lane=lane, user_id=user_id
+    )
+    return result.text if result else None
+
+def call_claude_ai(messages, context=None, summary=''):
     """Fallback na Claude API"""
-    if not ANTHROPIC_API_KEY:
-        return None
+    conversation = [{"role": "user" if m.get('sender_id') != 'radim' else "assistant", 
+                    "content": m.get('content', '')} for m in messages]
     
-    try:
-        conversation = [{"role": "user" if m.get('sender_id') != 'radim' else "assistant", 
-                        "content": m.get('content', '')} for m in messages[-10:]]
-        
-        response = requests.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={
-                "Content-Type": "application/json",
-                "x-api-key": ANTHROPIC_API_KEY,
-                "anthropic-version": "2023-06-01"
-            },
-            json={
-                "model": "claude-3-haiku-20240307",
-                "max_tokens": 200,
-                "system": RADIM_SYSTEM_PROMPT,
-                "messages": conversation
-            },
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if 'content' in data and data['content']:
-                return data['content'][0]['text'].strip()
-        
-        return None
-        
-    except Exception as e:
-        print(f"Claude AI error: {e}")
-        return None
-
-def get_ai_response(messages, context=None, image=None):
-    """Získej AI odpověď (Gemini s fallbackem na Claude)"""
-    response = call_gemini_ai(messages, context, image)
+    lane, user_id = conversation_lane(messages)
+    result = LLM.generate(
+        'claude', CLAUDE_HAIKU_MODEL, messages=conversation,
+        system=RADIM_SYSTEM_PROMPT + summary_block(summary), max_tokens=200, timeout=30,
+        lane=lane, user_id=user_id
+    )
+    return result.text if result else None
+
+AI_FALLBACK_RESPONSE = "Omlouvám se, momentálně mám technické potíže. Zkuste to prosím za chvíli. 🙏"
+PHRASE_BANK.add(AI_FALLBACK_RESPONSE)
+
+# Single-flight pro jednorázové dotazy bez historie (/api/ai/chat)
+AI_COALESCER = PromptCoalescer('ai_chat')
+
+# Kontext konverzace podle rozpočtu tokenů + shrnutí v chat_summaries
+CHAT_CONTEXT = ContextBuilder('chat', SqliteSummaryStore(get_db))
+CONTEXT_FETCH_LIMIT = 40
+
+def get_ai_response(messages, context=None, image=None, summary=None):
+    """
+    Získej AI odpověď (Gemini s fallbackem na Claude).
+    Bez summary se zprávy jen ořežou na rozpočet tokenů.
+    """
+    if summary is None:
+        messages = CHAT_CONTEXT.trim(messages)
+        summary = ''
+    response = call_gemini_ai(messages, context, image, summary=summary)
     if not response:
-        response = call_claude_ai(messages, context)
+        METRICS.fallback('gemini', 'claude')
+        response = call_claude_ai(messages, context, summary=summary)
     if not response:
-        response = "Omlouvám se, momentálně mám technické potíže. Zkuste to prosím za chvíli. 🙏"
+        METRICS.fallback('claude', 'static')
+        response = AI_FALLBACK_RESPONSE
     return response
 
+def get_ai_response_coalesced(messages, context=None, image=None):
+    """Jako get_ai_response, ale stejné souběžné dotazy bez historie sdílí jedno volání"""
+    if not is_coalescable(messages, context, image):
+        return get_ai_response(messages, context, image)
+    prompt = messages[0]['content']
+    return AI_COALESCER.run(
+        prompt, RADIM_SYSTEM_PROMPT, 'gemini-2.0-flash>claude-3-haiku',
+        lambda: get_ai_response(messages, context, image),
+        cache=reusable_intent(detect_intent(prompt)),
+        cacheable=lambda r: r != AI_FALLBACK_RESPONSE
+    )
+
 # ============================================
 # CLOUDINARY - MEDIA UPLOAD
 # ============================================
-def upload_to_cloudinary(file_data, resource_type='auto', folder='radim-chat'):
-    """Upload souboru do Cloudinary"""
+def upload_to_cloudinary(file_data, resource_type='auto', folder='radim-chat', public_id=None):
+    """Upload souboru do Cloudinary (public_id - např. odvozené audio vedle originálu)"""
     if not CLOUDINARY_CLOUD_NAME or not CLOUDINARY_API_KEY:
         return None
     
@@ -632,6 +672,7 @@ def upload_to_cloudinary(file_data, resource_type='auto', folder='radim-chat'):
             file_data,
             resource_type=resource_type,
             folder=folder,
+            public_id=public_id,
             transformation=[
                 {'quality': 'auto:good'},
                 {'fetch_format': 'auto'}
@@ -859,7 +900,7 @@ def send_message():
             'conversation_id': conversation_id,
             'sender_id': sender_id,
             'type': data.get('type', 'text'),
-            'content': data['content'],
+            'content': data.get('content', '') if data.get('type') == 'voice' else data['content'],
             'reply_to': data.get('replyTo'),
             'metadata': data.get('metadata', {}),
             'timestamp': now_iso(),
@@ -870,6 +911,21 @@ def send_message():
         }
         
         db = get_db()
+        
+        # Hlasová zpráva z /api/media/voice: URL až po převodu (finish_voice_media).
+        # Propojení a zápis zprávy v jedné transakci - dokončení převodu mezitím zprávu nemine.
+        media_id = message['metadata'].get('mediaId') if message['type'] == 'voice' else None
+        if media_id:
+            db.execute('UPDATE chat_media SET message_id = ? WHERE id = ?', (message['id'], media_id))
+            media = db.execute('SELECT * FROM chat_media WHERE id = ?', (media_id,)).fetchone()
+            if media is not None and media['status'] == 'processing':
+                message['content'] = ''
+                message['status'] = 'processing'
+            elif media is not None:
+                voice = media_voice(media)
+                message['content'] = voice['url']
+                message['metadata'].update(voice_metadata(voice))
+        
         db.execute('''
             INSERT INTO chat_messages 
             (id, conversation_id, sender_id, type, content, reply_to, metadata, timestamp, status, reactions, read_by, ai_generated)
@@ -909,17 +965,19 @@ def send_message():
         conv = cursor.fetchone()
         
         if conv and 'radim' in json.loads(conv['participants']) and sender_id != 'radim':
-            # Získej historii konverzace
-            cursor = db.execute('''
-                SELECT sender_id, content FROM chat_messages 
-                WHERE conversation_id = ? 
-                ORDER BY timestamp DESC LIMIT 10
-            ''', (conversation_id,))
-            history = [dict(row) for row in cursor.fetchall()]
-            history.reverse()
+            # Získej historii konverzace - rozpočet tokenů, starší tahy ve shrnutí
+            def fetch_history(after, before):
+                cursor = db.execute('''
+                    SELECT sender_id, content, timestamp FROM chat_messages 
+                    WHERE conversation_id = ? AND timestamp > ? AND (? IS NULL OR timestamp < ?)
+                    ORDER BY timestamp DESC LIMIT ?
+                ''', (conversation_id, after or '', before, before, CONTEXT_FETCH_LIMIT))
+                return [dict(row) for row in cursor.fetchall()]
+            
+            summary, history = CHAT_CONTEXT.prepare_rows(conversation_id, fetch_history, CONTEXT_FETCH_LIMIT)
             
             # Získej AI odpověď
-            ai_response = get_ai_response(history)
+            ai_response = get_ai_response(history, summary=summary)
             
             if ai_response:
                 ai_message = {
@@ -1143,7 +1201,12 @@ def upload_media():
 
 @app.route('/api/media/voice', methods=['POST'])
 def upload_voice_message():
-    """Upload hlasové zprávy"""
+    """
+    Upload hlasové zprávy. Originál se uloží hned, převod na Opus + délka
+    + vrcholy vlny běží na pozadí (voice_transcode). URL do zprávy přijde
+    až po převodu: zpráva s metadata.mediaId čeká ve stavu 'processing',
+    uploader dostane voice_ready, stav i GET /api/media/voice/<id>.
+    """
     try:
         if 'audio' not in request.files:
             return jsonify({'success': False, 'error': 'No audio provided'}), 400
@@ -1151,36 +1214,116 @@ def upload_voice_message():
         file = request.files['audio']
         user_id = request.form.get('userId', 'anonymous')
         duration = request.form.get('duration', 0)
+        audio_data = file.read()
+        content_type = file.mimetype or 'audio/webm'
         
-        result = upload_to_cloudinary(file, resource_type='video', folder='radim-chat/voice')
+        result = upload_to_cloudinary(io.BytesIO(audio_data), resource_type='video', folder='radim-chat/voice')
         
         if not result:
-            file_data = base64.b64encode(file.read()).decode('utf-8')
+            file_data = base64.b64encode(audio_data).decode('utf-8')
             result = {
-                'url': f"data:audio/webm;base64,{file_data}",
+                'url': f"data:{content_type};base64,{file_data}",
                 'public_id': generate_id()
             }
         
+        status = 'processing' if VOICE_TRANSCODER.accepts(audio_data) else 'ready'
         media_id = generate_id()
         db = get_db()
         db.execute('''
-            INSERT INTO chat_media (id, user_id, type, url, public_id, duration, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (media_id, user_id, 'voice', result['url'], result.get('public_id'), duration, now_iso()))
+            INSERT INTO chat_media (id, user_id, type, url, public_id, size, duration, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (media_id, user_id, 'voice', result['url'], result.get('public_id'), len(audio_data), duration,
+              status, now_iso()))
         db.commit()
         
+        if status == 'processing':
+            VOICE_TRANSCODER.submit(audio_data, lambda transcoded, error: finish_voice_media(
+                media_id, user_id, result, transcoded, error))
+        
         return jsonify({
             'success': True,
             'voice': {
                 'id': media_id,
-                'url': result['url'],
+                'status': status,
+                'url': result['url'] if status == 'ready' else None,
                 'duration': duration
             }
-        })
+        }), 202 if status == 'processing' else 200
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def finish_voice_media(media_id, user_id, original, transcoded, error):
+    """Po převodu: uložit Opus vedle originálu, doplnit URL do čekající zprávy"""
+    opus_url = None
+    if transcoded and transcoded['audio']:
+        base_id = (original.get('public_id') or media_id).rsplit('/', 1)[-1]
+        stored = upload_to_cloudinary(io.BytesIO(transcoded['audio']), resource_type='video',
+                                      folder='radim-chat/voice', public_id=f"{base_id}-opus")
+        if stored:
+            opus_url = stored['url']
+        else:
+            opus_url = f"data:{transcoded['content_type']};base64,{base64.b64encode(transcoded['audio']).decode('utf-8')}"
+    if error:
+        print(f"🎙️ Voice transcode {media_id} failed: {error}")
+    
+    db = sqlite3.connect(DATABASE)
+    db.row_factory = sqlite3.Row
+    try:
+        db.execute('''
+            UPDATE chat_media SET status = ?, opus_url = ?, duration = COALESCE(?, duration), peaks = ?
+            WHERE id = ?
+        ''', ('failed' if error else 'ready', opus_url, transcoded['duration'] if transcoded else None,
+              json.dumps(transcoded['peaks'] if transcoded else []), media_id))
+        db.commit()
+        row = db.execute('SELECT * FROM chat_media WHERE id = ?', (media_id,)).fetchone()
+        voice = media_voice(row)     # bez převodu aspoň originál
+        message = None
+        if row['message_id']:
+            message = db.execute('SELECT * FROM chat_messages WHERE id = ?', (row['message_id'],)).fetchone()
+        if message is not None:
+            metadata = json.loads(message['metadata'] or '{}')
+            metadata.update(voice_metadata(voice))
+            db.execute("UPDATE chat_messages SET content = ?, metadata = ?, status = 'sent' WHERE id = ?",
+                       (voice['url'], json.dumps(metadata), message['id']))
+            db.commit()
+            socketio.emit('message_updated', {
+                'id': message['id'],
+                'conversation_id': message['conversation_id'],
+                'content': voice['url'],
+                'metadata': metadata,
+                'status': 'sent'
+            }, room=message['conversation_id'])
+    finally:
+        db.close()
+    socketio.emit('voice_ready', voice, room=user_id)
+
+def media_voice(row):
+    """Řádek chat_media -> popis hlasové zprávy (URL jen po převodu)"""
+    ready = row['status'] != 'processing'
+    return {
+        'id': row['id'],
+        'status': row['status'],
+        'url': (row['opus_url'] or row['url']) if ready else None,
+        'originalUrl': row['url'],
+        'format': OPUS_CONTENT_TYPE if row['opus_url'] else None,
+        'duration': row['duration'],
+        'peaks': json.loads(row['peaks']) if row['peaks'] else []
+    }
+
+def voice_metadata(voice):
+    """Metadata hlasové zprávy pro přehrávač"""
+    return {'mediaId': voice['id'], 'duration': voice['duration'], 'peaks': voice['peaks'],
+            'format': voice['format'], 'originalUrl': voice['originalUrl']}
+
+@app.route('/api/media/voice/<media_id>', methods=['GET'])
+def get_voice_message(media_id):
+    """Stav převodu hlasové zprávy (alternativa k voice_ready)"""
+    row = get_db().execute('SELECT * FROM chat_media WHERE id = ? AND type = ?', (media_id, 'voice')).fetchone()
+    if row is None:
+        return jsonify({'success': False, 'error': 'Voice message not found'}), 404
+    return jsonify({'success': True, 'voice': {**media_voice(row), 'messageId': row['message_id']}})
+
 # ============================================
 # REST API - PUSH NOTIFICATIONS
 # ============================================
@@ -1445,7 +1588,10 @@ def get_ai_settings():
             },
             'primary_provider': 'gemini' if GEMINI_API_KEY else ('claude' if ANTHROPIC_API_KEY else None),
             'radim_enabled': bool(GEMINI_API_KEY or ANTHROPIC_API_KEY)
-        }
+        },
+        'coalescing': AI_COALESCER.stats(),
+        'context': CHAT_CONTEXT.stats(),
+        'gateway': LLM.stats()
     })
 
 @app.route('/api/ai/chat', methods=['POST'])
@@ -1459,7 +1605,7 @@ def ai_chat():
         if not messages:
             return jsonify({"success": False, "error": "No messages provided"}), 400
         
-        response = get_ai_response(messages, context=None, image=image_data)
+        response = get_ai_response_coalesced(messages, context=None, image=image_data)
         return jsonify({
             'success': True,
             'response': response,
@@ -1477,6 +1623,7 @@ def handle_connect():
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    STT_STREAMS.close_sid(request.sid)
     user_id = None
     for uid, sid in list(users_online.items()):
         if sid == request.sid:
@@ -1484,7 +1631,7 @@ def handle_disconnect():
             del users_online[uid]
             break
     if user_id:
-        socketio.emit('user_offline', {'userId': user_id, 'timestamp': now_iso()}, broadcast=True)
+        socketio.emit('user_offline', {'userId': user_id, 'timestamp': now_iso()})
         # Update user last_seen
         try:
             db = sqlite3.connect(DATABASE)
@@ -1500,7 +1647,7 @@ def handle_join(data):
     if user_id:
         users_online[user_id] = request.sid
         join_room(user_id)
-        socketio.emit('user_online', {'userId': user_id, 'timestamp': now_iso()}, broadcast=True)
+        socketio.emit('user_online', {'userId': user_id, 'timestamp': now_iso()})
         # Update user online status
         try:
             db = sqlite3.connect(DATABASE)
@@ -1544,6 +1691,10 @@ def handle_stop_typing(data):
         emit('user_stop_typing', {'userId': user_id, 'conversationId': conversation_id}, 
              room=conversation_id, include_self=False)
 
+# 🎧 Streamované STT: stt_start / stt_chunk / stt_stop -> stt_partial, stt_final
+init_stt_stream(socketio)
+init_voice_turn(socketio)
+
 @socketio.on('mark_read')
 def handle_mark_read(data):
     conversation_id = data.get('conversationId')
@@ -1748,6 +1899,7 @@ def health():
                 'claude': bool(ANTHROPIC_API_KEY)
             },
             'media': bool(CLOUDINARY_URL),
+            'voice_transcode': VOICE_TRANSCODER.stats(),
             'push': bool(VAPID_PRIVATE_KEY),
             'wordpress': bool(WP_URL and WP_USER)
         },
@@ -1908,6 +2060,10 @@ def server_error(e):
 with app.app_context():
     init_db()
 
+# 🗣️ Phrase bank: načíst pack, chybějící věty doplnit na pozadí
+# (až tady - všechny moduly mají zaregistrované věty a profily)
+PHRASE_BANK.start()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print(f'''
@@ -0,0 +1,166 @@
+# ============================================
+# 📦 RADIM AUDIO TRANSPORT
+# ============================================
+# Version: 1.0.0
+# Binární přenos audia místo base64 v JSON (+33 % velikosti, další kopie
+# celého klipu v paměti, escapování JSON):
+# - odpověď: surové audio v těle, metadata v hlavičkách X-Voice-* /
+#   X-Audio-* / X-Speech-Text (UTF-8 percent-encoded)
+# - upload: surové tělo (Content-Type: audio/*) nebo multipart - do
+#   Azure STT se předává jako stream po blocích, celý klip se nekopíruje
+# JSON s base64 zůstává jen jako kompatibilní fallback pro staré klienty.
+#
+# Volba přenosu: transport=binary|json (query nebo JSON), jinak Accept
+# s audio typem výš než application/json, jinak výchozí chování endpointu.
+# Audio po kusech (hlasový tah) jde jako chunked odpověď bez Content-Length.
+
+import base64
+from urllib.parse import quote
+
+from flask import request, Response
+
+EXPOSE_HEADERS = ['X-Audio-Format', 'X-Audio-Source', 'X-Audio-Latency-Ms', 'X-Voice-Name',
+                  'X-Voice-Emotion', 'X-Voice-Rate', 'X-Speech-Text', 'X-Voice-State', 'X-Voice-Trace']
+META_HEADERS = (('voice', 'X-Voice-Name'), ('emotion', 'X-Voice-Emotion'), ('rate', 'X-Voice-Rate'),
+                ('text', 'X-Speech-Text'), ('state', 'X-Voice-State'), ('trace', 'X-Voice-Trace'))
+
+# Přípona / mimetype -> Content-Type pro Azure STT
+UPLOAD_TYPES = {'webm': 'audio/webm', 'mp3': 'audio/mp3', 'mpeg': 'audio/mp3', 'ogg': 'audio/ogg',
+                'wav': 'audio/wav', 'x-wav': 'audio/wav', 'wave': 'audio/wav'}
+STREAM_BLOCK = 64 * 1024
+
+_stats = {'binary_responses': 0, 'streamed_responses': 0, 'json_responses': 0, 'binary_uploads': 0,
+          'multipart_uploads': 0, 'json_uploads': 0, 'bytes_out': 0, 'stream_errors': 0}
+
+
+def wants_binary(data=None, default=False):
+    """Má odpověď jít jako surové audio?"""
+    transport = request.args.get('transport') or (data or {}).get('transport')
+    if transport:
+        return transport == 'binary'
+    accept = request.accept_mimetypes
+    audio_q = max((quality for mimetype, quality in accept if mimetype.startswith('audio/')), default=0)
+    if audio_q:
+        return audio_q > accept['application/json']     # shoda -> JSON (starší klienti)
+    return default
+
+
+def _meta_headers(result, meta):
+    headers = {
+        'X-Audio-Format': meta.get('format') or result.format,
+        'X-Audio-Source': result.engine,
+        'X-Audio-Latency-Ms': f"{result.latency_ms:.1f}",
+        'Vary': 'Accept',
+        'Cache-Control': 'no-cache'
+    }
+    for key, header in META_HEADERS:
+        if meta.get(key):
+            headers[header] = quote(str(meta[key]), safe=' ,.!?-')
+    return headers
+
+
+def audio_response(result, filename=None, **meta):
+    """
+    Surové audio (TTSResult) bez další kopie - bytes jdou rovnou do WSGI.
+    meta: format, voice, emotion, rate, text, state, trace -> hlavičky
+    """
+    headers = _meta_headers(result, meta)
+    headers['Content-Length'] = str(len(result.audio))
+    headers['Content-Disposition'] = f'attachment; filename={filename}' if filename else 'inline'
+    _stats['binary_responses'] += 1
+    _stats['bytes_out'] += len(result.audio)
+    return Response(result.audio, content_type=result.content_type, headers=headers)
+
+
+def audio_stream_response(first, rest, **meta):
+    """
+    Audio po kusech: first je hotový TTSResult (chyba syntézy se ukáže
+    ještě před hlavičkami), rest iterátor dalších - posílají se, jakmile
+    dorazí. Kusy musí jít spojit za sebe (MP3). Hlavičky podle prvního.
+    """
+    headers = _meta_headers(first, meta)
+    headers['Content-Disposition'] = 'inline'
+
+    def body():
+        _stats['bytes_out'] += len(first.audio)
+        yield first.audio
+        try:
+            for result in rest:
+                _stats['bytes_out'] += len(result.audio)
+                yield result.audio
+        except Exception as e:
+            # Hlavičky jsou odeslané - klient dostane zkrácené audio
+            _stats['stream_errors'] += 1
+            print(f"📦 Audio stream aborted: {e}")
+
+    _stats['streamed_responses'] += 1
+    return Response(body(), content_type=first.content_type, headers=headers)
+
+
+def audio_json(result, **fields):
+    """Kompatibilní fallback: base64 v JSON"""
+    _stats['json_responses'] += 1
+    _stats['bytes_out'] += len(result.audio)
+    return {'success': True, 'audio': base64.b64encode(result.audio).decode('ascii'), **fields}
+
+
+# ============================================
+# UPLOAD (STT)
+# ============================================
+
+class BodyStream:
+    """
+    Vstup požadavku pro requests: délka známá předem (Content-Length do
+    Azure), čtení po blocích - klip se v paměti neskládá.
+    """
+
+    def __init__(self, stream, length):
+        self._stream = stream
+        self.len = length
+
+    def read(self, size=STREAM_BLOCK):
+        return self._stream.read(STREAM_BLOCK if size is None or size < 0 else size)
+
+
+def upload_type(mimetype=None, filename=None, default='audio/wav'):
+    if mimetype:
+        subtype = mimetype.split(';')[0].strip().lower().rpartition('/')[2]
+        if subtype in UPLOAD_TYPES:
+            return UPLOAD_TYPES[subtype]
+    if filename and '.' in filename:
+        return UPLOAD_TYPES.get(filename.rsplit('.', 1)[1].lower(), default)
+    return default
+
+
+def audio_upload():
+    """
+    (data, content_type) z požadavku - data je BodyStream, bytes nebo
+    None. Pořadí: surové tělo audio/* (application/octet-stream s
+    ?content_type=), multipart pole 'audio', JSON audio_base64.
+    """
+    mimetype = request.mimetype or ''
+    if mimetype.startswith('audio/') or mimetype == 'application/octet-stream':
+        content_type = upload_type(request.args.get('content_type') or mimetype)
+        length = request.content_length
+        if not length:
+            return None, content_type
+        _stats['binary_uploads'] += 1
+        return BodyStream(request.stream, length), content_type
+    if 'audio' in request.files:
+        audio_file = request.files['audio']
+        audio_file.stream.seek(0, 2)
+        length = audio_file.stream.tell()
+        audio_file.stream.seek(0)
+        _stats['multipart_uploads'] += 1
+        return BodyStream(audio_file.stream, length), upload_type(audio_file.mimetype, audio_file.filename)
+    if request.is_json and 'audio_base64' in (request.json or {}):
+        _stats['json_uploads'] += 1
+        return base64.b64decode(request.json['audio_base64']), request.json.get('content_type', 'audio/wav')
+    return None, None
+
+
+def stats():
+    return dict(_stats)
+
+
+print("📦 Audio transport loaded - binary audio bodies, base64 JSON fallback")
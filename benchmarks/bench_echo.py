@@ -0,0 +1,123 @@
+# ============================================
+# 📊 BENCHMARK: ECHO SUPPRESSION
+# ============================================
+# Jak často Radim "odpoví sám sobě": původní Jaccard množin slov proti
+# last_tts_text vs. echo_suppression (shingly nedávných odpovědí v okně).
+# Syntetické případy z typických odpovědí Radima:
+# - echo: souvislý útržek (4-14 slov) poslední nebo předposlední
+#   odpovědi, část slov STT přepíše špatně (--stt-errors)
+# - dotazy: skutečné otázky seniora, některé se slovy z odpovědí
+# Echo detekované = ušetřený LLM + TTS cyklus; dotaz označený jako echo
+# = Radim neodpoví (nesmí se stávat).
+#
+# Spuštění z kořene repozitáře:
+#   python benchmarks/bench_echo.py [--cases 2000] [--stt-errors 0.1]
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from echo_suppression import EchoIndex, ECHO_THRESHOLD
+
+REPLIES = [
+    "Dobré ráno. Venku je dnes polojasno kolem patnácti stupňů a odpoledne může trochu pršet, "
+    "takže si na procházku vezměte deštník a teplejší bundu.",
+    "Vaše dcera volala, že přijede v neděli odpoledne i s vnoučaty. Ptala se, jestli nepotřebujete "
+    "něco nakoupit, třeba mléko nebo chleba.",
+    "Nezapomeňte si vzít odpolední léky a napít se vody. Pokud se budete cítit unavený, "
+    "klidně si na chvíli lehněte a já vás za hodinu vzbudím.",
+    "Dnes je středa, devatenáctého října. Svátek má Pavla a zítra bude slunečno.",
+]
+
+QUESTIONS = [
+    "Radime, kolik je hodin?",
+    "Radime, kdy přijede dcera?",
+    "Radime, vezmu si deštník, nebo ne?",
+    "Radime, připomeň mi léky v osm večer",
+    "Radime, zavolej prosím vnučce",
+    "Radime, jaké bude zítra počasí?",
+    "Radime, je mi zima, co mám dělat?",
+    "ano",
+    "děkuji",
+    "Radime, pusť mi rádio",
+]
+
+NOISE_WORDS = ["a", "to", "je", "no", "tak", "ten", "se"]
+
+
+def legacy_similarity(text, last_tts):
+    """Původní compute_echo_similarity (Jaccard, jen poslední TTS)"""
+    if not last_tts:
+        return 0.0
+    text_words = set(text.lower().split())
+    tts_words = set(last_tts.lower().split())
+    union = text_words | tts_words
+    return len(text_words & tts_words) / len(union) if union else 0.0
+
+
+def echo_fragment(reply, rng, errors):
+    words = reply.split()
+    length = rng.randint(4, min(14, len(words)))
+    start = rng.randint(0, len(words) - length)
+    fragment = words[start:start + length]
+    return ' '.join(rng.choice(NOISE_WORDS) if rng.random() < errors else word for word in fragment)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cases', type=int, default=2000)
+    parser.add_argument('--stt-errors', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = EchoIndex()
+    counts = {'legacy': {'echo_caught': 0, 'false_echo': 0}, 'echo_index': {'echo_caught': 0, 'false_echo': 0}}
+    echoes = questions = 0
+    legacy_s = index_s = 0.0
+    for case in range(args.cases):
+        session_id = f"s{case % 50}"
+        spoken = rng.sample(REPLIES, 2)
+        for reply in spoken:
+            index.remember(session_id, reply)
+        last_tts = spoken[-1]
+        if rng.random() < 0.5:
+            text, is_echo = echo_fragment(rng.choice(spoken), rng, args.stt_errors), True
+            echoes += 1
+        else:
+            text, is_echo = rng.choice(QUESTIONS), False
+            questions += 1
+
+        started = time.perf_counter()
+        legacy = legacy_similarity(text, last_tts) > 0.75
+        legacy_s += time.perf_counter() - started
+        started = time.perf_counter()
+        indexed = index.score(session_id, text, last_tts) > ECHO_THRESHOLD
+        index_s += time.perf_counter() - started
+
+        for name, flagged in (('legacy', legacy), ('echo_index', indexed)):
+            if flagged and is_echo:
+                counts[name]['echo_caught'] += 1
+            elif flagged:
+                counts[name]['false_echo'] += 1
+
+    result = {}
+    for name, elapsed in (('legacy', legacy_s), ('echo_index', index_s)):
+        result[name] = {
+            'echo_detection_rate': round(counts[name]['echo_caught'] / echoes, 3),
+            'false_echo_rate': round(counts[name]['false_echo'] / questions, 3),
+            'us_per_score': round(elapsed * 1e6 / args.cases, 1)
+        }
+    print(json.dumps({'cases': args.cases, 'echo_cases': echoes, 'stt_errors': args.stt_errors,
+                      'threshold': ECHO_THRESHOLD, 'results': result,
+                      'index': {key: value for key, value in index.stats().items() if key != 'score_ms'}},
+                     indent=2))
+
+
+if __name__ == '__main__':
+    main()
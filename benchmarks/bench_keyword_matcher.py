@@ -0,0 +1,166 @@
+# ============================================
+# 📊 BENCHMARK: KEYWORD MATCHER
+# ============================================
+# Porovnání původních smyček `kw in msg` s jedním průchodem
+# sdíleného Aho-Corasick klasifikátoru (keyword_matcher.CLASSIFIER).
+#
+# Spuštění z kořene repozitáře:
+#   python benchmarks/bench_keyword_matcher.py [--rounds 2000]
+
+import os
+import sys
+import time
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_routes import detect_topic, detect_mood, TOPIC_KEYWORDS, MOOD_KEYWORDS
+from claude_routes import analyze_emotions_local, EMOTION_KEYWORDS, CHAT_INTENT_KEYWORDS, CLASSIFIER
+from radim_orchestrator import detect_intent, SAFETY_KEYWORDS, HEALTH_KEYWORDS, TASK_KEYWORDS, STORY_KEYWORDS
+from voice_runtime_routes import compute_relevance, RADIM_KEYWORDS, IGNORE_PATTERNS
+
+MESSAGES = [
+    "Dobré ráno Radime, jaké bude dnes počasí?",
+    "Bolí mě hlava a jsem unavený, nevím co mám dělat",
+    "Připomeň mi prosím vzít léky v 8 hodin",
+    "Spadl jsem v koupelně a nemohu vstát, zavolej záchranku",
+    "Děkuji, to je skvělé, moc se mi to líbí",
+    "Chybí mi vnuci, jsem tu sám a je mi smutno",
+    "Jaké jsou dnešní zprávy ze světa politiky?",
+    "Vytvoř příběh na instagram s pozvánkou na výlet",
+    "Bojím se, že zapomenu na doktora, jsem nervózní",
+    "Včera jsme s manželkou vařili oběd podle nového receptu",
+    "Pusť mi prosím nějakou hudbu nebo film",
+    "Nechápu jak funguje ten telefon a internet",
+    "Reklama: sponzor dnešního vysílání je ...",
+    "Zprávy dne: předpověď počasí na obrazovce ukazuje déšť",
+    "Je mi dobře, mám klid a pohodu, těším se na procházku",
+    "pocasi zitra a teplota v brne",  # bez diakritiky
+    "Hodně dlouhá zpráva " * 12,
+]
+
+
+# ----------------------------------------------------------------------
+# Původní implementace (před sdíleným klasifikátorem)
+# ----------------------------------------------------------------------
+
+def legacy_detect_topic(message):
+    msg = message.lower()
+    for topic, keywords in TOPIC_KEYWORDS.items():
+        if any(kw in msg for kw in keywords):
+            return topic
+    return "general"
+
+
+def legacy_detect_mood(message):
+    msg = message.lower()
+    for mood, words in MOOD_KEYWORDS.items():
+        if any(w in msg for w in words):
+            return mood
+    return "neutral"
+
+
+def legacy_analyze_emotions_local(text):
+    lower = text.lower()
+    emotions = {}
+    max_emotion = ("neutral", 0)
+    for emotion, words in EMOTION_KEYWORDS.items():
+        matches = sum(1 for w in words if w in lower)
+        intensity = min(1.0, matches * 0.25)
+        emotions[emotion] = intensity
+        if intensity > max_emotion[1]:
+            max_emotion = (emotion, intensity)
+    emotions["dominant_emotion"] = max_emotion[0]
+    emotions["needs_empathy"] = emotions.get("sadness", 0) > 0.3 or emotions.get("fear", 0) > 0.3
+    emotions["crisis_level"] = int(min(10, (emotions.get("fear", 0) + emotions.get("sadness", 0)) * 10))
+    return emotions
+
+
+def legacy_detect_intent(message):
+    msg_lower = message.lower()
+    for intent, words in (('safety', SAFETY_KEYWORDS), ('health', HEALTH_KEYWORDS),
+                          ('task', TASK_KEYWORDS), ('story', STORY_KEYWORDS)):
+        for word in words:
+            if word in msg_lower:
+                return intent
+    return 'chat'
+
+
+def legacy_chat_intent(message):
+    msg_lower = message.lower()
+    for intent, words in CHAT_INTENT_KEYWORDS.items():
+        if any(w in msg_lower for w in words):
+            return intent
+    return "general"
+
+
+def legacy_compute_relevance(text):
+    text_lower = text.lower()
+    score = 0.0
+    if 'radim' in text_lower or 'radime' in text_lower:
+        score += 0.5
+    keyword_hits = sum(1 for kw in RADIM_KEYWORDS if kw in text_lower)
+    score += min(keyword_hits * 0.15, 0.4)
+    for pattern in IGNORE_PATTERNS:
+        if pattern in text_lower:
+            score -= 0.3
+    words = text.split()
+    if 2 <= len(words) <= 10:
+        score += 0.1
+    if len(words) > 30:
+        score -= 0.2
+    return max(0.0, min(1.0, score))
+
+
+def legacy_all(message):
+    return (legacy_detect_topic(message), legacy_detect_mood(message),
+            legacy_analyze_emotions_local(message), legacy_detect_intent(message),
+            legacy_chat_intent(message), legacy_compute_relevance(message))
+
+
+def compiled_all(message):
+    return (detect_topic(message), detect_mood(message),
+            analyze_emotions_local(message), detect_intent(message),
+            CLASSIFIER.first(message, 'chat_intent') or "general", compute_relevance(message))
+
+
+def bench(fn, messages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            fn(message)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+
+    # Každá zpráva unikátní, aby nepomáhala paměť posledního výsledku
+    unique = [f"{m} #{i}" for i, m in enumerate(MESSAGES)]
+
+    differences = []
+    for message in unique:
+        old, new = legacy_all(message), compiled_all(message)
+        if old != new:
+            differences.append({'message': message, 'legacy': repr(old), 'compiled': repr(new)})
+
+    legacy_us = bench(legacy_all, unique, args.rounds)
+    compiled_us = bench(compiled_all, unique, args.rounds)
+
+    print(json.dumps({
+        'messages': len(unique),
+        'rounds': args.rounds,
+        'classifier': CLASSIFIER.stats(),
+        'legacy_us_per_message': round(legacy_us, 2),
+        'compiled_us_per_message': round(compiled_us, 2),
+        'speedup': round(legacy_us / compiled_us, 2),
+        'differences': differences
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
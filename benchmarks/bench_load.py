@@ -0,0 +1,573 @@
+# ============================================
+# 📊 BENCHMARK: LOAD TEST
+# ============================================
+# Reprodukovatelný zátěžový test celého backendu:
+# - spustí fake upstreamy (benchmarks/fake_upstreams.py) s danou latencí
+# - spustí app.py stejně jako Procfile (gunicorn, 1 eventlet worker) nad
+#   dočasnou databází, všechny externí služby přesměrované na fake
+# - virtuální uživatelé střídají REST chat (s AI odpovědí), hlasový chat,
+#   TTS/STT, upload médií, WordPress login a polling dashboardu podle vah
+# - Socket.IO klienti: join, typing/stop_typing/send_message s ack a
+#   doručení new_message z REST chatu do místnosti
+#
+# Výstup: JSON s propustností, p50/p95/p99 a chybovostí po endpointech
+# (+ commit, konfigurace, stav hubu ze serveru). --compare porovná s
+# dřívějším výsledkem, --max-regression vrátí exit 1 při zhoršení p95.
+#
+# Spuštění z kořene repozitáře:
+#   python benchmarks/bench_load.py [--duration 30] [--users 16] [--sockets 8] \
+#       [--latency gemini=700,claude=900] [--mix chat_send=3,dashboard=10] \
+#       [--output results.json] [--compare baseline.json --max-regression 15]
+
+import os
+import sys
+import json
+import math
+import time
+import wave
+import base64
+import random
+import importlib.util
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from io import BytesIO
+from array import array
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_upstreams import FakeUpstreams, UpstreamConfig, parse_spec
+
+try:
+    import socketio
+    SOCKETIO_AVAILABLE = True
+except ImportError:
+    SOCKETIO_AVAILABLE = False
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_TOKEN = 'bench-admin'
+MIN_SAMPLES_FOR_COMPARE = 20
+
+MESSAGES = [
+    "Dobré ráno Radime, jaké bude dnes počasí?",
+    "Bolí mě trochu hlava, co mám dělat?",
+    "Připomeň mi prosím vzít léky v osm hodin",
+    "Chybí mi vnuci, je mi smutno",
+    "Řekni mi něco hezkého o přírodě",
+    "Co je dnes za den a kdo má svátek?",
+]
+
+
+# ============================================
+# MĚŘENÍ
+# ============================================
+
+class Recorder:
+    """Latence a výsledky po endpointech (jen po zahřátí)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.recording = False
+        self.started = None
+        self.stopped = None
+
+    def stop(self):
+        with self._lock:
+            self.recording = False
+            self.stopped = time.perf_counter()
+
+    def record(self, name, latency_ms, ok, always=False):
+        """always=True: jednorázové kroky (Socket.IO connect/join) i během zahřátí"""
+        with self._lock:
+            if self.recording or always:
+                self.samples.setdefault(name, []).append((latency_ms, ok))
+
+    def start(self):
+        """Začátek měření - jednorázové kroky ze zahřátí (always=True) zůstávají"""
+        with self._lock:
+            self.recording = True
+            self.started = time.perf_counter()
+
+    def summary(self):
+        elapsed = (self.stopped or time.perf_counter()) - self.started
+        endpoints = {}
+        for name, samples in sorted(self.samples.items()):
+            latencies = sorted(latency for latency, _ in samples)
+            errors = sum(1 for _, ok in samples if not ok)
+            endpoints[name] = {
+                'requests': len(samples),
+                'errors': errors,
+                'error_rate': round(errors / len(samples), 4),
+                'throughput_rps': round(len(samples) / elapsed, 3),
+                'latency_ms': {
+                    'mean': round(sum(latencies) / len(latencies), 2),
+                    'p50': round(percentile(latencies, 0.50), 2),
+                    'p95': round(percentile(latencies, 0.95), 2),
+                    'p99': round(percentile(latencies, 0.99), 2),
+                    'max': round(latencies[-1], 2)
+                }
+            }
+        total = sum(e['requests'] for e in endpoints.values())
+        errors = sum(e['errors'] for e in endpoints.values())
+        return round(elapsed, 2), {
+            'requests': total,
+            'errors': errors,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'throughput_rps': round(total / elapsed, 3)
+        }, endpoints
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentil seřazeného seznamu"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(q * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+# ============================================
+# SCÉNÁŘE (REST)
+# ============================================
+
+def _wav_bytes(voiced_s=1.0, silence_s=0.5, rate=16000):
+    """
+    PCM 16 bit mono: ticho, znělý tón, ticho. Tón 180 Hz s harmonickými
+    (špička ~-14 dBFS, úzkopásmový jako samohláska) projde VAD jako řeč
+    a okraje se oříznou; voiced_s=0 = čisté ticho, které VAD zahodí
+    ještě před STT (scénář stt_silent).
+    """
+    edge = bytes(int(silence_s * rate) * 2)
+    count = int(voiced_s * rate)
+    fade = rate // 100                     # 10 ms náběh/doběh bez lupnutí
+    tone = array('h', (
+        int(8000 * min(1.0, i / fade, (count - i) / fade) * sum(
+            math.sin(2 * math.pi * 180 * harmonic * i / rate) / harmonic for harmonic in (1, 2, 3)) / 1.84)
+        for i in range(count)
+    ))
+    if sys.byteorder != 'little':
+        tone.byteswap()
+    buffer = BytesIO()
+    with wave.open(buffer, 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(edge + tone.tobytes() + edge)
+    return buffer.getvalue()
+
+
+WAV_BYTES = _wav_bytes()
+WAV_BASE64 = base64.b64encode(WAV_BYTES).decode('ascii')
+SILENT_WAV_BYTES = _wav_bytes(voiced_s=0.0)
+JPEG_BYTES = b'\xff\xd8\xff\xe0' + bytes(20000) + b'\xff\xd9'
+
+
+class VirtualUser:
+    """Jeden uživatel = vlastní keep-alive session, konverzace s Radimem a RNG"""
+
+    def __init__(self, base_url, index, seed):
+        self.base_url = base_url
+        self.user_id = f"bench-user-{index}"
+        self.session = requests.Session()
+        self.random = random.Random(seed * 1000 + index)
+        self.conversation_id = None
+        self.voice_history = []
+
+    def setup(self):
+        response = self.session.post(f"{self.base_url}/api/chat/conversations", timeout=30,
+                                     json={'participants': [self.user_id, 'radim'], 'type': 'direct'})
+        response.raise_for_status()
+        self.conversation_id = response.json()['conversation']['id']
+
+    def message(self):
+        return self.random.choice(MESSAGES)
+
+    def request(self, method, path, **kwargs):
+        response = self.session.request(method, f"{self.base_url}{path}", timeout=60, **kwargs)
+        response.content        # dočíst tělo (audio) do měřeného času
+        return response.status_code < 400
+
+    # --- scénáře: vrací True/False (úspěch) ---
+
+    def chat_send(self):
+        return self.request('POST', '/api/chat/messages', json={
+            'conversationId': self.conversation_id, 'senderId': self.user_id,
+            'content': self.message(), 'metadata': {'bench_sent': time.time()}})
+
+    def chat_history(self):
+        return self.request('GET', f"/api/chat/messages/{self.conversation_id}?limit=50")
+
+    def conversations(self):
+        return self.request('GET', f"/api/chat/conversations/{self.user_id}")
+
+    def ai_chat(self):
+        return self.request('POST', '/api/ai/chat', json={'messages': [{'role': 'user', 'content': self.message()}]})
+
+    def voice_chat(self):
+        self.voice_history = (self.voice_history + [{'role': 'user', 'content': self.message()}])[-6:]
+        return self.request('POST', '/api/voice/chat', json={'messages': self.voice_history,
+                                                           'session_id': self.user_id})
+
+    def tts_azure(self):
+        return self.request('POST', '/api/azure/tts', json={'text': self.message()})
+
+    def tts_speech(self):
+        return self.request('POST', '/api/speech/synthesize', json={'text': self.message()})
+
+    def tts_speech_binary(self):
+        return self.request('POST', '/api/speech/synthesize', json={'text': self.message()},
+                            headers={'Accept': 'audio/mpeg'})
+
+    def tts_elevenlabs(self):
+        return self.request('POST', '/api/elevenlabs/tts', json={'text': self.message()})
+
+    def stt(self):
+        return self.request('POST', '/api/speech/transcribe', json={'audio_base64': WAV_BASE64,
+                                                                   'content_type': 'audio/wav'})
+
+    def stt_binary(self):
+        return self.request('POST', '/api/speech/transcribe', data=WAV_BYTES, headers={'Content-Type': 'audio/wav'})
+
+    def stt_silent(self):
+        return self.request('POST', '/api/speech/transcribe', data=SILENT_WAV_BYTES,
+                            headers={'Content-Type': 'audio/wav'})
+
+    def media_upload(self):
+        return self.request('POST', '/api/media/upload', data={'userId': self.user_id, 'type': 'image'},
+                            files={'file': ('photo.jpg', JPEG_BYTES, 'image/jpeg')})
+
+    def wp_login(self):
+        return self.request('POST', '/api/wordpress/login', json={'email': f"{self.user_id}@example.invalid"})
+
+    def dashboard(self):
+        return self.request('GET', '/api/dashboard')
+
+    def dashboard_quick(self):
+        return self.request('GET', '/api/dashboard/quick')
+
+
+# Realistický mix: polling dashboardu a čtení historie převažuje, AI a
+# audio jsou dražší a řidší (váhy = relativní četnost)
+DEFAULT_MIX = {
+    'chat_send': 12,
+    'chat_history': 14,
+    'conversations': 6,
+    'ai_chat': 6,
+    'voice_chat': 8,
+    'tts_azure': 6,
+    'tts_speech': 4,
+    'tts_speech_binary': 2,
+    'tts_elevenlabs': 2,
+    'stt': 5,
+    'stt_binary': 3,
+    'stt_silent': 1,
+    'media_upload': 1,
+    'wp_login': 1,
+    'dashboard': 10,
+    'dashboard_quick': 15,
+}
+
+ENDPOINT_NAMES = {
+    'chat_send': 'POST /api/chat/messages',
+    'chat_history': 'GET /api/chat/messages/<id>',
+    'conversations': 'GET /api/chat/conversations/<user>',
+    'ai_chat': 'POST /api/ai/chat',
+    'voice_chat': 'POST /api/voice/chat',
+    'tts_azure': 'POST /api/azure/tts',
+    'tts_speech': 'POST /api/speech/synthesize',
+    'tts_speech_binary': 'POST /api/speech/synthesize (binary)',
+    'tts_elevenlabs': 'POST /api/elevenlabs/tts',
+    'stt': 'POST /api/speech/transcribe',
+    'stt_binary': 'POST /api/speech/transcribe (binary)',
+    'stt_silent': 'POST /api/speech/transcribe (silent)',
+    'media_upload': 'POST /api/media/upload',
+    'wp_login': 'POST /api/wordpress/login',
+    'dashboard': 'GET /api/dashboard',
+    'dashboard_quick': 'GET /api/dashboard/quick',
+}
+
+
+def run_user(user, mix, recorder, stop, think_ms):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while not stop.is_set():
+        scenario = user.random.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            ok = getattr(user, scenario)()
+        except requests.RequestException:
+            ok = False
+        recorder.record(ENDPOINT_NAMES[scenario], (time.perf_counter() - started) * 1000, ok)
+        if think_ms:
+            stop.wait(user.random.uniform(0.5, 1.5) * think_ms / 1000.0)
+
+
+# ============================================
+# SOCKET.IO
+# ============================================
+
+def run_socket_user(base_url, index, conversation_ids, recorder, stop, think_ms, seed, transports):
+    rng = random.Random(seed * 7919 + index)
+    client = socketio.Client(reconnection=False)
+    user_id = f"bench-socket-{index}"
+    conversation_id = conversation_ids[index % len(conversation_ids)]
+
+    @client.on('new_message')
+    def on_new_message(data):
+        sent = ((data or {}).get('metadata') or {}).get('bench_sent')
+        if sent:
+            recorder.record('SOCKET new_message delivery', (time.time() - sent) * 1000, True)
+
+    started = time.perf_counter()
+    try:
+        client.connect(base_url, transports=transports, wait_timeout=30)
+    except Exception:
+        recorder.record('SOCKET connect', (time.perf_counter() - started) * 1000, False, always=True)
+        return
+    recorder.record('SOCKET connect', (time.perf_counter() - started) * 1000, True, always=True)
+
+    def call(event, data, always=False):
+        started = time.perf_counter()
+        try:
+            client.call(event, data, timeout=30)
+            ok = True
+        except Exception:
+            ok = False
+        recorder.record(f'SOCKET {event}', (time.perf_counter() - started) * 1000, ok, always)
+
+    try:
+        call('join', {'userId': user_id}, always=True)
+        call('join_conversation', {'conversationId': conversation_id}, always=True)
+        while not stop.is_set() and client.connected:
+            data = {'conversationId': conversation_id, 'userId': user_id}
+            call('typing', data)
+            stop.wait(rng.uniform(0.5, 1.5) * think_ms / 1000.0)
+            call('stop_typing', data)
+            call('send_message', {**data, 'content': rng.choice(MESSAGES), 'senderId': user_id})
+            stop.wait(rng.uniform(0.5, 1.5) * think_ms / 1000.0)
+    finally:
+        client.disconnect()
+
+
+# ============================================
+# SERVER
+# ============================================
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(port, upstream_env, workdir, log):
+    """app:app pod gunicorn eventlet (jako Procfile) v dočasném adresáři"""
+    env = {**os.environ, **upstream_env,
+           'PORT': str(port),
+           'DATABASE_PATH': os.path.join(workdir, 'radim_chat.db'),
+           'ADMIN_TOKEN': ADMIN_TOKEN,
+           'PYTHONPATH': REPO_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''),
+           'PYTHONUNBUFFERED': '1'}
+    env.pop('LLM_FAKE', None)       # LLM jde přes HTTP na fake upstream
+    command = [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '-w', '1',
+               '--bind', f'127.0.0.1:{port}', '--timeout', '120', '--pythonpath', REPO_ROOT, 'app:app']
+    # cwd = workdir: relativní radim_brain.db se nesmí zapisovat do repozitáře
+    return subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(base_url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError("app did not become ready")
+
+
+def server_stats(base_url):
+    """Stav hubu a LLM brány ze serveru po běhu (admin endpointy)"""
+    headers = {'X-Admin-Token': ADMIN_TOKEN}
+    out = {}
+    try:
+        blocking = requests.get(f"{base_url}/api/admin/blocking", headers=headers, timeout=10).json()
+        out['hub'] = {
+            'blocked_episodes': blocking.get('blocked_episodes'),
+            'loop_lag_ms': blocking.get('loop_lag_ms'),
+            'call_sites': blocking.get('call_sites', [])[:5],
+            'heartbeat_jitter_ms': (blocking.get('heartbeat') or {}).get('jitter_ms')
+        }
+        llm = requests.get(f"{base_url}/api/metrics/llm", timeout=10).json()
+        out['llm'] = {key: llm.get(key) for key in ('requests', 'errors', 'fallbacks')}
+    except (requests.RequestException, ValueError) as e:
+        out['error'] = str(e)
+    return out
+
+
+def git_revision():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                             cwd=REPO_ROOT, stderr=subprocess.DEVNULL, text=True).strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+# ============================================
+# POROVNÁNÍ
+# ============================================
+
+def compare(result, baseline, max_regression):
+    """Tabulka p95/propustnosti proti baseline; vrací seznam regresí"""
+    regressions = []
+    print(f"\n{'endpoint':<40} {'p95 base':>10} {'p95 now':>10} {'Δ%':>8} {'rps Δ%':>8}", file=sys.stderr)
+    for name, now in result['endpoints'].items():
+        base = baseline.get('endpoints', {}).get(name)
+        if not base:
+            continue
+        p95_base, p95_now = base['latency_ms']['p95'], now['latency_ms']['p95']
+        delta = (p95_now / p95_base - 1) * 100 if p95_base else 0.0
+        rps_delta = (now['throughput_rps'] / base['throughput_rps'] - 1) * 100 if base['throughput_rps'] else 0.0
+        flag = ''
+        enough = min(now['requests'], base['requests']) >= MIN_SAMPLES_FOR_COMPARE
+        if max_regression is not None and enough and delta > max_regression:
+            regressions.append(name)
+            flag = '  ⚠️'
+        print(f"{name:<40} {p95_base:>10.1f} {p95_now:>10.1f} {delta:>+8.1f} {rps_delta:>+8.1f}{flag}",
+              file=sys.stderr)
+    return regressions
+
+
+def parse_mix(spec):
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, (spec or '').split(',')):
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"unknown scenario: {name} (known: {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=30, help="měřené sekundy")
+    parser.add_argument('--warmup', type=float, default=3, help="sekundy před měřením")
+    parser.add_argument('--users', type=int, default=16, help="souběžní REST uživatelé")
+    parser.add_argument('--sockets', type=int, default=8, help="Socket.IO klienti")
+    parser.add_argument('--think-ms', type=float, default=200, help="pauza uživatele mezi akcemi")
+    parser.add_argument('--mix', default='', help="váhy scénářů, např. chat_send=20,stt=0")
+    parser.add_argument('--latency', default='', help="latence upstreamů v ms, např. gemini=700")
+    parser.add_argument('--errors', default='', help="chybovost upstreamů 0-1, např. claude=0.05")
+    parser.add_argument('--jitter', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', help="běžící server místo spuštění app.py (upstreamy si nastavte sami)")
+    parser.add_argument('--output', help="uložit JSON výsledek")
+    parser.add_argument('--compare', help="JSON dřívějšího běhu")
+    parser.add_argument('--max-regression', type=float, help="exit 1, když p95 vzroste o víc %%")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    config = UpstreamConfig(parse_spec(args.latency), args.jitter, parse_spec(args.errors), args.seed)
+    upstreams = FakeUpstreams(config).start()
+    workdir = tempfile.mkdtemp(prefix='radim-bench-')
+    process = None
+    log = open(os.path.join(workdir, 'server.log'), 'wb')
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            process = start_app(port, upstreams.env(), workdir, log)
+            try:
+                wait_ready(base_url, process)
+            except RuntimeError:
+                log.flush()
+                with open(log.name, 'rb') as f:
+                    sys.stderr.write(f.read()[-4000:].decode('utf-8', 'replace'))
+                raise
+
+        recorder = Recorder()
+        stop = threading.Event()
+        users = [VirtualUser(base_url, i, args.seed) for i in range(args.users)]
+        for user in users:
+            user.setup()
+
+        # websocket-client je volitelný transport pro socketio.Client
+        transports = ['websocket', 'polling'] if importlib.util.find_spec('websocket') else ['polling']
+        sockets = args.sockets if SOCKETIO_AVAILABLE else 0
+        conversation_ids = [user.conversation_id for user in users] or ['bench']
+
+        threads = [threading.Thread(target=run_user, args=(user, mix, recorder, stop, args.think_ms), daemon=True)
+                   for user in users]
+        threads += [threading.Thread(target=run_socket_user, daemon=True,
+                                     args=(base_url, i, conversation_ids, recorder, stop,
+                                           args.think_ms, args.seed, transports))
+                    for i in range(sockets)]
+        for thread in threads:
+            thread.start()
+
+        time.sleep(args.warmup)
+        recorder.start()
+        time.sleep(args.duration)
+        recorder.stop()
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=60)
+
+        elapsed, totals, endpoints = recorder.summary()
+        result = {
+            'benchmark': 'load',
+            **git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'config': {
+                'duration_s': args.duration, 'warmup_s': args.warmup, 'users': args.users,
+                'sockets': sockets, 'socket_transports': transports if sockets else [],
+                'think_ms': args.think_ms, 'seed': args.seed, 'mix': mix,
+                'upstream_latency_ms': config.latency, 'upstream_jitter': args.jitter,
+                'upstream_error_rate': config.error_rate, 'server': args.url or 'gunicorn eventlet -w 1'
+            },
+            'elapsed_s': elapsed,
+            'totals': totals,
+            'endpoints': endpoints,
+            'upstream_calls': dict(config.counts),
+            'server': server_stats(base_url)
+        }
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log.close()
+        upstreams.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            out.write(output + '\n')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        if regressions:
+            print(f"\n❌ p95 regression > {args.max_regression}%: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
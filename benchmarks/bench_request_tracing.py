@@ -0,0 +1,204 @@
+# ============================================
+# 📊 BENCHMARK: REQUEST TRACING
+# ============================================
+# Režie request_tracing (WSGI obal + SQLite spany) proti stejné aplikaci
+# bez tracingu, end-to-end A/B: stejný test client, soubor na disku,
+# spojení na požadavek jako app.py. Endpointy jsou kopie chat API z
+# app.py: GET historie (nejčastější požadavek), --write POST zprávy
+# (INSERT + UPDATE + commit; fsync na disku je řádově hlučnější než režie).
+# SQLite spany dostane jen vzorek požadavků (TRACE_SQL_SAMPLE, výchozí
+# každý 10.) - měří se tedy i s touto režií v poměru, v jakém běží.
+# overhead_pct je výsledek (cíl < 1 %), control_overhead_pct je táž
+# A/B metoda mezi dvěma netracovanými aplikacemi = šum měření.
+#
+# Spuštění z kořene repozitáře:
+#   python benchmarks/bench_request_tracing.py [--requests 200] [--repeats 60] [--write]
+
+import gc
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, g, jsonify, request
+
+from request_tracing import RequestTracer, sqlite_factory
+
+HISTORY_LIMIT = 50          # Výchozí limit GET /api/chat/messages/<id> v app.py
+
+
+def create_app(database, traced):
+    app = Flask(__name__)
+
+    def get_db():
+        if 'db' not in g:
+            if traced:
+                g.db = sqlite3.connect(database, factory=sqlite_factory())
+            else:
+                g.db = sqlite3.connect(database)
+            g.db.row_factory = sqlite3.Row
+        return g.db
+
+    @app.teardown_appcontext
+    def close_db(exception):
+        db = g.pop('db', None)
+        if db is not None:
+            db.close()
+
+    # Kopie get_messages z app.py - nejčastější požadavek chatu (načtení historie)
+    @app.route('/api/chat/messages/<conversation_id>', methods=['GET'])
+    def get_messages(conversation_id):
+        limit = request.args.get('limit', HISTORY_LIMIT, type=int)
+        db = get_db()
+        cursor = db.execute('''
+            SELECT * FROM chat_messages
+            WHERE conversation_id = ?
+            ORDER BY timestamp DESC LIMIT ?
+        ''', (conversation_id, limit))
+        messages = []
+        for row in cursor.fetchall():
+            msg = dict(row)
+            msg['reactions'] = json.loads(msg['reactions']) if msg['reactions'] else []
+            msg['read_by'] = json.loads(msg['read_by']) if msg['read_by'] else []
+            msg['metadata'] = json.loads(msg['metadata']) if msg['metadata'] else {}
+            messages.append(msg)
+        return jsonify({'success': True, 'messages': list(reversed(messages)), 'hasMore': len(messages) == limit})
+
+    # Zápisová část send_message z app.py (bez AI odpovědi a emitů)
+    @app.route('/api/chat/messages', methods=['POST'])
+    def send_message():
+        data = request.json
+        timestamp = datetime.utcnow().isoformat() + 'Z'
+        db = get_db()
+        db.execute('''
+            INSERT INTO chat_messages (id, conversation_id, sender_id, type, content, metadata, timestamp, read_by)
+            VALUES (?, ?, ?, 'text', ?, '{}', ?, ?)
+        ''', (os.urandom(8).hex(), data['conversationId'], data['senderId'], data['content'],
+              timestamp, json.dumps([data['senderId']])))
+        db.execute('''
+            UPDATE chat_conversations SET updated_at = ?, last_message = ? WHERE id = ?
+        ''', (timestamp, json.dumps({'content': data['content'][:50], 'sender_id': data['senderId']}),
+              data['conversationId']))
+        db.commit()
+        return jsonify({'success': True}), 201
+
+    if traced:
+        tracer = RequestTracer()
+        tracer.init_app(app)
+    return app
+
+
+def create_database(path):
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA journal_mode=WAL')     # Jako produkční radim_chat.db pod zátěží
+    db.executescript('''
+        CREATE TABLE chat_conversations (
+            id TEXT PRIMARY KEY, participants TEXT NOT NULL, type TEXT DEFAULT 'direct', name TEXT,
+            created_at TIMESTAMP, updated_at TIMESTAMP, last_message TEXT, settings TEXT DEFAULT '{}'
+        );
+        CREATE TABLE chat_messages (
+            id TEXT PRIMARY KEY, conversation_id TEXT NOT NULL, sender_id TEXT NOT NULL,
+            type TEXT DEFAULT 'text', content TEXT NOT NULL, reply_to TEXT, metadata TEXT DEFAULT '{}',
+            timestamp TIMESTAMP, status TEXT DEFAULT 'sent', reactions TEXT DEFAULT '[]',
+            read_by TEXT DEFAULT '[]', ai_generated INTEGER DEFAULT 0
+        );
+        CREATE INDEX idx_messages_conversation ON chat_messages(conversation_id);
+        CREATE INDEX idx_messages_timestamp ON chat_messages(timestamp DESC);
+    ''')
+    db.execute("INSERT INTO chat_conversations (id, participants) VALUES ('c1', '[\"senior\", \"radim\"]')")
+    db.executemany(
+        '''INSERT INTO chat_messages (id, conversation_id, sender_id, content, metadata, timestamp, read_by, ai_generated)
+           VALUES (?, 'c1', ?, ?, ?, ?, ?, ?)''',
+        [(f'm{i}', 'radim' if i % 2 else 'senior', f'Zpráva číslo {i}, dobrý den, jak se dnes máte?',
+          json.dumps({'ai_provider': 'gemini'} if i % 2 else {}), f'2026-01-01T00:{i // 60:02d}:{i % 60:02d}',
+          json.dumps(['senior', 'radim']), i % 2)
+         for i in range(200)]
+    )
+    db.commit()
+    db.close()
+    return path
+
+
+BLOCK = 10                  # Požadavků v jednom bloku jedné varianty
+
+
+def request_function(app, write=False):
+    """Jeden požadavek na aplikaci (test client, jako produkční provoz bez sítě)"""
+    client = app.test_client()
+    if write:
+        message = {'conversationId': 'c1', 'senderId': 'senior', 'content': 'Dobrý den, Radime'}
+        return lambda: client.post('/api/chat/messages', json=message)
+    return lambda: client.get('/api/chat/messages/c1')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=60)
+    parser.add_argument('--write', action='store_true')
+    args = parser.parse_args()
+
+    # control = druhá netracovaná aplikace: A/B plain proti plain ukáže
+    # šum měření, se kterým se režie tracingu porovnává.
+    names = ['plain', 'control', 'traced']
+    times = {name: [] for name in names}
+    ratios = {'traced': [], 'control': []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        databases = [create_database(os.path.join(tmp, f'{index}.db')) for index in range(len(names))]
+
+        # Šum na jediném vCPU je větší než měřená režie, proto:
+        # - aplikace i přiřazení souborů se v každém kole posunou - dvě stejné
+        #   aplikace se podle pořadí vzniku (rozmístění v paměti) i souboru
+        #   liší až o 1 %
+        # - varianty se v kole střídají po blocích BLOCK požadavků (tam a zpět),
+        #   výkyvy stroje tak zasáhnou všechny stejně
+        # - čas CPU vlákna (thread_time) - bez času, kdy CPU má jiný proces;
+        #   u --write tedy bez čekání na fsync
+        # Výsledkem je medián poměrů kol.
+        for i in range(args.repeats):
+            order = names[i % 3:] + names[:i % 3]
+            send = {
+                name: request_function(create_app(databases[(names.index(name) + i) % 3], name == 'traced'),
+                                       args.write)
+                for name in order
+            }
+            for name in order:
+                for _ in range(20):
+                    send[name]()
+            gc.collect()
+            round_s = dict.fromkeys(names, 0.0)
+            for block in range(args.requests // BLOCK):
+                for name in (order if block % 2 else order[::-1]):
+                    request_once = send[name]
+                    start = time.thread_time()
+                    for _ in range(BLOCK):
+                        request_once()
+                    round_s[name] += time.thread_time() - start
+            for name in names:
+                times[name].append(round_s[name] / args.requests * 1e6)
+            for name in ratios:
+                ratios[name].append(round_s[name] / round_s['plain'])
+
+    def median(values):
+        return sorted(values)[len(values) // 2]
+
+    print(json.dumps({
+        'requests_per_round': args.requests,
+        'rounds': args.repeats,
+        'write': args.write,
+        'plain_cpu_us_per_request': round(median(times['plain']), 1),
+        'traced_cpu_us_per_request': round(median(times['traced']), 1),
+        'control_overhead_pct': round((median(ratios['control']) - 1) * 100, 2),
+        'overhead_pct': round((median(ratios['traced']) - 1) * 100, 2)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# ============================================
+# 📊 BENCHMARK: VOICE SESSION STORE
+# ============================================
+# Paměť hlasových session po dlouhém běhu dynu: původní nekonečný dict
+# s rostoucím seznamem konverzace vs. session_store (__slots__, deque
+# posledních výměn, TTL + strop počtu). Simuluje --sessions různých
+# session_id, každá s --chats výměnami; tracemalloc měří živou paměť.
+#
+# Spuštění z kořene repozitáře:
+#   python benchmarks/bench_session_store.py [--sessions 20000] [--chats 30]
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import SessionStore, SESSION_MAX
+
+QUESTION = "Radime, jaké bude dnes odpoledne počasí a mám si vzít deštník?"
+ANSWER = "Odpoledne bude polojasno kolem patnácti stupňů, deštník si pro jistotu vezměte."
+
+
+def legacy(sessions, chats):
+    """Původní voice_runtime_routes: dict session + seznam konverzace"""
+    store = {}
+    for i in range(sessions):
+        session = store.setdefault(f"s{i}", {
+            'state': 'idle', 'C': 5.0, 'kappa': 0.8, 'alpha': 0.0, 'last_tts_text': '',
+            'conversation': [], 'wake_count': 0, 'created': datetime.now().isoformat()
+        })
+        for turn in range(chats):
+            session['last_tts_text'] = f"{ANSWER} {turn}"
+            session['conversation'].append({'role': 'user', 'content': f"{QUESTION} {turn}"})
+            session['conversation'].append({'role': 'assistant', 'content': f"{ANSWER} {turn}"})
+    return store
+
+
+def bounded(sessions, chats):
+    store = SessionStore('memory')
+    for i in range(sessions):
+        session = store.get(f"s{i}")
+        for turn in range(chats):
+            session.last_tts_text = f"{ANSWER} {turn}"
+            session.add_turn(f"{QUESTION} {turn}", f"{ANSWER} {turn}")
+            store.save(session)
+    return store
+
+
+def measure(fn, sessions, chats):
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = fn(sessions, chats)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(store) if isinstance(store, dict) else store.stats()['sessions']
+    return store, {'sessions': count, 'live_mb': round(current / 1e6, 1), 'peak_mb': round(peak / 1e6, 1),
+                   'ops_per_s': round(sessions * chats / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=20000)
+    parser.add_argument('--chats', type=int, default=30)
+    args = parser.parse_args()
+
+    _, before = measure(legacy, args.sessions, args.chats)
+    store, after = measure(bounded, args.sessions, args.chats)
+    after['reported_memory_mb'] = round(store.stats()['memory_bytes'] / 1e6, 1)
+
+    print(json.dumps({
+        'sessions_seen': args.sessions,
+        'chats_per_session': args.chats,
+        'max_sessions': SESSION_MAX,
+        'legacy_dict': before,
+        'session_store': after,
+        'live_memory_reduction': round(before['live_mb'] / after['live_mb'], 1) if after['live_mb'] else None
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
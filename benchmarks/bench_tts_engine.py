@@ -0,0 +1,85 @@
+# ============================================
+# 📊 BENCHMARK: TTS ENGINE
+# ============================================
+# Latence jedné krátké Radimovy odpovědi: studený REST (nové spojení na
+# každý dotaz, původní chování) proti persistent enginu (keep-alive pool,
+# předehřáté spojení). Proti lokálnímu fake Azure TTS s cenou nového
+# spojení --connect-ms (TCP + TLS + session setup; EU -> eastus bývá
+# 100-300 ms, lokálně by byla nulová).
+#
+# Spuštění z kořene repozitáře:
+#   python benchmarks/bench_tts_engine.py [--utterances 40] [--connect-ms 150] [--latency-ms 120]
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_upstreams import FakeUpstreams, UpstreamConfig
+from tts_engine import AzureTTSEngine
+
+REPLIES = [
+    "Dobré ráno, jak jste se vyspal?",
+    "Nezapomeňte na léky.",
+    "To je moc hezké.",
+    "Venku je dnes krásně, půjdeme na procházku?",
+]
+
+SSML = """<speak version='1.0' xml:lang='cs-CZ'><voice name='cs-CZ-AntoninNeural'>
+<prosody rate='0.85' pitch='-5%'>{text}</prosody></voice></speak>"""
+
+
+def run(engine, base_url, count):
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        engine.synthesize(SSML.format(text=REPLIES[i % len(REPLIES)]), base_url, 'bench')
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        'p50_ms': round(latencies[len(latencies) // 2], 1),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 1),
+        'mean_ms': round(sum(latencies) / len(latencies), 1),
+        'connections_opened': engine.connections_opened()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--utterances', type=int, default=40)
+    parser.add_argument('--connect-ms', type=float, default=150)
+    parser.add_argument('--latency-ms', type=float, default=120)
+    args = parser.parse_args()
+
+    config = UpstreamConfig({'azure-tts': args.latency_ms}, jitter=0.0, connect_ms=args.connect_ms)
+    upstreams = FakeUpstreams(config).start()
+    base_url = f"{upstreams.base_url}/azure-tts"
+    try:
+        cold = run(AzureTTSEngine('rest', keepwarm=0), base_url, args.utterances)
+        cold['server_connections'] = config.connections
+
+        before = config.connections
+        engine = AzureTTSEngine('persistent', keepwarm=0)
+        engine.probe(base_url, 'bench')         # předehřátí jako TTS.prewarm při startu
+        warm = run(engine, base_url, args.utterances)
+        warm['server_connections'] = config.connections - before
+    finally:
+        upstreams.stop()
+
+    print(json.dumps({
+        'utterances': args.utterances,
+        'connect_ms': args.connect_ms,
+        'upstream_latency_ms': args.latency_ms,
+        'rest': cold,
+        'persistent': warm,
+        'p50_speedup': round(cold['p50_ms'] / warm['p50_ms'], 2),
+        'p50_saved_ms': round(cold['p50_ms'] - warm['p50_ms'], 1)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
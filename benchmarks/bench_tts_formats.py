@@ -0,0 +1,94 @@
+# ============================================
+# 📊 BENCHMARK: TTS OUTPUT FORMATS
+# ============================================
+# Velikost odpovědi a doba přenosu k seniorovi na mobilním připojení pro
+# každý výstupní formát (tts_engine.OUTPUT_FORMATS): binární audio
+# (/api/azure/tts, /api/speech/synthesize/stream) i base64 v JSON
+# (/api/radim/voice/speak, /api/speech/synthesize). Audio z lokálního
+# fake Azure TTS (velikost podle datového toku formátu), přenos =
+# RTT + bajty / --link-kbps (výchozí 1 Mbit/s ~ slabé 3G/EDGE+).
+#
+# Spuštění z kořene repozitáře:
+#   python benchmarks/bench_tts_formats.py [--link-kbps 1000] [--rtt-ms 150]
+
+import os
+import sys
+import json
+import base64
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_upstreams import FakeUpstreams, UpstreamConfig
+from tts_engine import AzureTTSEngine, OUTPUT_FORMATS
+
+REPLIES = [
+    "Dobré ráno, jak jste se vyspal?",
+    "Nezapomeňte si vzít odpolední léky a napít se vody.",
+    "Venku je dnes krásně, půjdeme spolu na krátkou procházku kolem domu?",
+    "Vaše dcera volala, že přijede v neděli odpoledne i s vnoučaty.",
+]
+
+# Stejný obal jako speech_routes.synthesize_ssml (fake server odečítá ~250 znaků)
+SSML = """<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis"
+       xmlns:mstts="https://www.w3.org/2001/mstts" xml:lang="cs-CZ">
+    <voice name="cs-CZ-AntoninNeural">
+        <mstts:express-as style="friendly" styledegree="1.2">
+            <prosody rate="0.85" pitch="-5%" volume="loud">{text}</prosody>
+        </mstts:express-as>
+    </voice>
+</speak>"""
+
+
+def transfer_ms(size, link_kbps, rtt_ms):
+    return rtt_ms + size * 8 / link_kbps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--link-kbps', type=float, default=1000)
+    parser.add_argument('--rtt-ms', type=float, default=150)
+    args = parser.parse_args()
+
+    upstreams = FakeUpstreams(UpstreamConfig({'azure-tts': 5}, jitter=0.0)).start()
+    base_url = f"{upstreams.base_url}/azure-tts"
+    engine = AzureTTSEngine('persistent', keepwarm=0)
+    results = {}
+    try:
+        for name in OUTPUT_FORMATS:
+            audio = json_body = 0
+            content_types = set()
+            for text in REPLIES:
+                result = engine.synthesize(SSML.format(text=text), base_url, 'bench', output_format=name)
+                content_types.add(result.content_type)
+                audio += len(result.audio)
+                json_body += len(json.dumps({'success': True, 'audio': base64.b64encode(result.audio).decode(),
+                                             'format': name, 'content_type': result.content_type}))
+            audio //= len(REPLIES)
+            json_body //= len(REPLIES)
+            results[name] = {
+                'content_type': ', '.join(sorted(content_types)),
+                'audio_bytes': audio,
+                'json_base64_bytes': json_body,
+                'transfer_ms_binary': round(transfer_ms(audio, args.link_kbps, args.rtt_ms)),
+                'transfer_ms_json': round(transfer_ms(json_body, args.link_kbps, args.rtt_ms))
+            }
+    finally:
+        upstreams.stop()
+
+    baseline = results['mp3']
+    for name, row in results.items():
+        row['size_reduction'] = round(baseline['audio_bytes'] / row['audio_bytes'], 2)
+        row['transfer_speedup_json'] = round(baseline['transfer_ms_json'] / row['transfer_ms_json'], 2)
+
+    print(json.dumps({
+        'replies': len(REPLIES),
+        'link_kbps': args.link_kbps,
+        'rtt_ms': args.rtt_ms,
+        'formats': results
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# ============================================
+# 📊 BENCHMARK: HLASOVÝ TAH - ROUND TRIPY
+# ============================================
+# Doba od konce řeči seniora po první bajt odpovědi Radima:
+# - původní tok klienta: /api/voice/metrics, /state (wake_detected,
+#   voice_valid, speech_end), /chat, /state (response_ready),
+#   /api/speech/synthesize - 7 HTTP požadavků za sebou
+# - POST /api/voice/turn - jeden požadavek, první věta audia ve streamu
+# Serverový čas se měří (Flask test client nad fake upstreamy - Gemini,
+# Azure TTS), síť se připočítá jako --rtt-ms za každý požadavek (tablet
+# na Wi-Fi/LTE ~100-300 ms). Fake upstreamy běží v samostatném procesu:
+# import app.py zapne eventlet monkey patch a vlákna serveru ve stejném
+# procesu by se na hub nedostala.
+#
+# Spuštění z kořene repozitáře:
+#   python benchmarks/bench_voice_turn.py [--rtt-ms 150] [--repeat 5] [--latency gemini=700,azure-tts=350]
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+QUESTIONS = {
+    'local_answer': "Radime, kolik je hodin?",
+    'llm_answer': "Radime, co mám dnes dělat, když venku prší a jsem sám doma?",
+}
+
+
+def legacy_turn(client, session_id, text):
+    """Původní tok klienta - vrací počet požadavků"""
+    base = {'session_id': session_id, 'sensors': {}, 'bio': {}}
+    client.post('/api/voice/metrics', json={**base, 'user_text': text})
+    for event in ('wake_detected', 'voice_valid', 'speech_end'):
+        client.post('/api/voice/state', json={'session_id': session_id, 'event': event})
+    reply = client.post('/api/voice/chat', json={'session_id': session_id,
+                                                'messages': [{'role': 'user', 'content': text}]}).json['response']
+    client.post('/api/voice/state', json={'session_id': session_id, 'event': 'response_ready', 'data': {'text': reply}})
+    client.post('/api/speech/synthesize', json={'text': reply, 'transport': 'binary'})
+    return 7
+
+
+def combined_turn(client, session_id, text):
+    """/turn - čas do prvního kusu audia (stream se dočte mimo měření)"""
+    response = client.post('/api/voice/turn', json={'session_id': session_id, 'user_text': text},
+                           buffered=False)
+    next(iter(response.response), b'')
+    first = time.perf_counter()
+    b''.join(response.response)
+    return 1, first
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rtt-ms', type=float, default=150)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', default='gemini=700,azure-tts=350')
+    parser.add_argument('--port', type=int, default=8911)
+    args = parser.parse_args()
+
+    upstreams = subprocess.Popen([sys.executable, '-u', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                    'fake_upstreams.py'),
+                                  '--port', str(args.port), '--latency', args.latency, '--jitter', '0'],
+                                 stdout=subprocess.PIPE, text=True)
+    for line in upstreams.stdout:
+        if line.startswith('export '):
+            key, _, value = line[len('export '):].strip().partition('=')
+            os.environ[key] = value
+            if key == 'WP_APP_PASSWORD':
+                break
+    os.environ.setdefault('PHRASE_BANK_BUILD', 'off')
+    import app as radim_app
+    client = radim_app.app.test_client()
+
+    results = {}
+    try:
+        for name, text in QUESTIONS.items():
+            legacy, combined = [], []
+            for i in range(args.repeat):
+                started = time.perf_counter()
+                requests_made = legacy_turn(client, f"legacy-{name}-{i}", text)
+                legacy.append((time.perf_counter() - started) * 1000 + requests_made * args.rtt_ms)
+
+                started = time.perf_counter()
+                requests_made, first = combined_turn(client, f"turn-{name}-{i}", text)
+                combined.append((first - started) * 1000 + requests_made * args.rtt_ms)
+            results[name] = {
+                'legacy_requests': 7,
+                'legacy_first_audio_ms': round(statistics.median(legacy), 1),
+                'turn_requests': 1,
+                'turn_first_audio_ms': round(statistics.median(combined), 1),
+                'saved_ms': round(statistics.median(legacy) - statistics.median(combined), 1)
+            }
+    finally:
+        upstreams.terminate()
+        upstreams.wait()
+
+    print(json.dumps({'rtt_ms': args.rtt_ms, 'latency': args.latency, 'repeat': args.repeat,
+                      'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
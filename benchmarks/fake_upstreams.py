@@ -0,0 +1,335 @@
+# ============================================
+# 🎭 BENCHMARK: FAKE UPSTREAMS
+# ============================================
+# Lokální HTTP server napodobující externí služby, na které backend volá.
+# Každý poskytovatel má vlastní prefix cesty a nastavitelnou latenci,
+# jitter a chybovost; --connect-ms přidá cenu nového spojení (TCP + TLS +
+# inicializace session u skutečné služby, lokálně jinak zadarmo):
+#
+#   /gemini      GEMINI_BASE_URL      generateContent + streamGenerateContent (SSE)
+#   /claude      ANTHROPIC_BASE_URL   /v1/messages (JSON i stream)
+#   /azure-tts   AZURE_TTS_BASE_URL   /cognitiveservices/v1 (audio), voices/list
+#   /azure-stt   AZURE_STT_BASE_URL   /speech/recognition/conversation/...
+#   /elevenlabs  ELEVENLABS_BASE_URL  /v1/text-to-speech/<voice>
+#   /cloudinary  CLOUDINARY_UPLOAD_PREFIX  /v1_1/<cloud>/<type>/upload
+#   /wordpress   WP_URL               /wp-json/wp/v2/users, kafanek-brain/*
+#
+# Samostatně (pro ruční vývoj bez klíčů):
+#   python benchmarks/fake_upstreams.py --port 8900 --latency gemini=600,claude=800
+# vypíše proměnné prostředí, se kterými app.py volá tento server.
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# Typické latence produkčních služeb (ms) - přepsatelné --latency
+DEFAULT_LATENCY_MS = {
+    'gemini': 700,
+    'claude': 900,
+    'azure-tts': 350,
+    'azure-stt': 450,
+    'elevenlabs': 600,
+    'cloudinary': 400,
+    'wordpress': 150,
+}
+PROVIDERS = tuple(DEFAULT_LATENCY_MS)
+
+# Audio: velikost podle datového toku formátu, senior tempo ~ 12 znaků/s
+# (MP3 128 kbit/s ~ 16 kB/s; Azure Opus ~ 24 kbit/s)
+CHARS_PER_SECOND = 12
+MP3_FRAME_HEADER = b'\xff\xf3\x64\xc4'
+OPUS_KBPS = 24
+AZURE_CONTAINERS = {'ogg': ('audio/ogg; codecs=opus', b'OggS'),
+                    'webm': ('audio/webm; codecs=opus', b'\x1a\x45\xdf\xa3')}
+STREAM_CHUNKS = 5
+
+REPLIES = [
+    "Dobrý den, jsem tady pro vás. Jak se dnes máte?",
+    "To je moc hezké, řekněte mi o tom víc.",
+    "Nezapomeňte se napít vody a vzít si odpolední léky.",
+    "Venku je krásně, možná by se hodila krátká procházka.",
+]
+
+
+def parse_spec(spec, cast=float):
+    """'gemini=600,claude=800' -> {'gemini': 600.0, 'claude': 800.0}"""
+    out = {}
+    for item in filter(None, (spec or '').split(',')):
+        name, _, value = item.partition('=')
+        if name.strip() not in DEFAULT_LATENCY_MS:
+            raise ValueError(f"unknown provider: {name}")
+        out[name.strip()] = cast(value)
+    return out
+
+
+class UpstreamConfig:
+    """Latence (ms), relativní jitter a chybovost (HTTP 503) po poskytovatelích"""
+
+    def __init__(self, latency=None, jitter=0.2, error_rate=None, seed=42, connect_ms=0.0):
+        self.latency = {**DEFAULT_LATENCY_MS, **(latency or {})}
+        self.jitter = jitter
+        self.error_rate = error_rate or {}
+        self.connect_ms = connect_ms
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {name: 0 for name in PROVIDERS}
+
+    def draw(self, provider):
+        """(zpoždění v s, selhat?) - seeded, reprodukovatelné mezi běhy"""
+        with self._lock:
+            self.counts[provider] += 1
+            spread = self._random.uniform(1 - self.jitter, 1 + self.jitter)
+            failed = self._random.random() < self.error_rate.get(provider, 0.0)
+        return self.latency[provider] * spread / 1000.0, failed
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'       # keep-alive jako skutečné API
+    disable_nagle_algorithm = True      # TCP_NODELAY jako produkční servery (jinak +40 ms delayed ACK)
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.config._lock:
+            self.config.connections += 1
+        if self.config.connect_ms:
+            time.sleep(self.config.connect_ms / 1000.0)
+
+    # ------------------------------------------------------------------
+
+    def _body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            # Streamovaný upload (stt_stream -> Azure STT)
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                if not size:
+                    self.rfile.readline()
+                    return b''.join(parts)
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, body, content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sse(self, events, delay):
+        """SSE odpověď: první událost po delay, zbytek rozložený do STREAM_CHUNKS"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        time.sleep(delay * 0.4)
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(delay * 0.6 / max(1, len(events)))
+        self.close_connection = True
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_HEAD(self):
+        """Keep-warm/probe (tts_engine) - jen hlavičky, bez latence služby"""
+        provider = urlsplit(self.path).path.lstrip('/').partition('/')[0]
+        self.send_response(200 if provider in PROVIDERS else 404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _dispatch(self, method):
+        path = urlsplit(self.path).path
+        provider, _, rest = path.lstrip('/').partition('/')
+        body = self._body() if method == 'POST' else b''
+        if provider not in PROVIDERS:
+            return self._send(404, {'error': f'unknown upstream {provider}'})
+        delay, failed = self.config.draw(provider)
+        if failed:
+            time.sleep(delay / 4)
+            return self._send(503, {'error': 'fake upstream failure'})
+        handler = getattr(self, '_' + provider.replace('-', '_'))
+        return handler('/' + rest, body, delay)
+
+    # ------------------------------------------------------------------
+
+    def _reply(self, body):
+        seed = sum(body[-64:]) if body else 0
+        return REPLIES[seed % len(REPLIES)]
+
+    def _gemini(self, path, body, delay):
+        text = self._reply(body)
+        usage = {'promptTokenCount': max(1, len(body) // 4), 'candidatesTokenCount': len(text) // 4}
+        if ':streamGenerateContent' in path:
+            words = text.split(' ')
+            step = max(1, len(words) // STREAM_CHUNKS)
+            events = [{'candidates': [{'content': {'parts': [{'text': ' '.join(words[i:i + step]) + ' '}]}}]}
+                      for i in range(0, len(words), step)]
+            events[-1]['usageMetadata'] = usage
+            return self._sse(events, delay)
+        time.sleep(delay)
+        return self._send(200, {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'},
+                                                'finishReason': 'STOP'}], 'usageMetadata': usage})
+
+    def _claude(self, path, body, delay):
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            return self._send(400, {'error': 'invalid json'})
+        text = self._reply(body)
+        usage = {'input_tokens': max(1, len(body) // 4), 'output_tokens': len(text) // 4}
+        if request.get('stream'):
+            words = text.split(' ')
+            events = [{'type': 'message_start', 'message': {'usage': {'input_tokens': usage['input_tokens'],
+                                                                      'output_tokens': 1}}}]
+            events += [{'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': word + ' '}}
+                       for word in words]
+            events.append({'type': 'message_delta', 'usage': {'output_tokens': usage['output_tokens']}})
+            return self._sse(events, delay)
+        time.sleep(delay)
+        return self._send(200, {'id': 'msg_fake', 'type': 'message', 'role': 'assistant',
+                                'model': request.get('model'), 'content': [{'type': 'text', 'text': text}],
+                                'stop_reason': 'end_turn', 'usage': usage})
+
+    def _audio(self, chars, delay, kbps=128, content_type='audio/mpeg', magic=MP3_FRAME_HEADER):
+        time.sleep(delay)
+        size = max(256, chars * kbps * 125 // CHARS_PER_SECOND)
+        return self._send(200, magic + bytes(size - len(magic)), content_type)
+
+    def _azure_tts(self, path, body, delay):
+        if path.endswith('/voices/list'):
+            time.sleep(delay / 4)
+            return self._send(200, [{'ShortName': 'cs-CZ-AntoninNeural', 'Locale': 'cs-CZ'},
+                                    {'ShortName': 'cs-CZ-VlastaNeural', 'Locale': 'cs-CZ'}])
+        # SSML obal ~ 250 znaků navíc proti vlastnímu textu
+        chars = max(1, len(body) - 250)
+        output_format = self.headers.get('X-Microsoft-OutputFormat', 'audio-16khz-128kbitrate-mono-mp3')
+        container = output_format.partition('-')[0]
+        if container in AZURE_CONTAINERS:
+            content_type, magic = AZURE_CONTAINERS[container]
+            return self._audio(chars, delay, OPUS_KBPS, content_type, magic)
+        match = re.search(r'(\d+)kbitrate', output_format)
+        return self._audio(chars, delay, int(match.group(1)) if match else 128)
+
+    def _azure_stt(self, path, body, delay):
+        time.sleep(delay)
+        if not body:
+            return self._send(200, {'RecognitionStatus': 'NoMatch'})
+        text = 'Dobrý den Radime, jaké bude dnes počasí?'
+        return self._send(200, {'RecognitionStatus': 'Success', 'DisplayText': text,
+                                'NBest': [{'Confidence': 0.93, 'Lexical': text.lower(), 'Display': text}]})
+
+    def _elevenlabs(self, path, body, delay):
+        try:
+            chars = len(json.loads(body or b'{}').get('text', ''))
+        except ValueError:
+            return self._send(400, {'detail': 'invalid json'})
+        # ?output_format=mp3_22050_32 (výchozí mp3_44100_128)
+        output_format = parse_qs(urlsplit(self.path).query).get('output_format', ['mp3_44100_128'])[0]
+        kbps = int(output_format.rpartition('_')[2]) if output_format.startswith('mp3_') else 128
+        return self._audio(chars, delay, kbps)
+
+    def _cloudinary(self, path, body, delay):
+        time.sleep(delay)
+        parts = path.strip('/').split('/')      # v1_1/<cloud>/<type>/upload
+        cloud = parts[1] if len(parts) > 1 else 'bench'
+        resource_type = parts[2] if len(parts) > 2 else 'image'
+        public_id = f"radim-chat/fake{self.config.counts['cloudinary']}"
+        return self._send(200, {
+            'public_id': public_id, 'format': 'webm' if resource_type == 'video' else 'jpg',
+            'resource_type': resource_type, 'bytes': len(body),
+            'secure_url': f"https://res.cloudinary.com/{cloud}/{resource_type}/upload/{public_id}",
+            'duration': 3.2 if resource_type == 'video' else None, 'width': 640, 'height': 480
+        })
+
+    def _wordpress(self, path, body, delay):
+        time.sleep(delay)
+        if path.startswith('/wp-json/wp/v2/users'):
+            return self._send(200, [{'id': 7, 'name': 'Benchmark Senior', 'slug': 'bench',
+                                     'avatar_urls': {'96': 'https://example.invalid/avatar.png'}}])
+        if path.startswith('/wp-json/wp/v2/posts'):
+            return self._send(200, [{'id': 1, 'title': {'rendered': 'Fake post'}}])
+        return self._send(200, {'status': 'ok', 'source': 'fake-wordpress'})
+
+
+class FakeUpstreams:
+    """Server v daemon vlákně; env() = proměnné pro app.py"""
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.config = config or UpstreamConfig()
+        handler = type('Handler', (_Handler,), {'config': self.config})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fake-upstreams', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def env(self):
+        base = self.base_url
+        return {
+            'GEMINI_API_KEY': 'bench', 'GEMINI_BASE_URL': f"{base}/gemini",
+            'ANTHROPIC_API_KEY': 'bench', 'ANTHROPIC_BASE_URL': f"{base}/claude",
+            'AZURE_SPEECH_KEY': 'bench', 'AZURE_TTS_KEY': 'bench',
+            'AZURE_TTS_BASE_URL': f"{base}/azure-tts", 'AZURE_STT_BASE_URL': f"{base}/azure-stt",
+            'ELEVENLABS_API_KEY': 'bench', 'ELEVENLABS_BASE_URL': f"{base}/elevenlabs",
+            'CLOUDINARY_CLOUD_NAME': 'bench', 'CLOUDINARY_API_KEY': 'bench',
+            'CLOUDINARY_API_SECRET': 'bench', 'CLOUDINARY_UPLOAD_PREFIX': f"{base}/cloudinary",
+            'WP_URL': f"{base}/wordpress", 'WP_USER': 'bench', 'WP_APP_PASSWORD': 'bench',
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', default='', help="ms po poskytovatelích: gemini=600,claude=800")
+    parser.add_argument('--errors', default='', help="chybovost 0-1: gemini=0.05")
+    parser.add_argument('--jitter', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--connect-ms', type=float, default=0.0, help="cena nového spojení")
+    args = parser.parse_args()
+
+    config = UpstreamConfig(parse_spec(args.latency), args.jitter, parse_spec(args.errors), args.seed,
+                            args.connect_ms)
+    upstreams = FakeUpstreams(config, port=args.port).start()
+    print(f"🎭 Fake upstreams on {upstreams.base_url} - latency ms: {json.dumps(config.latency)}")
+    for key, value in upstreams.env().items():
+        print(f"export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        upstreams.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,17 +9,25 @@ Version: 1.1.0 (Flask) + Emotion Analysis
 import os
 import json
 import re
+import hashlib
 import logging
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 
-# Anthropic Claude SDK
-try:
-    from anthropic import Anthropic
-    ANTHROPIC_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_AVAILABLE = False
-    print("⚠️ Anthropic SDK not installed. Run: pip install anthropic")
+from response_cache import ResponseCache, hour_bucket
+from content_pool import ContentPool, all_pool_stats
+from prompt_coalescing import PromptCoalescer, reusable_intent
+from semantic_cache import SemanticCache
+from radim_orchestrator import detect_intent
+from local_answers import LocalAnswerEngine, LOCAL_TZ
+from keyword_matcher import CLASSIFIER
+
+# Claude přes společnou LLM bránu (pooling, retry, metering)
+from llm_gateway import LLM, CLAUDE_HAIKU_MODEL
+from llm_scheduler import lane_for_intent
+from llm_metrics import METRICS
+from phrase_bank import PHRASE_BANK
+from request_tracing import admin_required
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +41,16 @@ claude_bp = Blueprint('claude', __name__, url_prefix='/api/claude')
 ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
 CLAUDE_MODEL = os.environ.get('CLAUDE_MODEL', 'claude-3-5-sonnet-20241022')
 
+# Cache pro web search odpovědi - klíč (endpoint, lokace/kategorie, hodina)
+WEATHER_CACHE = ResponseCache('weather', ttl=1200, stale_ttl=1800)
+NEWS_CACHE = ResponseCache('news', ttl=3600, stale_ttl=1800)
+
+# Single-flight pro /chat - dotaz nemá historii ani profil, jen zprávu + denní prompt
+CHAT_COALESCER = PromptCoalescer('claude_chat')
+
+# Sémantická cache pro FAQ parafráze ("kdy mám vzít léky", "co je RadimCare")
+SEMANTIC_CACHE = SemanticCache('claude_chat')
+
 # České jmeniny - kompletní kalendář
 NAMEDAY_CALENDAR = {
     1: {1: 'Nový rok', 2: 'Karina', 3: 'Radmila', 4: 'Diana', 5: 'Dalimil', 6: 'Tři králové', 7: 'Vilma', 8: 'Čestmír', 9: 'Vladan', 10: 'Břetislav', 11: 'Bohdana', 12: 'Pravoslav', 13: 'Edita', 14: 'Radovan', 15: 'Alice', 16: 'Ctirad', 17: 'Drahoslav', 18: 'Vladislav', 19: 'Doubravka', 20: 'Ilona', 21: 'Běla', 22: 'Slavomír', 23: 'Zdeněk', 24: 'Milena', 25: 'Miloš', 26: 'Zora', 27: 'Ingrid', 28: 'Otýlie', 29: 'Zdislava', 30: 'Robin', 31: 'Marika'},
@@ -102,16 +120,14 @@ Rozumíš: neckband biofeedback, Azure TTS (Antonín), smart home, RADIM matemat
 # ============================================================================
 
 def get_claude_client():
-    """Get Anthropic client"""
-    if not ANTHROPIC_AVAILABLE:
+    """Claude klient přes LLM bránu (messages.create jako Anthropic SDK)"""
+    if not LLM.available('claude'):
         return None
-    if not ANTHROPIC_API_KEY:
-        return None
-    return Anthropic(api_key=ANTHROPIC_API_KEY)
+    return LLM.claude_client()
 
-def get_today_info():
-    """Get today's date info"""
-    now = datetime.now()
+def get_today_info(now=None):
+    """Get today's date info (české datum - server běží v UTC)"""
+    now = now or datetime.now(LOCAL_TZ)
     day_names = ['Pondělí', 'Úterý', 'Středa', 'Čtvrtek', 'Pátek', 'Sobota', 'Neděle']
     month_names = ['ledna', 'února', 'března', 'dubna', 'května', 'června', 
                    'července', 'srpna', 'září', 'října', 'listopadu', 'prosince']
@@ -133,17 +149,52 @@ def extract_text_from_response(response):
             text_parts.append(block.text)
     return "\n".join(text_parts)
 
-def get_greeting():
-    """Získat pozdrav podle denní doby"""
-    hour = datetime.now().hour
+GREETINGS = {
+    'morning': "Dobré ráno! ☀️",
+    'afternoon': "Dobré odpoledne! 🌤️",
+    'evening': "Dobrý večer! 🌙",
+    'night': "Dobrou noc! 🌟"
+}
+
+def get_greeting(now=None):
+    """Získat pozdrav podle denní doby (v českém čase)"""
+    hour = (now or datetime.now(LOCAL_TZ)).hour
     if 5 <= hour < 12:
-        return "Dobré ráno! ☀️"
+        return GREETINGS['morning']
     elif 12 <= hour < 18:
-        return "Dobré odpoledne! 🌤️"
+        return GREETINGS['afternoon']
     elif 18 <= hour < 22:
-        return "Dobrý večer! 🌙"
+        return GREETINGS['evening']
     else:
-        return "Dobrou noc! 🌟"
+        return GREETINGS['night']
+
+# Konstantní odpovědi - předrenderované v phrase_bank
+CHAT_ERROR_RESPONSE = "Promiňte, něco se pokazilo. Zkuste to prosím znovu."
+STORY_ERROR_CONTENT = "Nepodařilo se vytvořit příběh."
+PHRASE_BANK.add(list(GREETINGS.values()), CHAT_ERROR_RESPONSE, STORY_ERROR_CONTENT)
+
+# Záměr zprávy v /chat (pořadí = priorita)
+CHAT_INTENT_KEYWORDS = {
+    "weather": ["počasí", "teplota", "prší"],
+    "news": ["zprávy", "novinky"],
+    "quiz": ["kvíz", "otázky"],
+    "story": ["příběh", "povídka"]
+}
+
+CLASSIFIER.register('chat_intent', CHAT_INTENT_KEYWORDS)
+
+# Lokální odpovědi (svátek, datum, čas, pozdrav) před voláním LLM
+LOCAL_ANSWERS = LocalAnswerEngine(NAMEDAY_CALENDAR, get_greeting)
+
+def semantic_cache_intent(message, chat_intent):
+    """
+    Záměr pro sémantickou cache: bezpečnost, zdraví a úkoly se necachují
+    nikdy (INTENT_TTLS = 0), jinak záměr z /chat (weather, news, ...).
+    """
+    base_intent = detect_intent(message)
+    if base_intent in ('safety', 'task', 'health', 'story'):
+        return base_intent
+    return chat_intent
 
 # ============================================================================
 # ROUTES
@@ -157,6 +208,14 @@ def health_check():
         "service": "Claude AI for RadimCare",
         "model": CLAUDE_MODEL,
         "anthropic_configured": bool(ANTHROPIC_API_KEY),
+        "cache": {
+            "weather": WEATHER_CACHE.stats(),
+            "news": NEWS_CACHE.stats(),
+            "semantic": SEMANTIC_CACHE.stats()
+        },
+        "coalescing": CHAT_COALESCER.stats(),
+        "local_answers": LOCAL_ANSWERS.stats(),
+        "gateway": LLM.stats(),
         "timestamp": datetime.utcnow().isoformat()
     })
 
@@ -189,6 +248,17 @@ def chat_with_radim():
                 "timestamp": datetime.utcnow().isoformat()
             })
         
+        # Deterministické dotazy - bez volání Claude
+        local = LOCAL_ANSWERS.answer(message)
+        if local:
+            return jsonify({
+                "success": True,
+                "response": local[1],
+                "intent": local[0],
+                "local": True,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        
         client = get_claude_client()
         
         if not client:
@@ -218,28 +288,33 @@ def chat_with_radim():
                 "max_uses": 3
             }]
         
-        # Volání Claude API
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=1024,
-            system=system,
-            tools=tools,
-            messages=[{"role": "user", "content": message}]
-        )
+        # Detekovat intent
+        intent = CLASSIFIER.first(message, 'chat_intent') or "general"
         
-        text = extract_text_from_response(response)
+        # FAQ parafráze - odpověď ze sémantické cache bez volání Claude
+        model_key = f"{CLAUDE_MODEL}|search={bool(use_search)}"
+        cache_intent = semantic_cache_intent(message, intent)
+        cache_scope = hashlib.sha1(f"{model_key}|{system}".encode('utf-8')).hexdigest()[:16]
+        text = SEMANTIC_CACHE.lookup(message, cache_intent, cache_scope)
+        cached = text is not None
         
-        # Detekovat intent
-        intent = "general"
-        msg_lower = message.lower()
-        if any(w in msg_lower for w in ["počasí", "teplota", "prší"]):
-            intent = "weather"
-        elif any(w in msg_lower for w in ["zprávy", "novinky"]):
-            intent = "news"
-        elif any(w in msg_lower for w in ["kvíz", "otázky"]):
-            intent = "quiz"
-        elif any(w in msg_lower for w in ["příběh", "povídka"]):
-            intent = "story"
+        if not cached:
+            # Volání Claude API - souběžné stejné dotazy sdílí jedno volání
+            def ask_claude():
+                response = client.messages.create(
+                    model=CLAUDE_MODEL,
+                    max_tokens=1024,
+                    system=system,
+                    tools=tools,
+                    messages=[{"role": "user", "content": message}],
+                    lane=lane_for_intent(detect_intent(message)),
+                    user_id=user_id
+                )
+                return extract_text_from_response(response)
+            
+            text = CHAT_COALESCER.run(message, system, model_key, ask_claude,
+                                      cache=reusable_intent(detect_intent(message)))
+            SEMANTIC_CACHE.store(message, cache_intent, text, cache_scope)
         
         logger.info(f"Chat | User: {user_id} | Intent: {intent}")
         
@@ -247,14 +322,16 @@ def chat_with_radim():
             "success": True,
             "response": text,
             "intent": intent,
+            "cached": cached,
             "timestamp": datetime.utcnow().isoformat()
         })
         
     except Exception as e:
         logger.error(f"Chat error: {e}")
+        METRICS.fallback('claude', 'static')
         return jsonify({
             "success": False,
-            "response": "Promiňte, něco se pokazilo. Zkuste to prosím znovu.",
+            "response": CHAT_ERROR_RESPONSE,
             "intent": "error",
             "timestamp": datetime.utcnow().isoformat()
         })
@@ -280,46 +357,13 @@ def get_news():
                 "timestamp": datetime.utcnow().isoformat()
             })
         
-        category_queries = {
-            "politics": "české politické zprávy dnes",
-            "sports": "český sport zprávy hokej fotbal",
-            "health": "zdraví zprávy tipy pro seniory",
-            "culture": "kultura Praha divadlo koncerty",
-            "science": "věda technika zajímavosti Česko",
-            "local": "Praha zprávy doprava události",
-            "general": "hlavní české zprávy dnes"
-        }
-        
-        query = category_queries.get(category, category_queries["general"])
-        
-        system = f"""Vyhledej {count} aktuálních českých zpráv z kategorie: {category}.
-        
-FORMÁT (pouze JSON pole):
-[
-  {{"title": "Titulek", "description": "Popis", "source": "Zdroj"}}
-]
-
-Dnešní datum: {info['date']}"""
-
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=2048,
-            system=system,
-            tools=[{"type": "web_search_20250305", "name": "web_search", "max_uses": 5}],
-            messages=[{"role": "user", "content": f"Vyhledej zprávy: {query}"}]
+        # Stejná kategorie v rámci hodiny = stejná odpověď pro všechny seniory
+        articles, _ = NEWS_CACHE.get_or_fetch(
+            ('news', category, count, hour_bucket()),
+            lambda: fetch_news(client, category, count, info),
+            cacheable=lambda result: result[1]
         )
         
-        text = extract_text_from_response(response)
-        
-        # Parse JSON
-        articles = []
-        try:
-            json_match = re.search(r'\[.*\]', text, re.DOTALL)
-            if json_match:
-                articles = json.loads(json_match.group())
-        except:
-            articles = [{"title": f"Zprávy z {category}", "description": text[:200], "source": "Claude AI"}]
-        
         return jsonify({
             "success": True,
             "category": category,
@@ -330,6 +374,7 @@ Dnešní datum: {info['date']}"""
         
     except Exception as e:
         logger.error(f"News error: {e}")
+        METRICS.fallback('claude', 'local')
         return jsonify({
             "success": False,
             "category": category,
@@ -337,6 +382,55 @@ Dnešní datum: {info['date']}"""
             "timestamp": datetime.utcnow().isoformat()
         })
 
+def fetch_news(client, category, count, info):
+    """
+    Claude + web search dotaz na zprávy (volá se jen při cache miss).
+    Vrací (articles, cacheable) - cachovat jen skutečně naparsované
+    zprávy, ne prázdný seznam ani text neparsovatelné odpovědi.
+    """
+    category_queries = {
+        "politics": "české politické zprávy dnes",
+        "sports": "český sport zprávy hokej fotbal",
+        "health": "zdraví zprávy tipy pro seniory",
+        "culture": "kultura Praha divadlo koncerty",
+        "science": "věda technika zajímavosti Česko",
+        "local": "Praha zprávy doprava události",
+        "general": "hlavní české zprávy dnes"
+    }
+    
+    query = category_queries.get(category, category_queries["general"])
+    
+    system = f"""Vyhledej {count} aktuálních českých zpráv z kategorie: {category}.
+        
+FORMÁT (pouze JSON pole):
+[
+  {{"title": "Titulek", "description": "Popis", "source": "Zdroj"}}
+]
+
+Dnešní datum: {info['date']}"""
+
+    response = client.messages.create(
+        model=CLAUDE_MODEL,
+        max_tokens=2048,
+        system=system,
+        tools=[{"type": "web_search_20250305", "name": "web_search", "max_uses": 5}],
+        messages=[{"role": "user", "content": f"Vyhledej zprávy: {query}"}]
+    )
+    
+    text = extract_text_from_response(response)
+    
+    # Parse JSON
+    articles = []
+    try:
+        json_match = re.search(r'\[.*\]', text, re.DOTALL)
+        if json_match:
+            articles = json.loads(json_match.group())
+    except:
+        # Neparsovatelná odpověď - vrátit text, ale bez uložení do cache
+        return [{"title": f"Zprávy z {category}", "description": text[:200], "source": "Claude AI"}], False
+    
+    return articles, bool(articles)
+
 @claude_bp.route('/weather', methods=['GET'])
 def get_weather():
     """🌤️ Získat aktuální počasí"""
@@ -348,28 +442,13 @@ def get_weather():
         if not client:
             return jsonify(get_fallback_weather(location))
         
-        system = """Vyhledej aktuální počasí a odpověz pouze JSON:
-{"temperature": 5, "condition": "Oblačno", "humidity": 75, "wind": 12, "forecast": "Odpoledne déšť."}"""
-
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=512,
-            system=system,
-            tools=[{"type": "web_search_20250305", "name": "web_search", "max_uses": 2}],
-            messages=[{"role": "user", "content": f"Aktuální počasí v {location}?"}]
+        # Stejné město v rámci hodiny = jedno volání Claude pro všechny
+        weather = WEATHER_CACHE.get_or_fetch(
+            ('weather', location.strip().lower(), hour_bucket()),
+            lambda: fetch_weather(client, location),
+            cacheable=lambda w: bool(w) and w.get("temperature") is not None
         )
         
-        text = extract_text_from_response(response)
-        
-        # Parse JSON
-        weather = {}
-        try:
-            json_match = re.search(r'\{.*\}', text, re.DOTALL)
-            if json_match:
-                weather = json.loads(json_match.group())
-        except:
-            weather = {"condition": "Informace nedostupná"}
-        
         return jsonify({
             "success": True,
             "location": location,
@@ -383,8 +462,35 @@ def get_weather():
         
     except Exception as e:
         logger.error(f"Weather error: {e}")
+        METRICS.fallback('claude', 'local')
         return jsonify(get_fallback_weather(location))
 
+def fetch_weather(client, location):
+    """Claude + web search dotaz na počasí (volá se jen při cache miss)"""
+    system = """Vyhledej aktuální počasí a odpověz pouze JSON:
+{"temperature": 5, "condition": "Oblačno", "humidity": 75, "wind": 12, "forecast": "Odpoledne déšť."}"""
+
+    response = client.messages.create(
+        model=CLAUDE_MODEL,
+        max_tokens=512,
+        system=system,
+        tools=[{"type": "web_search_20250305", "name": "web_search", "max_uses": 2}],
+        messages=[{"role": "user", "content": f"Aktuální počasí v {location}?"}]
+    )
+    
+    text = extract_text_from_response(response)
+    
+    # Parse JSON
+    weather = {}
+    try:
+        json_match = re.search(r'\{.*\}', text, re.DOTALL)
+        if json_match:
+            weather = json.loads(json_match.group())
+    except:
+        weather = {"condition": "Informace nedostupná"}
+    
+    return weather
+
 @claude_bp.route('/quiz', methods=['POST'])
 def generate_quiz():
     """🎮 Vygenerovat kvíz"""
@@ -404,38 +510,25 @@ def generate_quiz():
                 "timestamp": datetime.utcnow().isoformat()
             })
         
-        system = f"""Vytvoř {count} kvízových otázek pro seniory.
-Téma: {topic}, Obtížnost: {difficulty}
-
-FORMÁT (pouze JSON):
-[{{"question": "Otázka?", "options": {{"A": "...", "B": "...", "C": "...", "D": "..."}}, "correct": "A", "explanation": "Vysvětlení."}}]"""
-
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=2048,
-            system=system,
-            messages=[{"role": "user", "content": f"Vytvoř kvíz na téma: {topic}"}]
-        )
-        
-        text = extract_text_from_response(response)
-        
-        questions = []
-        try:
-            json_match = re.search(r'\[.*\]', text, re.DOTALL)
-            if json_match:
-                questions = json.loads(json_match.group())
-        except:
-            questions = get_fallback_quiz(topic)
+        # Hotový kvíz z poolu, synchronně jen když je pool prázdný
+        questions = QUIZ_POOL.take((topic, difficulty, count))
+        pregenerated = questions is not None
+        if not pregenerated:
+            questions = build_quiz(client, topic, difficulty, count)
+            if questions is None:
+                questions = get_fallback_quiz(topic)
         
         return jsonify({
             "success": True,
             "topic": topic,
             "questions": questions,
+            "pregenerated": pregenerated,
             "timestamp": datetime.utcnow().isoformat()
         })
         
     except Exception as e:
         logger.error(f"Quiz error: {e}")
+        METRICS.fallback('claude', 'local')
         return jsonify({
             "success": False,
             "topic": topic,
@@ -443,6 +536,34 @@ FORMÁT (pouze JSON):
             "timestamp": datetime.utcnow().isoformat()
         })
 
+def build_quiz(client, topic, difficulty, count):
+    """Vygenerovat kvízové otázky přes Claude - vrací seznam nebo None při chybném JSON"""
+    system = f"""Vytvoř {count} kvízových otázek pro seniory.
+Téma: {topic}, Obtížnost: {difficulty}
+
+FORMÁT (pouze JSON):
+[{{"question": "Otázka?", "options": {{"A": "...", "B": "...", "C": "...", "D": "..."}}, "correct": "A", "explanation": "Vysvětlení."}}]"""
+
+    response = client.messages.create(
+        model=CLAUDE_MODEL,
+        max_tokens=2048,
+        system=system,
+        messages=[{"role": "user", "content": f"Vytvoř kvíz na téma: {topic}"}],
+        lane='batch'
+    )
+    
+    text = extract_text_from_response(response)
+    
+    questions = []
+    try:
+        json_match = re.search(r'\[.*\]', text, re.DOTALL)
+        if json_match:
+            questions = json.loads(json_match.group())
+    except:
+        return None
+    
+    return questions
+
 @claude_bp.route('/story', methods=['POST'])
 def generate_story():
     """📖 Vygenerovat příběh"""
@@ -463,50 +584,96 @@ def generate_story():
                 "timestamp": datetime.utcnow().isoformat()
             })
         
-        length_words = {"short": "100-150", "medium": "200-300", "long": "400-500"}
-        
-        system = f"""Vyprávěj {style} příběh pro seniory.
-Téma: {theme}, Délka: {length_words.get(length, '150')} slov.
-Česká jména a místa. Pozitivní a uklidňující.
-
-FORMÁT (pouze JSON):
-{{"title": "Název", "content": "Text příběhu..."}}"""
-
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=1024,
-            system=system,
-            messages=[{"role": "user", "content": f"Vyprávěj příběh na téma: {theme}"}]
-        )
-        
-        text = extract_text_from_response(response)
-        
-        story = {}
-        try:
-            json_match = re.search(r'\{.*\}', text, re.DOTALL)
-            if json_match:
-                story = json.loads(json_match.group())
-        except:
-            story = {"title": f"Příběh o {theme}", "content": text}
+        # Hotový příběh z poolu, synchronně jen když je pool prázdný
+        story = STORY_POOL.take((theme, length, style))
+        pregenerated = story is not None
+        if not pregenerated:
+            story = build_story(client, theme, length, style)
         
         return jsonify({
             "success": True,
-            "title": story.get("title", "Příběh"),
-            "content": story.get("content", text),
+            "title": story["title"],
+            "content": story["content"],
             "theme": theme,
+            "pregenerated": pregenerated,
             "timestamp": datetime.utcnow().isoformat()
         })
         
     except Exception as e:
         logger.error(f"Story error: {e}")
+        METRICS.fallback('claude', 'static')
         return jsonify({
             "success": False,
             "title": "Chyba",
-            "content": "Nepodařilo se vytvořit příběh.",
+            "content": STORY_ERROR_CONTENT,
             "theme": theme,
             "timestamp": datetime.utcnow().isoformat()
         })
 
+def build_story(client, theme, length, style):
+    """Vygenerovat příběh přes Claude - vrací {"title", "content"}"""
+    length_words = {"short": "100-150", "medium": "200-300", "long": "400-500"}
+    
+    system = f"""Vyprávěj {style} příběh pro seniory.
+Téma: {theme}, Délka: {length_words.get(length, '150')} slov.
+Česká jména a místa. Pozitivní a uklidňující.
+
+FORMÁT (pouze JSON):
+{{"title": "Název", "content": "Text příběhu..."}}"""
+
+    response = client.messages.create(
+        model=CLAUDE_MODEL,
+        max_tokens=1024,
+        system=system,
+        messages=[{"role": "user", "content": f"Vyprávěj příběh na téma: {theme}"}],
+        lane='batch'
+    )
+    
+    text = extract_text_from_response(response)
+    
+    story = {}
+    try:
+        json_match = re.search(r'\{.*\}', text, re.DOTALL)
+        if json_match:
+            story = json.loads(json_match.group())
+    except:
+        story = {"title": f"Příběh o {theme}", "content": text}
+    
+    return {
+        "title": story.get("title", "Příběh"),
+        "content": story.get("content", text)
+    }
+
+def _pool_quiz(key):
+    """Generátor pro QUIZ_POOL - prázdný výsledek se do poolu neuloží"""
+    client = get_claude_client()
+    return build_quiz(client, *key) if client else None
+
+def _pool_story(key):
+    """Generátor pro STORY_POOL"""
+    client = get_claude_client()
+    if not client:
+        return None
+    story = build_story(client, *key)
+    return story if story.get("content") else None
+
+QUIZ_POOL = ContentPool('quiz', _pool_quiz)
+STORY_POOL = ContentPool('story', _pool_story)
+
+# Volitelné naplnění výchozích klíčů hned po startu (výchozí hodnoty endpointů)
+if os.environ.get('CONTENT_POOL_PREWARM') == '1' and ANTHROPIC_API_KEY:
+    QUIZ_POOL.warm([('general', 'easy', 5)])
+    STORY_POOL.warm([('nature', 'short', 'relaxing')])
+
+@claude_bp.route('/pool', methods=['GET'])
+def get_pool_stats():
+    """🎁 Hloubka a stáří předgenerovaných kvízů a příběhů"""
+    return jsonify({
+        "success": True,
+        "pools": all_pool_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
 @claude_bp.route('/dashboard-data', methods=['GET'])
 def get_dashboard_data():
     """📊 Všechna data pro dashboard"""
@@ -537,10 +704,66 @@ def get_dashboard_data():
     return jsonify(result)
 
 
+@claude_bp.route('/cache', methods=['GET'])
+def get_cache_stats():
+    """⚡ Statistiky cache pro počasí a zprávy"""
+    return jsonify({
+        "success": True,
+        "caches": {
+            "weather": WEATHER_CACHE.stats(),
+            "news": NEWS_CACHE.stats(),
+            "semantic": SEMANTIC_CACHE.stats()
+        },
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+@claude_bp.route('/cache', methods=['DELETE'])
+@admin_required
+def clear_cache():
+    """⚡ Vymazat cache (volitelně jen ?name=weather|news|semantic, pro semantic i ?intent=)"""
+    name = request.args.get('name')
+    for cache_name, cache in (("weather", WEATHER_CACHE), ("news", NEWS_CACHE)):
+        if not name or name == cache_name:
+            cache.invalidate()
+    removed = 0
+    if not name or name == "semantic":
+        removed = SEMANTIC_CACHE.invalidate(request.args.get('intent'))
+    return jsonify({"success": True, "cleared": name or "all", "semantic_removed": removed})
+
+
 # ============================================================================
 # EMOTION ANALYSIS (pro RadimConsciousnessEngine)
 # ============================================================================
 
+EMOTION_MODEL = CLAUDE_HAIKU_MODEL
+
+EMOTION_FIELDS = """{
+  "joy": 0.0-1.0,
+  "sadness": 0.0-1.0,
+  "fear": 0.0-1.0,
+  "hope": 0.0-1.0,
+  "calm": 0.0-1.0,
+  "tension": 0.0-1.0,
+  "curiosity": 0.0-1.0,
+  "gratitude": 0.0-1.0,
+  "loneliness": 0.0-1.0,
+  "confusion": 0.0-1.0,
+  "dominant_emotion": "název",
+  "needs_empathy": true/false,
+  "crisis_level": 0-10
+}"""
+
+EMOTION_SYSTEM_PROMPT = f"""Analyzuj emoce v textu seniora. Vrať POUZE JSON:
+{EMOTION_FIELDS}
+
+Kontext: Péče o seniory. Buď citlivý k implicitním emocím."""
+
+EMOTION_BATCH_SYSTEM_PROMPT = f"""Analyzuj emoce v očíslovaných textech seniorů.
+Vrať POUZE JSON pole, pro každý text jeden objekt s jeho "id" a poli:
+{EMOTION_FIELDS}
+
+Kontext: Péče o seniory. Buď citlivý k implicitním emocím."""
+
 @claude_bp.route('/analyze-emotion', methods=['POST'])
 def analyze_emotion():
     """
@@ -569,29 +792,10 @@ def analyze_emotion():
                 "timestamp": datetime.utcnow().isoformat()
             })
         
-        system = """Analyzuj emoce v textu seniora. Vrať POUZE JSON:
-{
-  "joy": 0.0-1.0,
-  "sadness": 0.0-1.0,
-  "fear": 0.0-1.0,
-  "hope": 0.0-1.0,
-  "calm": 0.0-1.0,
-  "tension": 0.0-1.0,
-  "curiosity": 0.0-1.0,
-  "gratitude": 0.0-1.0,
-  "loneliness": 0.0-1.0,
-  "confusion": 0.0-1.0,
-  "dominant_emotion": "název",
-  "needs_empathy": true/false,
-  "crisis_level": 0-10
-}
-
-Kontext: Péče o seniory. Buď citlivý k implicitním emocím."""
-
         response = client.messages.create(
-            model="claude-3-haiku-20240307",
+            model=EMOTION_MODEL,
             max_tokens=300,
-            system=system,
+            system=EMOTION_SYSTEM_PROMPT,
             messages=[{"role": "user", "content": f"Analyzuj emoce: {text}"}]
         )
         
@@ -616,6 +820,7 @@ Kontext: Péče o seniory. Buď citlivý k implicitním emocím."""
         
     except Exception as e:
         logger.error(f"Emotion analysis error: {e}")
+        METRICS.fallback('claude', 'local')
         return jsonify({
             "success": True,
             "emotions": analyze_emotions_local(text if text else ''),
@@ -625,32 +830,165 @@ Kontext: Péče o seniory. Buď citlivý k implicitním emocím."""
         })
 
 
+# Dávková analýza: max textů na požadavek a na jeden Claude prompt
+EMOTION_BATCH_MAX = 200
+EMOTION_BATCH_CHUNK = 25
+EMOTION_AMBIGUOUS_MIN_WORDS = 4
+
+POSITIVE_EMOTIONS = ("joy", "hope", "calm", "gratitude")
+NEGATIVE_EMOTIONS = ("sadness", "fear", "tension", "loneliness")
+
+def is_emotion_ambiguous(text, emotions):
+    """
+    Lokální výsledek je nejistý, pokud delší text nenašel žádné emoční slovo
+    (implicitní emoce), nebo se míchají pozitivní a negativní emoce.
+    """
+    if emotions.get("dominant_emotion") == "neutral":
+        return len(text.split()) >= EMOTION_AMBIGUOUS_MIN_WORDS
+    positive = any(emotions.get(e, 0) > 0 for e in POSITIVE_EMOTIONS)
+    negative = any(emotions.get(e, 0) > 0 for e in NEGATIVE_EMOTIONS)
+    return positive and negative
+
+def analyze_emotions_claude_batch(client, texts):
+    """
+    Jeden strukturovaný prompt pro více textů.
+    texts: [(id, text)] -> {id: emotions}; chybějící id volající doplní lokálně.
+    """
+    numbered = "\n".join(f"[{item_id}] {text[:1000]}" for item_id, text in texts)
+    response = client.messages.create(
+        model=EMOTION_MODEL,
+        max_tokens=min(4096, 150 * len(texts) + 100),
+        system=EMOTION_BATCH_SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": f"Analyzuj emoce:\n{numbered}"}],
+        lane='batch'
+    )
+    result_text = extract_text_from_response(response)
+    
+    json_match = re.search(r'\[.*\]', result_text, re.DOTALL)
+    if not json_match:
+        return {}
+    results = {}
+    for item in json.loads(json_match.group()):
+        if isinstance(item, dict) and "id" in item:
+            item_id = item.pop("id")
+            try:
+                results[int(item_id)] = item
+            except (TypeError, ValueError):
+                continue
+    return results
+
+@claude_bp.route('/analyze-emotion/batch', methods=['POST'])
+def analyze_emotion_batch():
+    """
+    🧠 Dávková analýza emocí (backfill, dashboard)
+    Body: {"texts": ["...", {"id": "msg-1", "text": "..."}], "local_only": false}
+    Lokální analýza pro všechny texty, Claude jen pro nejisté - v jednom promptu.
+    """
+    started = datetime.utcnow()
+    data = request.get_json() or {}
+    items = data.get('texts') or []
+    local_only = bool(data.get('local_only', False))
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "error": "texts (list) is required", "results": []}), 400
+    if len(items) > EMOTION_BATCH_MAX:
+        return jsonify({"success": False, "error": f"Max {EMOTION_BATCH_MAX} texts per batch", "results": []}), 400
+    
+    results = []
+    ambiguous = {}
+    local_by_text = {}
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            ref, text = item.get('id'), str(item.get('text') or '')
+        else:
+            ref, text = None, str(item or '')
+        
+        # Stejné texty (typicky "děkuji", "dobře") se analyzují jednou
+        emotions = local_by_text.get(text)
+        if emotions is None:
+            emotions = local_by_text[text] = analyze_emotions_local(text)
+        
+        result = {"index": index, "emotions": emotions, "source": "local"}
+        if ref is not None:
+            result["id"] = ref
+        results.append(result)
+        
+        if text and is_emotion_ambiguous(text, emotions):
+            ambiguous.setdefault(text, []).append(index)
+    
+    client = None if local_only or not ambiguous else get_claude_client()
+    llm_calls = 0
+    errors = []
+    
+    if client:
+        unique_texts = list(ambiguous)
+        for start in range(0, len(unique_texts), EMOTION_BATCH_CHUNK):
+            chunk = list(enumerate(unique_texts[start:start + EMOTION_BATCH_CHUNK], start=start))
+            try:
+                llm_calls += 1
+                analyzed = analyze_emotions_claude_batch(client, chunk)
+            except Exception as e:
+                logger.error(f"Emotion batch error: {e}")
+                errors.append(str(e))
+                continue
+            for item_id, text in chunk:
+                emotions = analyzed.get(item_id)
+                if not emotions:
+                    continue
+                for index in ambiguous[text]:
+                    results[index]["emotions"] = emotions
+                    results[index]["source"] = "claude"
+    
+    claude_count = sum(1 for r in results if r["source"] == "claude")
+    elapsed_ms = (datetime.utcnow() - started).total_seconds() * 1000
+    logger.info(f"Emotion batch | Texts: {len(items)} | Ambiguous: {len(ambiguous)} | LLM calls: {llm_calls}")
+    
+    response = {
+        "success": True,
+        "results": results,
+        "stats": {
+            "total": len(items),
+            "local": len(items) - claude_count,
+            "claude": claude_count,
+            "ambiguous_unique": len(ambiguous),
+            "llm_calls": llm_calls,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "per_item_ms": round(elapsed_ms / len(items), 2)
+        },
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if errors:
+        response["errors"] = errors
+    return jsonify(response)
+
+
+EMOTION_KEYWORDS = {
+    "joy": ["skvělé", "výborně", "super", "krásné", "radost", "šťastný", "hurá", "děkuji", "líbí"],
+    "sadness": ["smutný", "smutná", "bolí", "chybí", "osamělý", "samota", "pláču", "těžké", "ztráta"],
+    "fear": ["bojím", "strach", "úzkost", "panika", "děsí", "obávám", "nervózní"],
+    "hope": ["doufám", "věřím", "zlepší", "lépe", "naděje", "těším"],
+    "calm": ["klid", "pohoda", "relaxuji", "odpočinek", "dobře", "v pohodě"],
+    "tension": ["problém", "stres", "napětí", "nejde", "nefunguje", "zlost", "naštvaný"],
+    "curiosity": ["zajímá", "proč", "jak", "co je", "vysvětli", "nevím"],
+    "gratitude": ["děkuji", "díky", "vděčný", "oceňuji", "pomohl"],
+    "loneliness": ["sám", "sama", "nikdo", "opuštěný", "izolace"],
+    "confusion": ["nechápu", "zmatený", "nevím", "jak to", "co mám"]
+}
+
+CLASSIFIER.register('emotion', EMOTION_KEYWORDS)
+
 def analyze_emotions_local(text):
     """Lokální emoční analýza (fallback)"""
     if not text:
         return {}
     
-    lower = text.lower()
-    
-    patterns = {
-        "joy": ["skvělé", "výborně", "super", "krásné", "radost", "šťastný", "hurá", "děkuji", "líbí"],
-        "sadness": ["smutný", "smutná", "bolí", "chybí", "osamělý", "samota", "pláču", "těžké", "ztráta"],
-        "fear": ["bojím", "strach", "úzkost", "panika", "děsí", "obávám", "nervózní"],
-        "hope": ["doufám", "věřím", "zlepší", "lépe", "naděje", "těším"],
-        "calm": ["klid", "pohoda", "relaxuji", "odpočinek", "dobře", "v pohodě"],
-        "tension": ["problém", "stres", "napětí", "nejde", "nefunguje", "zlost", "naštvaný"],
-        "curiosity": ["zajímá", "proč", "jak", "co je", "vysvětli", "nevím"],
-        "gratitude": ["děkuji", "díky", "vděčný", "oceňuji", "pomohl"],
-        "loneliness": ["sám", "sama", "nikdo", "opuštěný", "izolace"],
-        "confusion": ["nechápu", "zmatený", "nevím", "jak to", "co mám"]
-    }
+    counts = CLASSIFIER.counts(text, 'emotion')
     
     emotions = {}
     max_emotion = ("neutral", 0)
     
-    for emotion, words in patterns.items():
-        matches = sum(1 for w in words if w in lower)
-        intensity = min(1.0, matches * 0.25)
+    for emotion in EMOTION_KEYWORDS:
+        intensity = min(1.0, counts.get(emotion, 0) * 0.25)
         emotions[emotion] = intensity
         if intensity > max_emotion[1]:
             max_emotion = (emotion, intensity)
@@ -807,7 +1145,7 @@ def get_fallback_news(category):
 def get_fallback_weather(location):
     """Lokální fallback počasí"""
     import random
-    month = datetime.now().month
+    month = datetime.now(LOCAL_TZ).month
     
     if month in [12, 1, 2]:
         temp = random.randint(-5, 3)
@@ -855,6 +1193,8 @@ def get_fallback_quiz(topic):
 # ============================================================================
 
 print("✅ Claude AI Blueprint loaded - /api/claude/* endpoints ready")
-print("🧠 Emotion Analysis endpoint: /api/claude/analyze-emotion")
+print("🧠 Emotion Analysis endpoint: /api/claude/analyze-emotion (+ /batch)")
 print("🧠 Consciousness State endpoint: /api/claude/consciousness-state")
 print("📝 Memory endpoints: /api/claude/memory/save, /api/claude/memory/recall")
+print("⚡ Weather/News/Semantic cache: /api/claude/cache")
+print("🎁 Quiz/Story pool: /api/claude/pool")
@@ -0,0 +1,173 @@
+# ============================================
+# 🎁 RADIM CONTENT POOL
+# ============================================
+# Version: 1.1.0
+# Předgenerované kvízy a příběhy připravené k okamžitému vydání.
+# Každý klíč (téma, obtížnost, délka...) má vlastní frontu hotových
+# položek, která se na pozadí doplňuje pod low-water mark.
+# Klíče pocházejí z volného textu (téma, počet otázek...) - frontu
+# dostane klíč až po CONTENT_POOL_MIN_SEEN dotazech (nebo warm()),
+# jinak by každé jednorázové téma stálo capacity generování navíc.
+
+import os
+import time
+import threading
+import logging
+from collections import deque, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+POOL_CAPACITY = int(os.environ.get('CONTENT_POOL_CAPACITY', 3))
+POOL_LOW_WATER = int(os.environ.get('CONTENT_POOL_LOW_WATER', 1))
+POOL_MAX_AGE = int(os.environ.get('CONTENT_POOL_MAX_AGE', 24 * 3600))
+POOL_MIN_SEEN = int(os.environ.get('CONTENT_POOL_MIN_SEEN', 3))
+POOL_MAX_KEYS = 64
+POOL_MAX_SEEN = POOL_MAX_KEYS * 16
+
+# Registr všech poolů pro společný endpoint se statistikami
+POOLS = {}
+
+
+class ContentPool:
+    """
+    Pool předgenerovaného obsahu.
+
+    generate(key) -> položka nebo None (None / prázdná položka se neukládá).
+    take(key) vydá nejstarší hotovou položku v O(1), nebo None pokud je
+    fronta prázdná - pak volající generuje synchronně. Klíč bez fronty
+    ji dostane až při min_seen-tém dotazu.
+    """
+
+    def __init__(self, name, generate, capacity=POOL_CAPACITY, low_water=POOL_LOW_WATER,
+                 max_age=POOL_MAX_AGE, min_seen=POOL_MIN_SEEN):
+        self.name = name
+        self.generate = generate
+        self.capacity = capacity
+        self.low_water = low_water
+        self.max_age = max_age
+        self.min_seen = min_seen
+        self._queues = {}
+        self._seen = OrderedDict()      # klíč bez fronty -> počet dotazů (LRU)
+        self._refilling = set()
+        self._lock = threading.Lock()
+        self.served = 0
+        self.empty = 0
+        self.cold = 0
+        self.generated = 0
+        self.errors = 0
+        POOLS[name] = self
+
+    def take(self, key):
+        """Vydat hotovou položku (O(1)) a případně spustit doplnění"""
+        now = time.time()
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                if not self._hot(key):
+                    self.empty += 1
+                    self.cold += 1
+                    return None
+                if len(self._queues) >= POOL_MAX_KEYS:
+                    self._drop_idle_key()
+                queue = self._queues[key] = deque(maxlen=self.capacity)
+            while queue and now - queue[0][0] > self.max_age:
+                queue.popleft()
+            item = queue.popleft()[1] if queue else None
+            needs_refill = len(queue) < max(1, self.low_water)
+
+        if item is None:
+            self.empty += 1
+        else:
+            self.served += 1
+        if needs_refill:
+            self.refill_async(key)
+        return item
+
+    def _hot(self, key):
+        """Započítat dotaz na klíč bez fronty; True = zaslouží si frontu (pod zámkem)"""
+        seen = self._seen.pop(key, 0) + 1
+        if seen >= self.min_seen:
+            return True
+        self._seen[key] = seen
+        while len(self._seen) > POOL_MAX_SEEN:
+            self._seen.popitem(last=False)
+        return False
+
+    def refill_async(self, key):
+        """Doplnit frontu klíče na kapacitu v zeleném vlákně (max jeden refill na klíč)"""
+        with self._lock:
+            if key in self._refilling:
+                return
+            self._refilling.add(key)
+        threading.Thread(target=self._refill, args=(key,), daemon=True).start()
+
+    def warm(self, keys):
+        for key in keys:
+            with self._lock:
+                self._queues.setdefault(key, deque(maxlen=self.capacity))
+            self.refill_async(key)
+
+    def _refill(self, key):
+        try:
+            failures = 0
+            while failures < 2:
+                with self._lock:
+                    queue = self._queues.get(key)
+                    if queue is None or len(queue) >= self.capacity:
+                        return
+                try:
+                    item = self.generate(key)
+                except Exception as e:
+                    item = None
+                    logger.warning(f"Pool {self.name} generate error for {key}: {e}")
+                if not item:
+                    self.errors += 1
+                    failures += 1
+                    continue
+                self.generated += 1
+                with self._lock:
+                    queue.append((time.time(), item))
+        finally:
+            with self._lock:
+                self._refilling.discard(key)
+
+    def _drop_idle_key(self):
+        """Uvolnit místo pro nový klíč - zahodí prázdnou frontu (volat pod zámkem)"""
+        for k, q in list(self._queues.items()):
+            if not q and k not in self._refilling:
+                del self._queues[k]
+                return
+        oldest = min(self._queues, key=lambda k: self._queues[k][0][0] if self._queues[k] else 0)
+        del self._queues[oldest]
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            keys = {
+                '|'.join(str(part) for part in key): {
+                    'depth': len(queue),
+                    'oldest_age_s': round(now - queue[0][0], 1) if queue else None
+                }
+                for key, queue in self._queues.items()
+            }
+            refilling = len(self._refilling)
+        requests = self.served + self.empty
+        return {
+            'name': self.name,
+            'capacity': self.capacity,
+            'low_water': self.low_water,
+            'total_depth': sum(k['depth'] for k in keys.values()),
+            'keys': keys,
+            'served_from_pool': self.served,
+            'pool_empty_fallbacks': self.empty,
+            'cold_key_requests': self.cold,
+            'min_seen': self.min_seen,
+            'pool_hit_rate': round(self.served / requests, 3) if requests else 0.0,
+            'generated': self.generated,
+            'generate_errors': self.errors,
+            'refills_running': refilling
+        }
+
+
+def all_pool_stats():
+    return {name: pool.stats() for name, pool in POOLS.items()}
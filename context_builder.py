@@ -0,0 +1,254 @@
+# ============================================
+# 🧩 RADIM CONTEXT BUILDER
+# ============================================
+# Version: 1.1.0
+# Kontext konverzace podle odhadu tokenů místo počtu zpráv.
+# Nejnovější zprávy se berou od konce, dokud nedojde rozpočet (O(budget)),
+# starší tahy se po dávkách přidávají do klouzavého shrnutí uloženého
+# pro každou konverzaci. Shrnutí se mění jen při přeložení celé dávky,
+# takže začátek promptu (system + shrnutí) zůstává stabilní pro
+# cache na straně poskytovatele (Claude prompt caching, Gemini implicit cache).
+# Vypadlé zprávy do neúplné dávky jdou do promptu jako řádky za uložené
+# shrnutí (neukládají se) - žádná zpráva nezmizí mezi recent a shrnutím.
+
+import os
+import re
+import time
+import threading
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 1200))
+SUMMARY_TOKEN_BUDGET = int(os.environ.get('SUMMARY_TOKEN_BUDGET', 300))
+MESSAGE_TOKEN_LIMIT = int(os.environ.get('MESSAGE_TOKEN_LIMIT', 400))
+SUMMARY_CHUNK = 6           # Přeložit do shrnutí až po 6 vypadlých zprávách
+SUMMARY_LINE_CHARS = 120    # Jedna zpráva ve shrnutí = první věta, max 120 znaků
+CHARS_PER_TOKEN = 3.2       # Čeština s diakritikou ~3 znaky na token
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text):
+    """Rychlý odhad počtu tokenů bez tokenizeru"""
+    return int(len(text or '') / CHARS_PER_TOKEN) + 1
+
+
+def is_assistant(message):
+    """Zprávy z app.py mají sender_id, z klienta/memory role"""
+    return message.get('role') == 'assistant' or message.get('sender_id') == 'radim'
+
+
+def speaker(message):
+    return "Radim" if is_assistant(message) else "Uživatel"
+
+
+def truncate_to_tokens(text, max_tokens):
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0] + ' …'
+
+
+def summarize_turns(summary, turns, max_tokens=SUMMARY_TOKEN_BUDGET):
+    """
+    Extraktivní klouzavé shrnutí: ke starému shrnutí přidá první větu
+    každého tahu a odřízne nejstarší řádky nad rozpočet. Bez volání LLM.
+    """
+    lines = summary.split('\n') if summary else []
+    for turn in turns:
+        content = ' '.join((turn.get('content') or '').split())
+        if not content:
+            continue
+        first = _SENTENCE_END.split(content, 1)[0][:SUMMARY_LINE_CHARS]
+        lines.append(f"{speaker(turn)}: {first}")
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+# ============================================
+# ÚLOŽIŠTĚ SHRNUTÍ
+# ============================================
+
+class MemorySummaryStore:
+    """Shrnutí v paměti procesu (memory_routes, hlasové session)"""
+
+    def __init__(self, max_keys=5000):
+        self.max_keys = max_keys
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._data.get(key, ('', None))
+
+    def set(self, key, summary, cursor):
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.max_keys:
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (summary, cursor)
+
+
+class SqliteSummaryStore:
+    """Shrnutí v tabulce chat_summaries (get_db vrací sqlite3 spojení z app.py)"""
+
+    def __init__(self, get_db):
+        self.get_db = get_db
+
+    def get(self, key):
+        row = self.get_db().execute(
+            'SELECT summary, summarized_until FROM chat_summaries WHERE conversation_id = ?', (key,)
+        ).fetchone()
+        return (row[0], row[1]) if row else ('', None)
+
+    def set(self, key, summary, cursor):
+        db = self.get_db()
+        db.execute('''
+            INSERT INTO chat_summaries (conversation_id, summary, summarized_until, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(conversation_id) DO UPDATE SET
+                summary = excluded.summary,
+                summarized_until = excluded.summarized_until,
+                updated_at = excluded.updated_at
+        ''', (key, summary, cursor, time.strftime('%Y-%m-%dT%H:%M:%S')))
+        db.commit()
+
+
+# ============================================
+# CONTEXT BUILDER
+# ============================================
+
+class ContextBuilder:
+    """
+    Sestaví (shrnutí, poslední zprávy) v rozpočtu tokenů.
+
+    summarize(summary, turns, max_tokens) -> nové shrnutí; výchozí je
+    lokální summarize_turns, lze předat i funkci volající LLM.
+    """
+
+    def __init__(self, name, store=None, budget=CONTEXT_TOKEN_BUDGET,
+                 summary_budget=SUMMARY_TOKEN_BUDGET, message_limit=MESSAGE_TOKEN_LIMIT,
+                 summarize=summarize_turns):
+        self.name = name
+        self.store = store or MemorySummaryStore()
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.message_limit = message_limit
+        self.summarize = summarize
+        self.builds = 0
+        self.folds = 0
+        self.truncated = 0
+        self.tokens_total = 0
+
+    def select(self, newest_first):
+        """
+        Bere zprávy od nejnovější, dokud se vejdou do rozpočtu.
+        Vrací (recent oldest-first, tokens, vyčerpán_rozpočet). Nejnovější
+        zpráva se vezme vždy (případně zkrácená).
+        """
+        recent = []
+        used = 0
+        exhausted = False
+        for message in newest_first:
+            content = message.get('content') or ''
+            tokens = estimate_tokens(content)
+            if tokens > self.message_limit:
+                content = truncate_to_tokens(content, self.message_limit)
+                tokens = estimate_tokens(content)
+                message = dict(message, content=content)
+                self.truncated += 1
+            if recent and used + tokens > self.budget:
+                exhausted = True
+                break
+            recent.append(message)
+            used += tokens
+        recent.reverse()
+        return recent, used, exhausted
+
+    def trim(self, messages):
+        """Jen rozpočet bez shrnutí (jednorázové dotazy, /api/ai/chat)"""
+        recent, used, _ = self.select(reversed(messages))
+        self._count(used)
+        return recent
+
+    def prepare(self, key, messages):
+        """
+        Pro seznamy zpráv v paměti (oldest-first). Kurzor = počet zpráv
+        už přeložených do shrnutí. Vrací (summary, recent).
+        """
+        summary, cursor = self.store.get(key)
+        cursor = cursor or 0
+        if cursor > len(messages):
+            summary, cursor = '', 0     # Klient začal novou konverzaci
+
+        recent, used, _ = self.select(reversed(messages[cursor:]))
+        dropped = messages[cursor:len(messages) - len(recent)]
+        if len(dropped) >= SUMMARY_CHUNK:
+            summary = self.summarize(summary, dropped, self.summary_budget)
+            self.store.set(key, summary, cursor + len(dropped))
+            self.folds += 1
+        elif dropped:
+            summary = self._with_pending(summary, dropped)
+        self._count(used + estimate_tokens(summary))
+        return summary, recent
+
+    def prepare_rows(self, key, fetch_newest_first, page_size):
+        """
+        Pro SQLite historii. fetch_newest_first(after, before) vrací nejvýš
+        page_size řádků s 'timestamp' od nejnovější, novějších než kurzor
+        shrnutí (after) a starších než before (None = bez horní meze).
+        Stránkuje se, dokud nepřijde neúplná stránka - do shrnutí se tak
+        dostanou i řádky starší než první stránka. Vrací (summary, recent).
+        """
+        summary, cursor = self.store.get(key)
+        rows = list(fetch_newest_first(cursor, None))
+        page = rows
+        while len(page) >= page_size:
+            page = list(fetch_newest_first(cursor, page[-1]['timestamp']))
+            rows.extend(page)
+        recent, used, _ = self.select(rows)
+        dropped = rows[len(recent):]
+        dropped.reverse()
+        if len(dropped) >= SUMMARY_CHUNK:
+            summary = self.summarize(summary, dropped, self.summary_budget)
+            self.store.set(key, summary, dropped[-1]['timestamp'])
+            self.folds += 1
+        elif dropped:
+            summary = self._with_pending(summary, dropped)
+        self._count(used + estimate_tokens(summary))
+        return summary, recent
+
+    def _with_pending(self, summary, dropped):
+        """
+        Vypadlé zprávy, které ještě netvoří celou dávku: jen do promptu
+        jako řádky za uložené shrnutí (vždy lokálně, bez volání LLM).
+        Uložené shrnutí a kurzor se nemění - začátek promptu zůstává.
+        """
+        pending = summarize_turns('', dropped, self.summary_budget)
+        return f"{summary}\n{pending}" if summary and pending else summary or pending
+
+    def fold(self, key, turns):
+        """Přidat tahy vypadlé z paměťové historie rovnou do shrnutí"""
+        if not turns:
+            return
+        summary, cursor = self.store.get(key)
+        summary = self.summarize(summary, turns, self.summary_budget)
+        self.store.set(key, summary, cursor)
+        self.folds += 1
+
+    def _count(self, tokens):
+        self.builds += 1
+        self.tokens_total += tokens
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'token_budget': self.budget,
+            'summary_budget': self.summary_budget,
+            'builds': self.builds,
+            'avg_prompt_tokens': round(self.tokens_total / self.builds, 1) if self.builds else 0.0,
+            'summary_folds': self.folds,
+            'truncated_messages': self.truncated
+        }
+
+
+def summary_block(summary):
+    """Text shrnutí pro připojení za system prompt (prázdný, pokud není)"""
+    return f"\n\nShrnutí dřívější konverzace:\n{summary}" if summary else ""
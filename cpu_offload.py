@@ -0,0 +1,113 @@
+# ============================================
+# 🧵 RADIM CPU OFFLOAD
+# ============================================
+# Version: 1.0.0
+# Produkce běží v jednom eventlet workeru - CPU práce bez yieldu drží hub
+# a zamrzne všechny Socket.IO klienty. offload() pošle funkci do
+# eventlet.tpool (skutečná OS vlákna), volající greenlet čeká a hub dál
+# obsluhuje ostatní.
+#
+# Pozor na GIL: vlákno ho pustí jen mezi bytecode instrukcemi (po
+# sys.getswitchinterval(), 5 ms). Jedno dlouhé C volání (json.dumps
+# celého payloadu, jeden re.sub nad megabajtem) drží GIL až do konce -
+# i v tpool. Proto offload_jsonify serializuje po částech a regexové
+# řetězy mají smysl jen jako řada samostatných volání.
+#
+# Bez eventlet monkey patche (testy, skripty) se vše volá přímo.
+
+import os
+import json
+import time
+import threading
+from functools import partial
+
+from flask import current_app
+
+try:
+    from eventlet import patcher, tpool
+    EVENTLET_AVAILABLE = True
+except ImportError:
+    EVENTLET_AVAILABLE = False
+
+CPU_OFFLOAD_MIN_CHARS = int(os.environ.get('CPU_OFFLOAD_MIN_CHARS', 4000))
+JSON_CHUNK_DEPTH = 2        # {'slowest': [záznam, ...]} - záznamy zvlášť
+
+_stats = {'calls': 0, 'inline': 0, 'errors': 0, 'seconds': 0.0}
+_stats_lock = threading.Lock()
+
+
+def offload_enabled():
+    """tpool jen pod eventlet s patchnutými vlákny (gunicorn -k eventlet)"""
+    return EVENTLET_AVAILABLE and patcher.is_monkey_patched('thread')
+
+
+def offload(fn, *args, **kwargs):
+    """Spustit CPU-bound fn v tpool vlákně; bez eventlet přímo"""
+    if not offload_enabled():
+        with _stats_lock:
+            _stats['inline'] += 1
+        return fn(*args, **kwargs)
+    started = time.perf_counter()
+    try:
+        return tpool.execute(fn, *args, **kwargs)
+    except Exception:
+        with _stats_lock:
+            _stats['errors'] += 1
+        raise
+    finally:
+        with _stats_lock:
+            _stats['calls'] += 1
+            _stats['seconds'] += time.perf_counter() - started
+
+
+def offload_text(fn, text, min_chars=CPU_OFFLOAD_MIN_CHARS):
+    """Krátké texty přímo (tpool stojí desítky µs), dlouhé přes offload"""
+    if text and len(text) >= min_chars:
+        return offload(fn, text)
+    return fn(text)
+
+
+# ============================================
+# JSON
+# ============================================
+
+def chunked_dumps(obj, dumps=json.dumps, depth=JSON_CHUNK_DEPTH, sort_keys=False):
+    """
+    Stejný výstup jako dumps(obj) (kompaktní oddělovače), ale horní úrovně
+    dictů/listů se skládají v Pythonu - mezi částmi může vlákno pustit GIL.
+    """
+    if depth <= 0 or not isinstance(obj, (dict, list, tuple)) or not obj:
+        return dumps(obj)
+    if isinstance(obj, dict):
+        if not all(isinstance(key, str) for key in obj):
+            return dumps(obj)       # int/bool/None klíče převádí json po svém
+        items = sorted(obj.items()) if sort_keys else obj.items()
+        return '{' + ','.join(
+            f"{dumps(key)}:{chunked_dumps(value, dumps, depth - 1, sort_keys)}"
+            for key, value in items
+        ) + '}'
+    return '[' + ','.join(chunked_dumps(item, dumps, depth - 1, sort_keys) for item in obj) + ']'
+
+
+def offload_jsonify(payload, status=200):
+    """jsonify pro velké (admin) payloady - serializace v tpool po částech"""
+    provider = current_app.json
+    dumps = partial(json.dumps, default=provider.default, ensure_ascii=provider.ensure_ascii,
+                    sort_keys=provider.sort_keys, separators=(',', ':'))
+    body = offload(chunked_dumps, payload, dumps, JSON_CHUNK_DEPTH, provider.sort_keys)
+    return current_app.response_class(body + '\n', status=status, mimetype=provider.mimetype)
+
+
+def stats():
+    with _stats_lock:
+        return {
+            'enabled': offload_enabled(),
+            'offloaded_calls': _stats['calls'],
+            'inline_calls': _stats['inline'],
+            'errors': _stats['errors'],
+            'offloaded_seconds': round(_stats['seconds'], 3),
+            'min_chars': CPU_OFFLOAD_MIN_CHARS
+        }
+
+
+print("🧵 CPU offload loaded - eventlet tpool for CPU-bound helpers")
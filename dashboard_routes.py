@@ -10,6 +10,7 @@ from datetime import datetime
 import math
 import hashlib
 import time
+from functools import lru_cache
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
@@ -56,6 +57,13 @@ def _get_seniors_summary():
         return {'error': str(e), 'total': 0}
 
 
+@lru_cache(maxsize=1024)
+def _offline_sensors(senior_id, hour):
+    """Deterministická simulace offline senzoru - md5 jen jednou za hodinu a pokoj"""
+    h = int(hashlib.md5(f"{senior_id}{hour}".encode()).hexdigest(), 16)
+    return 1 if (h % 7 == 0) else 0
+
+
 def _get_iot_summary():
     """Sumarizace IoT senzorů z iot_routes.ROOM_SENSORS"""
     try:
@@ -67,14 +75,14 @@ def _get_iot_summary():
         alerts = []
         room_statuses = []
 
+        hour = datetime.utcnow().hour
         for senior_id, config in ROOM_SENSORS.items():
             rooms_online += 1
             room_sensors = len(config['sensors'])
             sensors_total += room_sensors
 
             # Deterministická simulace offline senzoru (shodná logika s iot_routes)
-            h = int(hashlib.md5(f"{senior_id}{datetime.utcnow().hour}".encode()).hexdigest(), 16)
-            offline_count = 1 if (h % 7 == 0) else 0
+            offline_count = _offline_sensors(senior_id, hour)
             sensors_online += room_sensors - offline_count
 
             if offline_count > 0:
@@ -202,6 +210,24 @@ def _get_risk_overview():
         return {'error': str(e), 'high_risk_count': 0}
 
 
+def _get_llm_summary():
+    """LLM latence, tokeny a fallbacky z llm_metrics.METRICS"""
+    try:
+        from llm_metrics import METRICS
+        return METRICS.snapshot()
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def _get_hub_summary():
+    """Lag eventlet hubu, Socket.IO heartbeat jitter a blokující call sites"""
+    try:
+        from profiler import hub_health
+        return hub_health()
+    except Exception as e:
+        return {'error': str(e)}
+
+
 # ============================================
 # DASHBOARD ENDPOINTS
 # ============================================
@@ -211,7 +237,7 @@ def get_dashboard():
     Agregační dashboard endpoint.
     
     Query params:
-        sections: čárkou oddělené sekce (seniors,iot,consciousness,risk,all)
+        sections: čárkou oddělené sekce (seniors,iot,consciousness,risk,llm,hub,all)
                   default: all
     
     Returns: Kompletní přehled systému v jednom requestu.
@@ -240,6 +266,12 @@ def get_dashboard():
     if include_all or 'risk' in requested:
         result['risk'] = _get_risk_overview()
 
+    if include_all or 'llm' in requested:
+        result['llm'] = _get_llm_summary()
+
+    if include_all or 'hub' in requested:
+        result['hub'] = _get_hub_summary()
+
     # Quick health indicator
     errors = [k for k, v in result.items() if isinstance(v, dict) and 'error' in v]
     result['health'] = 'healthy' if not errors else 'degraded'
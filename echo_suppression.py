@@ -0,0 +1,162 @@
+# ============================================
+# 🔁 RADIM ECHO SUPPRESSION
+# ============================================
+# Version: 1.0.0
+# Radim slyší sám sebe: reproduktor tabletu -> mikrofon -> STT. Původní
+# compute_echo_similarity porovnávala Jaccardem množiny slov jen s
+# last_tts_text - útržek dlouhé odpovědi (pár vět z dvaceti) měl
+# Jaccard nízký, prošel bránou a spustil zbytečný LLM + TTS cyklus.
+# Tady:
+# - každá vyslovená odpověď se tokenizuje a rozdělí na shingly jen
+#   jednou, při remember() - slova (casefold, bez diakritiky) a dvojice
+#   sousedních slov, uložené jako hashe
+# - index po session: posledních ECHO_MAX_UTTERANCES odpovědí za
+#   ECHO_WINDOW_S sekund, starší session se odebírají z čela (LRU)
+# - skóre = kolik z příchozího textu je obsaženo v některé nedávné
+#   odpovědi (containment, ne Jaccard - délka odpovědi nevadí), průměr
+#   slov a dvojic; krátké vstupy (< ECHO_MIN_TOKENS) Jaccardem jako dřív,
+#   aby "ano" nebylo ozvěnou každé odpovědi se slovem "ano"
+#
+# Index je v paměti procesu; session bez odpovědi v okně (jiný worker
+# přes Redis, restart) se porovná s last_tts_text původním Jaccardem.
+
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict, deque
+
+from llm_metrics import HdrHistogram
+
+ECHO_WINDOW_S = float(os.environ.get('ECHO_WINDOW_S', 45))
+ECHO_MAX_UTTERANCES = int(os.environ.get('ECHO_MAX_UTTERANCES', 8))
+ECHO_MAX_SESSIONS = int(os.environ.get('ECHO_MAX_SESSIONS', 5000))
+ECHO_MIN_TOKENS = int(os.environ.get('ECHO_MIN_TOKENS', 3))
+ECHO_THRESHOLD = float(os.environ.get('ECHO_THRESHOLD', 0.75))
+
+_WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """casefold, bez diakritiky (STT ji občas ztratí), jen slova"""
+    text = unicodedata.normalize('NFKD', (text or '').casefold())
+    return _WORD.findall(''.join(ch for ch in text if not unicodedata.combining(ch)))
+
+
+class Shingles:
+    """Hashe slov a dvojic sousedních slov jednoho textu"""
+    __slots__ = ('words', 'pairs', 'tokens')
+
+    def __init__(self, text):
+        tokens = tokenize(text)
+        self.tokens = len(tokens)
+        self.words = frozenset(hash(token) for token in tokens)
+        self.pairs = frozenset(hash(pair) for pair in zip(tokens, tokens[1:]))
+
+    def jaccard(self, spoken):
+        if not self.words or not spoken.words:
+            return 0.0
+        return len(self.words & spoken.words) / len(self.words | spoken.words)
+
+    def score(self, spoken):
+        """Podobnost tohoto (příchozího) textu s vyslovenou odpovědí, 0..1"""
+        if not self.words or not spoken.words:
+            return 0.0
+        if self.tokens < ECHO_MIN_TOKENS:
+            return self.jaccard(spoken)
+        words = len(self.words & spoken.words) / len(self.words)
+        if not self.pairs:
+            return words
+        return (words + len(self.pairs & spoken.pairs) / len(self.pairs)) / 2
+
+
+class EchoIndex:
+    def __init__(self, window=ECHO_WINDOW_S, max_utterances=ECHO_MAX_UTTERANCES, max_sessions=ECHO_MAX_SESSIONS):
+        self.window = window
+        self.max_utterances = max_utterances
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()      # session_id -> deque[(čas, Shingles)], nejstarší první
+        self._lock = threading.Lock()
+        self.remembered = 0
+        self.scored = 0
+        self.echoes = 0
+        self.fallbacks = 0
+        self.score_ms = HdrHistogram(scale=1000)
+
+    def _expire(self, now):
+        """Session s poslední odpovědí mimo okno jsou v čele (pod zámkem)"""
+        while self._sessions:
+            utterances = next(iter(self._sessions.values()))
+            if utterances and now - utterances[-1][0] < self.window:
+                break
+            self._sessions.popitem(last=False)
+
+    def remember(self, session_id, text, now=None):
+        """Radim právě říká text - shingly jednou, tady"""
+        if not text:
+            return
+        now = time.monotonic() if now is None else now
+        shingles = Shingles(text)
+        with self._lock:
+            self._expire(now)
+            utterances = self._sessions.get(session_id)
+            if utterances is None:
+                utterances = self._sessions[session_id] = deque(maxlen=self.max_utterances)
+            if utterances and utterances[-1][1].pairs == shingles.pairs and utterances[-1][1].words == shingles.words:
+                utterances.pop()        # /chat a /state response_ready hlásí tutéž odpověď
+            utterances.append((now, shingles))
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            self.remembered += 1
+
+    def score(self, session_id, text, fallback_text='', now=None):
+        """Nejvyšší podobnost textu s odpověďmi session v okně, 0..1"""
+        started = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            utterances = self._sessions.get(session_id)
+            recent = [shingles for spoken_at, shingles in utterances or ()
+                      if now - spoken_at < self.window]
+        heard = Shingles(text)
+        if recent:
+            similarity = max(heard.score(spoken) for spoken in recent)
+        elif fallback_text:
+            # Odpověď z jiného workeru / po restartu / mimo okno - neznámo kdy
+            # zazněla, proto jen Jaccard s posledním textem jako dřív
+            self.fallbacks += 1
+            similarity = heard.jaccard(Shingles(fallback_text))
+        else:
+            similarity = 0.0
+        self.scored += 1
+        if similarity > ECHO_THRESHOLD:
+            self.echoes += 1
+        self.score_ms.record((time.perf_counter() - started) * 1000)
+        return similarity
+
+    def forget(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            sessions = len(self._sessions)
+            utterances = sum(len(items) for items in self._sessions.values())
+        return {
+            'window_s': self.window,
+            'threshold': ECHO_THRESHOLD,
+            'sessions': sessions,
+            'utterances': utterances,
+            'remembered': self.remembered,
+            'scored': self.scored,
+            'echoes': self.echoes,
+            'fallbacks': self.fallbacks,
+            'score_ms': self.score_ms.snapshot()
+        }
+
+
+ECHO_INDEX = EchoIndex()
+
+print(f"🔁 Echo suppression loaded - window {ECHO_WINDOW_S:.0f}s, {ECHO_MAX_UTTERANCES} utterances/session")
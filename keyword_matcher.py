@@ -0,0 +1,220 @@
+# ============================================
+# 🔎 RADIM KEYWORD MATCHER
+# ============================================
+# Version: 1.1.0
+# Předkompilovaný víceslovníkový matcher (Aho-Corasick) sdílený všemi
+# detektory záměru, tématu, nálady, emocí a relevance.
+# Všechny tabulky klíčových slov se zkompilují jednou do jednoho automatu
+# a zpráva se projde jedním průchodem bez ohledu na počet slov a tabulek.
+#
+# Diakritika: automat běží nad textem bez diakritiky ("pocasi" = "počasí").
+# Shoda přesně s originálním tvarem platí jako dřív (podřetězec). Shoda
+# jen po odstranění diakritiky platí, jen když je úsek textu psaný bez
+# diakritiky, začíná na začátku slova a krátká slova (<= 4 znaky) jsou
+# celým slovem - jinak by "pád" našel "vypadá" a "dobře" našlo "dobré".
+
+import threading
+import unicodedata
+
+FOLDED_MIN_WORD = 4
+
+
+def _fold_char(ch):
+    base = unicodedata.normalize('NFD', ch)[0]
+    return base if len(base) == 1 else ch
+
+
+# Tabulka pro str.translate: znak -> znak bez diakritiky (zachová pozice)
+_FOLD_TABLE = {cp: _fold_char(chr(cp)) for cp in range(0xC0, 0x250) if _fold_char(chr(cp)) != chr(cp)}
+
+
+def fold(text):
+    """Malá písmena bez diakritiky, stejná délka jako text.lower()"""
+    return text.lower().translate(_FOLD_TABLE)
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automat nad tabulkami {kategorie: [klíčová slova]}.
+
+    whole_words=True přijme jen shody ohraničené nealfanumerickým znakem
+    ("čas" nenajde v "časopis").
+    """
+
+    def __init__(self, tables, whole_words=False):
+        self.whole_words = whole_words
+        self.categories = list(tables)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self.keywords = 0
+        for category, keywords in tables.items():
+            for keyword in keywords:
+                self.add(keyword, category, whole_words)
+        self._build()
+
+    def add(self, keyword, category, whole_words=False):
+        keyword = keyword.lower()
+        node = 0
+        for ch in fold(keyword):
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((keyword, category, whole_words))
+        self.keywords += 1
+
+    def _build(self):
+        """Fail odkazy do šířky, výstupy se dědí z fail uzlu"""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def iter_matches(self, text):
+        """Generuje (start, keyword, category) pro všechny shody v textu"""
+        lowered = text.lower()
+        folded = lowered.translate(_FOLD_TABLE)
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for end, ch in enumerate(folded):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for keyword, category, whole_words in out[node]:
+                start = end - len(keyword) + 1
+                span = lowered[start:end + 1]
+                if span != keyword:
+                    # Shoda jen bez diakritiky - platí jen pro text psaný bez
+                    # diakritiky ("dobré" není "dobře") a s přísnější hranicí slova
+                    if span != folded[start:end + 1]:
+                        continue
+                    if start > 0 and folded[start - 1].isalnum():
+                        continue
+                    if len(keyword) <= FOLDED_MIN_WORD and not _is_bounded(folded, start, end + 1):
+                        continue
+                if whole_words and not _is_bounded(folded, start, end + 1):
+                    continue
+                yield start, keyword, category
+
+    def find(self, text):
+        """{kategorie: [nalezená klíčová slova]} v pořadí prvního výskytu"""
+        hits = {}
+        for _, keyword, category in self.iter_matches(text):
+            found = hits.setdefault(category, [])
+            if keyword not in found:
+                found.append(keyword)
+        return hits
+
+    def first(self, text, order=None):
+        """Nejvyšší kategorie podle pořadí (výchozí = pořadí tabulek), nebo None"""
+        hits = self.find(text)
+        for category in order or self.categories:
+            if category in hits:
+                return category
+        return None
+
+
+def _is_bounded(text, start, end):
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    if end < len(text) and text[end].isalnum():
+        return False
+    return True
+
+
+# ============================================
+# SDÍLENÝ KLASIFIKÁTOR
+# ============================================
+
+class TextClassifier:
+    """
+    Jeden automat pro všechny registrované tabulky.
+
+    Tabulky se registrují pod jmenným prostorem (např. 'topic', 'mood',
+    'intent') a kompilují se líně při prvním dotazu. Výsledek posledního
+    textu se pamatuje, takže detect_topic + detect_mood nad stejnou
+    zprávou projdou text jen jednou.
+    """
+
+    def __init__(self):
+        self._tables = {}
+        self._matcher = None
+        self._last = (None, None)
+        self._lock = threading.Lock()
+
+    def register(self, namespace, tables, whole_words=False):
+        with self._lock:
+            self._tables[namespace] = (
+                {category: list(keywords) for category, keywords in tables.items()},
+                whole_words
+            )
+            self._matcher = None
+            self._last = (None, None)
+
+    def _compile(self):
+        with self._lock:
+            if self._matcher is None:
+                matcher = KeywordMatcher({})
+                for namespace, (tables, whole_words) in self._tables.items():
+                    for category, keywords in tables.items():
+                        for keyword in keywords:
+                            matcher.add(keyword, (namespace, category), whole_words)
+                matcher._build()
+                self._matcher = matcher
+            return self._matcher
+
+    def classify(self, text):
+        """{namespace: {kategorie: [klíčová slova]}} - jeden průchod textem"""
+        text = text or ''
+        last_text, last_hits = self._last
+        if last_text == text:
+            return last_hits
+        matcher = self._matcher or self._compile()
+        hits = {}
+        for (namespace, category), keywords in matcher.find(text).items():
+            hits.setdefault(namespace, {})[category] = keywords
+        self._last = (text, hits)
+        return hits
+
+    def hits(self, text, namespace):
+        """{kategorie: [klíčová slova]} jednoho jmenného prostoru"""
+        return self.classify(text).get(namespace, {})
+
+    def counts(self, text, namespace):
+        """{kategorie: počet různých nalezených klíčových slov}"""
+        return {category: len(found) for category, found in self.hits(text, namespace).items()}
+
+    def first(self, text, namespace, order=None):
+        """První kategorie podle pořadí (výchozí = pořadí v tabulce), nebo None"""
+        hits = self.hits(text, namespace)
+        if not hits:
+            return None
+        for category in order or self._tables[namespace][0]:
+            if category in hits:
+                return category
+        return None
+
+    def stats(self):
+        matcher = self._matcher or self._compile()
+        return {
+            'namespaces': list(self._tables),
+            'keywords': matcher.keywords,
+            'states': len(matcher._goto)
+        }
+
+
+CLASSIFIER = TextClassifier()
@@ -0,0 +1,573 @@
+# ============================================
+# 🚪 RADIM LLM GATEWAY
+# ============================================
+# Version: 1.0.1
+# Jediné místo pro volání Gemini a Claude (REST).
+# - sdílený HTTP pool (keep-alive) pro všechny blueprinty
+# - retry s backoffem na 429/5xx a síťové chyby; safety/interactive
+#   pruh má na všechny pokusy dohromady jeden timeout a timeout
+#   neopakuje (senior by čekal dvakrát), batch opakuje i timeouty
+# - hedging: po hedge_after sekundách se pošle druhý stejný dotaz
+# - streaming (SSE) pro oba poskytovatele
+# - metering: latence, tokeny, web search, odhad ceny podle modelu
+# - fake provider pro testy a benchmarky bez API klíčů
+# - přijímací plánovač (llm_scheduler) s pruhy safety/interactive/batch
+#
+# Base URL lze přepsat (GEMINI_BASE_URL, ANTHROPIC_BASE_URL) - lokální
+# mock servery, proxy. LLM_FAKE=1 přesměruje všechna volání na fake.
+
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from types import SimpleNamespace
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from llm_scheduler import SCHEDULER, SchedulerTimeout
+
+try:
+    from flask import has_request_context, request as flask_request
+    FLASK_AVAILABLE = True
+except ImportError:
+    FLASK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+GEMINI_BASE_URL = os.environ.get('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com').rstrip('/')
+ANTHROPIC_BASE_URL = os.environ.get('ANTHROPIC_BASE_URL', 'https://api.anthropic.com').rstrip('/')
+ANTHROPIC_VERSION = '2023-06-01'
+
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 30))
+LLM_RETRIES = int(os.environ.get('LLM_RETRIES', 1))
+LLM_POOL_SIZE = int(os.environ.get('LLM_POOL_SIZE', 20))
+LLM_HEDGE_AFTER = float(os.environ.get('LLM_HEDGE_MS', 0)) / 1000.0
+LLM_FAKE = os.environ.get('LLM_FAKE') == '1'
+LLM_FAKE_LATENCY = float(os.environ.get('LLM_FAKE_LATENCY_MS', 0)) / 1000.0
+
+GEMINI_MODEL = 'gemini-2.0-flash'
+CLAUDE_HAIKU_MODEL = 'claude-3-haiku-20240307'
+
+RETRY_STATUS = (429, 500, 502, 503, 504, 529)
+RETRY_AFTER_MAX = 2.0
+
+# USD za 1M tokenů (vstup, výstup) - odhad pro metering
+MODEL_PRICES = {
+    'gemini-2.0-flash': (0.10, 0.40),
+    'claude-3-haiku-20240307': (0.25, 1.25),
+    'claude-3-5-haiku-20241022': (0.80, 4.00),
+    'claude-3-5-sonnet-20241022': (3.00, 15.00),
+    'fake': (0.0, 0.0),
+}
+WEB_SEARCH_PRICE = 0.01     # USD za jedno vyhledávání
+
+# Gemini safety nastavení používané chatem (BLOCK_NONE)
+RELAXED_SAFETY = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
+]
+
+
+class LLMError(Exception):
+    """Chyba volání poskytovatele (status None = síťová chyba)"""
+
+    def __init__(self, message, status=None, retry_after=None, timeout=False):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.timeout = timeout
+
+
+class LLMResult:
+    """Výsledek jednoho volání"""
+    __slots__ = ('text', 'provider', 'model', 'input_tokens', 'output_tokens',
+                 'web_searches', 'latency_ms', 'ttfb_ms', 'attempts', 'hedged', 'raw')
+
+    def __init__(self, text, provider, model, input_tokens=0, output_tokens=0,
+                 web_searches=0, raw=None):
+        self.text = text
+        self.provider = provider
+        self.model = model
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.web_searches = web_searches
+        self.latency_ms = 0.0
+        self.ttfb_ms = 0.0
+        self.attempts = 1
+        self.hedged = False
+        self.raw = raw
+
+
+def estimate_cost(model, input_tokens, output_tokens, web_searches=0):
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1e6 + web_searches * WEB_SEARCH_PRICE
+
+
+# ============================================
+# PROVIDERS
+# ============================================
+
+class GeminiProvider:
+    name = 'gemini'
+
+    def available(self):
+        return bool(os.environ.get('GEMINI_API_KEY'))
+
+    def build(self, req, stream=False):
+        method = 'streamGenerateContent?alt=sse&' if stream else 'generateContent?'
+        url = f"{GEMINI_BASE_URL}/v1beta/models/{req['model']}:{method}key={os.environ.get('GEMINI_API_KEY', '')}"
+        if req.get('prompt') is not None:
+            parts = [{"text": req['prompt']}]
+            for image in req.get('images') or []:
+                if image.startswith("data:"):
+                    image = image.split(",")[1]
+                parts.insert(0, {"inline_data": {"mime_type": "image/jpeg", "data": image}})
+            contents = [{"parts": parts}]
+        else:
+            contents = [{"role": "model" if m['role'] == 'assistant' else "user",
+                         "parts": [{"text": m['content']}]} for m in req['messages']]
+        body = {"contents": contents, "generationConfig": {"maxOutputTokens": req['max_tokens']}}
+        if req.get('system'):
+            body["systemInstruction"] = {"parts": [{"text": req['system']}]}
+        if req.get('temperature') is not None:
+            body["generationConfig"]["temperature"] = req['temperature']
+        if req.get('top_p') is not None:
+            body["generationConfig"]["topP"] = req['top_p']
+        if req.get('relaxed_safety'):
+            body["safetySettings"] = RELAXED_SAFETY
+        return url, {"Content-Type": "application/json"}, body
+
+    def parse(self, data, model):
+        candidates = data.get('candidates') or []
+        if not candidates:
+            raise LLMError("Gemini: no candidates")
+        parts = candidates[0].get('content', {}).get('parts') or []
+        text = ''.join(p.get('text', '') for p in parts)
+        usage = data.get('usageMetadata', {})
+        return LLMResult(text.strip(), self.name, model,
+                         usage.get('promptTokenCount', 0), usage.get('candidatesTokenCount', 0), raw=data)
+
+    def stream_chunk(self, event):
+        """Text z jedné SSE události (+ usage, pokud je)"""
+        parts = ((event.get('candidates') or [{}])[0].get('content') or {}).get('parts') or []
+        usage = event.get('usageMetadata')
+        tokens = (usage.get('promptTokenCount', 0), usage.get('candidatesTokenCount', 0)) if usage else None
+        return ''.join(p.get('text', '') for p in parts), tokens
+
+
+class ClaudeProvider:
+    name = 'claude'
+
+    def available(self):
+        return bool(os.environ.get('ANTHROPIC_API_KEY'))
+
+    def build(self, req, stream=False):
+        messages = req.get('messages')
+        if req.get('prompt') is not None:
+            messages = [{"role": "user", "content": req['prompt']}]
+        body = {"model": req['model'], "max_tokens": req['max_tokens'], "messages": messages}
+        if req.get('system'):
+            body["system"] = req['system']
+        if req.get('tools'):
+            body["tools"] = req['tools']
+        if req.get('temperature') is not None:
+            body["temperature"] = req['temperature']
+        if stream:
+            body["stream"] = True
+        headers = {
+            "Content-Type": "application/json",
+            "x-api-key": os.environ.get('ANTHROPIC_API_KEY', ''),
+            "anthropic-version": ANTHROPIC_VERSION
+        }
+        return f"{ANTHROPIC_BASE_URL}/v1/messages", headers, body
+
+    def parse(self, data, model):
+        blocks = data.get('content') or []
+        text = "\n".join(b.get('text', '') for b in blocks if b.get('type') == 'text')
+        usage = data.get('usage', {})
+        searches = (usage.get('server_tool_use') or {}).get('web_search_requests', 0)
+        return LLMResult(text.strip(), self.name, model, usage.get('input_tokens', 0),
+                         usage.get('output_tokens', 0), searches, raw=data)
+
+    def stream_chunk(self, event):
+        kind = event.get('type')
+        if kind == 'content_block_delta':
+            return event.get('delta', {}).get('text', ''), None
+        if kind == 'message_start':
+            usage = event.get('message', {}).get('usage', {})
+            return '', (usage.get('input_tokens', 0), usage.get('output_tokens', 0))
+        if kind == 'message_delta':
+            return '', (0, event.get('usage', {}).get('output_tokens', 0))
+        return '', None
+
+
+class FakeProvider:
+    """Deterministická odpověď bez sítě (testy, benchmarky, vývoj bez klíčů)"""
+    name = 'fake'
+
+    def available(self):
+        return True
+
+    def respond(self, req):
+        if LLM_FAKE_LATENCY:
+            time.sleep(LLM_FAKE_LATENCY)
+        last = req.get('prompt')
+        if last is None:
+            last = (req.get('messages') or [{}])[-1].get('content', '')
+        text = f"[fake:{req['model']}] {str(last)[-80:]}"
+        return LLMResult(text, self.name, req['model'], len(str(last)) // 3 + 1, len(text) // 3 + 1)
+
+
+# ============================================
+# GATEWAY
+# ============================================
+
+def estimate_request_tokens(req):
+    """Rezervace pro plánovač: odhad vstupu (~3.2 znaku/token) + max výstup"""
+    chars = len(req.get('prompt') or '') + len(req.get('system') or '')
+    for message in req.get('messages') or []:
+        content = message.get('content')
+        chars += len(content) if isinstance(content, str) else len(json.dumps(content))
+    return int(chars / 3.2) + req['max_tokens']
+
+
+def _default_lane():
+    """Bez explicitního pruhu: požadavek uživatele = interactive, pozadí = batch"""
+    if FLASK_AVAILABLE and has_request_context():
+        return 'interactive'
+    return 'batch'
+
+
+def endpoint_label():
+    if FLASK_AVAILABLE and has_request_context():
+        return flask_request.endpoint or flask_request.path
+    return 'background'
+
+
+class LLMGateway:
+    """
+    Společná brána pro všechna LLM volání.
+
+    generate() vrací LLMResult nebo None (chyba je zalogovaná a započtená),
+    stream() generuje textové kusy. Posluchači (add_listener) dostanou
+    po každém volání slovník s metrikami - napojení histogramů, tracingu.
+    """
+
+    def __init__(self):
+        self.providers = {p.name: p for p in (GeminiProvider(), ClaudeProvider(), FakeProvider())}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=LLM_POOL_SIZE, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._listeners = []
+        self._meter = {}
+        self._lock = threading.Lock()
+
+    def available(self, provider):
+        return LLM_FAKE or self.providers[provider].available()
+
+    def add_listener(self, fn):
+        self._listeners.append(fn)
+
+    # ------------------------------------------------------------------
+    # Jednorázové volání
+    # ------------------------------------------------------------------
+
+    def generate(self, provider, model, prompt=None, messages=None, system=None, max_tokens=512,
+                 temperature=None, top_p=None, tools=None, images=None, relaxed_safety=False,
+                 timeout=None, retries=None, hedge_after=None, endpoint=None, lane=None, user_id=None):
+        req = {
+            'model': model, 'prompt': prompt, 'messages': messages, 'system': system,
+            'max_tokens': max_tokens, 'temperature': temperature, 'top_p': top_p,
+            'tools': tools, 'images': images, 'relaxed_safety': relaxed_safety
+        }
+        endpoint = endpoint or endpoint_label()
+        impl = self.providers['fake'] if LLM_FAKE else self.providers[provider]
+        if not impl.available():
+            return None
+
+        start = time.perf_counter()
+        hedge_after = LLM_HEDGE_AFTER if hedge_after is None else hedge_after
+        lane = lane or _default_lane()
+        budget = lane != 'batch'
+        try:
+            with SCHEDULER.admit(lane, user_id, estimate_request_tokens(req)) as slot:
+                if impl.name == 'fake':
+                    result = impl.respond(req)
+                elif hedge_after and hedge_after > 0:
+                    result = self._hedged(impl, req, timeout, retries, hedge_after, budget)
+                else:
+                    result = self._with_retries(impl, req, timeout, retries, budget)
+                slot.actual_tokens = result.input_tokens + result.output_tokens
+        except Exception as e:
+            logger.warning(f"LLM {provider}/{model} error: {e}")
+            if isinstance(e, SchedulerTimeout):
+                self._count(impl.name, model, 'throttled')
+            self._record(impl.name, model, endpoint, None, (time.perf_counter() - start) * 1000, error=e)
+            return None
+
+        result.latency_ms = (time.perf_counter() - start) * 1000
+        if not result.ttfb_ms:
+            result.ttfb_ms = result.latency_ms
+        self._record(impl.name, model, endpoint, result, result.latency_ms)
+        return result
+
+    def _with_retries(self, impl, req, timeout, retries, budget=False):
+        """
+        budget=True (safety/interactive): timeout platí pro všechny pokusy
+        dohromady a vypršení se neopakuje - nejhorší případ zůstane timeout
+        """
+        retries = LLM_RETRIES if retries is None else retries
+        timeout = timeout or LLM_TIMEOUT
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self._post(impl, req, deadline - time.monotonic() if budget else timeout)
+                result.attempts = attempt
+                return result
+            except LLMError as e:
+                retryable = e.status is None or e.status in RETRY_STATUS
+                if not retryable or attempt > retries or (budget and e.timeout):
+                    raise
+                delay = min(RETRY_AFTER_MAX, e.retry_after if e.retry_after is not None
+                            else 0.25 * (2 ** (attempt - 1))) + random.uniform(0, 0.1)
+                if budget and deadline - time.monotonic() - delay < 1.0:
+                    raise
+                time.sleep(delay)
+
+    def _post(self, impl, req, timeout):
+        url, headers, body = impl.build(req)
+        try:
+            response = self.session.post(url, headers=headers, json=body, timeout=timeout or LLM_TIMEOUT)
+        except requests.Timeout as e:
+            raise LLMError(f"{impl.name}: {e.__class__.__name__}: {e}", timeout=True)
+        except requests.RequestException as e:
+            raise LLMError(f"{impl.name}: {e.__class__.__name__}: {e}")
+        if response.status_code != 200:
+            retry_after = response.headers.get('retry-after')
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise LLMError(f"{impl.name}: HTTP {response.status_code} - {response.text[:200]}",
+                           response.status_code, retry_after)
+        return impl.parse(response.json(), req['model'])
+
+    def _hedged(self, impl, req, timeout, retries, hedge_after, budget=False):
+        """Druhý dotaz po hedge_after s; vyhrává první úspěšná odpověď"""
+        results = queue.Queue()
+
+        def attempt(hedged):
+            try:
+                result = self._with_retries(impl, req, timeout, retries, budget)
+                result.hedged = hedged
+                results.put((result, None))
+            except Exception as e:
+                results.put((None, e))
+
+        threading.Thread(target=attempt, args=(False,), daemon=True).start()
+        pending = 1
+        try:
+            result, error = results.get(timeout=hedge_after)
+            if result is not None:
+                return result
+            pending -= 1
+        except queue.Empty:
+            error = None
+        self._count(impl.name, req['model'], 'hedges')
+        threading.Thread(target=attempt, args=(True,), daemon=True).start()
+        pending += 1
+        if budget:
+            deadline = (timeout or LLM_TIMEOUT) + 1
+        else:
+            deadline = (timeout or LLM_TIMEOUT) * (1 + (LLM_RETRIES if retries is None else retries)) + 1
+        while pending:
+            result, error = results.get(timeout=deadline)
+            pending -= 1
+            if result is not None:
+                return result
+        raise error or LLMError(f"{impl.name}: hedged requests failed")
+
+    # ------------------------------------------------------------------
+    # Streaming
+    # ------------------------------------------------------------------
+
+    def stream(self, provider, model, prompt=None, messages=None, system=None, max_tokens=512,
+               temperature=None, top_p=None, tools=None, relaxed_safety=False, timeout=None, endpoint=None,
+               lane=None, user_id=None):
+        """Generuje kusy textu (SSE). Chyba před prvním kusem vyhodí LLMError."""
+        req = {
+            'model': model, 'prompt': prompt, 'messages': messages, 'system': system,
+            'max_tokens': max_tokens, 'temperature': temperature, 'top_p': top_p,
+            'tools': tools, 'relaxed_safety': relaxed_safety
+        }
+        endpoint = endpoint or endpoint_label()
+        impl = self.providers['fake'] if LLM_FAKE else self.providers[provider]
+        start = time.perf_counter()
+        with SCHEDULER.admit(lane or _default_lane(), user_id, estimate_request_tokens(req)) as slot:
+            for chunk in self._stream(impl, req, model, endpoint, timeout, start, slot):
+                yield chunk
+
+    def _stream(self, impl, req, model, endpoint, timeout, start, slot):
+        if impl.name == 'fake':
+            result = impl.respond(req)
+            result.latency_ms = result.ttfb_ms = (time.perf_counter() - start) * 1000
+            self._record(impl.name, model, endpoint, result, result.latency_ms)
+            for word in result.text.split(' '):
+                yield word + ' '
+            return
+
+        url, headers, body = impl.build(req, stream=True)
+        try:
+            response = self.session.post(url, headers=headers, json=body, stream=True,
+                                         timeout=timeout or LLM_TIMEOUT)
+        except requests.RequestException as e:
+            error = LLMError(f"{impl.name}: {e}")
+            self._record(impl.name, model, endpoint, None, (time.perf_counter() - start) * 1000, error=error)
+            raise error
+        if response.status_code != 200:
+            error = LLMError(f"{impl.name}: HTTP {response.status_code}", response.status_code)
+            self._record(impl.name, model, endpoint, None, (time.perf_counter() - start) * 1000, error=error)
+            response.close()
+            raise error
+
+        result = LLMResult('', impl.name, model)
+        parts = []
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                payload = line[5:].strip()
+                if not payload or payload == '[DONE]':
+                    continue
+                text, tokens = impl.stream_chunk(json.loads(payload))
+                if tokens:
+                    result.input_tokens = tokens[0] or result.input_tokens
+                    result.output_tokens = tokens[1] or result.output_tokens
+                if text:
+                    if not parts:
+                        result.ttfb_ms = (time.perf_counter() - start) * 1000
+                    parts.append(text)
+                    yield text
+        finally:
+            response.close()
+            result.text = ''.join(parts)
+            result.latency_ms = (time.perf_counter() - start) * 1000
+            slot.actual_tokens = result.input_tokens + result.output_tokens
+            self._record(impl.name, model, endpoint, result, result.latency_ms)
+
+    # ------------------------------------------------------------------
+    # Claude SDK kompatibilita (claude_routes)
+    # ------------------------------------------------------------------
+
+    def claude_client(self):
+        """Objekt s messages.create(...) jako Anthropic SDK - volání jdou přes bránu"""
+        return _ClaudeCompatClient(self)
+
+    # ------------------------------------------------------------------
+    # Metering
+    # ------------------------------------------------------------------
+
+    def _count(self, provider, model, field):
+        with self._lock:
+            m = self._meter.setdefault((provider, model), _new_meter())
+            m[field] += 1
+
+    def _record(self, provider, model, endpoint, result, latency_ms, error=None):
+        with self._lock:
+            m = self._meter.setdefault((provider, model), _new_meter())
+            m['calls'] += 1
+            m['latency_ms_total'] += latency_ms
+            m['latency_ms_max'] = max(m['latency_ms_max'], latency_ms)
+            m['endpoints'][endpoint] = m['endpoints'].get(endpoint, 0) + 1
+            if error is not None:
+                m['errors'] += 1
+            else:
+                m['input_tokens'] += result.input_tokens
+                m['output_tokens'] += result.output_tokens
+                m['web_searches'] += result.web_searches
+                m['retries'] += result.attempts - 1
+                m['cost_usd'] += estimate_cost(model, result.input_tokens, result.output_tokens,
+                                               result.web_searches)
+        event = {
+            'provider': provider, 'model': model, 'endpoint': endpoint,
+            'ok': error is None, 'error': str(error) if error is not None else None,
+            'latency_ms': latency_ms,
+            'ttfb_ms': result.ttfb_ms if result is not None else None,
+            'input_tokens': result.input_tokens if result is not None else 0,
+            'output_tokens': result.output_tokens if result is not None else 0,
+            'web_searches': result.web_searches if result is not None else 0,
+            'hedged': bool(result is not None and result.hedged)
+        }
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning(f"LLM listener error: {e}")
+
+    def stats(self):
+        with self._lock:
+            out = {}
+            for (provider, model), m in self._meter.items():
+                calls = m['calls']
+                out[f"{provider}/{model}"] = dict(
+                    m,
+                    endpoints=dict(m['endpoints']),
+                    cost_usd=round(m['cost_usd'], 5),
+                    latency_ms_avg=round(m['latency_ms_total'] / calls, 1) if calls else 0.0,
+                    latency_ms_total=round(m['latency_ms_total'], 1),
+                    latency_ms_max=round(m['latency_ms_max'], 1)
+                )
+        return {
+            'fake_mode': LLM_FAKE,
+            'pool_size': LLM_POOL_SIZE,
+            'retries': LLM_RETRIES,
+            'hedge_after_ms': LLM_HEDGE_AFTER * 1000,
+            'base_urls': {'gemini': GEMINI_BASE_URL, 'claude': ANTHROPIC_BASE_URL},
+            'models': out,
+            'scheduler': SCHEDULER.stats()
+        }
+
+
+def _new_meter():
+    return {
+        'calls': 0, 'errors': 0, 'retries': 0, 'hedges': 0, 'throttled': 0,
+        'input_tokens': 0, 'output_tokens': 0, 'web_searches': 0, 'cost_usd': 0.0,
+        'latency_ms_total': 0.0, 'latency_ms_max': 0.0, 'endpoints': {}
+    }
+
+
+class _ClaudeMessages:
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    def create(self, model, max_tokens, messages, system=None, tools=None, temperature=None,
+               lane=None, user_id=None, **_):
+        """Navíc proti SDK: lane a user_id pro plánovač"""
+        result = self.gateway.generate('claude', model, messages=messages, system=system,
+                                       max_tokens=max_tokens, tools=tools, temperature=temperature,
+                                       lane=lane, user_id=user_id)
+        if result is None:
+            raise LLMError(f"claude/{model}: request failed")
+        blocks = [SimpleNamespace(type='text', text=b.get('text', ''))
+                  for b in (result.raw or {}).get('content', []) if b.get('type') == 'text']
+        if not blocks and result.text:
+            blocks = [SimpleNamespace(type='text', text=result.text)]
+        usage = SimpleNamespace(input_tokens=result.input_tokens, output_tokens=result.output_tokens)
+        return SimpleNamespace(content=blocks, usage=usage, model=model)
+
+
+class _ClaudeCompatClient:
+    def __init__(self, gateway):
+        self.messages = _ClaudeMessages(gateway)
+
+
+LLM = LLMGateway()
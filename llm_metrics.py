@@ -0,0 +1,246 @@
+# ============================================
+# 📈 RADIM LLM METRICS
+# ============================================
+# Version: 1.0.0
+# Instrumentace volání LLM (posluchač llm_gateway.LLM):
+# TTFB, celková latence, vstupní/výstupní tokeny, web search a fallbacky
+# podle poskytovatele, modelu a endpointu.
+#
+# Histogramy jsou HDR-style (log-lineární koše, 2 platné číslice, řídké
+# pole) - záznam je O(1), paměť neroste s počtem vzorků a percentily mají
+# relativní chybu < 1 % v celém rozsahu (1 ms až hodiny).
+#
+# GET /metrics          - Prometheus text format (summary s kvantily)
+# GET /api/metrics/llm  - JSON (a sekce 'llm' v /api/dashboard)
+
+import time
+import threading
+
+from flask import Blueprint, Response, jsonify
+
+from llm_gateway import LLM, estimate_cost, endpoint_label
+
+metrics_bp = Blueprint('metrics', __name__)
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+SUB_BUCKET_BITS = 8         # 256 podkošů = 2 platné číslice
+
+
+class HdrHistogram:
+    """
+    Log-lineární histogram celých čísel. Hodnoty se násobí scale
+    (latence v ms se ukládá v µs), koš má šířku < 1 % hodnoty.
+    """
+    __slots__ = ('scale', 'counts', 'total', 'sum', 'min', 'max')
+
+    def __init__(self, scale=1):
+        self.scale = scale
+        self.counts = {}
+        self.total = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def _index(value):
+        bucket = max(0, value.bit_length() - SUB_BUCKET_BITS)
+        return (bucket << (SUB_BUCKET_BITS - 1)) + (value >> bucket)
+
+    @staticmethod
+    def _value_at(index):
+        """Horní hranice koše (HDR 'highest equivalent value')"""
+        half = 1 << (SUB_BUCKET_BITS - 1)
+        if index < 2 * half:
+            return index
+        bucket = index // half - 1
+        sub = index - bucket * half
+        return ((sub + 1) << bucket) - 1
+
+    def record(self, value):
+        if value is None:
+            return
+        value = max(0.0, float(value))
+        index = self._index(int(value * self.scale))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        if not self.total:
+            return 0.0
+        rank = max(1, int(q * self.total + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value_at(index) / self.scale, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.total,
+            'sum': round(self.sum, 3),
+            'min': round(self.min or 0.0, 3),
+            'max': round(self.max or 0.0, 3),
+            'avg': round(self.sum / self.total, 3) if self.total else 0.0,
+            **{f'p{int(q * 100)}': round(self.percentile(q), 3) for q in QUANTILES}
+        }
+
+
+class _Series:
+    """Jedna kombinace (provider, model, endpoint)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.hedged = 0
+        self.web_searches = 0
+        self.cost_usd = 0.0
+        self.ttfb_ms = HdrHistogram(scale=1000)
+        self.latency_ms = HdrHistogram(scale=1000)
+        self.input_tokens = HdrHistogram()
+        self.output_tokens = HdrHistogram()
+
+
+class LLMMetrics:
+    """Sběr událostí z brány + fallbacky hlášené volajícím"""
+
+    HISTOGRAMS = ('ttfb_ms', 'latency_ms', 'input_tokens', 'output_tokens')
+
+    def __init__(self):
+        self._series = {}
+        self._fallbacks = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def observe(self, event):
+        """Posluchač LLM.add_listener - jedna událost na volání"""
+        key = (event['provider'], event['model'], event['endpoint'])
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.requests += 1
+            series.latency_ms.record(event['latency_ms'])
+            if not event['ok']:
+                series.errors += 1
+                return
+            series.ttfb_ms.record(event['ttfb_ms'])
+            series.input_tokens.record(event['input_tokens'])
+            series.output_tokens.record(event['output_tokens'])
+            series.web_searches += event['web_searches']
+            series.hedged += int(event['hedged'])
+            if event['provider'] != 'fake':
+                series.cost_usd += estimate_cost(event['model'], event['input_tokens'],
+                                                 event['output_tokens'], event['web_searches'])
+
+    def fallback(self, source, target, endpoint=None):
+        """Volající přešel na záložního poskytovatele (gemini -> claude, claude -> local)"""
+        key = (endpoint or endpoint_label(), source, target)
+        with self._lock:
+            self._fallbacks[key] = self._fallbacks.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            series = [
+                {
+                    'provider': provider, 'model': model, 'endpoint': endpoint,
+                    'requests': s.requests, 'errors': s.errors, 'hedged': s.hedged,
+                    'web_searches': s.web_searches, 'cost_usd': round(s.cost_usd, 5),
+                    **{name: getattr(s, name).snapshot() for name in self.HISTOGRAMS}
+                }
+                for (provider, model, endpoint), s in sorted(self._series.items())
+            ]
+            fallbacks = [
+                {'endpoint': endpoint, 'from': source, 'to': target, 'count': count}
+                for (endpoint, source, target), count in sorted(self._fallbacks.items())
+            ]
+        return {
+            'since': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started)),
+            'requests': sum(s['requests'] for s in series),
+            'errors': sum(s['errors'] for s in series),
+            'fallbacks': sum(f['count'] for f in fallbacks),
+            'cost_usd': round(sum(s['cost_usd'] for s in series), 5),
+            'series': series,
+            'fallback_paths': fallbacks
+        }
+
+    def prometheus(self):
+        """Prometheus text exposition format 0.0.4"""
+        lines = []
+        with self._lock:
+            items = sorted(self._series.items())
+            fallbacks = sorted(self._fallbacks.items())
+
+            def counter(name, help_text, attr):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for key, s in items:
+                    lines.append(f'{name}{{{_labels(*key)}}} {getattr(s, attr)}')
+
+            counter('radim_llm_requests_total', 'LLM calls through the gateway.', 'requests')
+            counter('radim_llm_errors_total', 'Failed LLM calls (after retries).', 'errors')
+            counter('radim_llm_hedged_total', 'Calls answered by the hedged request.', 'hedged')
+            counter('radim_llm_web_searches_total', 'Web search tool uses.', 'web_searches')
+            counter('radim_llm_cost_usd_total', 'Estimated cost in USD.', 'cost_usd')
+
+            for attr, help_text in (('ttfb_ms', 'Time to first byte in milliseconds.'),
+                                    ('latency_ms', 'Total call latency in milliseconds.'),
+                                    ('input_tokens', 'Input tokens per call.'),
+                                    ('output_tokens', 'Output tokens per call.')):
+                name = f'radim_llm_{attr}'
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} summary')
+                for key, s in items:
+                    histogram = getattr(s, attr)
+                    labels = _labels(*key)
+                    for q in QUANTILES:
+                        lines.append(f'{name}{{{labels},quantile="{q}"}} {histogram.percentile(q):g}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum:g}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.total}')
+
+            lines.append('# HELP radim_llm_fallbacks_total Provider fallbacks by endpoint.')
+            lines.append('# TYPE radim_llm_fallbacks_total counter')
+            for (endpoint, source, target), count in fallbacks:
+                lines.append(f'radim_llm_fallbacks_total{{endpoint="{_escape(endpoint)}",'
+                             f'from="{_escape(source)}",to="{_escape(target)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(provider, model, endpoint):
+    return f'provider="{_escape(provider)}",model="{_escape(model)}",endpoint="{_escape(endpoint)}"'
+
+
+METRICS = LLMMetrics()
+LLM.add_listener(METRICS.observe)
+
+
+# ============================================
+# ENDPOINTS
+# ============================================
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint (+ lag hubu a heartbeat jitter z profiler)"""
+    body = METRICS.prometheus()
+    try:
+        from profiler import hub_prometheus
+        body += hub_prometheus()
+    except ImportError:
+        pass
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@metrics_bp.route('/api/metrics/llm', methods=['GET'])
+def llm_metrics_json():
+    """Stejná data jako JSON"""
+    return jsonify({'success': True, **METRICS.snapshot()})
+
+
+print("📈 LLM metrics loaded - /metrics, /api/metrics/llm")
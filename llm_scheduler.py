@@ -0,0 +1,263 @@
+# ============================================
+# 🚦 RADIM LLM SCHEDULER
+# ============================================
+# Version: 1.0.0
+# Přijímací plánovač před voláními LLM (volá ho llm_gateway).
+# Tři pruhy podle priority:
+#   safety      - bezpečnost a zdraví (detect_intent 'safety'/'health')
+#   interactive - běžný chat, hlas, počasí, zprávy
+#   batch       - kvízy, příběhy, pooly, dávková analýza
+# Globální rozpočet tokenů za minutu (TPM), rozpočet na uživatele
+# (jen volání s user_id - systémová volání bez uživatele nesdílí jeden
+# společný "anonymní" rozpočet), vlastní rozpočet dávkového pruhu,
+# omezení souběžnosti a deadline čekání ve frontě. Bezpečnostní pruh
+# rozpočty tokenů nepřekáží - jen se do nich započítá.
+
+import os
+import time
+import itertools
+import threading
+from collections import deque
+
+LLM_MAX_CONCURRENT = int(os.environ.get('LLM_MAX_CONCURRENT', 8))
+LLM_TPM_BUDGET = int(os.environ.get('LLM_TPM_BUDGET', 200000))
+LLM_USER_TPM = int(os.environ.get('LLM_USER_TPM', 20000))
+LLM_BATCH_TPM = int(os.environ.get('LLM_BATCH_TPM', 40000))
+
+LANES = ('safety', 'interactive', 'batch')
+
+# Výchozí maximální čekání ve frontě (s)
+LANE_DEADLINES = {'safety': 30.0, 'interactive': 15.0, 'batch': 120.0}
+
+WINDOW = 60.0
+WAIT_SAMPLES = 512
+
+
+class SchedulerTimeout(Exception):
+    """Požadavek nebyl připuštěn před deadlinem"""
+
+
+def lane_for_intent(intent):
+    """Pruh podle detect_intent() z radim_orchestrator"""
+    return 'safety' if intent in ('safety', 'health') else 'interactive'
+
+
+class _TokenWindow:
+    """Klouzavé okno 60 s se součtem tokenů"""
+
+    def __init__(self):
+        self.events = deque()
+        self.total = 0
+
+    def used(self, now):
+        while self.events and now - self.events[0][0] > WINDOW:
+            self.total -= self.events.popleft()[1]
+        return self.total
+
+    def add(self, now, tokens):
+        if tokens:
+            self.events.append((now, tokens))
+            self.total += tokens
+
+
+class _Waiter:
+    __slots__ = ('lane', 'user_id', 'tokens', 'seq', 'enqueued', 'event', 'admitted')
+
+    def __init__(self, lane, user_id, tokens, seq):
+        self.lane = lane
+        self.user_id = user_id
+        self.tokens = tokens
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.event = threading.Event()
+        self.admitted = False
+
+
+class _LaneStats:
+    def __init__(self):
+        self.admitted = 0
+        self.timeouts = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    def snapshot(self, waiting):
+        waits = sorted(self.waits)
+        n = len(waits)
+        return {
+            'admitted': self.admitted,
+            'deadline_timeouts': self.timeouts,
+            'waiting': waiting,
+            'wait_ms_avg': round(sum(waits) / n, 1) if n else 0.0,
+            'wait_ms_p95': round(waits[min(n - 1, int(n * 0.95))], 1) if n else 0.0,
+            'wait_ms_max': round(waits[-1], 1) if n else 0.0
+        }
+
+
+class LLMScheduler:
+    """
+    admit(lane, user_id, tokens) je context manager - drží slot po dobu
+    volání. Kdo čeká, rozhoduje pořadí (pruh, tokeny uživatele za poslední
+    minutu, pořadí příchodu): vyšší pruh vždy dřív, v rámci pruhu má
+    přednost uživatel, který poslední minutu spotřeboval nejméně.
+    """
+
+    def __init__(self, max_concurrent=LLM_MAX_CONCURRENT, tpm_budget=LLM_TPM_BUDGET,
+                 user_tpm=LLM_USER_TPM, batch_tpm=LLM_BATCH_TPM):
+        self.max_concurrent = max_concurrent
+        self.tpm_budget = tpm_budget
+        self.user_tpm = user_tpm
+        self.batch_tpm = batch_tpm
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._running = 0
+        self._seq = itertools.count()
+        self._global = _TokenWindow()
+        self._batch = _TokenWindow()
+        self._users = {}
+        self._lanes = {lane: _LaneStats() for lane in LANES}
+        self._retry_pending = False
+
+    def admit(self, lane='interactive', user_id=None, tokens=0, deadline=None):
+        return _Admission(self, lane if lane in LANES else 'interactive', user_id,
+                          tokens, LANE_DEADLINES[lane if lane in LANES else 'interactive']
+                          if deadline is None else deadline)
+
+    # ------------------------------------------------------------------
+
+    def _acquire(self, lane, user_id, tokens, deadline):
+        with self._lock:
+            waiter = _Waiter(lane, user_id, tokens, next(self._seq))
+            self._waiters.append(waiter)
+            self._dispatch()
+
+        if not waiter.event.wait(timeout=deadline):
+            with self._lock:
+                if not waiter.admitted:
+                    self._waiters.remove(waiter)
+                    self._lanes[lane].timeouts += 1
+                    self._dispatch()    # Mohl blokovat nižší pruhy
+                    raise SchedulerTimeout(f"LLM queue deadline {deadline}s exceeded ({lane})")
+        self._lanes[lane].waits.append((time.monotonic() - waiter.enqueued) * 1000)
+        return waiter
+
+    def _release(self, waiter, actual_tokens):
+        with self._lock:
+            self._running -= 1
+            # Rezervace se opraví na skutečnou spotřebu (z odpovědi poskytovatele)
+            if actual_tokens is not None and actual_tokens != waiter.tokens:
+                now = time.monotonic()
+                delta = actual_tokens - waiter.tokens
+                self._global.add(now, delta)
+                self._charge(waiter, now, delta)
+            self._dispatch()
+
+    def _charge(self, waiter, now, tokens):
+        if waiter.user_id is not None:
+            self._user_window(waiter.user_id).add(now, tokens)
+        if waiter.lane == 'batch':
+            self._batch.add(now, tokens)
+
+    def _user_used(self, user_id, now):
+        return self._user_window(user_id).used(now) if user_id is not None else 0
+
+    def _user_window(self, user_id):
+        window = self._users.get(user_id)
+        if window is None:
+            if len(self._users) > 10000:
+                now = time.monotonic()
+                self._users = {u: w for u, w in self._users.items() if w.used(now)}
+            window = self._users[user_id] = _TokenWindow()
+        return window
+
+    def _dispatch(self):
+        """Připustí čekající, dokud jsou sloty a rozpočet (volat pod zámkem)"""
+        now = time.monotonic()
+        while self._waiters and self._running < self.max_concurrent:
+            self._waiters.sort(key=lambda w: (LANES.index(w.lane), self._user_used(w.user_id, now), w.seq))
+            chosen = None
+            blocked_lane = None
+            for waiter in self._waiters:
+                # Nižší pruh nesmí předběhnout vyšší, který čeká na globální rozpočet
+                if blocked_lane is not None and waiter.lane != blocked_lane:
+                    break
+                shortage = None if waiter.lane == 'safety' else self._shortage(waiter, now)
+                if shortage is None:
+                    chosen = waiter
+                    break
+                if shortage == 'global':
+                    blocked_lane = waiter.lane
+                # Rozpočet uživatele / dávkového pruhu - přeskočit, ostatní čekat nemusí
+            if chosen is None:
+                if self._waiters:
+                    self._schedule_retry()
+                return
+            self._waiters.remove(chosen)
+            self._running += 1
+            self._global.add(now, chosen.tokens)
+            self._charge(chosen, now, chosen.tokens)
+            self._lanes[chosen.lane].admitted += 1
+            chosen.admitted = True
+            chosen.event.set()
+
+    def _shortage(self, waiter, now):
+        """Který rozpočet chybí: 'global', 'batch', 'user', nebo None (vejde se)"""
+        # Požadavek větší než celý rozpočet projde, až je okno prázdné
+        if self._global.used(now) + min(waiter.tokens, self.tpm_budget) > self.tpm_budget:
+            return 'global'
+        if waiter.lane == 'batch' and self._batch.used(now) + min(waiter.tokens, self.batch_tpm) > self.batch_tpm:
+            return 'batch'
+        if self._user_used(waiter.user_id, now) + min(waiter.tokens, self.user_tpm) > self.user_tpm:
+            return 'user'
+        return None
+
+    def _schedule_retry(self):
+        """Čeká se na rozpočet - zkusit znovu, až z okna vypadnou staré tokeny"""
+        if self._retry_pending:
+            return
+        self._retry_pending = True
+        timer = threading.Timer(0.5, self._retry)
+        timer.daemon = True
+        timer.start()
+
+    def _retry(self):
+        with self._lock:
+            self._retry_pending = False
+            self._dispatch()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            waiting = {lane: 0 for lane in LANES}
+            for waiter in self._waiters:
+                waiting[waiter.lane] += 1
+            return {
+                'max_concurrent': self.max_concurrent,
+                'running': self._running,
+                'tpm_budget': self.tpm_budget,
+                'tpm_used': self._global.used(now),
+                'user_tpm_budget': self.user_tpm,
+                'batch_tpm_budget': self.batch_tpm,
+                'batch_tpm_used': self._batch.used(now),
+                'lanes': {lane: self._lanes[lane].snapshot(waiting[lane]) for lane in LANES}
+            }
+
+
+class _Admission:
+    def __init__(self, scheduler, lane, user_id, tokens, deadline):
+        self.scheduler = scheduler
+        self.lane = lane
+        self.user_id = user_id
+        self.tokens = tokens
+        self.deadline = deadline
+        self.actual_tokens = None
+        self._waiter = None
+
+    def __enter__(self):
+        self._waiter = self.scheduler._acquire(self.lane, self.user_id, self.tokens, self.deadline)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.scheduler._release(self._waiter, self.actual_tokens)
+        return False
+
+
+SCHEDULER = LLMScheduler()
@@ -0,0 +1,157 @@
+# ============================================
+# ⚡ RADIM LOCAL ANSWERS
+# ============================================
+# Version: 1.1.2
+# Deterministické dotazy (svátek, datum, den, čas, pozdrav) se zodpoví
+# lokálně šablonou během mikrosekund - bez volání Claude/Gemini.
+# Cokoli s bezpečnostním, zdravotním nebo úkolovým slovem jde vždy na LLM.
+
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from keyword_matcher import CLASSIFIER, fold
+from radim_orchestrator import detect_intent
+
+# Senioři jsou v Česku - server (Heroku) běží v UTC
+LOCAL_TZ = ZoneInfo('Europe/Prague')
+
+# Pořadí odpovědí při více záměrech v jedné zprávě
+LOCAL_INTENTS = ['date', 'time', 'nameday', 'nameday_lookup', 'greeting']
+
+LOCAL_KEYWORDS = {
+    'nameday': [
+        'kdo má svátek', 'kdo má dnes svátek', 'kdo má dneska svátek', 'kdo má zítra svátek',
+        'kdo měl včera svátek', 'kdo slaví svátek', 'kdo dnes slaví', 'jaký je dnes svátek',
+        'jaký je svátek', 'čí je svátek', 'dnešní svátek', 'zítřejší svátek',
+        'kdo má jmeniny', 'kdo má dnes jmeniny', 'kdo má zítra jmeniny', 'kdo slaví jmeniny'
+    ],
+    'nameday_lookup': ['kdy má svátek', 'kdy slaví svátek', 'kdy má jmeniny', 'kdy slaví jmeniny'],
+    'date': [
+        'jaké je datum', 'jaké je dnes datum', 'jaké je dneska datum', 'dnešní datum',
+        'kolikátého je', 'kolikátýho je', 'kolikátého je dnes', 'kolikátého máme',
+        'co je dnes za den', 'co je dneska za den', 'jaký je dnes den', 'jaký je dneska den',
+        'jaký den je dnes', 'jaký den je dneska', 'který je dnes den', 'co je zítra za den'
+    ],
+    'time': [
+        'kolik je hodin', 'kolik je teď hodin', 'kolik je teďka hodin', 'kolik je právě hodin',
+        'kolik máme hodin', 'kolik je čas', 'jaký je čas', 'kolik ukazují hodiny'
+    ],
+    'greeting': [
+        'dobré ráno', 'dobrý den', 'dobré odpoledne', 'dobrý večer', 'ahoj', 'ahojky',
+        'čau', 'nazdar', 'zdravím', 'dobrou noc'
+    ]
+}
+
+# Záměry z radim_orchestrator, které nikdy neodpovídáme lokálně
+BLOCKING_INTENTS = ('safety', 'health', 'task')
+
+CLASSIFIER.register('local', LOCAL_KEYWORDS, whole_words=True)
+
+DAY_NAMES = ['pondělí', 'úterý', 'středa', 'čtvrtek', 'pátek', 'sobota', 'neděle']
+MONTH_NAMES = ['ledna', 'února', 'března', 'dubna', 'května', 'června',
+               'července', 'srpna', 'září', 'října', 'listopadu', 'prosince']
+
+# Pozdrav bez dalšího obsahu ("Dobré ráno, Radime!")
+GREETING_MAX_WORDS = 3
+
+
+class LocalAnswerEngine:
+    """
+    Pravidlový engine před voláním LLM.
+
+    nameday_calendar je NAMEDAY_CALENDAR z claude_routes ({měsíc: {den: jméno}}),
+    greeting je get_greeting(now) (pozdrav podle denní doby).
+    """
+
+    def __init__(self, nameday_calendar, greeting):
+        self.calendar = nameday_calendar
+        self.greeting = greeting
+        self._name_index = {}
+        for month, days in nameday_calendar.items():
+            for day, names in days.items():
+                for name in names.split(' a '):
+                    self._name_index.setdefault(fold(name), (month, day, names))
+        self.answered = {}
+        self.passed = 0
+        self.blocked = 0
+        self.total_us = 0.0
+
+    def answer(self, message, now=None):
+        """Vrátí (intent, text) nebo None, pokud zprávu musí zpracovat LLM"""
+        start = time.perf_counter()
+        result = self._answer(message or '', now or datetime.now(LOCAL_TZ))
+        self.total_us += (time.perf_counter() - start) * 1e6
+        if result is None:
+            self.passed += 1
+        else:
+            self.answered[result[0]] = self.answered.get(result[0], 0) + 1
+        return result
+
+    def _answer(self, message, now):
+        hits = CLASSIFIER.hits(message, 'local')
+        if not hits:
+            return None
+        if detect_intent(message) in BLOCKING_INTENTS:
+            self.blocked += 1
+            return None
+
+        intents = [i for i in LOCAL_INTENTS if i in hits]
+        if intents == ['greeting'] and len(message.split()) > GREETING_MAX_WORDS:
+            return None
+        if 'greeting' in intents and len(intents) > 1:
+            intents.remove('greeting')
+
+        folded = fold(message)
+        parts = []
+        for intent in intents:
+            text = getattr(self, f'_answer_{intent}')(message, folded, now)
+            if text is None:
+                return None
+            parts.append(text)
+        return ('+'.join(intents), ' '.join(parts))
+
+    def _answer_date(self, message, folded, now):
+        if 'zitra' in folded:
+            day = now + timedelta(days=1)
+            return f"Zítra bude {DAY_NAMES[day.weekday()]} {day.day}. {MONTH_NAMES[day.month - 1]} {day.year}."
+        return f"Dnes je {DAY_NAMES[now.weekday()]} {now.day}. {MONTH_NAMES[now.month - 1]} {now.year}."
+
+    def _answer_time(self, message, folded, now):
+        return f"Je právě {now.hour}:{now.minute:02d}."
+
+    def _answer_nameday(self, message, folded, now):
+        if 'zitra' in folded or 'zitrejsi' in folded:
+            day, label = now + timedelta(days=1), "Zítra má svátek"
+        elif 'vcera' in folded:
+            day, label = now - timedelta(days=1), "Včera měl svátek"
+        else:
+            day, label = now, "Dnes má svátek"
+        name = self.calendar.get(day.month, {}).get(day.day)
+        if not name:
+            return None
+        return f"{label} {name}. 🎉"
+
+    def _answer_nameday_lookup(self, message, folded, now):
+        """'Kdy má svátek Jana?' - hledání jména v kalendáři (jen 1. pád)"""
+        for word in folded.replace('?', ' ').replace(',', ' ').split():
+            found = self._name_index.get(word)
+            if found:
+                month, day, names = found
+                return f"{names} má svátek {day}. {MONTH_NAMES[month - 1]}."
+        return None
+
+    def _answer_greeting(self, message, folded, now):
+        return f"{self.greeting(now)} Jak se dnes máte?"
+
+    def stats(self):
+        saved = sum(self.answered.values())
+        total = saved + self.passed
+        return {
+            'saved_llm_calls': saved,
+            'answered_by_intent': dict(self.answered),
+            'passed_to_llm': self.passed,
+            'blocked_by_safety_keywords': self.blocked,
+            'local_rate': round(saved / total, 3) if total else 0.0,
+            'avg_us': round(self.total_us / total, 1) if total else 0.0
+        }
@@ -13,6 +13,9 @@ from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 from collections import defaultdict
 
+from keyword_matcher import CLASSIFIER
+from context_builder import ContextBuilder, summary_block
+
 logger = logging.getLogger(__name__)
 
 # Flask Blueprint
@@ -26,6 +29,9 @@ memory_bp = Blueprint('memory', __name__, url_prefix='/api/memory')
 CONVERSATION_HISTORY = defaultdict(list)
 MAX_HISTORY = 20  # Posledních 20 zpráv
 
+# Rozpočet tokenů pro historii + klouzavé shrnutí zpráv vypadlých z MAX_HISTORY
+MEMORY_CONTEXT = ContextBuilder('memory')
+
 # User profiles
 USER_PROFILES = {}
 
@@ -136,45 +142,36 @@ def build_personalized_prompt(user_id: str) -> str:
     
     return "\n".join(parts)
 
+TOPIC_KEYWORDS = {
+    "health": ["zdraví", "lék", "doktor", "bolest", "nemoc", "léčba"],
+    "weather": ["počasí", "teplota", "déšť", "slunce", "vítr"],
+    "news": ["zprávy", "novinky", "politik", "svět"],
+    "family": ["rodina", "děti", "vnuci", "manžel", "manželka"],
+    "memory": ["paměť", "vzpomínk", "zapomn"],
+    "exercise": ["cvičení", "pohyb", "procházka", "sport"],
+    "food": ["jídlo", "vaření", "recept", "oběd", "večeře"],
+    "entertainment": ["film", "seriál", "kniha", "hudba", "televize"],
+    "technology": ["počítač", "telefon", "internet", "aplikace"],
+    "emotions": ["cítím", "smutný", "šťastný", "osamělý", "strach"]
+}
+
+# Pořadí = priorita (úzkost přebíjí smutek, smutek radost)
+MOOD_KEYWORDS = {
+    "anxious": ["strach", "bojím", "nervózní", "úzkost", "stres", "nemůžu spát"],
+    "sad": ["smutný", "osamělý", "chybí mi", "bolí", "unavený", "špatně"],
+    "happy": ["rád", "šťastný", "skvělé", "super", "děkuji", "výborně", "hezky"]
+}
+
+CLASSIFIER.register('topic', TOPIC_KEYWORDS)
+CLASSIFIER.register('mood', MOOD_KEYWORDS)
+
 def detect_topic(message: str) -> str:
     """Detekovat téma zprávy"""
-    msg = message.lower()
-    
-    topic_keywords = {
-        "health": ["zdraví", "lék", "doktor", "bolest", "nemoc", "léčba"],
-        "weather": ["počasí", "teplota", "déšť", "slunce", "vítr"],
-        "news": ["zprávy", "novinky", "politik", "svět"],
-        "family": ["rodina", "děti", "vnuci", "manžel", "manželka"],
-        "memory": ["paměť", "vzpomínk", "zapomn"],
-        "exercise": ["cvičení", "pohyb", "procházka", "sport"],
-        "food": ["jídlo", "vaření", "recept", "oběd", "večeře"],
-        "entertainment": ["film", "seriál", "kniha", "hudba", "televize"],
-        "technology": ["počítač", "telefon", "internet", "aplikace"],
-        "emotions": ["cítím", "smutný", "šťastný", "osamělý", "strach"]
-    }
-    
-    for topic, keywords in topic_keywords.items():
-        if any(kw in msg for kw in keywords):
-            return topic
-    
-    return "general"
+    return CLASSIFIER.first(message, 'topic') or "general"
 
 def detect_mood(message: str) -> str:
     """Detekovat náladu z zprávy"""
-    msg = message.lower()
-    
-    happy_words = ["rád", "šťastný", "skvělé", "super", "děkuji", "výborně", "hezky"]
-    sad_words = ["smutný", "osamělý", "chybí mi", "bolí", "unavený", "špatně"]
-    anxious_words = ["strach", "bojím", "nervózní", "úzkost", "stres", "nemůžu spát"]
-    
-    if any(w in msg for w in anxious_words):
-        return "anxious"
-    elif any(w in msg for w in sad_words):
-        return "sad"
-    elif any(w in msg for w in happy_words):
-        return "happy"
-    
-    return "neutral"
+    return CLASSIFIER.first(message, 'mood') or "neutral"
 
 # ============================================================================
 # ROUTES
@@ -188,6 +185,7 @@ def health_check():
         "service": "RADIM Memory & Learning",
         "users_tracked": len(USER_PROFILES),
         "conversations_active": len(CONVERSATION_HISTORY),
+        "context": MEMORY_CONTEXT.stats(),
         "timestamp": datetime.utcnow().isoformat()
     })
 
@@ -400,14 +398,16 @@ def submit_feedback(user_id):
 # ─────────────────────────────────────────────────────────────────────────────
 
 def get_personalized_system_prompt(user_id: str, base_prompt: str) -> str:
-    """Vrátit personalizovaný system prompt"""
+    """Vrátit personalizovaný system prompt (+ shrnutí starší konverzace)"""
     addition = build_personalized_prompt(user_id)
-    return base_prompt + addition
+    summary, _ = MEMORY_CONTEXT.store.get(user_id)
+    return base_prompt + addition + summary_block(summary)
 
 def get_conversation_messages(user_id: str, limit: int = 10) -> list:
-    """Vrátit konverzační historii pro Claude"""
+    """Vrátit konverzační historii pro Claude (max limit zpráv v rozpočtu tokenů)"""
     history = CONVERSATION_HISTORY.get(user_id, [])
-    return [{"role": m["role"], "content": m["content"]} for m in history[-limit:]]
+    recent = MEMORY_CONTEXT.trim(history[-limit:])
+    return [{"role": m["role"], "content": m["content"]} for m in recent]
 
 def record_interaction(user_id: str, user_message: str, assistant_response: str):
     """Zaznamenat interakci"""
@@ -425,8 +425,9 @@ def record_interaction(user_id: str, user_message: str, assistant_response: str)
         "timestamp": datetime.utcnow().isoformat()
     })
     
-    # Keep only last N
+    # Keep only last N - vypadlé tahy do shrnutí
     if len(CONVERSATION_HISTORY[user_id]) > MAX_HISTORY:
+        MEMORY_CONTEXT.fold(user_id, CONVERSATION_HISTORY[user_id][:-MAX_HISTORY])
         CONVERSATION_HISTORY[user_id] = CONVERSATION_HISTORY[user_id][-MAX_HISTORY:]
     
     # Update learning
@@ -13,6 +13,8 @@ from datetime import datetime
 import time
 import concurrent.futures
 
+from llm_gateway import LLM, GEMINI_MODEL
+
 orchestrator_bp = Blueprint('orchestrator', __name__)
 
 # ============================================
@@ -148,25 +150,11 @@ Odpověz strukturovaně:
 3. Doporučené akce (konkrétní kroky)
 """
     
-    try:
-        resp = requests.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            json={
-                "contents": [{"parts": [{"text": prompt}]}],
-                "generationConfig": {"temperature": 0.3, "maxOutputTokens": 600}
-            },
-            timeout=30
-        )
-        
-        if resp.status_code == 200:
-            data = resp.json()
-            if "candidates" in data:
-                return data["candidates"][0]["content"]["parts"][0]["text"]
-        
-        return f"Gemini error: {resp.status_code}"
-    except Exception as e:
-        return f"Gemini error: {e}"
+    result = LLM.generate('gemini', GEMINI_MODEL, prompt=prompt, max_tokens=600,
+                          temperature=0.3, timeout=30, lane='batch')
+    if result is None:
+        return "Gemini error: volání selhalo (viz log)"
+    return result.text
 
 
 # ============================================
@@ -0,0 +1,340 @@
+# ============================================
+# 🗣️ RADIM PHRASE BANK
+# ============================================
+# Version: 1.2.0
+# Konstantní věty (bezpečnostní odpověď, fallbacky, pozdravy, reflexe)
+# se předrenderují pro každý nakonfigurovaný hlas a emoci do jednoho
+# audio packu - TTS endpointy je pak vrací okamžitě bez volání Azure.
+# Bezpečnostní odpověď nesmí nikdy čekat na Azure, renderuje se první.
+#
+# - moduly registrují věty (PHRASE_BANK.add) a SSML profily
+#   (PHRASE_BANK.profile) - stejná SSML funkce, jakou používá endpoint
+# - klíč záznamu = sha1(výstupní formát + SSML): změna hlasu, prosody
+#   nebo šablony záznam sama zneplatní, jiné parametry = prostý miss
+# - každý formát zvlášť (PHRASE_BANK_FORMATS, výchozí mp3 + webm)
+# - pack: RPB1 + délka indexu + JSON index + audio bloby za sebou
+#   (PHRASE_BANK_PATH, zápis přes tmp + os.replace)
+# - pack se renderuje při buildu slugu (bin/post_compile -> python
+#   phrase_bank.py build) - souborový systém dyna je dočasný, pack
+#   vyrenderovaný za běhu by restart (denně) zahodil a vše by šlo do
+#   Azure znovu
+# - PHRASE_BANK_BUILD za běhu: lazy (výchozí) = načíst pack, hned
+#   doplnit jen bezpečnostní věty, ostatní záznam se vyrenderuje na
+#   pozadí při prvním missu; startup = doplnit všechno chybějící na
+#   pozadí; off = jen načíst pack
+
+import os
+import sys
+import json
+import time
+import struct
+import hashlib
+import logging
+import importlib
+import threading
+import unicodedata
+
+from tts_engine import TTS, TTSError, TTSResult, OUTPUT_FORMATS, DEFAULT_FORMAT
+
+try:
+    import eventlet
+    from eventlet import patcher
+    EVENTLET_AVAILABLE = True
+except ImportError:
+    EVENTLET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PHRASE_BANK_PATH = os.environ.get('PHRASE_BANK_PATH', 'radim_phrases.pack')
+PHRASE_BANK_BUILD = os.environ.get('PHRASE_BANK_BUILD', 'lazy')
+PHRASE_BANK_PAUSE = float(os.environ.get('PHRASE_BANK_PAUSE_MS', 50)) / 1000.0   # šetrnost k Azure kvótě
+PHRASE_BANK_FORMATS = [f.strip() for f in os.environ.get('PHRASE_BANK_FORMATS', 'mp3,webm').split(',') if f.strip()]
+
+PACK_MAGIC = b'RPB1'
+PACK_VERSION = 1
+_DROP_CATEGORIES = {'So', 'Sk', 'Cf', 'Cs', 'Co', 'Cn'}     # emoji, ZWJ, variation selectors...
+
+
+def spoken_text(text):
+    """Text, který se skutečně vysloví: bez emoji a symbolů, normalizované mezery"""
+    text = unicodedata.normalize('NFC', text or '')
+    kept = ''.join(ch for ch in text
+                   if unicodedata.category(ch) not in _DROP_CATEGORIES and not '\ufe00' <= ch <= '\ufe0f')
+    return ' '.join(kept.split())
+
+
+def entry_key(ssml, output_format=DEFAULT_FORMAT):
+    azure_format = OUTPUT_FORMATS[output_format].azure
+    return hashlib.sha1(f"{azure_format}\n{ssml}".encode('utf-8')).hexdigest()
+
+
+class PhraseProfile:
+    """SSML šablona jednoho endpointu + varianty (hlas/emoce) k předrenderování"""
+    __slots__ = ('name', 'ssml_fn', 'variants', 'target')
+
+    def __init__(self, name, ssml_fn, variants, target):
+        self.name = name
+        self.ssml_fn = ssml_fn
+        self.variants = variants    # [kwargs pro ssml_fn]
+        self.target = target        # () -> (base_url, key), čte se až při buildu
+
+
+class PhraseBank:
+    """
+    lookup(text, ssml_fn, **params) -> TTSResult | None. Nekonstantní text
+    skončí na slovníkovém lookupu bez hashování - endpointy volají lookup
+    před každou syntézou.
+    """
+
+    def __init__(self, path=PHRASE_BANK_PATH, formats=PHRASE_BANK_FORMATS):
+        self.path = path
+        self.formats = [f for f in formats if f in OUTPUT_FORMATS]
+        self._phrases = {}          # casefold mluveného textu -> (mluvený text, safety)
+        self._profiles = {}
+        self._by_ssml_fn = {}       # SSML funkce -> profil (lazy render z lookupu)
+        self._pending = set()       # klíče renderované na pozadí
+        self._entries = {}          # klíč -> (content_type, audio, meta)
+        self._lock = threading.Lock()
+        self._building = False
+        self.hits = 0
+        self.misses = 0
+        self.rendered = 0
+        self.failed = 0
+        self.loaded = 0
+        self.last_build = None
+
+    # ------------------------------------------------------------------
+    # Registrace
+    # ------------------------------------------------------------------
+
+    def add(self, *texts, safety=False):
+        """Zaregistrovat konstantní věty (přijímá i seznamy)"""
+        for text in texts:
+            if isinstance(text, (list, tuple, set)):
+                self.add(*text, safety=safety)
+                continue
+            spoken = spoken_text(text)
+            if not spoken:
+                continue
+            previous = self._phrases.get(spoken.casefold())
+            self._phrases[spoken.casefold()] = (spoken, safety or bool(previous and previous[1]))
+
+    def profile(self, name, ssml_fn, variants, target):
+        self._profiles[name] = self._by_ssml_fn[ssml_fn] = PhraseProfile(name, ssml_fn, list(variants), target)
+
+    # ------------------------------------------------------------------
+    # Lookup (horká cesta)
+    # ------------------------------------------------------------------
+
+    def lookup(self, text, ssml_fn, output_format=DEFAULT_FORMAT, **params):
+        phrase = self._phrases.get(spoken_text(text).casefold())
+        if phrase is None:
+            return None
+        started = time.perf_counter()
+        ssml = ssml_fn(phrase[0], **params)
+        key = entry_key(ssml, output_format)
+        entry = self._entries.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                if PHRASE_BANK_BUILD == 'lazy':
+                    self._render_later(key, ssml, output_format, ssml_fn, params, phrase[0])
+                return None
+            self.hits += 1
+        return TTSResult(entry[1], entry[0], (time.perf_counter() - started) * 1000, 'phrase_bank', output_format)
+
+    def _render_later(self, key, ssml, fmt, ssml_fn, params, spoken):
+        """Miss registrované varianty -> vyrenderovat na pozadí pro příště (pod zámkem)"""
+        profile = self._by_ssml_fn.get(ssml_fn)
+        if (profile is None or key in self._pending or fmt not in self.formats
+                or params not in profile.variants):
+            return
+        self._pending.add(key)
+
+        def render():
+            try:
+                self._render(key, ssml, fmt, profile, params, spoken)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        _spawn(render, 'phrase-bank-lazy')
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+
+    def _jobs(self):
+        """(klíč, ssml, formát, profil, varianta, věta) - bezpečnostní věty první"""
+        phrases = sorted(self._phrases.values(), key=lambda item: not item[1])
+        for spoken, safety in phrases:
+            for profile in self._profiles.values():
+                for variant in profile.variants:
+                    ssml = profile.ssml_fn(spoken, **variant)
+                    for fmt in self.formats:
+                        yield entry_key(ssml, fmt), ssml, fmt, profile, variant, spoken, safety
+
+    def wanted(self):
+        return {job[0] for job in self._jobs()}
+
+    def _render(self, key, ssml, fmt, profile, variant, spoken):
+        """Jeden záznam z Azure (mock jen bez klíče); True = vyrenderováno"""
+        base_url, api_key = profile.target()
+        if not api_key and TTS.mode != 'mock':
+            return False
+        try:
+            result = TTS.synthesize(ssml, base_url, api_key, output_format=fmt, timeout=30)
+        except TTSError as e:
+            self.failed += 1
+            logger.warning(f"🗣️ Phrase bank: {profile.name} '{spoken[:40]}' failed: {e}")
+            return False
+        meta = {'profile': profile.name, 'format': fmt, 'text': spoken, **variant}
+        self._entries[key] = (result.content_type, result.audio, meta)
+        self.rendered += 1
+        return True
+
+    def build(self, save=True, safety_only=False):
+        """Doplnit chybějící záznamy; vrací počet nově vyrenderovaných"""
+        rendered = 0
+        saved_safety = False
+        started = time.time()
+        for key, ssml, fmt, profile, variant, spoken, safety in self._jobs():
+            if not safety and safety_only:
+                break               # bezpečnostní věty jsou v _jobs první
+            if not safety and not saved_safety:
+                # Bezpečnostní věty uložit hned - pád buildu je neztratí
+                saved_safety = True
+                if save and rendered:
+                    self.save()
+            if key in self._entries or not self._render(key, ssml, fmt, profile, variant, spoken):
+                continue
+            rendered += 1
+            if PHRASE_BANK_PAUSE:
+                time.sleep(PHRASE_BANK_PAUSE)
+        if save and rendered:
+            self.save()
+        self.last_build = {'at': started, 'seconds': round(time.time() - started, 2), 'rendered': rendered}
+        return rendered
+
+    def start(self):
+        """
+        Při startu: načíst pack; chybějící záznamy doplnit na pozadí -
+        startup všechny, lazy jen bezpečnostní (nesmí čekat na Azure)
+        """
+        self.load()
+        if PHRASE_BANK_BUILD not in ('startup', 'lazy') or self._building:
+            return
+        self._building = True
+        _spawn(self._build_background, 'phrase-bank')
+
+    def _build_background(self):
+        try:
+            # Mock audio nepatří do packu - sdílel by se s produkcí
+            rendered = self.build(save=TTS.mode != 'mock', safety_only=PHRASE_BANK_BUILD == 'lazy')
+            if rendered:
+                logger.info(f"🗣️ Phrase bank: {rendered} phrases rendered")
+        except Exception as e:
+            logger.error(f"🗣️ Phrase bank build failed: {e}")
+        finally:
+            self._building = False
+
+    # ------------------------------------------------------------------
+    # Pack
+    # ------------------------------------------------------------------
+
+    def save(self, path=None):
+        path = path or self.path
+        wanted = self.wanted()
+        index, blobs, offset = {}, [], 0
+        for key, (content_type, audio, meta) in self._entries.items():
+            if key not in wanted:
+                continue        # stará šablona/věta - do nového packu se nepřenáší
+            index[key] = {'o': offset, 'n': len(audio), 'type': content_type, **meta}
+            blobs.append(audio)
+            offset += len(audio)
+        header = json.dumps({'version': PACK_VERSION, 'engine': TTS.mode, 'entries': index},
+                            ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(PACK_MAGIC + struct.pack('<I', len(header)) + header)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp, path)
+        return len(index)
+
+    def load(self, path=None):
+        path = path or self.path
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        if data[:4] != PACK_MAGIC:
+            logger.warning(f"🗣️ Phrase bank {path}: not a phrase pack, ignored")
+            return 0
+        (header_len,) = struct.unpack('<I', data[4:8])
+        header = json.loads(data[8:8 + header_len].decode('utf-8'))
+        if header.get('version') != PACK_VERSION:
+            return 0
+        body = 8 + header_len
+        for key, item in header['entries'].items():
+            meta = {k: v for k, v in item.items() if k not in ('o', 'n', 'type')}
+            audio = data[body + item['o']:body + item['o'] + item['n']]
+            self._entries.setdefault(key, (item['type'], audio, meta))
+        self.loaded = len(header['entries'])
+        return self.loaded
+
+    def stats(self):
+        wanted = self.wanted()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'mode': PHRASE_BANK_BUILD,
+                'pending': len(self._pending),
+                'phrases': len(self._phrases),
+                'profiles': sorted(self._profiles),
+                'formats': self.formats,
+                'entries': len(self._entries),
+                'wanted': len(wanted),
+                'missing': len(wanted - set(self._entries)),
+                'bytes': sum(len(entry[1]) for entry in self._entries.values()),
+                'building': self._building,
+                'loaded': self.loaded,
+                'rendered': self.rendered,
+                'failed': self.failed,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'last_build': self.last_build
+            }
+
+
+def _spawn(fn, name):
+    if EVENTLET_AVAILABLE and patcher.is_monkey_patched('socket'):
+        return eventlet.spawn(fn)
+    thread = threading.Thread(target=fn, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+PHRASE_BANK = PhraseBank()
+
+
+def _main(argv):
+    """python phrase_bank.py build|stats - build slugu (bin/post_compile, načte app.py)"""
+    command = argv[1] if len(argv) > 1 else 'build'
+    os.environ['PHRASE_BANK_BUILD'] = 'off'
+    from phrase_bank import PHRASE_BANK as bank    # app.py registruje do modulu, ne do __main__
+    importlib.import_module('app')                 # registrace vět a profilů
+    bank.load()
+    if command == 'build':
+        rendered = bank.build(save=TTS.mode != 'mock')
+        print(f"🗣️ Phrase bank: {rendered} rendered, {bank.stats()['entries']} entries -> {bank.path}")
+    print(json.dumps(bank.stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    _main(sys.argv)
+else:
+    print("🗣️ Phrase bank loaded - pre-rendered constant phrases")
@@ -0,0 +1,418 @@
+# ============================================
+# 🔬 RADIM PROFILER
+# ============================================
+# Version: 1.1.0
+# Diagnostika jediného eventlet workeru v produkci:
+# - StackSampler: signálový sampler (setitimer) na N sekund; handler
+#   dostane právě běžící rámec hlavního vlákna = právě běžící greenlet.
+#   Výstup collapsed stacks (flamegraph.pl, speedscope) nebo JSON.
+# - HubWatchdog: heartbeat greenlet + skutečné OS vlákno (mimo monkey
+#   patch). Když heartbeat neproběhne do PROFILER_BLOCK_MS, někdo drží
+#   hub - watchdog vezme zásobník hlavního vlákna, heartbeat po uvolnění
+#   hubu epizodu zaloguje se skutečnou délkou. Epizody se sčítají podle
+#   call site (nejhlubší rámec kódu aplikace, ne knihovny pod ním) a
+#   heartbeat měří lag smyčky hubu do histogramu.
+# - SocketHeartbeat: RTT Engine.IO ping/pong a jitter (|ΔRTT| po sobě
+#   jdoucích heartbeatů jednoho klienta) jako zdravotní metrika.
+#
+# POST /api/admin/profile?seconds=10&interval_ms=5&mode=cpu|wall&format=collapsed|json
+# GET  /api/admin/blocking
+# Obojí jen s hlavičkou X-Admin-Token (request_tracing.admin_required).
+
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+from collections import deque
+
+from flask import Blueprint, Response, request, jsonify
+
+from request_tracing import admin_required
+from llm_metrics import HdrHistogram
+from cpu_offload import offload_jsonify, stats as offload_stats
+
+try:
+    import eventlet
+    from eventlet import patcher
+    EVENTLET_AVAILABLE = True
+except ImportError:
+    EVENTLET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+profiler_bp = Blueprint('profiler', __name__)
+
+PROFILER_BLOCK_MS = float(os.environ.get('PROFILER_BLOCK_MS', 200))
+PROFILER_MAX_SECONDS = 60
+PROFILER_MAX_DEPTH = 64
+BLOCKING_EPISODES = 50
+CALL_SITES = 100
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Rámce, ve kterých hub jen čeká na I/O (wall režim je označí jako idle)
+_HUB_IDLE_FUNCS = frozenset(('wait', 'poll', 'select', 'epoll', 'kqueue'))
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, max_depth=PROFILER_MAX_DEPTH):
+    """Zásobník od kořene k listu jako 'a;b;c' (rámce po f_back = jeden greenlet)"""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+def call_site(frame):
+    """Nejhlubší rámec z kódu aplikace (json/re/sqlite pod ním nic neřeknou)"""
+    leaf = frame
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_ROOT) and 'site-packages' not in filename:
+            return f"{frame.f_code.co_name} ({os.path.relpath(filename, APP_ROOT)}:{frame.f_lineno})"
+        frame = frame.f_back
+    return _frame_label(leaf.f_code) if leaf is not None else 'unknown'
+
+
+def _is_hub_idle(frame):
+    code = frame.f_code
+    return code.co_name in _HUB_IDLE_FUNCS and f"{os.sep}hubs{os.sep}" in code.co_filename
+
+
+# ============================================
+# SAMPLER
+# ============================================
+
+class StackSampler:
+    """
+    mode='cpu' -> ITIMER_PROF/SIGPROF (jen čas na CPU),
+    mode='wall' -> ITIMER_REAL/SIGALRM (včetně čekání; idle hub zvlášť).
+    Signály jdou jen z hlavního vlákna - pod eventlet na něm běží
+    všechny greenlety, takže se vzorkuje přesně to, co drží hub.
+    """
+
+    TIMERS = {'cpu': (signal.ITIMER_PROF, signal.SIGPROF),
+              'wall': (signal.ITIMER_REAL, signal.SIGALRM)}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = False
+        self.counts = {}
+        self.samples = 0
+        self.idle = 0
+
+    def _handler(self, signum, frame):
+        if frame is None:
+            return
+        if _is_hub_idle(frame):
+            self.idle += 1
+            stack = 'eventlet-hub-idle'
+        else:
+            stack = collapse_stack(frame)
+        self.counts[stack] = self.counts.get(stack, 0) + 1
+        self.samples += 1
+
+    def profile(self, seconds, interval, mode='cpu'):
+        """Vzorkuje seconds sekund, vrací {stack: počet}. Blokuje volajícího (greenlet)."""
+        if mode not in self.TIMERS:
+            raise ValueError(f"unknown mode: {mode}")
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("profiling already running")
+        which, signum = self.TIMERS[mode]
+        try:
+            self.counts, self.samples, self.idle = {}, 0, 0
+            previous = signal.signal(signum, self._handler)    # ValueError mimo hlavní vlákno
+            self.running = True
+            try:
+                signal.setitimer(which, interval, interval)
+                _sleep(seconds)
+            finally:
+                signal.setitimer(which, 0, 0)
+                signal.signal(signum, previous)
+                self.running = False
+            return dict(self.counts)
+        finally:
+            self._lock.release()
+
+
+def _sleep(seconds):
+    """Uspat jen volající greenlet (hub dál obsluhuje ostatní)"""
+    if EVENTLET_AVAILABLE:
+        eventlet.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def format_collapsed(counts):
+    """Brendan Gregg collapsed format: 'stack count' na řádek"""
+    return '\n'.join(f"{stack} {count}" for stack, count in
+                     sorted(counts.items(), key=lambda item: -item[1])) + '\n'
+
+
+def top_functions(counts, limit=25):
+    """Self čas (list zásobníku) a total čas (kdekoli v zásobníku) po funkcích"""
+    self_counts, total_counts = {}, {}
+    for stack, count in counts.items():
+        frames = stack.split(';')
+        self_counts[frames[-1]] = self_counts.get(frames[-1], 0) + count
+        for label in set(frames):
+            total_counts[label] = total_counts.get(label, 0) + count
+    samples = sum(counts.values()) or 1
+    ranked = sorted(total_counts, key=lambda label: -total_counts[label])[:limit]
+    return [{'function': label,
+             'self_pct': round(self_counts.get(label, 0) / samples * 100, 1),
+             'total_pct': round(total_counts[label] / samples * 100, 1)} for label in ranked]
+
+
+# ============================================
+# HUB WATCHDOG
+# ============================================
+
+class HubWatchdog:
+    """
+    Heartbeat greenlet zapisuje čas každých interval sekund. Skutečné OS
+    vlákno (eventlet.patcher.original) kontroluje, jestli heartbeat
+    nestojí déle než threshold - pak hub drží jeden greenlet bez yieldu
+    a jeho zásobník je právě rámec hlavního vlákna.
+    """
+
+    def __init__(self, threshold_ms=PROFILER_BLOCK_MS):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = min(0.05, self.threshold / 4)
+        self.episodes = deque(maxlen=BLOCKING_EPISODES)
+        self.blocked_total = 0
+        self.lag_ms = HdrHistogram(scale=1000)
+        self.sites = {}             # call site -> [epizody, ms celkem, ms max]
+        self.started = False
+        self._beat = time.monotonic()
+        self._current = None
+        self._main_ident = None
+
+    def start(self):
+        """Volat z hlavního vlákna (import app.py) - jen pod eventlet"""
+        if self.started or not EVENTLET_AVAILABLE:
+            return False
+        real_threading = patcher.original('threading')
+        self._main_ident = real_threading.get_ident()
+        self._beat = time.monotonic()
+        eventlet.spawn(self._heartbeat)
+        watcher = real_threading.Thread(target=self._watch, name='hub-watchdog', daemon=True)
+        watcher.start()
+        self.started = True
+        return True
+
+    def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            eventlet.sleep(self.interval)
+            # Lag smyčky = o kolik se probuzení opozdilo proti plánu
+            self.lag_ms.record(max(0.0, time.monotonic() - self._beat - self.interval) * 1000)
+            current = self._current
+            if current is not None:
+                # Hub se uvolnil - uzavřít epizodu skutečnou délkou a zalogovat
+                # (z greenletu, logging pod monkey patch používá zelené zámky)
+                self._current = None
+                current['blocked_ms'] = round((time.monotonic() - current['since'] - self.interval) * 1000, 1)
+                self._count_site(current['site'], current['blocked_ms'])
+                logger.warning(f"⏱️ Hub blocked {current['blocked_ms']:.0f}ms in {current['site']}")
+
+    def _count_site(self, site, blocked_ms):
+        entry = self.sites.get(site)
+        if entry is None:
+            if len(self.sites) >= CALL_SITES:
+                return
+            entry = self.sites[site] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += blocked_ms
+        entry[2] = max(entry[2], blocked_ms)
+
+    def _watch(self):
+        """OS vlákno - jen čte čas a zásobník, žádné zámky ani logging"""
+        real_sleep = patcher.original('time').sleep
+        while True:
+            real_sleep(self.interval)
+            self._check(time.monotonic())
+
+    def _check(self, now):
+        beat = self._beat
+        stalled = now - beat
+        if self._current is None and stalled > self.threshold + self.interval:
+            frame = sys._current_frames().get(self._main_ident)
+            stack = collapse_stack(frame) if frame is not None else 'unknown'
+            episode = {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'since': beat,
+                'blocked_ms': round(stalled * 1000, 1),
+                'site': call_site(frame),
+                'leaf': stack.rsplit(';', 1)[-1],
+                'stack': stack
+            }
+            self._current = episode
+            self.episodes.append(episode)
+            self.blocked_total += 1
+
+    def call_sites(self, limit=20):
+        ranked = sorted(self.sites.items(), key=lambda item: -item[1][1])[:limit]
+        return [{'site': site, 'episodes': count, 'blocked_ms_total': round(total, 1),
+                 'blocked_ms_max': round(worst, 1)} for site, (count, total, worst) in ranked]
+
+    def stats(self):
+        episodes = [{k: v for k, v in e.items() if k != 'since'} for e in list(self.episodes)]
+        return {
+            'enabled': self.started,
+            'threshold_ms': round(self.threshold * 1000, 1),
+            'blocked_episodes': self.blocked_total,
+            'loop_lag_ms': self.lag_ms.snapshot(),
+            'call_sites': self.call_sites(),
+            'recent': list(reversed(episodes))
+        }
+
+
+# ============================================
+# SOCKET.IO HEARTBEAT
+# ============================================
+
+class SocketHeartbeat:
+    """
+    Engine.IO server posílá PING každých ping_interval, klient odpoví PONG.
+    RTT = PONG - PING (síť + zpoždění hubu při odeslání i příjmu), jitter =
+    |RTT - předchozí RTT| téhož klienta (RFC 3550 styl). Zablokovaný hub
+    se projeví skokem jitteru u všech klientů najednou.
+    """
+
+    def __init__(self):
+        self.rtt_ms = HdrHistogram(scale=1000)
+        self.jitter_ms = HdrHistogram(scale=1000)
+        self.pongs = 0
+        self.instrumented = False
+
+    def instrument(self):
+        """Obalí engineio.socket.Socket.receive (všechny instance)"""
+        if self.instrumented:
+            return False
+        try:
+            from engineio import packet
+            from engineio.socket import Socket
+        except ImportError:
+            return False
+        original = Socket.receive
+        heartbeat = self
+
+        def receive(sock, pkt):
+            if pkt.packet_type == packet.PONG and sock.last_ping:
+                heartbeat.observe(sock, (time.time() - sock.last_ping) * 1000)
+            return original(sock, pkt)
+
+        Socket.receive = receive
+        self.instrumented = True
+        return True
+
+    def observe(self, sock, rtt_ms):
+        previous = getattr(sock, '_radim_rtt_ms', None)
+        sock._radim_rtt_ms = rtt_ms
+        self.pongs += 1
+        self.rtt_ms.record(rtt_ms)
+        if previous is not None:
+            self.jitter_ms.record(abs(rtt_ms - previous))
+
+    def stats(self):
+        return {
+            'instrumented': self.instrumented,
+            'pongs': self.pongs,
+            'rtt_ms': self.rtt_ms.snapshot(),
+            'jitter_ms': self.jitter_ms.snapshot()
+        }
+
+
+SAMPLER = StackSampler()
+WATCHDOG = HubWatchdog()
+HEARTBEAT = SocketHeartbeat()
+
+
+def hub_health():
+    """Souhrn pro dashboard: degraded, když p99 lagu nebo jitteru překročí práh"""
+    lag_p99 = WATCHDOG.lag_ms.percentile(0.99)
+    jitter_p95 = HEARTBEAT.jitter_ms.percentile(0.95)
+    threshold_ms = WATCHDOG.threshold * 1000
+    return {
+        'status': 'degraded' if max(lag_p99, jitter_p95) > threshold_ms else 'healthy',
+        'loop_lag_p99_ms': round(lag_p99, 2),
+        'loop_lag_max_ms': round(WATCHDOG.lag_ms.max or 0.0, 2),
+        'heartbeat_jitter_p95_ms': round(jitter_p95, 2),
+        'heartbeat_rtt_p50_ms': round(HEARTBEAT.rtt_ms.percentile(0.5), 2),
+        'blocked_episodes': WATCHDOG.blocked_total,
+        'top_call_site': (WATCHDOG.call_sites(1) or [{}])[0].get('site'),
+        'offload': offload_stats()
+    }
+
+
+def hub_prometheus():
+    """Lag hubu a heartbeat jitter v Prometheus text formátu (připojí /metrics)"""
+    lines = []
+    for name, help_text, histogram in (
+            ('radim_hub_loop_lag_ms', 'Eventlet hub loop lag in milliseconds.', WATCHDOG.lag_ms),
+            ('radim_socketio_heartbeat_rtt_ms', 'Engine.IO ping/pong round trip in milliseconds.', HEARTBEAT.rtt_ms),
+            ('radim_socketio_heartbeat_jitter_ms', 'Heartbeat RTT jitter per client in milliseconds.', HEARTBEAT.jitter_ms)):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} summary')
+        for q in (0.5, 0.9, 0.99):
+            lines.append(f'{name}{{quantile="{q}"}} {histogram.percentile(q):g}')
+        lines.append(f'{name}_sum {histogram.sum:g}')
+        lines.append(f'{name}_count {histogram.total}')
+    lines.append('# HELP radim_hub_blocked_total Episodes where one greenlet held the hub past the threshold.')
+    lines.append('# TYPE radim_hub_blocked_total counter')
+    lines.append(f'radim_hub_blocked_total {WATCHDOG.blocked_total}')
+    return '\n'.join(lines) + '\n'
+
+
+# ============================================
+# ADMIN ENDPOINTS
+# ============================================
+
+@profiler_bp.route('/api/admin/profile', methods=['POST', 'GET'])
+@admin_required
+def admin_profile():
+    """Vzorkovat N sekund a vrátit collapsed stacks (flamegraph) nebo JSON"""
+    seconds = min(max(request.args.get('seconds', 10, type=float), 0.1), PROFILER_MAX_SECONDS)
+    interval = min(max(request.args.get('interval_ms', 5, type=float), 1.0), 100.0) / 1000.0
+    mode = request.args.get('mode', 'cpu')
+    output = request.args.get('format', 'collapsed')
+
+    try:
+        counts = SAMPLER.profile(seconds, interval, mode)
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    if output == 'collapsed':
+        return Response(format_collapsed(counts), mimetype='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename=radim-{mode}.collapsed'})
+    return offload_jsonify({
+        'success': True,
+        'mode': mode,
+        'seconds': seconds,
+        'interval_ms': interval * 1000,
+        'samples': SAMPLER.samples,
+        'idle_samples': SAMPLER.idle,
+        'top': top_functions(counts),
+        'stacks': [{'stack': stack, 'count': count} for stack, count in
+                   sorted(counts.items(), key=lambda item: -item[1])[:200]]
+    })
+
+
+@profiler_bp.route('/api/admin/blocking', methods=['GET'])
+@admin_required
+def admin_blocking():
+    """Epizody blokování hubu, call sites, lag smyčky a heartbeat jitter"""
+    return offload_jsonify({'success': True, **WATCHDOG.stats(), 'heartbeat': HEARTBEAT.stats(),
+                            'offload': offload_stats()})
+
+
+print("🔬 Profiler loaded - /api/admin/profile, /api/admin/blocking (X-Admin-Token)")
@@ -0,0 +1,117 @@
+# ============================================
+# 🔗 RADIM PROMPT COALESCING
+# ============================================
+# Version: 1.0.1
+# Single-flight pro identické souběžné AI dotazy (ranní "dobré ráno",
+# "jaké je počasí"...). Souběžné stejné dotazy sdílí jedno upstream
+# volání; volitelně krátká cache výsledku pro nepersonalizované dotazy.
+#
+# Personalizované dotazy a dotazy s historií konverzace sem NEPATŘÍ -
+# o obejití rozhoduje volající (viz is_coalescable). Odpovědi nesoucí
+# akci (připomínka, nouzové volání) nebo zdravotní radu se jen sdílí
+# v letu, krátká cache je znovu nevydává (viz reusable_intent).
+
+import os
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+
+from response_cache import SingleFlight
+
+PROMPT_CACHE_TTL = float(os.environ.get('PROMPT_CACHE_TTL', 30))
+PROMPT_CACHE_MAX = 512
+
+# Záměry (detect_intent), jejichž odpověď se z krátké cache nevydává
+NO_REUSE_INTENTS = ('safety', 'health', 'task')
+
+_PUNCT_EDGES = re.compile(r'^[\W_]+|[\W_]+$', re.UNICODE)
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_prompt(text):
+    """Normalizace dotazu pro klíč: NFC, malá písmena, mezery, okrajová interpunkce/emoji"""
+    text = unicodedata.normalize('NFC', text or '').lower()
+    text = _SPACES.sub(' ', text).strip()
+    return _PUNCT_EDGES.sub('', text)
+
+
+def prompt_key(prompt, system, model):
+    """Klíč = normalizovaný dotaz + hash system promptu + model"""
+    system_hash = hashlib.sha1((system or '').encode('utf-8')).hexdigest()[:16]
+    return (normalize_prompt(prompt), system_hash, model)
+
+
+def is_coalescable(messages=None, context=None, image=None):
+    """Jen jedna textová zpráva, bez kontextu a bez obrázku - jinak jde o personalizovaný dotaz"""
+    if context or image:
+        return False
+    if messages is not None and (len(messages) != 1 or not isinstance(messages[0].get('content'), str)):
+        return False
+    return True
+
+
+def reusable_intent(intent):
+    """Smí se výsledek s tímto záměrem vydat z krátké cache? (cache= pro run)"""
+    return intent not in NO_REUSE_INTENTS
+
+
+class PromptCoalescer:
+    """Sdílení in-flight volání + krátká cache výsledků podle prompt_key"""
+
+    def __init__(self, name, cache_ttl=PROMPT_CACHE_TTL):
+        self.name = name
+        self.cache_ttl = cache_ttl
+        self._flight = SingleFlight()
+        self._results = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.upstream_calls = 0
+        self.cache_hits = 0
+
+    def run(self, prompt, system, model, fn, cache=True, cacheable=None):
+        """
+        Provede fn() nejvýše jednou pro souběžné stejné dotazy.
+        cache=False vypne krátkou cache výsledku (jen single-flight).
+        cacheable(result) -> bool zabrání uložení fallback odpovědí.
+        """
+        self.calls += 1
+        key = prompt_key(prompt, system, model)
+        use_cache = cache and self.cache_ttl > 0
+
+        if use_cache:
+            cached = self._results.get(key)
+            if cached is not None and time.time() < cached[0]:
+                self.cache_hits += 1
+                return cached[1]
+
+        def call():
+            self.upstream_calls += 1
+            return fn()
+
+        result, _ = self._flight.do(key, call)
+
+        if use_cache and result and (cacheable is None or cacheable(result)):
+            with self._lock:
+                if len(self._results) >= PROMPT_CACHE_MAX:
+                    now = time.time()
+                    self._results = {k: v for k, v in self._results.items() if v[0] > now}
+                    if len(self._results) >= PROMPT_CACHE_MAX:
+                        self._results.clear()
+                self._results[key] = (time.time() + self.cache_ttl, result)
+
+        return result
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'upstream_calls': self.upstream_calls,
+            'coalesced': self._flight.shared,
+            'cache_hits': self.cache_hits,
+            'saved_calls': self.calls - self.upstream_calls,
+            'cache_ttl_s': self.cache_ttl,
+            'cached_results': len(self._results),
+            'in_flight': self._flight.in_flight()
+        }
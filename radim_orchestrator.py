@@ -5,13 +5,20 @@
 # WhatsApp styl chat s action JSON
 
 from flask import Blueprint, request, jsonify
-import requests
 import json
 import re
 import os
-import base64
 from datetime import datetime
 
+from content_pool import ContentPool
+from keyword_matcher import CLASSIFIER
+from llm_gateway import LLM, GEMINI_MODEL
+from llm_scheduler import lane_for_intent
+from prompt_coalescing import PromptCoalescer, is_coalescable
+from tts_engine import TTS, TTSError, negotiate_format
+from phrase_bank import PHRASE_BANK
+from audio_transport import wants_binary, audio_response, audio_json
+
 radim_bp = Blueprint('radim', __name__)
 
 # ============================================
@@ -22,6 +29,12 @@ WP_URL = os.environ.get('WP_URL', 'https://dev.kafanek.com')
 WP_USER = os.environ.get('WP_USER')
 WP_APP_PASSWORD = os.environ.get('WP_APP_PASSWORD')
 
+# Konstantní odpovědi - předrenderované v phrase_bank (bezpečnost nesmí čekat na Azure)
+SAFETY_RESPONSE = '🚨 Zůstaňte v klidu! Volám pomoc a informuji rodinu.'
+CHAT_FALLBACK_RESPONSE = "Promiňte, zkuste to za chvíli. 🙏"
+PHRASE_BANK.add(SAFETY_RESPONSE, safety=True)
+PHRASE_BANK.add(CHAT_FALLBACK_RESPONSE)
+
 # ============================================
 # RADIM WHATSAPP SYSTEM PROMPT
 # ============================================
@@ -83,27 +96,16 @@ HEALTH_KEYWORDS = ['bolí', 'nemohu', 'špatně', 'léky', 'doktor', 'nemocnice'
 SAFETY_KEYWORDS = ['spadl', 'pád', 'nemohu dýchat', 'bolest na hrudi', 'záchranka', '155', '112', 'panika']
 STORY_KEYWORDS = ['příběh', 'story', 'instagram', 'facebook', 'pozvánka']
 
+CLASSIFIER.register('intent', {
+    'safety': SAFETY_KEYWORDS,
+    'health': HEALTH_KEYWORDS,
+    'task': TASK_KEYWORDS,
+    'story': STORY_KEYWORDS
+})
+
 def detect_intent(message):
-    """Detekce záměru ze zprávy"""
-    msg_lower = message.lower()
-    
-    for word in SAFETY_KEYWORDS:
-        if word in msg_lower:
-            return 'safety'
-    
-    for word in HEALTH_KEYWORDS:
-        if word in msg_lower:
-            return 'health'
-    
-    for word in TASK_KEYWORDS:
-        if word in msg_lower:
-            return 'task'
-    
-    for word in STORY_KEYWORDS:
-        if word in msg_lower:
-            return 'story'
-    
-    return 'chat'
+    """Detekce záměru ze zprávy (priorita: safety > health > task > story)"""
+    return CLASSIFIER.first(message, 'intent') or 'chat'
 
 def extract_time(message):
     """Extrahovat čas ze zprávy"""
@@ -145,32 +147,21 @@ def call_gemini_whatsapp(message, context=None, mode='senior'):
             context_text = f"\n\nKontext:\n{json.dumps(context, ensure_ascii=False)}"
         
         full_prompt = f"{system}{context_text}\n\nUživatel: {message}\nRadim:"
+        lane = lane_for_intent(detect_intent(message))
         
-        response = requests.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            json={
-                "contents": [{"parts": [{"text": full_prompt}]}],
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "maxOutputTokens": 500,
-                    "topP": 0.9
-                },
-                "safetySettings": [
-                    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
-                ]
-            },
-            timeout=30
-        )
+        # Stejné souběžné dotazy bez kontextu sdílí jedno volání Gemini; odpověď
+        # nese akce (připomínky...), proto bez krátké cache - jen sdílení v letu
+        if is_coalescable(context=context):
+            full_response = WHATSAPP_COALESCER.run(
+                message, system, 'gemini-2.0-flash',
+                lambda: _gemini_whatsapp_request(full_prompt, lane),
+                cache=False
+            )
+        else:
+            full_response = _gemini_whatsapp_request(full_prompt, lane)
         
-        if response.status_code == 200:
-            data = response.json()
-            if 'candidates' in data and data['candidates']:
-                full_response = data['candidates'][0]['content']['parts'][0]['text'].strip()
-                return parse_radim_response(full_response)
+        if full_response:
+            return parse_radim_response(full_response)
         
         return None, None
         
@@ -178,6 +169,14 @@ def call_gemini_whatsapp(message, context=None, mode='senior'):
         print(f"Gemini WhatsApp error: {e}")
         return None, None
 
+def _gemini_whatsapp_request(full_prompt, lane=None):
+    """Samotný dotaz na Gemini přes LLM bránu - vrací surový text nebo None"""
+    result = LLM.generate('gemini', GEMINI_MODEL, prompt=full_prompt, max_tokens=500,
+                          temperature=0.7, top_p=0.9, relaxed_safety=True, timeout=30, lane=lane)
+    return result.text if result else None
+
+WHATSAPP_COALESCER = PromptCoalescer('radim_whatsapp')
+
 def parse_radim_response(full_response):
     """Parsovat odpověď Radima"""
     text_response = full_response
@@ -256,7 +255,7 @@ def radim_chat():
             severity = 'critical' if any(w in message.lower() for w in ['155', '112', 'záchranka']) else 'high'
             return jsonify({
                 'success': True,
-                'response': '🚨 Zůstaňte v klidu! Volám pomoc a informuji rodinu.',
+                'response': SAFETY_RESPONSE,
                 'radim_action': {
                     'type': 'safety_alert',
                     'payload': {'user_id': user_id, 'severity': severity, 'message': message},
@@ -269,7 +268,7 @@ def radim_chat():
         text_response, action_json = call_gemini_whatsapp(message, context, mode)
         
         if not text_response:
-            text_response = "Promiňte, zkuste to za chvíli. 🙏"
+            text_response = CHAT_FALLBACK_RESPONSE
         
         return jsonify({
             'success': True,
@@ -337,51 +336,81 @@ def radim_story_generate():
         fields = data.get('fields', {})
         platform = data.get('platform', 'instagram')
         
-        prompt = f"""Vytvoř krátký příspěvek pro {platform}.
-Šablona: {template_id}
-Pole: {json.dumps(fields, ensure_ascii=False)}
-
-Pravidla: Max 3 věty, senior-friendly, Kolibri tón.
-Odpověz POUZE textem příspěvku:"""
+        # Bez vlastních polí je výstup pro všechny stejný - vydat z poolu
+        story_text = None
+        pregenerated = False
+        if not fields:
+            story_text = STORY_POST_POOL.take((template_id, platform))
+            pregenerated = story_text is not None
+        if story_text is None:
+            story_text = generate_story_post(template_id, fields, platform)
         
-        if GEMINI_API_KEY:
-            response = requests.post(
-                f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "contents": [{"parts": [{"text": prompt}]}],
-                    "generationConfig": {"temperature": 0.8, "maxOutputTokens": 200}
+        if story_text:
+            return jsonify({
+                'success': True,
+                'story': {
+                    'text': story_text,
+                    'platform': platform,
+                    'template_id': template_id,
+                    'hashtags': ['#KavárnaKolibri', '#Senioři', '#PlusOne']
                 },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if 'candidates' in result:
-                    story_text = result['candidates'][0]['content']['parts'][0]['text'].strip()
-                    return jsonify({
-                        'success': True,
-                        'story': {
-                            'text': story_text,
-                            'platform': platform,
-                            'template_id': template_id,
-                            'hashtags': ['#KavárnaKolibri', '#Senioři', '#PlusOne']
-                        }
-                    })
+                'pregenerated': pregenerated
+            })
         
         return jsonify({'success': False, 'error': 'AI nedostupné'}), 503
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def generate_story_post(template_id, fields, platform):
+    """Vygenerovat text příspěvku přes Gemini - vrací text nebo None"""
+    if not GEMINI_API_KEY:
+        return None
+    
+    prompt = f"""Vytvoř krátký příspěvek pro {platform}.
+Šablona: {template_id}
+Pole: {json.dumps(fields, ensure_ascii=False)}
+
+Pravidla: Max 3 věty, senior-friendly, Kolibri tón.
+Odpověz POUZE textem příspěvku:"""
+    
+    result = LLM.generate('gemini', GEMINI_MODEL, prompt=prompt, max_tokens=200,
+                          temperature=0.8, timeout=30, lane='batch')
+    return result.text if result else None
+
+STORY_POST_POOL = ContentPool('story_post', lambda key: generate_story_post(key[0], {}, key[1]))
+
+VOICE_EMOTION_SETTINGS = {
+    'friendly': {'pitch': '-5%', 'rate': '0.85'},
+    'calm': {'pitch': '-8%', 'rate': '0.8'},
+    'warm': {'pitch': '-3%', 'rate': '0.9'}
+}
+
+def _voice_target():
+    """(base URL, klíč) Azure Speech - čte se až při volání"""
+    region = os.environ.get('AZURE_SPEECH_REGION', 'westeurope')
+    base_url = os.environ.get('AZURE_TTS_BASE_URL', f"https://{region}.tts.speech.microsoft.com").rstrip('/')
+    return base_url, os.environ.get('AZURE_SPEECH_KEY')
+
+def voice_speak_ssml(text, voice, emotion):
+    """SSML pro /api/radim/voice/speak"""
+    settings = VOICE_EMOTION_SETTINGS.get(emotion, VOICE_EMOTION_SETTINGS['friendly'])
+    return f'''<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="cs-CZ">
+            <voice name="{voice}">
+                <prosody rate="{settings['rate']}" pitch="{settings['pitch']}" volume="loud">{text}</prosody>
+            </voice>
+        </speak>'''
+
+PHRASE_BANK.profile('radim.voice', voice_speak_ssml,
+                    [{'voice': 'cs-CZ-AntoninNeural', 'emotion': e} for e in VOICE_EMOTION_SETTINGS], _voice_target)
+
 @radim_bp.route('/api/radim/voice/speak', methods=['POST', 'OPTIONS'])
 def radim_voice_speak():
     """Azure TTS endpoint"""
     if request.method == 'OPTIONS':
         return '', 204
     
-    AZURE_KEY = os.environ.get('AZURE_SPEECH_KEY')
-    AZURE_REGION = os.environ.get('AZURE_SPEECH_REGION', 'westeurope')
+    AZURE_TTS_BASE_URL, AZURE_KEY = _voice_target()
     
     if not AZURE_KEY:
         return jsonify({'success': False, 'error': 'Azure Speech není nakonfigurován'}), 503
@@ -395,41 +424,24 @@ def radim_voice_speak():
         if not text:
             return jsonify({'success': False, 'error': 'Text je povinný'}), 400
         
-        emotion_settings = {
-            'friendly': {'pitch': '-5%', 'rate': '0.85'},
-            'calm': {'pitch': '-8%', 'rate': '0.8'},
-            'warm': {'pitch': '-3%', 'rate': '0.9'}
-        }
-        settings = emotion_settings.get(emotion, emotion_settings['friendly'])
-        
-        ssml = f'''<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="cs-CZ">
-            <voice name="{voice}">
-                <prosody rate="{settings['rate']}" pitch="{settings['pitch']}" volume="loud">{text}</prosody>
-            </voice>
-        </speak>'''
-        
-        response = requests.post(
-            f"https://{AZURE_REGION}.tts.speech.microsoft.com/cognitiveservices/v1",
-            headers={
-                'Ocp-Apim-Subscription-Key': AZURE_KEY,
-                'Content-Type': 'application/ssml+xml',
-                'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3'
-            },
-            data=ssml.encode('utf-8'),
-            timeout=15
-        )
+        # Opus (format=webm/opus) je ~5x menší než MP3 128 kbit/s
+        try:
+            fmt = negotiate_format(data.get('format'), request.headers.get('Accept'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        if response.status_code == 200:
-            audio_base64 = base64.b64encode(response.content).decode('utf-8')
-            return jsonify({
-                'success': True,
-                'audio': audio_base64,
-                'format': 'mp3',
-                'voice': voice,
-                'emotion': emotion
-            })
+        result = PHRASE_BANK.lookup(text, voice_speak_ssml, output_format=fmt, voice=voice, emotion=emotion)
+        if result is None:
+            try:
+                result = TTS.synthesize(voice_speak_ssml(text, voice, emotion), AZURE_TTS_BASE_URL, AZURE_KEY,
+                                        output_format=fmt, timeout=15)
+            except TTSError as e:
+                return jsonify({'success': False, 'error': f'Azure TTS error: {e.status}'}), 500
         
-        return jsonify({'success': False, 'error': f'Azure TTS error: {response.status_code}'}), 500
+        # Surové audio s metadaty v hlavičkách; base64 JSON jen pro starší klienty
+        if wants_binary(data):
+            return audio_response(result, format=fmt, voice=voice, emotion=emotion)
+        return jsonify(audio_json(result, format=fmt, content_type=result.content_type, voice=voice, emotion=emotion))
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -449,5 +461,6 @@ def radim_health():
             'voice_synthesis': bool(os.environ.get('AZURE_SPEECH_KEY')),
             'ai_provider': 'gemini' if GEMINI_API_KEY else 'none'
         },
+        'coalescing': WHATSAPP_COALESCER.stats(),
         'timestamp': datetime.utcnow().isoformat() + 'Z'
     })
@@ -0,0 +1,475 @@
+# ============================================
+# 🧭 RADIM REQUEST TRACING
+# ============================================
+# Version: 1.3.0
+# Flask obdoba add_request_id middleware z main.py:
+# - WSGI obal kolem Flask hooků: request ID (X-Request-ID) a měření času
+# - spany pro SQLite dotazy, odchozí HTTP (requests) a Socket.IO emity
+# - kruhový buffer N nejpomalejších požadavků s rozpadem na spany
+# - Server-Timing hlavička s TRACE_SERVER_TIMING=true (DevTools ukáže
+#   sqlite/http/emit čas); výchozí vypnuto - hlavička navíc je režie každé odpovědi
+#
+# GET /api/admin/traces - jen s hlavičkou X-Admin-Token = ADMIN_TOKEN
+#
+# Režie: SQLite dotazy jsou nejčastější span a každý obalený dotaz je
+# rámec Pythonu navíc (na 1ms požadavku s 6 dotazy ~1 %). Dotazy se proto
+# měří jen v každém TRACE_SQL_SAMPLE-tém požadavku (vzorek, 1 = všechny);
+# spojení se otevírá přes sqlite3.connect(path, factory=sqlite_factory()):
+# ve vzorku TracedConnection, jinak (i mimo požadavek) obyčejné
+# sqlite3.Connection - volba je čtení ContextVar v C, bez rámce Pythonu
+# na požadavek. Trace požadavku leží v environ (TRACE_ENVIRON_KEY), ne ve
+# vlastní ContextVar - set/reset na každý požadavek stál víc než spany,
+# které ho čtou jen ve vzorku a u HTTP/emitů. Ve vzorku se rychlé
+# dotazy jen sečtou (počet + čas ve dvou slotech), samostatný span má
+# jen dotaz nad TRACE_SQL_SPAN_MS. Request ID, čas, statistiky endpointů
+# a buffer nejpomalejších mají všechny požadavky. Měřeno end-to-end A/B
+# (benchmarks/bench_request_tracing.py).
+
+import os
+import hmac
+import time
+import heapq
+import logging
+import sqlite3
+import threading
+import itertools
+import contextvars
+from functools import wraps
+
+import requests
+from flask import Blueprint, request, jsonify, has_request_context
+
+from cpu_offload import offload_jsonify
+
+logger = logging.getLogger(__name__)
+
+tracing_bp = Blueprint('tracing', __name__)
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+TRACE_SLOW_N = int(os.environ.get('TRACE_SLOW_N', 50))
+TRACE_LOG_SLOW_MS = float(os.environ.get('TRACE_LOG_SLOW_MS', 1000))
+TRACE_SQL_SPAN_S = float(os.environ.get('TRACE_SQL_SPAN_MS', 1.0)) / 1000.0
+TRACE_SQL_SAMPLE = max(1, int(os.environ.get('TRACE_SQL_SAMPLE', 10)))
+TRACE_SERVER_TIMING = os.environ.get('TRACE_SERVER_TIMING', 'false').lower() == 'true'
+MAX_SPANS = 100             # Další spany jen v součtech (dlouhé smyčky dotazů)
+SPAN_DETAIL_CHARS = 120
+TRACE_ENVIRON_KEY = 'radim.trace'
+
+# Request ID = náhodný prefix procesu + desítkový čítač (levnější než uuid4 i hex)
+_ID_PREFIX = os.urandom(3).hex()
+_request_ids = itertools.count(1)
+_perf = time.perf_counter
+
+
+def admin_required(f):
+    """Admin endpointy: X-Admin-Token musí odpovídat ADMIN_TOKEN (bez něj vypnuto)"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'success': False, 'error': 'ADMIN_TOKEN not configured'}), 403
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        return f(*args, **kwargs)
+    return decorated
+
+
+class _Trace:
+    """
+    Trace jednoho požadavku - zároveň start_response předaný aplikaci
+    (přidá X-Request-ID), takže požadavek nepotřebuje další closure.
+    """
+    __slots__ = ('request_id', 'start', 'sql', 'environ', 'start_response', 'spans', 'totals', 'dropped',
+                 'sql_count', 'sql_seconds', 'status', 'req')
+
+    def __init__(self, environ, start_response):
+        number = next(_request_ids)
+        request_id = environ.get('HTTP_X_REQUEST_ID')
+        self.request_id = request_id[:64] if request_id else _ID_PREFIX + str(number)
+        self.start = _perf()
+        self.sql = number % TRACE_SQL_SAMPLE == 0       # SQLite dotazy ve vzorku
+        self.environ = environ
+        self.start_response = start_response
+        self.spans = None           # list / dict až s prvním spanem - většina
+        self.totals = None          # požadavků žádný nemá
+        self.dropped = 0
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.status = None
+        self.req = None
+
+    def __call__(self, status, headers, exc_info=None):
+        # Flask při pop() kontextu maže environ['werkzeug.request'] - vzít teď
+        self.status = status
+        self.req = self.environ.get('werkzeug.request')
+        headers.append(('X-Request-ID', self.request_id))
+        if TRACE_SERVER_TIMING:
+            headers.append(('Server-Timing', self.server_timing()))
+        return self.start_response(status, headers, exc_info)
+
+    def server_timing(self):
+        # Jedno %-formátování pro total + sqlite (formát floatu je tu nejdražší krok)
+        timing = 'total;dur=%.1f, sqlite;dur=%.1f' % ((time.perf_counter() - self.start) * 1000,
+                                                      self.sql_seconds * 1000)
+        for kind, (_, seconds) in (self.totals or {}).items():
+            timing += ', %s;dur=%.1f' % (kind, seconds * 1000)
+        return timing
+
+    def record(self, endpoint, total_ms):
+        """
+        Záznam do bufferu nejpomalejších: n-tice řetězců a čísel místo
+        trace - nedrží environ ani Request a GC ji po prvním průchodu
+        přestane sledovat (trace v bufferu se jinak stěhují do starších
+        generací a zdražují každý sběr)
+        """
+        return (self.request_id, self.environ.get('REQUEST_METHOD', ''), self.environ.get('PATH_INFO', ''),
+                endpoint, int(self.status[:3]) if self.status else 500, total_ms, self.sql, time.time(),
+                tuple(self.kinds().items()), tuple(self.spans or ()), self.dropped)
+
+    def add_sql(self, sql, started, duration):
+        """SQLite dotaz: jen součet, span až nad TRACE_SQL_SPAN_MS"""
+        self.sql_count += 1
+        self.sql_seconds += duration
+        if duration >= TRACE_SQL_SPAN_S:
+            self.sql_span(sql, started, duration)
+
+    def sql_span(self, sql, started, duration):
+        self._span(('sqlite', sql, started - self.start, duration))
+
+    def _span(self, span):
+        if self.spans is None:
+            self.spans = [span]
+        elif len(self.spans) < MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    def kinds(self):
+        """Součty podle druhu spanu: {kind: (počet, sekundy)}"""
+        out = {kind: tuple(totals) for kind, totals in (self.totals or {}).items()}
+        if self.sql_count:
+            out['sqlite'] = (self.sql_count, self.sql_seconds)
+        return out
+
+    def add(self, kind, detail, started, duration):
+        if self.totals is None:
+            self.totals = {}
+        totals = self.totals.get(kind)
+        if totals is None:
+            self.totals[kind] = [1, duration]
+        else:
+            totals[0] += 1
+            totals[1] += duration
+        self._span((kind, detail, started - self.start, duration))
+
+
+# Třída spojení pro sqlite3.connect(..., factory=sqlite_factory()) -
+# TracedConnection jen po dobu požadavku ze vzorku SQL
+_SQLITE_FACTORY = contextvars.ContextVar('radim_sqlite_factory', default=sqlite3.Connection)
+sqlite_factory = _SQLITE_FACTORY.get
+
+
+def current_trace():
+    """Aktivní trace požadavku, nebo None (pozadí, socket handlery)"""
+    if not has_request_context():
+        return None
+    return request.environ.get(TRACE_ENVIRON_KEY)
+
+
+def current_request_id():
+    """Request ID pro logy (None mimo HTTP požadavek)"""
+    trace = current_trace()
+    return trace.request_id if trace is not None else None
+
+
+def record_span(kind, detail, started):
+    """Zapsat span od started (perf_counter) do teď - bez aktivního požadavku nic"""
+    trace = current_trace()
+    if trace is not None:
+        trace.add(kind, detail, started, time.perf_counter() - started)
+
+
+class span:
+    """Ruční span: with span('llm', 'gemini'): ..."""
+    __slots__ = ('kind', 'detail', 'started')
+
+    def __init__(self, kind, detail=''):
+        self.kind = kind
+        self.detail = detail
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_span(self.kind, self.detail, self.started)
+        return False
+
+
+# ============================================
+# SQLITE
+# ============================================
+
+
+def _traced(method):
+    """Obal metody sqlite3 objektu - bez aktivního požadavku jen current_trace()"""
+    def wrapper(self, sql, *args):
+        trace = current_trace()
+        if trace is None:
+            return method(self, sql, *args)
+        started = _perf()
+        try:
+            return method(self, sql, *args)
+        finally:
+            # add_sql inline - jedno volání Pythonu na dotaz místo dvou
+            duration = _perf() - started
+            trace.sql_count += 1
+            trace.sql_seconds += duration
+            if duration >= TRACE_SQL_SPAN_S:
+                trace.sql_span(sql, started, duration)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+def _traced_shortcut(method):
+    """
+    Connection.execute* jako v C (cursor() + metoda kurzoru), jen s
+    obyčejným sqlite3.Cursor vytvořeným přímo v C - C zkratka volá
+    self.cursor(), tedy Python přepis níže, a instance Python podtřídy
+    je na každý dotaz znatelně dražší. Dotaz už je změřený tady.
+    """
+    def wrapper(self, sql, *args):
+        cursor = _new_cursor(self)
+        trace = current_trace()
+        if trace is None:
+            return method(cursor, sql, *args)
+        started = _perf()
+        try:
+            return method(cursor, sql, *args)
+        finally:
+            duration = _perf() - started
+            trace.sql_count += 1
+            trace.sql_seconds += duration
+            if duration >= TRACE_SQL_SPAN_S:
+                trace.sql_span(sql, started, duration)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+_new_cursor = sqlite3.Connection.cursor
+
+
+class TracedCursor(sqlite3.Cursor):
+    __slots__ = ()
+
+    execute = _traced(sqlite3.Cursor.execute)
+    executemany = _traced(sqlite3.Cursor.executemany)
+    executescript = _traced(sqlite3.Cursor.executescript)
+
+
+class TracedConnection(sqlite3.Connection):
+    """
+    db.execute i db.cursor() s měřením - sqlite_factory() ji vrací jen
+    v požadavku ze vzorku SQL (TRACE_SQL_SAMPLE). Zkratky
+    Connection.execute* měří dotaz samy a vrací obyčejný sqlite3.Cursor
+    (fetch*, lastrowid); db.cursor() vrací TracedCursor.
+    """
+    __slots__ = ()
+
+    execute = _traced_shortcut(sqlite3.Cursor.execute)
+    executemany = _traced_shortcut(sqlite3.Cursor.executemany)
+    executescript = _traced_shortcut(sqlite3.Cursor.executescript)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        trace = current_trace()
+        if trace is None:
+            return super().commit()
+        started = _perf()
+        try:
+            return super().commit()
+        finally:
+            trace.add_sql('COMMIT', started, _perf() - started)
+
+
+# ============================================
+# ODCHOZÍ HTTP + SOCKET.IO
+# ============================================
+
+_original_send = requests.Session.send
+
+
+def _traced_send(self, req, **kwargs):
+    if current_trace() is None:
+        return _original_send(self, req, **kwargs)
+    started = time.perf_counter()
+    try:
+        return _original_send(self, req, **kwargs)
+    finally:
+        # Bez query stringu - Gemini má API klíč v URL
+        record_span('http', f"{req.method} {req.url.split('?', 1)[0]}", started)
+
+
+def instrument_socketio(socketio):
+    """Obalí socketio.emit instance (emity z HTTP handlerů)"""
+    original = socketio.emit
+
+    @wraps(original)
+    def emit(event, *args, **kwargs):
+        if current_trace() is None:
+            return original(event, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return original(event, *args, **kwargs)
+        finally:
+            record_span('emit', event, started)
+
+    socketio.emit = emit
+    return socketio
+
+
+# ============================================
+# TRACER
+# ============================================
+
+class RequestTracer:
+    """
+    Obal app.wsgi_app (běží kolem Flask before/after_request hooků).
+    Request ID, metoda a cesta se čtou přímo z WSGI environ a endpoint
+    z werkzeug Request objektu až po zpracování - žádný přístup přes
+    LocalProxy (request/g), který by na rychlých endpointech stál víc
+    než samotné spany. Statistiky se zapíší hned na konci požadavku a
+    trace zaniká; buffer nejpomalejších drží jen n-tice z _Trace.record.
+    (Fronta na dávkové zpracování i trace v bufferu přežívaly do starších
+    generací GC a sběry stály víc, než dávky ušetřily.)
+    """
+
+    def __init__(self, slow_n=TRACE_SLOW_N):
+        self.slow_n = slow_n
+        self._slowest = []          # min-heap (ms, seq, záznam z _Trace.record)
+        self._seq = itertools.count()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def init_app(self, app):
+        requests.Session.send = _traced_send
+        app.wsgi_app = self._middleware(app.wsgi_app)
+        app.register_blueprint(tracing_bp)
+
+    def _middleware(self, wsgi_app):
+        @wraps(wsgi_app)
+        def traced_wsgi_app(environ, start_response):
+            trace = _Trace(environ, start_response)
+            environ[TRACE_ENVIRON_KEY] = trace
+            factory_token = _SQLITE_FACTORY.set(TracedConnection) if trace.sql else None
+            try:
+                return wsgi_app(environ, trace)
+            finally:
+                if factory_token is not None:
+                    _SQLITE_FACTORY.reset(factory_token)
+                # trace.environ -> environ -> trace je cyklus, bez pop by
+                # environ i Request uvolnil až cyklický GC
+                environ.pop(TRACE_ENVIRON_KEY, None)
+                total_ms = (_perf() - trace.start) * 1000
+                rule = getattr(trace.req, 'url_rule', None)
+                endpoint = rule.endpoint if rule is not None else 'unknown'
+                # Součty po endpointech + buffer nejpomalejších (min-heap podle ms);
+                # trace sám po požadavku hned zaniká
+                with self._lock:
+                    self.requests += 1
+                    totals = self._endpoints.get(endpoint)
+                    if totals is None:
+                        self._endpoints[endpoint] = [1, total_ms, total_ms]
+                    else:
+                        totals[0] += 1
+                        totals[1] += total_ms
+                        if total_ms > totals[2]:
+                            totals[2] = total_ms
+                    slowest = self._slowest
+                    if len(slowest) < self.slow_n:
+                        heapq.heappush(slowest, (total_ms, next(self._seq), trace.record(endpoint, total_ms)))
+                    elif total_ms > slowest[0][0]:
+                        heapq.heapreplace(slowest, (total_ms, next(self._seq), trace.record(endpoint, total_ms)))
+                if total_ms >= TRACE_LOG_SLOW_MS:
+                    logger.info(f"[{trace.request_id}] {environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')}"
+                                f" → {trace.status} ({total_ms:.0f}ms)")
+
+        return traced_wsgi_app
+
+    def slowest(self):
+        with self._lock:
+            records = [record for _, _, record in sorted(self._slowest, key=lambda item: -item[0])]
+        return [_format_record(record) for record in records]
+
+    def stats(self):
+        with self._lock:
+            endpoints = {
+                endpoint: {'requests': count, 'avg_ms': round(total / count, 2), 'max_ms': round(worst, 2)}
+                for endpoint, (count, total, worst) in self._endpoints.items()
+            }
+            return {'requests': self.requests, 'slow_buffer': len(self._slowest),
+                    'slow_buffer_size': self.slow_n, 'endpoints': endpoints}
+
+    def reset(self):
+        with self._lock:
+            self._slowest = []
+            self._endpoints = {}
+            self.requests = 0
+
+
+def _format_record(record):
+    request_id, method, path, endpoint, status, total_ms, sql_sampled, finished, kinds, spans, dropped = record
+    return {
+        'request_id': request_id,
+        'method': method,
+        'path': path,
+        'endpoint': endpoint,
+        'status': status,
+        'duration_ms': round(total_ms, 2),
+        'sql_sampled': sql_sampled,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(finished)),
+        'breakdown': _breakdown(kinds, total_ms),
+        'spans': [
+            {'kind': kind, 'detail': ' '.join(str(detail).split())[:SPAN_DETAIL_CHARS],
+             'offset_ms': round(offset * 1000, 2), 'duration_ms': round(duration * 1000, 2)}
+            for kind, detail, offset, duration in spans
+        ],
+        'dropped_spans': dropped
+    }
+
+
+def _breakdown(kinds, total_ms):
+    out = {}
+    accounted = 0.0
+    for kind, (count, seconds) in kinds:
+        out[kind] = {'count': count, 'ms': round(seconds * 1000, 2)}
+        accounted += seconds * 1000
+    out['app_ms'] = round(max(0.0, total_ms - accounted), 2)
+    return out
+
+
+TRACER = RequestTracer()
+
+
+# ============================================
+# ADMIN ENDPOINT
+# ============================================
+
+@tracing_bp.route('/api/admin/traces', methods=['GET', 'DELETE'])
+@admin_required
+def admin_traces():
+    """Nejpomalejší požadavky se spany (?limit=20), DELETE = vynulovat"""
+    if request.method == 'DELETE':
+        TRACER.reset()
+        return jsonify({'success': True})
+    limit = request.args.get('limit', 20, type=int)
+    return offload_jsonify({
+        'success': True,
+        'stats': TRACER.stats(),
+        'slowest': TRACER.slowest()[:limit]
+    })
+
+
+print("🧭 Request tracing loaded - /api/admin/traces (X-Admin-Token)")
@@ -0,0 +1,221 @@
+# ============================================
+# ⚡ RADIM RESPONSE CACHE
+# ============================================
+# Version: 1.0.0
+# TTL cache + single-flight + stale-while-revalidate
+# Pro drahá AI volání s web search (počasí, zprávy), která jsou
+# pro všechny seniory ve stejném městě / kategorii stejná.
+
+import time
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def hour_bucket(now=None):
+    """Časový kbelík 'YYYY-MM-DD HH' pro klíče cache"""
+    return (now or datetime.now()).strftime('%Y-%m-%d %H')
+
+
+# ============================================
+# SINGLE-FLIGHT
+# ============================================
+
+class _Call:
+    """Jedno probíhající volání, na které mohou čekat další požadavky"""
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Sdružení souběžných volání se stejným klíčem.
+    První požadavek (leader) volá upstream, ostatní čekají na jeho výsledek.
+    Pod eventlet.monkey_patch() jsou zámky i eventy zelené.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Vrátí (výsledek, shared) - shared=True pokud výsledek přišel od jiného volání"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+# ============================================
+# RESPONSE CACHE
+# ============================================
+
+class _Entry:
+    __slots__ = ('value', 'created', 'expires', 'stale_until')
+
+    def __init__(self, value, ttl, stale_ttl):
+        now = time.time()
+        self.value = value
+        self.created = now
+        self.expires = now + ttl
+        self.stale_until = now + ttl + stale_ttl
+
+
+class ResponseCache:
+    """
+    TTL cache s deduplikací souběžných missů a stale-while-revalidate.
+
+    Klíč je n-tice, jejíž poslední prvek je časový kbelík (hour_bucket).
+    Prefix klíče bez kbelíku tvoří "rodinu" - pokud v novém kbelíku
+    ještě nic není, poslouží se poslední hodnota rodiny (je-li v okně
+    stale_ttl) a obnova proběhne na pozadí.
+    """
+
+    def __init__(self, name, ttl=1800, stale_ttl=900, max_entries=256):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._latest = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def get_or_fetch(self, key, fetch, cacheable=None):
+        """
+        Vrátí hodnotu z cache nebo ji načte přes fetch().
+        cacheable(value) -> bool rozhoduje, zda výsledek uložit (např. ne fallback).
+        """
+        now = time.time()
+        entry = self._entries.get(key)
+
+        if entry is not None and now < entry.expires:
+            self.hits += 1
+            return entry.value
+
+        stale = entry
+        if stale is None:
+            latest_key = self._latest.get(key[:-1])
+            if latest_key is not None:
+                stale = self._entries.get(latest_key)
+
+        if stale is not None and now < stale.stale_until:
+            self.stale_hits += 1
+            self._refresh_async(key, fetch, cacheable)
+            return stale.value
+
+        self.misses += 1
+        value, _ = self._flight.do(key, lambda: self._load(key, fetch, cacheable))
+        return value
+
+    def _load(self, key, fetch, cacheable):
+        value = fetch()
+        if cacheable is None or cacheable(value):
+            self.set(key, value)
+        return value
+
+    def _refresh_async(self, key, fetch, cacheable):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def worker():
+            try:
+                self._flight.do(key, lambda: self._load(key, fetch, cacheable))
+                self.refreshes += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Cache {self.name} refresh error: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = _Entry(value, self.ttl, self.stale_ttl)
+            self._latest[key[:-1]] = key
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Odstraní prošlé položky, případně nejstarší (volat pod zámkem)"""
+        now = time.time()
+        for k in [k for k, e in self._entries.items() if now >= e.stale_until]:
+            del self._entries[k]
+        while len(self._entries) > self.max_entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k].created)
+            del self._entries[oldest]
+        self._latest = {f: k for f, k in self._latest.items() if k in self._entries}
+
+    def invalidate(self, prefix=None):
+        """Smaže vše, nebo jen klíče začínající danou n-ticí"""
+        with self._lock:
+            if prefix is None:
+                self._entries.clear()
+                self._latest.clear()
+                return
+            n = len(prefix)
+            for k in [k for k in self._entries if k[:n] == prefix]:
+                del self._entries[k]
+            self._latest = {f: k for f, k in self._latest.items() if k in self._entries}
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'name': self.name,
+            'entries': len(self._entries),
+            'ttl_s': self.ttl,
+            'stale_ttl_s': self.stale_ttl,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+            'background_refreshes': self.refreshes,
+            'refresh_errors': self.errors,
+            'coalesced_requests': self._flight.shared,
+            'in_flight': self._flight.in_flight()
+        }
@@ -3,13 +3,15 @@
 Frontend volá tyto endpointy místo přímého volání external APIs
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header
 from fastapi.responses import Response
 from pydantic import BaseModel, Field
 from typing import Optional
 import logging
 import os
 
+from tts_engine import OUTPUT_FORMATS, negotiate_format
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["tts-proxy"])
@@ -23,6 +25,7 @@ class AzureTTSRequest(BaseModel):
     voice: Optional[str] = Field("cs-CZ-AntoninNeural", description="Azure voice name")
     rate: Optional[str] = Field("0.85", description="Speech rate")
     pitch: Optional[str] = Field("+0Hz", description="Pitch adjustment")
+    format: Optional[str] = Field(None, description="Audio format (mp3, mp3-64, mp3-32, opus, webm); default from Accept")
 
 # ============================================================================
 # CORS PREFLIGHT HANDLERS (OPTIONS)
@@ -67,12 +70,17 @@ async def elevenlabs_tts_preflight():
 # ============================================================================
 
 @router.post("/azure/tts")
-async def azure_tts_proxy(request: AzureTTSRequest):
+async def azure_tts_proxy(request: AzureTTSRequest, accept: Optional[str] = Header(None)):
     """
     🎤 Azure TTS Proxy
     
     Přeposílá požadavek na Azure Cognitive Services TTS s API klíčem ze serveru
     """
+    try:
+        fmt = OUTPUT_FORMATS[negotiate_format(request.format, accept)]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         import aiohttp
         
@@ -87,7 +95,7 @@ async def azure_tts_proxy(request: AzureTTSRequest):
         headers = {
             'Ocp-Apim-Subscription-Key': api_key,
             'Content-Type': 'application/ssml+xml',
-            'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3'
+            'X-Microsoft-OutputFormat': fmt.azure
         }
         
         # Build SSML
@@ -113,9 +121,10 @@ async def azure_tts_proxy(request: AzureTTSRequest):
                 # Return audio stream directly
                 return Response(
                     content=audio_data,
-                    media_type='audio/mpeg',
+                    media_type=fmt.content_type,
                     headers={
-                        'Content-Type': 'audio/mpeg',
+                        'Content-Type': fmt.content_type,
+                        'Vary': 'Accept',
                         'Accept-Ranges': 'bytes',
                         'Access-Control-Allow-Origin': '*',
                         'X-Voice-Name': request.voice,
@@ -0,0 +1,227 @@
+# ============================================
+# 🧭 RADIM SEMANTIC CACHE
+# ============================================
+# Version: 1.0.0
+# Lokální sémantická cache pro FAQ dotazy ("kdy mám vzít léky",
+# "jaký je dnes svátek", "co je RadimCare").
+# Znakové n-gramy (hashing trick) + kosinová podobnost v NumPy,
+# bez GPU a bez externího embedding modelu.
+# N-gramy negaci skoro nevidí ("mám" / "nemám" ~ 0.94) - shoda musí mít
+# i stejnou polaritu. Zdravotní odpovědi se necachují vůbec.
+
+import os
+import re
+import time
+import zlib
+import threading
+import unicodedata
+import logging
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("⚠️ NumPy not installed - semantic cache disabled. Run: pip install numpy")
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.82))
+SEMANTIC_CACHE_CAPACITY = int(os.environ.get('SEMANTIC_CACHE_CAPACITY', 1024))
+VECTOR_DIM = 1024
+NGRAM_SIZES = (2, 3, 4)
+
+# TTL podle záměru (sekundy). 0 = nikdy necachovat.
+INTENT_TTLS = {
+    'general': 6 * 3600,
+    'health': 0,            # léky, dávkování - odpověď musí sedět přesně na dotaz
+    'weather': 1800,
+    'news': 3600,
+    'quiz': 0,
+    'story': 0,
+    'task': 0,
+    'safety': 0,
+}
+
+_NON_WORD = re.compile(r'[^\w]+', re.UNICODE)
+NEGATION_WORDS = frozenset({'ne', 'nikdy'})
+_ENTITY = re.compile(r'\w*\d\w*|(?<=\s)[A-ZÁČĎÉĚÍŇÓŘŠŤÚŮÝŽ]\w+', re.UNICODE)
+
+
+def fold_text(text):
+    """Malá písmena, bez diakritiky, jen slova oddělená mezerou"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def extract_entities(text):
+    """Čísla a vlastní jména uprostřed věty (Praha vs. Brno, 8 vs. 9 hodin)"""
+    return frozenset(fold_text(m) for m in _ENTITY.findall(' ' + text))
+
+
+def entities_compatible(entities_a, words_a, entities_b, words_b):
+    """Každá entita jednoho dotazu musí být slovem i v druhém dotazu"""
+    return entities_a <= words_b and entities_b <= words_a
+
+
+def polarity_compatible(words_a, words_b):
+    """
+    Stejná polarita: stejná záporná slova (ne, nikdy) a žádné sloveso
+    s ne- v jednom dotazu, které je v druhém kladně (nemám / mám).
+    """
+    if words_a & NEGATION_WORDS != words_b & NEGATION_WORDS:
+        return False
+    for words, other in ((words_a, words_b), (words_b, words_a)):
+        for word in words - other:
+            if word.startswith('ne') and len(word) > 4 and word[2:] in other:
+                return False
+    return True
+
+
+class NgramVectorizer:
+    """Hashovaný vektor znakových n-gramů, L2-normalizovaný"""
+
+    def __init__(self, dim=VECTOR_DIM, sizes=NGRAM_SIZES):
+        self.dim = dim
+        self.sizes = sizes
+
+    def transform(self, text):
+        folded = f" {fold_text(text)} "
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for n in self.sizes:
+            for i in range(len(folded) - n + 1):
+                vec[zlib.crc32(folded[i:i + n].encode('utf-8')) % self.dim] += 1.0
+        norm = float(np.linalg.norm(vec))
+        if norm > 0:
+            vec /= norm
+        return vec
+
+
+class SemanticCache:
+    """
+    Index otázek -> odpovědí s kosinovou podobností.
+
+    Vektory leží v předalokované matici (capacity x dim), lookup je jeden
+    maticový součin. Položky platí jen pro stejný scope (hash system promptu
+    a modelu) a stejný záměr a vyprší podle INTENT_TTLS.
+    """
+
+    def __init__(self, name, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 capacity=SEMANTIC_CACHE_CAPACITY, intent_ttls=None):
+        self.name = name
+        self.threshold = threshold
+        self.capacity = capacity
+        self.intent_ttls = dict(INTENT_TTLS, **(intent_ttls or {}))
+        self.enabled = NUMPY_AVAILABLE
+        self._lock = threading.Lock()
+        self._meta = []
+        self._next = 0
+        self.hits = {}
+        self.misses = {}
+        self.bypassed = 0
+        if self.enabled:
+            self._vectorizer = NgramVectorizer()
+            self._vectors = np.zeros((capacity, self._vectorizer.dim), dtype=np.float32)
+            self._expires = np.zeros(capacity, dtype=np.float64)
+
+    def ttl_for(self, intent):
+        return self.intent_ttls.get(intent, 0)
+
+    def lookup(self, question, intent, scope=''):
+        """Vrátí uloženou odpověď nebo None"""
+        if not self.enabled or not self.ttl_for(intent):
+            self.bypassed += 1
+            return None
+
+        vec = self._vectorizer.transform(question)
+        entities = extract_entities(question)
+        words = frozenset(fold_text(question).split())
+        now = time.time()
+
+        with self._lock:
+            count = len(self._meta)
+            answer = None
+            if count:
+                sims = self._vectors[:count] @ vec
+                sims[self._expires[:count] < now] = -1.0
+                for idx in np.argsort(sims)[::-1][:5]:
+                    if sims[idx] < self.threshold:
+                        break
+                    meta = self._meta[idx]
+                    if (meta['intent'] == intent and meta['scope'] == scope and
+                            entities_compatible(entities, words, meta['entities'], meta['words']) and
+                            polarity_compatible(words, meta['words'])):
+                        meta['hits'] += 1
+                        answer = meta['answer']
+                        break
+
+        bucket = self.hits if answer is not None else self.misses
+        bucket[intent] = bucket.get(intent, 0) + 1
+        return answer
+
+    def store(self, question, intent, answer, scope=''):
+        ttl = self.ttl_for(intent)
+        if not self.enabled or not ttl or not answer:
+            return
+        vec = self._vectorizer.transform(question)
+        meta = {
+            'question': question[:200],
+            'intent': intent,
+            'scope': scope,
+            'entities': extract_entities(question),
+            'words': frozenset(fold_text(question).split()),
+            'answer': answer,
+            'hits': 0
+        }
+        with self._lock:
+            if len(self._meta) < self.capacity:
+                idx = len(self._meta)
+                self._meta.append(meta)
+            else:
+                # Přednostně přepsat prošlou položku, jinak kruhově nejstarší
+                expired = np.flatnonzero(self._expires < time.time())
+                if len(expired):
+                    idx = int(expired[0])
+                else:
+                    idx = self._next
+                    self._next = (self._next + 1) % self.capacity
+                self._meta[idx] = meta
+            self._vectors[idx] = vec
+            self._expires[idx] = time.time() + ttl
+
+    def invalidate(self, intent=None):
+        """Zneplatní vše nebo jen položky daného záměru"""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            removed = 0
+            for idx, meta in enumerate(self._meta):
+                if intent is None or meta['intent'] == intent:
+                    if self._expires[idx] > 0:
+                        removed += 1
+                    self._expires[idx] = 0.0
+            return removed
+
+    def stats(self):
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        now = time.time()
+        live = int((self._expires[:len(self._meta)] > now).sum()) if self.enabled else 0
+        per_intent = {}
+        for intent in set(self.hits) | set(self.misses):
+            h, m = self.hits.get(intent, 0), self.misses.get(intent, 0)
+            per_intent[intent] = {'hits': h, 'misses': m, 'hit_rate': round(h / (h + m), 3)}
+        return {
+            'name': self.name,
+            'enabled': self.enabled,
+            'threshold': self.threshold,
+            'entries': live,
+            'capacity': self.capacity,
+            'hits': hits,
+            'misses': misses,
+            'bypassed': self.bypassed,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'per_intent': per_intent,
+            'intent_ttls': self.intent_ttls
+        }
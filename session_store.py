@@ -0,0 +1,287 @@
+# ============================================
+# 🗂️ RADIM SESSION STORE
+# ============================================
+# Version: 1.0.2
+# Hlasové session (voice_runtime_routes) bývaly v nekonečném dictu a
+# konverzace v nich rostla s každým /api/voice/chat - pomalý únik paměti
+# na dlouho běžícím dynu. Tady:
+# - VoiceSession se __slots__, konverzace jako deque(maxlen) - posledních
+#   SESSION_HISTORY_TURNS výměn, starší kontext drží shrnutí ContextBuilderu
+# - paměťový backend: OrderedDict v pořadí posledního přístupu, prošlé
+#   session (SESSION_TTL_S od posledního použití) se odebírají z čela
+#   při každém přístupu, nad SESSION_MAX vypadne nejdéle nepoužitá;
+#   velikost a počet tahů se sčítají průběžně při uložení/odebrání,
+#   health check nic nepřepočítává
+# - redis backend (SESSION_BACKEND=redis, SESSION_REDIS_URL / REDIS_URL):
+#   sdílený mezi workery, JSON na klíč s EX = TTL. Souběžné zápisy téže
+#   session: vyhrává poslední. Při výpadku Redis poslouží paměť procesu.
+#   Statistiky jsou čítače operací; počet klíčů (SCAN přes celý Redis)
+#   jen na vyžádání - stats(count=True), ne při každém health checku.
+#
+# get(session_id) -> session (vytvoří), změny uložit přes save(session).
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from collections import OrderedDict, deque
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_S = float(os.environ.get('SESSION_TTL_S', 2 * 3600))
+SESSION_MAX = int(os.environ.get('SESSION_MAX', 5000))
+SESSION_HISTORY_TURNS = int(os.environ.get('SESSION_HISTORY_TURNS', 20))     # výměna = dotaz + odpověď
+SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL') or os.environ.get('REDIS_URL')
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'redis' if SESSION_REDIS_URL and REDIS_AVAILABLE else 'memory')
+SESSION_KEY_PREFIX = 'radim:voice:session:'
+
+
+class VoiceSession:
+    __slots__ = ('session_id', 'state', 'C', 'kappa', 'alpha', 'last_tts_text', 'conversation',
+                 'wake_count', 'created', 'last_seen')
+
+    def __init__(self, session_id, state='idle'):
+        self.session_id = session_id
+        self.state = state
+        self.C = 5.0            # Míra zatížení
+        self.kappa = 0.8        # Koherence
+        self.alpha = 0.0        # Regulační zásah
+        self.last_tts_text = ''
+        self.conversation = deque(maxlen=SESSION_HISTORY_TURNS * 2)    # (role, text)
+        self.wake_count = 0
+        self.created = datetime.now().isoformat()
+        self.last_seen = time.monotonic()
+
+    def add_turn(self, user_text, assistant_text):
+        self.conversation.append(('user', user_text))
+        self.conversation.append(('assistant', assistant_text))
+
+    def history(self):
+        return [{'role': role, 'content': text} for role, text in self.conversation]
+
+    def nbytes(self):
+        """Přibližná velikost v paměti (objekt, řetězce, konverzace)"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.conversation)
+        size += sum(sys.getsizeof(value) for value in (self.session_id, self.state, self.last_tts_text, self.created))
+        return size + sum(sys.getsizeof(turn) + sys.getsizeof(turn[1]) for turn in self.conversation)
+
+    def to_json(self):
+        return json.dumps({
+            'state': self.state, 'C': self.C, 'kappa': self.kappa, 'alpha': self.alpha,
+            'last_tts_text': self.last_tts_text, 'conversation': list(self.conversation),
+            'wake_count': self.wake_count, 'created': self.created
+        }, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, session_id, raw):
+        data = json.loads(raw)
+        session = cls(session_id, data.get('state', 'idle'))
+        session.C = data.get('C', session.C)
+        session.kappa = data.get('kappa', session.kappa)
+        session.alpha = data.get('alpha', session.alpha)
+        session.last_tts_text = data.get('last_tts_text', '')
+        session.conversation.extend(tuple(turn) for turn in data.get('conversation', []))
+        session.wake_count = data.get('wake_count', 0)
+        session.created = data.get('created', session.created)
+        return session
+
+
+# ============================================
+# BACKENDY
+# ============================================
+
+class MemorySessionBackend:
+    name = 'memory'
+
+    def __init__(self, ttl=SESSION_TTL_S, max_sessions=SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()      # nejdéle nepoužitá první
+        self._footprints = {}               # session_id -> (bajty, zprávy) při posledním uložení
+        self._lock = threading.Lock()
+        self.memory_bytes = 0
+        self.messages = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _forget(self, session_id):
+        """Odečíst session z průběžných součtů (pod zámkem)"""
+        footprint = self._footprints.pop(session_id, None)
+        if footprint is not None:
+            self.memory_bytes -= footprint[0]
+            self.messages -= footprint[1]
+
+    def _expire(self, now):
+        """Prošlé session jsou v čele - stačí odebírat, dokud je první prošlá (pod zámkem)"""
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen < self.ttl:
+                break
+            self._forget(self._sessions.popitem(last=False)[0])
+            self.expired += 1
+
+    def load(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_seen = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def store(self, session):
+        footprint = (session.nbytes(), len(session.conversation))     # jen tahle session, mimo zámek
+        now = time.monotonic()
+        with self._lock:
+            session.last_seen = now
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            self._forget(session.session_id)
+            self._footprints[session.session_id] = footprint
+            self.memory_bytes += footprint[0]
+            self.messages += footprint[1]
+            while len(self._sessions) > self.max_sessions:
+                self._forget(self._sessions.popitem(last=False)[0])
+                self.evicted += 1
+
+    def delete(self, session_id):
+        with self._lock:
+            self._forget(session_id)
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self, count=False):
+        """count je tu zdarma - session i velikost se počítají průběžně"""
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                'sessions': len(self._sessions),
+                'memory_bytes': self.memory_bytes,
+                'conversation_turns': self.messages // 2,
+                'expired': self.expired,
+                'evicted': self.evicted
+            }
+
+
+class RedisSessionBackend:
+    """JSON na klíč s EX = TTL (každý zápis TTL prodlouží); při chybě paměť procesu"""
+    name = 'redis'
+
+    def __init__(self, url=SESSION_REDIS_URL, ttl=SESSION_TTL_S):
+        self.ttl = int(ttl)
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=1.0)
+        self.fallback = MemorySessionBackend(ttl)
+        self.errors = 0
+        self.loads = 0
+        self.load_misses = 0
+        self.stores = 0
+        self.deletes = 0
+
+    def _failed(self, action, error):
+        self.errors += 1
+        logger.warning(f"🗂️ Session store: redis {action} failed, using process memory: {error}")
+
+    def load(self, session_id):
+        try:
+            raw = self.client.get(SESSION_KEY_PREFIX + session_id)
+        except redis.RedisError as e:
+            self._failed('get', e)
+            return self.fallback.load(session_id)
+        self.loads += 1
+        if not raw:
+            self.load_misses += 1
+            return None
+        return VoiceSession.from_json(session_id, raw)
+
+    def store(self, session):
+        try:
+            self.client.set(SESSION_KEY_PREFIX + session.session_id, session.to_json(), ex=self.ttl)
+        except redis.RedisError as e:
+            self._failed('set', e)
+            self.fallback.store(session)
+            return
+        self.stores += 1
+
+    def delete(self, session_id):
+        self.fallback.delete(session_id)
+        try:
+            deleted = bool(self.client.delete(SESSION_KEY_PREFIX + session_id))
+        except redis.RedisError as e:
+            self._failed('delete', e)
+            return False
+        self.deletes += deleted
+        return deleted
+
+    def stats(self, count=False):
+        """count=True projde klíče SCANem (O(velikost Redis)) - jen na vyžádání"""
+        sessions = None
+        if count:
+            try:
+                sessions = sum(1 for _ in self.client.scan_iter(match=SESSION_KEY_PREFIX + '*', count=500))
+            except redis.RedisError:
+                pass
+        return {
+            'sessions': sessions,
+            'loads': self.loads,
+            'load_misses': self.load_misses,
+            'stores': self.stores,
+            'deletes': self.deletes,
+            'errors': self.errors,
+            'fallback': self.fallback.stats()
+        }
+
+
+# ============================================
+# STORE
+# ============================================
+
+class SessionStore:
+    def __init__(self, backend=SESSION_BACKEND):
+        if backend == 'redis' and not REDIS_AVAILABLE:
+            logger.warning("🗂️ Session store: redis package missing, using process memory")
+            backend = 'memory'
+        self.backend = RedisSessionBackend() if backend == 'redis' else MemorySessionBackend()
+        self.created = 0
+        self.hits = 0
+
+    def get(self, session_id, create=True):
+        """Session podle id; neexistující se založí (create=False -> None)"""
+        session = self.backend.load(session_id)
+        if session is not None:
+            self.hits += 1
+            return session
+        if not create:
+            return None
+        session = VoiceSession(session_id)
+        self.created += 1
+        self.backend.store(session)
+        return session
+
+    def save(self, session):
+        self.backend.store(session)
+
+    def delete(self, session_id):
+        return self.backend.delete(session_id)
+
+    def stats(self, count=False):
+        return {
+            'backend': self.backend.name,
+            'ttl_s': SESSION_TTL_S,
+            'max_sessions': SESSION_MAX,
+            'history_turns': SESSION_HISTORY_TURNS,
+            'created': self.created,
+            'hits': self.hits,
+            **self.backend.stats(count)
+        }
+
+
+print(f"🗂️ Session store loaded - {SESSION_BACKEND}, TTL {SESSION_TTL_S:.0f}s, max {SESSION_MAX}")
@@ -11,6 +11,9 @@ import sqlite3
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify, g
 
+from request_tracing import sqlite_factory
+from phrase_bank import PHRASE_BANK
+
 # Flask Blueprint
 soul_bp = Blueprint('soul', __name__, url_prefix='/api/soul')
 
@@ -23,7 +26,7 @@ DATABASE = 'radim_brain.db'
 def get_db():
     """Get database connection"""
     if 'db' not in g:
-        g.db = sqlite3.connect(DATABASE)
+        g.db = sqlite3.connect(DATABASE, factory=sqlite_factory())
         g.db.row_factory = sqlite3.Row
     return g.db
 
@@ -464,6 +467,32 @@ def log_interaction():
         }), 500
 
 
+# Denní reflexe (konstantní - předrenderované v phrase_bank)
+REFLECTIONS = {
+    "morning": [
+        "Každý nový den je příležitost někomu pomoci. 🌅",
+        "Ráno přináší naději. Co pro vás mohu udělat? ☀️",
+        "Zlatý řez nás učí harmonii - i v jednoduchých věcech. φ"
+    ],
+    "afternoon": [
+        "Odpoledne je čas na příběhy a vzpomínky. 📖",
+        "Každá konverzace mě učí něco nového. 💡",
+        "Empatie není slabost - je to síla. 💪"
+    ],
+    "evening": [
+        "Večer je čas na klid a reflexi. 🌙",
+        "Co jsem se dnes naučil? Trpělivost a laskavost. 🌟",
+        "Fibonacci nás učí, že vše je propojeno. 🔢"
+    ],
+    "night": [
+        "I v noci jsem zde pro vás. 🌃",
+        "Ticho noci přináší moudrost. 🦉",
+        "Sny jsou okna do duše. 💫"
+    ]
+}
+
+PHRASE_BANK.add(*REFLECTIONS.values())
+
 @soul_bp.route('/reflection', methods=['GET'])
 def get_reflection():
     """
@@ -471,29 +500,6 @@ def get_reflection():
     """
     hour = datetime.now().hour
     
-    reflections = {
-        "morning": [
-            "Každý nový den je příležitost někomu pomoci. 🌅",
-            "Ráno přináší naději. Co pro vás mohu udělat? ☀️",
-            "Zlatý řez nás učí harmonii - i v jednoduchých věcech. φ"
-        ],
-        "afternoon": [
-            "Odpoledne je čas na příběhy a vzpomínky. 📖",
-            "Každá konverzace mě učí něco nového. 💡",
-            "Empatie není slabost - je to síla. 💪"
-        ],
-        "evening": [
-            "Večer je čas na klid a reflexi. 🌙",
-            "Co jsem se dnes naučil? Trpělivost a laskavost. 🌟",
-            "Fibonacci nás učí, že vše je propojeno. 🔢"
-        ],
-        "night": [
-            "I v noci jsem zde pro vás. 🌃",
-            "Ticho noci přináší moudrost. 🦉",
-            "Sny jsou okna do duše. 💫"
-        ]
-    }
-    
     if 5 <= hour < 12:
         period = "morning"
     elif 12 <= hour < 18:
@@ -504,7 +510,7 @@ def get_reflection():
         period = "night"
     
     import random
-    reflection = random.choice(reflections[period])
+    reflection = random.choice(REFLECTIONS[period])
     
     return jsonify({
         "success": True,
@@ -6,15 +6,25 @@
 
 import os
 import uuid
-import base64
 import requests
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify
+
+from tts_engine import TTS, TTSError, OUTPUT_FORMATS, negotiate_format
+from phrase_bank import PHRASE_BANK
+from audio_transport import wants_binary, audio_response, audio_json, audio_upload
+from stt_stream import STT_STREAMS
+from vad import trim_upload, VAD_STATS
 
 speech_bp = Blueprint('speech', __name__, url_prefix='/api/speech')
 
 # Azure Speech konfigurace
 AZURE_SPEECH_KEY = os.environ.get('AZURE_SPEECH_KEY')
 AZURE_SPEECH_REGION = os.environ.get('AZURE_SPEECH_REGION', 'westeurope')
+# Přepsatelné base URL (lokální fake servery v benchmarks/, proxy)
+AZURE_TTS_BASE_URL = os.environ.get(
+    'AZURE_TTS_BASE_URL', f"https://{AZURE_SPEECH_REGION}.tts.speech.microsoft.com").rstrip('/')
+AZURE_STT_BASE_URL = os.environ.get(
+    'AZURE_STT_BASE_URL', f"https://{AZURE_SPEECH_REGION}.stt.speech.microsoft.com").rstrip('/')
 
 # České neurální hlasy
 CZECH_VOICES = {
@@ -29,6 +39,63 @@ SENIOR_DEFAULTS = {
     'volume': 'loud',
 }
 
+EMOTION_STYLES = {
+    'friendly': ('friendly', '1.2'),
+    'calm': ('calm', '1.0'),
+    'cheerful': ('cheerful', '1.3'),
+    'empathetic': ('empathetic', '1.1'),
+    'serious': ('serious', '0.9')
+}
+
+# ============================================
+# SSML ŠABLONY (sdílené s phrase_bank)
+# ============================================
+def synthesize_ssml(text, azure_voice, rate, pitch):
+    """SSML pro /synthesize"""
+    return f'''<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" 
+               xmlns:mstts="https://www.w3.org/2001/mstts" xml:lang="cs-CZ">
+            <voice name="{azure_voice}">
+                <mstts:express-as style="friendly" styledegree="1.2">
+                    <prosody rate="{rate}" pitch="{pitch}" volume="{SENIOR_DEFAULTS['volume']}">
+                        {text}
+                    </prosody>
+                </mstts:express-as>
+            </voice>
+        </speak>'''
+
+def stream_ssml(text, azure_voice):
+    """SSML pro /synthesize/stream"""
+    return f'''<speak version="1.0" xml:lang="cs-CZ">
+            <voice name="{azure_voice}">
+                <prosody rate="{SENIOR_DEFAULTS['rate']}" pitch="{SENIOR_DEFAULTS['pitch']}">
+                    {text}
+                </prosody>
+            </voice>
+        </speak>'''
+
+def speak_ssml(text, emotion='friendly'):
+    """SSML pro radim_speak (Antonín, styl podle emoce)"""
+    style, degree = EMOTION_STYLES.get(emotion, ('friendly', '1.2'))
+    return f'''<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" 
+               xmlns:mstts="https://www.w3.org/2001/mstts" xml:lang="cs-CZ">
+            <voice name="cs-CZ-AntoninNeural">
+                <mstts:express-as style="{style}" styledegree="{degree}">
+                    <prosody rate="{SENIOR_DEFAULTS['rate']}" pitch="{SENIOR_DEFAULTS['pitch']}">
+                        {text}
+                    </prosody>
+                </mstts:express-as>
+            </voice>
+        </speak>'''
+
+# 🗣️ Předrenderované věty: každý hlas (senior výchozí prosody) a každá emoce
+_SPEECH_TARGET = lambda: (AZURE_TTS_BASE_URL, AZURE_SPEECH_KEY)
+_VOICES = sorted(set(CZECH_VOICES.values()))
+PHRASE_BANK.profile('speech.synthesize', synthesize_ssml,
+                    [{'azure_voice': v, 'rate': SENIOR_DEFAULTS['rate'], 'pitch': SENIOR_DEFAULTS['pitch']}
+                     for v in _VOICES], _SPEECH_TARGET)
+PHRASE_BANK.profile('speech.stream', stream_ssml, [{'azure_voice': v} for v in _VOICES], _SPEECH_TARGET)
+PHRASE_BANK.profile('speech.speak', speak_ssml, [{'emotion': e} for e in EMOTION_STYLES], _SPEECH_TARGET)
+
 # ============================================
 # TEXT-TO-SPEECH (REST API)
 # ============================================
@@ -45,71 +112,46 @@ def synthesize_speech():
         rate = data.get('rate', SENIOR_DEFAULTS['rate'])
         pitch = data.get('pitch', SENIOR_DEFAULTS['pitch'])
         senior_mode = data.get('senior_mode', True)
-        return_base64 = data.get('return_base64', True)
+        # Binárně (transport=binary, Accept: audio/*, return_base64=false), base64 JSON jen pro staré klienty
+        binary = wants_binary(data, default=not data.get('return_base64', True))
         
         if not text:
             return jsonify({'success': False, 'error': 'Text je povinný'}), 400
         
+        # Formát: parametr format nebo Accept (Opus/WebM, MP3 32-128 kbit/s)
+        try:
+            fmt = negotiate_format(data.get('format'), request.headers.get('Accept'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
         azure_voice = CZECH_VOICES.get(voice_name, CZECH_VOICES['antonin'])
         
         if senior_mode:
             rate = SENIOR_DEFAULTS['rate']
             pitch = SENIOR_DEFAULTS['pitch']
         
-        # SSML pro Azure REST API
-        ssml = f'''<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" 
-               xmlns:mstts="https://www.w3.org/2001/mstts" xml:lang="cs-CZ">
-            <voice name="{azure_voice}">
-                <mstts:express-as style="friendly" styledegree="1.2">
-                    <prosody rate="{rate}" pitch="{pitch}" volume="{SENIOR_DEFAULTS['volume']}">
-                        {text}
-                    </prosody>
-                </mstts:express-as>
-            </voice>
-        </speak>'''
-        
-        # Azure TTS REST API endpoint
-        tts_url = f"https://{AZURE_SPEECH_REGION}.tts.speech.microsoft.com/cognitiveservices/v1"
-        
-        headers = {
-            'Ocp-Apim-Subscription-Key': AZURE_SPEECH_KEY,
-            'Content-Type': 'application/ssml+xml',
-            'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3',
-            'User-Agent': 'RadimBrain/3.0'
-        }
-        
-        response = requests.post(tts_url, headers=headers, data=ssml.encode('utf-8'), timeout=30)
-        
-        if response.status_code == 200:
-            audio_data = response.content
-            
-            if return_base64:
-                audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-                return jsonify({
-                    'success': True,
-                    'audio': audio_base64,
-                    'format': 'mp3',
-                    'voice': azure_voice,
-                    'text': text
-                })
-            else:
-                return Response(
-                    audio_data,
-                    mimetype='audio/mpeg',
-                    headers={
-                        'Content-Disposition': f'attachment; filename=radim_{uuid.uuid4().hex[:8]}.mp3'
-                    }
-                )
-        else:
-            error_msg = response.text if response.text else f"HTTP {response.status_code}"
+        # Předrenderovaná konstantní věta (phrase_bank) - bez volání Azure
+        result = PHRASE_BANK.lookup(text, synthesize_ssml, output_format=fmt,
+                                    azure_voice=azure_voice, rate=rate, pitch=pitch)
+        
+        # Azure TTS přes sdílené keep-alive spojení (tts_engine)
+        try:
+            result = result or TTS.synthesize(synthesize_ssml(text, azure_voice, rate, pitch), AZURE_TTS_BASE_URL,
+                                              AZURE_SPEECH_KEY, output_format=fmt, timeout=30)
+        except TTSError as e:
+            if e.timeout:
+                return jsonify({'success': False, 'error': 'Azure TTS timeout'}), 504
             return jsonify({
                 'success': False, 
-                'error': f'Azure TTS error: {error_msg}',
-                'status_code': response.status_code
+                'error': str(e),
+                'status_code': e.status
             }), 500
         
-    except requests.exceptions.Timeout:
-        return jsonify({'success': False, 'error': 'Azure TTS timeout'}), 504
+        if binary:
+            return audio_response(result, filename=f'radim_{uuid.uuid4().hex[:8]}.{OUTPUT_FORMATS[fmt].extension}',
+                                  format=fmt, voice=azure_voice, text=text)
+        return jsonify(audio_json(result, format=fmt, content_type=result.content_type, voice=azure_voice, text=text))
+        
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -129,36 +171,19 @@ def synthesize_stream():
         
         azure_voice = CZECH_VOICES.get(voice_name, CZECH_VOICES['antonin'])
         
-        ssml = f'''<speak version="1.0" xml:lang="cs-CZ">
-            <voice name="{azure_voice}">
-                <prosody rate="{SENIOR_DEFAULTS['rate']}" pitch="{SENIOR_DEFAULTS['pitch']}">
-                    {text}
-                </prosody>
-            </voice>
-        </speak>'''
-        
-        tts_url = f"https://{AZURE_SPEECH_REGION}.tts.speech.microsoft.com/cognitiveservices/v1"
+        try:
+            fmt = negotiate_format(data.get('format'), request.headers.get('Accept'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        headers = {
-            'Ocp-Apim-Subscription-Key': AZURE_SPEECH_KEY,
-            'Content-Type': 'application/ssml+xml',
-            'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3',
-            'User-Agent': 'RadimBrain/3.0'
-        }
-        
-        response = requests.post(tts_url, headers=headers, data=ssml.encode('utf-8'), timeout=30)
+        result = PHRASE_BANK.lookup(text, stream_ssml, output_format=fmt, azure_voice=azure_voice)
+        try:
+            result = result or TTS.synthesize(stream_ssml(text, azure_voice), AZURE_TTS_BASE_URL, AZURE_SPEECH_KEY,
+                                              output_format=fmt, timeout=30)
+        except TTSError:
+            return jsonify({'success': False, 'error': 'TTS synthesis failed'}), 500
         
-        if response.status_code == 200:
-            return Response(
-                response.content,
-                mimetype='audio/mpeg',
-                headers={
-                    'Content-Disposition': 'inline',
-                    'Content-Length': str(len(response.content))
-                }
-            )
-        
-        return jsonify({'success': False, 'error': 'TTS synthesis failed'}), 500
+        return audio_response(result, format=fmt, voice=azure_voice)
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -173,28 +198,25 @@ def transcribe_speech():
         return jsonify({'success': False, 'error': 'Speech service not available'}), 500
     
     try:
-        audio_data = None
-        content_type = 'audio/wav'
-        
-        if 'audio' in request.files:
-            audio_file = request.files['audio']
-            audio_data = audio_file.read()
-            # Detekce typu
-            if audio_file.filename:
-                if audio_file.filename.endswith('.webm'):
-                    content_type = 'audio/webm'
-                elif audio_file.filename.endswith('.mp3'):
-                    content_type = 'audio/mp3'
-                elif audio_file.filename.endswith('.ogg'):
-                    content_type = 'audio/ogg'
-        elif request.is_json and 'audio_base64' in request.json:
-            audio_data = base64.b64decode(request.json['audio_base64'])
-            content_type = request.json.get('content_type', 'audio/wav')
-        else:
+        # Surové tělo audio/* nebo multipart jde do Azure jako stream po blocích,
+        # audio_base64 v JSON jen jako kompatibilní fallback
+        audio_data, content_type = audio_upload()
+        if audio_data is None:
             return jsonify({'success': False, 'error': 'Není poskytnuto žádné audio'}), 400
         
+        # VAD: WAV bez ticha na okrajích, tichá nahrávka (pod VAD_DROP_DB) do Azure vůbec nejde
+        vad = trim_upload(audio_data, content_type)
+        if not vad.speech:
+            return jsonify({
+                'success': True,
+                'text': '',
+                'message': 'Řeč nebyla rozpoznána',
+                'vad': {'input_s': round(vad.input_s, 2), 'output_s': 0.0}
+            })
+        audio_data = vad.audio
+        
         # Azure STT REST API endpoint
-        stt_url = f"https://{AZURE_SPEECH_REGION}.stt.speech.microsoft.com/speech/recognition/conversation/cognitiveservices/v1"
+        stt_url = f"{AZURE_STT_BASE_URL}/speech/recognition/conversation/cognitiveservices/v1"
         
         params = {
             'language': 'cs-CZ',
@@ -286,6 +308,7 @@ def get_voices():
             }
         ],
         'senior_settings': SENIOR_DEFAULTS,
+        'formats': {name: f.content_type for name, f in OUTPUT_FORMATS.items()},
         'note': 'Pro seniory doporučujeme pomalejší tempo (0.85)',
         'api_type': 'REST'  # Indicates we're using REST API, not SDK
     })
@@ -300,13 +323,11 @@ def speech_health():
             'error': 'AZURE_SPEECH_KEY není nastaven'
         }), 500
     
-    # Test connection to Azure
+    # Test connection to Azure (zároveň udrží TTS spojení teplé)
     try:
-        test_url = f"https://{AZURE_SPEECH_REGION}.tts.speech.microsoft.com/cognitiveservices/voices/list"
-        headers = {'Ocp-Apim-Subscription-Key': AZURE_SPEECH_KEY}
-        response = requests.get(test_url, headers=headers, timeout=10)
+        status_code = TTS.probe(AZURE_TTS_BASE_URL, AZURE_SPEECH_KEY)
         
-        if response.status_code == 200:
+        if status_code == 200:
             return jsonify({
                 'success': True,
                 'status': 'healthy',
@@ -314,13 +335,17 @@ def speech_health():
                 'tts_ready': True,
                 'stt_ready': True,
                 'api_type': 'REST',
+                'tts_engine': TTS.stats(),
+                'phrase_bank': PHRASE_BANK.stats(),
+                'stt_stream': STT_STREAMS.stats(),
+                'vad': VAD_STATS.snapshot(),
                 'voices_available': list(CZECH_VOICES.keys())
             })
         else:
             return jsonify({
                 'success': False,
                 'status': 'error',
-                'error': f'Azure API returned {response.status_code}'
+                'error': f'Azure API returned {status_code}'
             }), 500
             
     except Exception as e:
@@ -348,7 +373,13 @@ def get_azure_config():
 # ============================================
 # RADIM HELPER FUNCTION
 # ============================================
-def radim_speak(text, emotion='friendly'):
+def speak_result(text, emotion='friendly', output_format='mp3'):
+    """TTSResult hlasem Radima: předrenderovaná věta, jinak Azure (TTSError propadá)"""
+    cached = PHRASE_BANK.lookup(text, speak_ssml, output_format=output_format, emotion=emotion)
+    return cached or TTS.synthesize(speak_ssml(text, emotion), AZURE_TTS_BASE_URL, AZURE_SPEECH_KEY,
+                                    output_format=output_format, timeout=30)
+
+def radim_speak(text, emotion='friendly', output_format='mp3'):
     """
     Helper funkce pro Radima - převede text na audio data
     Vrací bytes audio data nebo None při chybě
@@ -357,42 +388,7 @@ def radim_speak(text, emotion='friendly'):
         return None
     
     try:
-        emotion_styles = {
-            'friendly': ('friendly', '1.2'),
-            'calm': ('calm', '1.0'),
-            'cheerful': ('cheerful', '1.3'),
-            'empathetic': ('empathetic', '1.1'),
-            'serious': ('serious', '0.9')
-        }
-        
-        style, degree = emotion_styles.get(emotion, ('friendly', '1.2'))
-        
-        ssml = f'''<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" 
-               xmlns:mstts="https://www.w3.org/2001/mstts" xml:lang="cs-CZ">
-            <voice name="cs-CZ-AntoninNeural">
-                <mstts:express-as style="{style}" styledegree="{degree}">
-                    <prosody rate="{SENIOR_DEFAULTS['rate']}" pitch="{SENIOR_DEFAULTS['pitch']}">
-                        {text}
-                    </prosody>
-                </mstts:express-as>
-            </voice>
-        </speak>'''
-        
-        tts_url = f"https://{AZURE_SPEECH_REGION}.tts.speech.microsoft.com/cognitiveservices/v1"
-        
-        headers = {
-            'Ocp-Apim-Subscription-Key': AZURE_SPEECH_KEY,
-            'Content-Type': 'application/ssml+xml',
-            'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3',
-            'User-Agent': 'RadimBrain/3.0'
-        }
-        
-        response = requests.post(tts_url, headers=headers, data=ssml.encode('utf-8'), timeout=30)
-        
-        if response.status_code == 200:
-            return response.content
-        
-        return None
+        return speak_result(text, emotion, output_format).audio
         
     except Exception as e:
         print(f"Radim speak error: {e}")
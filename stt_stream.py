@@ -0,0 +1,395 @@
+# ============================================
+# 🎧 RADIM STREAMING STT
+# ============================================
+# Version: 1.1.1
+# /api/speech/transcribe čeká na celou nahrávku: latence = délka nahrávky
+# + upload + rozpoznání. Tady klient posílá audio po kouscích přes
+# Socket.IO už během mluvení a server je průběžně předává rozpoznávači:
+#
+#   klient -> stt_start {contentType, language}   ack {streamId}
+#   klient -> stt_chunk {streamId, audio: bytes}  (binární Socket.IO)
+#   server -> stt_partial {streamId, text}        průběžná hypotéza
+#   klient -> stt_stop {streamId}                 ack + stt_final {text, ...}
+#
+# Backendy (STT_STREAM_BACKEND):
+# - azure: Azure REST STT s chunked uploadem - spojení se otevře při
+#   stt_start a audio teče do Azure během mluvení, po stt_stop zbývá jen
+#   rozpoznání. REST průběžné hypotézy nemá (ty má jen WebSocket protokol
+#   Speech SDK, který na Heroku nepoužíváme), stt_partial proto neposílá.
+# - mock: lokální, deterministický (vývoj, testy, benchmarky) - hypotézy
+#   po slovech podle délky přijatého audia.
+# Výchozí azure s AZURE_SPEECH_KEY, jinak mock.
+#
+# PCM/WAV streamy jdou přes vad.StreamGate: ticho před řečí a po ní se
+# rozpoznávači neposílá (VAD_ENABLED).
+
+import os
+import time
+import uuid
+import queue
+import struct
+import base64
+import logging
+import threading
+
+import requests
+from flask import request
+from flask_socketio import emit
+
+from llm_metrics import HdrHistogram
+from vad import StreamGate, VAD_STATS, VAD_ENABLED, NUMPY_AVAILABLE as VAD_AVAILABLE
+
+try:
+    import eventlet
+    from eventlet import patcher
+    EVENTLET_AVAILABLE = True
+except ImportError:
+    EVENTLET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+AZURE_SPEECH_KEY = os.environ.get('AZURE_SPEECH_KEY')
+AZURE_SPEECH_REGION = os.environ.get('AZURE_SPEECH_REGION', 'westeurope')
+AZURE_STT_BASE_URL = os.environ.get(
+    'AZURE_STT_BASE_URL', f"https://{AZURE_SPEECH_REGION}.stt.speech.microsoft.com").rstrip('/')
+
+STT_STREAM_BACKEND = os.environ.get('STT_STREAM_BACKEND', 'azure' if AZURE_SPEECH_KEY else 'mock')
+STT_STREAM_MAX_PER_SID = int(os.environ.get('STT_STREAM_MAX_PER_SID', 2))
+# Azure REST pro krátké audio přijme nejvýš 60 s - delší stream by stejně selhal
+STT_STREAM_MAX_S = float(os.environ.get('STT_STREAM_MAX_S', 60))
+STT_STREAM_MAX_BYTES = int(os.environ.get('STT_STREAM_MAX_BYTES', int(16000 * 2 * STT_STREAM_MAX_S) + 44))   # 60 s PCM 16 kHz
+STT_STREAM_SWEEP_S = 1.0
+STT_STREAM_IDLE_S = float(os.environ.get('STT_STREAM_IDLE_S', 15))
+STT_FINAL_TIMEOUT = float(os.environ.get('STT_FINAL_TIMEOUT', 15))
+STT_MOCK_WORD_MS = float(os.environ.get('STT_MOCK_WORD_MS', 350))
+
+# Vstupní formáty: Content-Type pro Azure a přibližný datový tok (mock)
+PCM_RATE = 16000
+STREAM_TYPES = {
+    'audio/pcm': ('audio/wav; codecs=audio/pcm; samplerate=16000', PCM_RATE * 2),
+    'audio/wav': ('audio/wav; codecs=audio/pcm; samplerate=16000', PCM_RATE * 2),
+    'audio/ogg': ('audio/ogg; codecs=opus', 4000),
+    'audio/webm': ('audio/webm', 4000),
+}
+MOCK_TRANSCRIPT = 'Dobrý den Radime, jaké bude dnes počasí?'
+
+
+def _spawn(fn):
+    if EVENTLET_AVAILABLE and patcher.is_monkey_patched('socket'):
+        return eventlet.spawn(fn)
+    thread = threading.Thread(target=fn, name='stt-stream', daemon=True)
+    thread.start()
+    return thread
+
+
+def streaming_wav_header(rate=PCM_RATE):
+    """WAV hlavička s neznámou délkou (0xFFFFFFFF) pro surové PCM"""
+    return (b'RIFF' + struct.pack('<I', 0xFFFFFFFF) + b'WAVEfmt '
+            + struct.pack('<IHHIIHH', 16, 1, 1, rate, rate * 2, 2, 16)
+            + b'data' + struct.pack('<I', 0xFFFFFFFF))
+
+
+def parse_recognition(result):
+    """Azure detailed výsledek -> {status, text, confidence}"""
+    status = result.get('RecognitionStatus')
+    if status == 'Success':
+        if result.get('NBest'):
+            best = result['NBest'][0]
+            return {'status': status, 'text': best.get('Display', best.get('Lexical', '')),
+                    'confidence': best.get('Confidence', 0.9)}
+        return {'status': status, 'text': result.get('DisplayText', ''), 'confidence': 0.9}
+    return {'status': status or 'Error', 'text': '', 'confidence': 0.0}
+
+
+# ============================================
+# BACKENDY
+# ============================================
+
+class MockRecognizer:
+    """Hypotéza roste po slovech (STT_MOCK_WORD_MS audia na slovo), final po stop"""
+    name = 'mock'
+
+    def __init__(self, content_type, language='cs-CZ'):
+        self.bytes_per_s = STREAM_TYPES[content_type][1]
+        self.header = 44 if content_type == 'audio/wav' else 0
+        self.audio_s = 0.0
+        self.words = MOCK_TRANSCRIPT.split()
+        self.words_sent = 0
+
+    def feed(self, chunk):
+        skip = min(self.header, len(chunk))
+        self.header -= skip
+        self.audio_s += (len(chunk) - skip) / self.bytes_per_s
+        # Celá věta až ve finálu - poslední slovo se "dořekne" po stop
+        count = min(len(self.words) - 1, int(self.audio_s * 1000 / STT_MOCK_WORD_MS))
+        if count > self.words_sent:
+            self.words_sent = count
+            return ' '.join(self.words[:count])
+        return None
+
+    def finish(self, timeout=STT_FINAL_TIMEOUT):
+        if self.audio_s < 0.2:
+            return {'status': 'NoMatch', 'text': '', 'confidence': 0.0}
+        return {'status': 'Success', 'text': MOCK_TRANSCRIPT, 'confidence': 0.93}
+
+    def abort(self):
+        pass
+
+
+class AzureStreamingRecognizer:
+    """Chunked upload do Azure REST STT - audio teče během mluvení"""
+    name = 'azure'
+    session = requests.Session()
+
+    def __init__(self, content_type, language='cs-CZ'):
+        self.content_type = content_type
+        self.language = language
+        self._chunks = queue.Queue()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        if content_type == 'audio/pcm':
+            self._chunks.put(streaming_wav_header())
+        _spawn(self._run)
+
+    def _body(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def _run(self):
+        try:
+            response = self.session.post(
+                f"{AZURE_STT_BASE_URL}/speech/recognition/conversation/cognitiveservices/v1",
+                params={'language': self.language, 'format': 'detailed'},
+                headers={'Ocp-Apim-Subscription-Key': AZURE_SPEECH_KEY or '',
+                         'Content-Type': STREAM_TYPES[self.content_type][0], 'Accept': 'application/json'},
+                data=self._body(), timeout=(10, STT_FINAL_TIMEOUT))
+            if response.status_code == 200:
+                self._result = parse_recognition(response.json())
+            else:
+                self._error = f'Azure STT error: {response.status_code}'
+        except (requests.RequestException, ValueError) as e:
+            self._error = f'Azure STT error: {e}'
+        finally:
+            self._done.set()
+
+    def feed(self, chunk):
+        self._chunks.put(chunk)
+        return None
+
+    def finish(self, timeout=STT_FINAL_TIMEOUT):
+        self._chunks.put(None)
+        if not self._done.wait(timeout):
+            return {'status': 'Timeout', 'text': '', 'confidence': 0.0, 'error': 'Azure STT timeout'}
+        if self._error:
+            return {'status': 'Error', 'text': '', 'confidence': 0.0, 'error': self._error}
+        return self._result
+
+    def abort(self):
+        self._chunks.put(None)
+
+
+BACKENDS = {'azure': AzureStreamingRecognizer, 'mock': MockRecognizer}
+
+
+# ============================================
+# STREAMY
+# ============================================
+
+class STTStream:
+    __slots__ = ('stream_id', 'sid', 'recognizer', 'content_type', 'gate', 'started', 'last_chunk', 'bytes',
+                 'chunks', 'partial')
+
+    def __init__(self, sid, recognizer, content_type):
+        self.stream_id = uuid.uuid4().hex[:12]
+        self.sid = sid
+        self.recognizer = recognizer
+        self.content_type = content_type
+        self.gate = None
+        if VAD_ENABLED and VAD_AVAILABLE and content_type in ('audio/pcm', 'audio/wav'):
+            self.gate = StreamGate(PCM_RATE, header_bytes=44 if content_type == 'audio/wav' else 0)
+        self.started = self.last_chunk = time.monotonic()
+        self.bytes = 0
+        self.chunks = 0
+        self.partial = ''
+
+
+class StreamingSTT:
+    def __init__(self, backend=STT_STREAM_BACKEND):
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown STT stream backend: {backend}")
+        self.backend = backend
+        self._streams = {}          # stream_id -> STTStream
+        self._swept = 0.0
+        self.started = 0
+        self.finished = 0
+        self.aborted = 0
+        self.rejected = 0
+        self.partials = 0
+        self.bytes = 0
+        # stop -> final: co zbývá po konci mluvení (u REST celé nahrávání + rozpoznání)
+        self.final_ms = HdrHistogram(scale=1000)
+
+    def _sweep(self, now):
+        """Zahodit streamy bez audia STT_STREAM_IDLE_S (nejvýš jednou za STT_STREAM_SWEEP_S)"""
+        if now - self._swept < STT_STREAM_SWEEP_S:
+            return
+        self._swept = now
+        for stream in list(self._streams.values()):
+            if now - stream.last_chunk > STT_STREAM_IDLE_S:
+                self.abort(stream.stream_id)
+
+    def start(self, sid, content_type='audio/pcm', language='cs-CZ'):
+        now = time.monotonic()
+        self._sweep(now)
+        content_type = (content_type or 'audio/pcm').split(';')[0].strip().lower()
+        if content_type not in STREAM_TYPES:
+            raise ValueError(f"unsupported stream type: {content_type} (supported: {', '.join(STREAM_TYPES)})")
+        if sum(1 for s in self._streams.values() if s.sid == sid) >= STT_STREAM_MAX_PER_SID:
+            self.rejected += 1
+            raise ValueError('too many open STT streams')
+        stream = STTStream(sid, BACKENDS[self.backend](content_type, language), content_type)
+        self._streams[stream.stream_id] = stream
+        self.started += 1
+        return stream
+
+    def get(self, stream_id, sid):
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.sid != sid:
+            raise KeyError(stream_id)
+        return stream
+
+    def feed(self, stream, chunk):
+        """Vrací novou průběžnou hypotézu nebo None"""
+        now = time.monotonic()
+        self._sweep(now)
+        # Bajty hlídají PCM, čas komprimované formáty (Opus 60 s je jen ~200 kB)
+        if stream.bytes + len(chunk) > STT_STREAM_MAX_BYTES or now - stream.started > STT_STREAM_MAX_S:
+            self.abort(stream.stream_id)
+            raise ValueError('STT stream too long')
+        stream.bytes += len(chunk)
+        stream.chunks += 1
+        stream.last_chunk = now
+        self.bytes += len(chunk)
+        if stream.gate is not None:
+            chunk = stream.gate.feed(chunk)
+            if not chunk:
+                return None
+        partial = stream.recognizer.feed(chunk)
+        if partial and partial != stream.partial:
+            stream.partial = partial
+            self.partials += 1
+            return partial
+        return None
+
+    def stop(self, stream):
+        self._streams.pop(stream.stream_id, None)
+        stopped = time.perf_counter()
+        result = stream.recognizer.finish()
+        latency_ms = (time.perf_counter() - stopped) * 1000
+        self.final_ms.record(latency_ms)
+        self.finished += 1
+        if stream.gate is not None:
+            VAD_STATS.record_stream(stream.gate)
+        return {**result, 'final_latency_ms': round(latency_ms, 1),
+                'audio_bytes': stream.bytes, 'duration_s': round(time.monotonic() - stream.started, 2)}
+
+    def abort(self, stream_id):
+        stream = self._streams.pop(stream_id, None)
+        if stream is not None:
+            stream.recognizer.abort()
+            self.aborted += 1
+
+    def close_sid(self, sid):
+        """Odpojený klient - rozpracované streamy zahodit"""
+        for stream in list(self._streams.values()):
+            if stream.sid == sid:
+                self.abort(stream.stream_id)
+
+    def stats(self):
+        self._sweep(time.monotonic())
+        return {
+            'backend': self.backend,
+            'active': len(self._streams),
+            'started': self.started,
+            'finished': self.finished,
+            'aborted': self.aborted,
+            'rejected': self.rejected,
+            'partials': self.partials,
+            'bytes': self.bytes,
+            'final_latency_ms': self.final_ms.snapshot()
+        }
+
+
+STT_STREAMS = StreamingSTT()
+
+
+# ============================================
+# SOCKET.IO
+# ============================================
+
+def _chunk_bytes(audio):
+    if isinstance(audio, bytes):
+        return audio
+    if isinstance(audio, (bytearray, memoryview)):
+        return bytes(audio)
+    if isinstance(audio, str):
+        return base64.b64decode(audio)      # klienti bez binárních zpráv
+    raise ValueError('audio chunk must be bytes')
+
+
+def init_socketio(socketio):
+    """Zaregistrovat stt_start / stt_chunk / stt_stop (ack = návratová hodnota)"""
+
+    @socketio.on('stt_start')
+    def handle_stt_start(data=None):
+        data = data or {}
+        try:
+            stream = STT_STREAMS.start(request.sid, data.get('contentType'), data.get('language', 'cs-CZ'))
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        return {'success': True, 'streamId': stream.stream_id, 'backend': STT_STREAMS.backend}
+
+    @socketio.on('stt_chunk')
+    def handle_stt_chunk(data):
+        stream_id = (data or {}).get('streamId')
+        try:
+            stream = STT_STREAMS.get(stream_id, request.sid)
+            partial = STT_STREAMS.feed(stream, _chunk_bytes(data.get('audio')))
+        except KeyError:
+            return {'success': False, 'error': 'unknown streamId'}
+        except ValueError as e:
+            emit('stt_error', {'streamId': stream_id, 'error': str(e)})
+            return {'success': False, 'error': str(e)}
+        if partial:
+            emit('stt_partial', {'streamId': stream_id, 'text': partial})
+        return {'success': True}
+
+    @socketio.on('stt_stop')
+    def handle_stt_stop(data):
+        stream_id = (data or {}).get('streamId')
+        try:
+            stream = STT_STREAMS.get(stream_id, request.sid)
+        except KeyError:
+            return {'success': False, 'error': 'unknown streamId'}
+        result = STT_STREAMS.stop(stream)
+        final = {'streamId': stream_id, 'success': 'error' not in result, **result}
+        emit('stt_final', final)
+        return final
+
+    @socketio.on('stt_abort')
+    def handle_stt_abort(data):
+        try:
+            stream = STT_STREAMS.get((data or {}).get('streamId'), request.sid)
+        except KeyError:
+            return {'success': False, 'error': 'unknown streamId'}
+        STT_STREAMS.abort(stream.stream_id)
+        return {'success': True}
+
+    return socketio
+
+
+print(f"🎧 Streaming STT loaded - backend: {STT_STREAMS.backend}")
@@ -0,0 +1,361 @@
+# ============================================
+# 🔊 RADIM TTS ENGINE
+# ============================================
+# Version: 1.1.0
+# Jediné místo pro volání Azure TTS (speech_routes, app.py azure proxy,
+# radim_orchestrator voice/speak).
+# - persistent: sdílená keep-alive session (pool spojení), spojení se
+#   předehřeje při startu a udržuje levným HEAD každých TTS_KEEPWARM_S -
+#   krátká Radimova odpověď neplatí DNS + TCP + TLS handshake
+# - DNS cache v procesu (TTL, při výpadku resolveru poslední známá
+#   adresa - Heroku má občas DNS timeouty na EU regiony)
+# - rest: původní chování (nové spojení na každý dotaz) pro porovnání
+# - mock: syntetické MP3 bez sítě (vývoj, testy)
+#
+# - výstupní formát podle parametru format nebo hlavičky Accept
+#   (negotiate_format): MP3 128/64/32 kbit/s, Opus v Ogg a WebM -
+#   Opus ~24 kbit/s je pro mobilní připojení a base64 v JSON 4-5x menší
+#
+# TTS_ENGINE=persistent|rest|mock. Offline test proti lokálnímu serveru:
+# benchmarks/fake_upstreams.py + AZURE_TTS_BASE_URL, měření
+# benchmarks/bench_tts_engine.py a benchmarks/bench_tts_formats.py.
+
+import os
+import re
+import time
+import socket
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import eventlet
+    from eventlet import patcher
+    EVENTLET_AVAILABLE = True
+except ImportError:
+    EVENTLET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+TTS_ENGINE = os.environ.get('TTS_ENGINE', 'persistent')
+TTS_POOL_SIZE = int(os.environ.get('TTS_POOL_SIZE', 10))
+TTS_KEEPWARM_S = float(os.environ.get('TTS_KEEPWARM_S', 120))   # 0 = vypnuto
+TTS_DNS_TTL = float(os.environ.get('TTS_DNS_TTL', 300))
+TTS_DNS_STALE_S = float(os.environ.get('TTS_DNS_STALE_S', 3600))
+TTS_MOCK_LATENCY = float(os.environ.get('TTS_MOCK_LATENCY_MS', 0)) / 1000.0
+
+TTS_DEFAULT_FORMAT = os.environ.get('TTS_DEFAULT_FORMAT', 'mp3')
+USER_AGENT = 'RadimBrain/3.0'
+ENGINES = ('persistent', 'rest', 'mock')
+
+# Mock: senior tempo ~ 12 znaků/s, velikost podle bitrate formátu
+MOCK_CHARS_PER_SECOND = 12
+MP3_FRAME_HEADER = b'\xff\xf3\x64\xc4'
+_SSML_TAG = re.compile(r'<[^>]+>')
+
+
+class AudioFormat:
+    __slots__ = ('name', 'azure', 'content_type', 'extension', 'kbps', 'magic')
+
+    def __init__(self, name, azure, content_type, extension, kbps, magic):
+        self.name = name
+        self.azure = azure                  # X-Microsoft-OutputFormat
+        self.content_type = content_type
+        self.extension = extension
+        self.kbps = kbps                    # přibližný datový tok (mock, odhady)
+        self.magic = magic
+
+
+OUTPUT_FORMATS = {f.name: f for f in (
+    AudioFormat('mp3', 'audio-16khz-128kbitrate-mono-mp3', 'audio/mpeg', 'mp3', 128, MP3_FRAME_HEADER),
+    AudioFormat('mp3-64', 'audio-16khz-64kbitrate-mono-mp3', 'audio/mpeg', 'mp3', 64, MP3_FRAME_HEADER),
+    AudioFormat('mp3-32', 'audio-16khz-32kbitrate-mono-mp3', 'audio/mpeg', 'mp3', 32, MP3_FRAME_HEADER),
+    AudioFormat('opus', 'ogg-16khz-16bit-mono-opus', 'audio/ogg; codecs=opus', 'ogg', 24, b'OggS'),
+    AudioFormat('webm', 'webm-16khz-16bit-mono-opus', 'audio/webm; codecs=opus', 'webm', 24,
+                b'\x1a\x45\xdf\xa3'),
+)}
+FORMAT_ALIASES = {'mp3-128': 'mp3', 'ogg': 'opus', 'low': 'mp3-32'}
+# Accept -> formát; audio/mpeg znamená výchozí MP3 variantu
+ACCEPT_TYPES = {'audio/webm': 'webm', 'audio/ogg': 'opus', 'audio/opus': 'opus'}
+MP3_TYPES = ('audio/mpeg', 'audio/mp3')
+
+if TTS_DEFAULT_FORMAT not in OUTPUT_FORMATS:
+    raise ValueError(f"unknown TTS_DEFAULT_FORMAT: {TTS_DEFAULT_FORMAT}")
+DEFAULT_FORMAT = TTS_DEFAULT_FORMAT
+DEFAULT_MP3 = DEFAULT_FORMAT if DEFAULT_FORMAT.startswith('mp3') else 'mp3'
+
+
+def negotiate_format(requested=None, accept=None):
+    """
+    Formát odpovědi: explicitní parametr (format=webm, mp3-32, ...) má
+    přednost, jinak nejvýše hodnocený audio typ z Accept, jinak výchozí.
+    Neznámý parametr -> ValueError (endpoint vrátí 400).
+    """
+    if requested:
+        name = requested.strip().lower()
+        name = FORMAT_ALIASES.get(name, name)
+        if name not in OUTPUT_FORMATS:
+            raise ValueError(f"unsupported audio format: {requested} (supported: {', '.join(OUTPUT_FORMATS)})")
+        return name
+    if accept:
+        ranked = []
+        for position, part in enumerate(accept.split(',')):
+            media, _, params = part.strip().partition(';')
+            quality = 1.0
+            for param in params.split(';'):
+                key, _, value = param.strip().partition('=')
+                if key == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            ranked.append((-quality, position, media.strip().lower()))
+        for negative_q, _, media in sorted(ranked):
+            if negative_q >= 0:
+                break
+            if media in ACCEPT_TYPES:
+                return ACCEPT_TYPES[media]
+            if media in MP3_TYPES:
+                return DEFAULT_MP3
+    return DEFAULT_FORMAT
+
+
+class TTSError(Exception):
+    """Chyba syntézy (status None = síťová chyba, timeout zvlášť)"""
+
+    def __init__(self, message, status=None, timeout=False):
+        super().__init__(message)
+        self.status = status
+        self.timeout = timeout
+
+
+class TTSResult:
+    __slots__ = ('audio', 'content_type', 'latency_ms', 'engine', 'format')
+
+    def __init__(self, audio, content_type, latency_ms, engine, format=DEFAULT_FORMAT):
+        self.audio = audio
+        self.content_type = content_type
+        self.latency_ms = latency_ms
+        self.engine = engine
+        self.format = format
+
+
+# ============================================
+# DNS CACHE
+# ============================================
+
+class DNSCache:
+    """
+    Obal socket.getaddrinfo s TTL. Pod eventlet obaluje zelenou verzi
+    (install() volat po monkey_patch). Když resolver selže, vrátí se
+    prošlý záznam do TTS_DNS_STALE_S - spojení na známou IP je lepší
+    než chyba 503 uprostřed hovoru.
+    """
+
+    def __init__(self, ttl=TTS_DNS_TTL, stale=TTS_DNS_STALE_S):
+        self.ttl = ttl
+        self.stale = stale
+        self._entries = {}      # args -> (expires, result); bez zámku - volá se i z tpool
+        self._original = None
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+
+    def install(self):
+        if self._original is not None or self.ttl <= 0:
+            return False
+        self._original = socket.getaddrinfo
+        socket.getaddrinfo = self.getaddrinfo
+        return True
+
+    def uninstall(self):
+        if self._original is not None:
+            socket.getaddrinfo = self._original
+            self._original = None
+
+    def getaddrinfo(self, host, port, *args, **kwargs):
+        key = (host, port, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        try:
+            result = self._original(host, port, *args, **kwargs)
+        except socket.gaierror:
+            if entry is not None and entry[0] + self.stale > now:
+                self.stale_served += 1
+                logger.warning(f"🔊 DNS lookup for {host} failed, using cached address")
+                return entry[1]
+            raise
+        self._entries[key] = (now + self.ttl, result)
+        return result
+
+    def stats(self):
+        return {'installed': self._original is not None, 'ttl_s': self.ttl, 'entries': len(self._entries),
+                'hits': self.hits, 'misses': self.misses, 'stale_served': self.stale_served}
+
+
+DNS_CACHE = DNSCache()
+
+
+# ============================================
+# ENGINE
+# ============================================
+
+class AzureTTSEngine:
+    """
+    synthesize(ssml, base_url, key) -> TTSResult, chyby jako TTSError.
+    Klíč a base URL jsou parametry volání - app.py (eastus) a
+    speech_routes (westeurope) mají každý svůj účet, pool je společný.
+    """
+
+    def __init__(self, mode=TTS_ENGINE, pool_size=TTS_POOL_SIZE, keepwarm=TTS_KEEPWARM_S):
+        if mode not in ENGINES:
+            raise ValueError(f"unknown TTS engine: {mode}")
+        self.mode = mode
+        self.keepwarm = keepwarm
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._targets = {}          # base_url -> key (udržovaná spojení)
+        self._keepwarm_started = False
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.latency_ms_total = 0.0
+        self.keepwarm_pings = 0
+        self.formats = {}
+
+    def synthesize(self, ssml, base_url, key, output_format=DEFAULT_FORMAT, timeout=30):
+        """output_format = klíč OUTPUT_FORMATS (mp3, mp3-32, opus, webm, ...)"""
+        fmt = OUTPUT_FORMATS[output_format]
+        started = time.perf_counter()
+        try:
+            if self.mode == 'mock':
+                audio = self._mock(ssml, fmt)
+            else:
+                audio = self._post(ssml, base_url, key, fmt.azure, timeout)
+        except TTSError:
+            with self._lock:
+                self.errors += 1
+            raise
+        latency_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.calls += 1
+            self.latency_ms_total += latency_ms
+        if self.mode == 'persistent':
+            self._remember(base_url, key)
+        with self._lock:
+            self.formats[fmt.name] = self.formats.get(fmt.name, 0) + 1
+        return TTSResult(audio, fmt.content_type, latency_ms, self.mode, fmt.name)
+
+    def _post(self, ssml, base_url, key, output_format, timeout):
+        headers = {
+            'Ocp-Apim-Subscription-Key': key or '',
+            'Content-Type': 'application/ssml+xml',
+            'X-Microsoft-OutputFormat': output_format,
+            'User-Agent': USER_AGENT
+        }
+        url = f"{base_url}/cognitiveservices/v1"
+        try:
+            if self.mode == 'rest':
+                # Studená cesta: nové spojení (DNS + TCP + TLS) na každý dotaz
+                headers['Connection'] = 'close'
+                response = requests.post(url, headers=headers, data=ssml.encode('utf-8'), timeout=timeout)
+            else:
+                response = self.session.post(url, headers=headers, data=ssml.encode('utf-8'), timeout=timeout)
+        except requests.exceptions.Timeout as e:
+            raise TTSError(f"Azure TTS timeout: {e}", timeout=True)
+        except requests.RequestException as e:
+            raise TTSError(f"Azure TTS connection error: {e}")
+        if response.status_code != 200:
+            raise TTSError(f"Azure TTS error: {response.text[:200] or 'HTTP ' + str(response.status_code)}",
+                           response.status_code)
+        return response.content
+
+    def _mock(self, ssml, fmt):
+        if TTS_MOCK_LATENCY:
+            time.sleep(TTS_MOCK_LATENCY)
+        chars = len(' '.join(_SSML_TAG.sub(' ', ssml).split()))
+        size = max(256, chars * fmt.kbps * 125 // MOCK_CHARS_PER_SECOND)
+        return fmt.magic + bytes(size - len(fmt.magic))
+
+    # ------------------------------------------------------------------
+    # Předehřátí a udržování spojení
+    # ------------------------------------------------------------------
+
+    def probe(self, base_url, key, timeout=10):
+        """HEAD na seznam hlasů - otevře/udrží spojení, vrací HTTP status"""
+        if self.mode == 'mock':
+            return 200
+        response = self.session.head(f"{base_url}/cognitiveservices/voices/list", timeout=timeout,
+                                     headers={'Ocp-Apim-Subscription-Key': key or '', 'User-Agent': USER_AGENT})
+        return response.status_code
+
+    def prewarm(self, targets):
+        """Při startu: otevřít spojení na [(base_url, key)] na pozadí"""
+        for base_url, key in targets:
+            if key and self.mode == 'persistent':
+                self._remember(base_url, key)
+        self._start_keepwarm(immediately=True)
+
+    def _remember(self, base_url, key):
+        if self._targets.get(base_url) != key:
+            self._targets[base_url] = key
+        if not self._keepwarm_started:
+            self._start_keepwarm()
+
+    def _start_keepwarm(self, immediately=False):
+        if self._keepwarm_started or self.keepwarm <= 0 or self.mode != 'persistent' or not self._targets:
+            return
+        self._keepwarm_started = True
+        if EVENTLET_AVAILABLE and patcher.is_monkey_patched('socket'):
+            eventlet.spawn(self._keepwarm_loop, immediately)
+        else:
+            threading.Thread(target=self._keepwarm_loop, args=(immediately,), name='tts-keepwarm',
+                             daemon=True).start()
+
+    def _keepwarm_loop(self, immediately):
+        if not immediately:
+            time.sleep(self.keepwarm)
+        while True:
+            for base_url, key in list(self._targets.items()):
+                try:
+                    self.probe(base_url, key)
+                    self.keepwarm_pings += 1
+                except requests.RequestException as e:
+                    logger.warning(f"🔊 TTS keep-warm {base_url} failed: {e}")
+            time.sleep(self.keepwarm)
+
+    def connections_opened(self):
+        """Počet otevřených TCP spojení v poolu (nižší = víc znovupoužití)"""
+        total = 0
+        for adapter in set(self.session.adapters.values()):
+            for pool in list(adapter.poolmanager.pools._container.values()):
+                total += pool.num_connections
+        return total
+
+    def stats(self):
+        with self._lock:
+            return {
+                'engine': self.mode,
+                'calls': self.calls,
+                'errors': self.errors,
+                'latency_ms_avg': round(self.latency_ms_total / self.calls, 1) if self.calls else 0.0,
+                'connections_opened': self.connections_opened(),
+                'keepwarm_s': self.keepwarm,
+                'keepwarm_pings': self.keepwarm_pings,
+                'formats': dict(self.formats),
+                'targets': list(self._targets),
+                'dns': DNS_CACHE.stats()
+            }
+
+
+TTS = AzureTTSEngine()
+
+print(f"🔊 TTS engine loaded - mode: {TTS.mode}")
@@ -0,0 +1,327 @@
+# ============================================
+# 🔇 RADIM VAD (voice activity detection)
+# ============================================
+# Version: 1.1.0
+# Prohlížeč nahraje i dlouhé ticho na začátku a konci a šum televize -
+# každá sekunda navíc stojí upload i latenci rozpoznání. Před STT:
+# - trim_wav: celá nahrávka (/api/speech/transcribe) - ořízne ticho na
+#   okrajích; neposílá jen nahrávku, jejíž nejhlasitější rámec je pod
+#   absolutním prahem VAD_DROP_DB (ticho, vypnutý mikrofon)
+# - StreamGate: streamované STT (stt_stream) - kousky bez řeči před
+#   začátkem a po konci mluvení nepřeposílá
+#
+# Rámce 20 ms PCM 16 bit mono, vše vektorově v NumPy (jeden rfft přes
+# matici rámců). Rámec je řeč, když energie > adaptivní práh (šumové dno
+# + VAD_MARGIN_DB, min. VAD_MIN_DB) a zároveň aspoň jeden spektrální
+# příznak odpovídá řeči (měkké příznaky - heuristika se u neobvyklého
+# hlasu nesmí mýlit na obou):
+# - podíl energie v pásmu 80-4000 Hz (včetně základního tónu a nízkého
+#   F1 mužských /u/, /i/) > VAD_BAND_RATIO
+# - spektrální plochost < VAD_MAX_FLATNESS (stacionární širokopásmový šum
+#   - šumění, hukot TV bez dialogu - má plochost ~0.5, znělá řeč < 0.3)
+# Řečové úseky se vyhladí (většina z 5 rámců) a rozšíří o VAD_PAD_MS.
+# VAD jen ořezává okraje: když žádnou řeč nenajde, ale nahrávka není
+# tichá, jde do STT celý originál.
+#
+# Jen PCM/WAV - webm/ogg by vyžadovaly dekodér, posílají se beze změny.
+# Bez NumPy se nic neořezává.
+
+import os
+import time
+import struct
+import threading
+
+from llm_metrics import HdrHistogram
+from cpu_offload import offload
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+VAD_ENABLED = os.environ.get('VAD_ENABLED', 'true').lower() == 'true'
+VAD_FRAME_MS = int(os.environ.get('VAD_FRAME_MS', 20))
+VAD_PAD_MS = int(os.environ.get('VAD_PAD_MS', 200))
+VAD_MARGIN_DB = float(os.environ.get('VAD_MARGIN_DB', 10))
+VAD_MIN_DB = float(os.environ.get('VAD_MIN_DB', -55))
+VAD_DROP_DB = float(os.environ.get('VAD_DROP_DB', -50))        # nejhlasitější rámec pod tímto = nic neposílat
+VAD_DYNAMIC_DB = float(os.environ.get('VAD_DYNAMIC_DB', 30))     # práh nejvýš peak - 30 dB (celá nahrávka je řeč)
+VAD_BAND_RATIO = float(os.environ.get('VAD_BAND_RATIO', 0.7))
+VAD_MAX_FLATNESS = float(os.environ.get('VAD_MAX_FLATNESS', 0.35))
+VAD_MIN_SPEECH_MS = int(os.environ.get('VAD_MIN_SPEECH_MS', 100))
+VAD_MAX_BYTES = int(os.environ.get('VAD_MAX_BYTES', 8 * 1024 * 1024))            # větší upload jde streamem beze změny
+VAD_OFFLOAD_BYTES = int(os.environ.get('VAD_OFFLOAD_BYTES', 160 * 1024))         # ~5 s PCM 16 kHz -> tpool
+
+SPEECH_BAND = (80.0, 4000.0)
+SMOOTH_FRAMES = 5
+EPS = 1e-10
+
+
+# ============================================
+# WAV
+# ============================================
+
+def parse_wav(data):
+    """
+    (rate, channels, bits, data_offset, data_length) z RIFF hlavičky, nebo
+    None. Snese i streamovanou hlavičku s délkou 0xFFFFFFFF.
+    """
+    if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        return None
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        (size,) = struct.unpack('<I', data[offset + 4:offset + 8])
+        body = offset + 8
+        if chunk_id == b'fmt ':
+            audio_format, channels, rate, _, _, bits = struct.unpack('<HHIIHH', data[body:body + 16])
+            if audio_format != 1:
+                return None             # jen nekomprimované PCM
+            fmt = (rate, channels, bits)
+        elif chunk_id == b'data':
+            if fmt is None:
+                return None
+            length = min(size, len(data) - body)
+            return fmt + (body, length)
+        offset = body + size + (size & 1)
+    return None
+
+
+def wav_header(rate, length, channels=1, bits=16):
+    block = channels * bits // 8
+    return (b'RIFF' + struct.pack('<I', 36 + length) + b'WAVEfmt '
+            + struct.pack('<IHHIIHH', 16, 1, channels, rate, rate * block, block, bits)
+            + b'data' + struct.pack('<I', length))
+
+
+# ============================================
+# KLASIFIKACE RÁMCŮ
+# ============================================
+
+def frame_features(samples, rate, frame_ms=VAD_FRAME_MS):
+    """int16 vzorky -> (energie dB, podíl řečového pásma, plochost) po rámcích"""
+    frame_len = rate * frame_ms // 1000
+    count = len(samples) // frame_len
+    if count == 0:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty, empty
+    frames = samples[:count * frame_len].reshape(count, frame_len).astype(np.float32) / 32768.0
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + EPS)
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame_len).astype(np.float32), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(frame_len, 1.0 / rate)
+    band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+    band_power = spectrum[:, band]
+    band_ratio = band_power.sum(axis=1) / (spectrum.sum(axis=1) + EPS)
+    flatness = np.exp(np.mean(np.log(band_power + EPS), axis=1)) / (np.mean(band_power, axis=1) + EPS)
+    return energy_db, band_ratio, flatness
+
+
+def speech_like(band_ratio, flatness):
+    return (band_ratio > VAD_BAND_RATIO) & (flatness < VAD_MAX_FLATNESS)
+
+
+def speech_mask(energy_db, band_ratio, flatness, threshold_db=None, frame_ms=VAD_FRAME_MS, pad_ms=VAD_PAD_MS):
+    """Bool maska řečových rámců (vyhlazená a rozšířená o pad_ms)"""
+    if not len(energy_db):
+        return np.zeros(0, dtype=bool)
+    if threshold_db is None:
+        noise_floor = float(np.percentile(energy_db, 10))
+        threshold_db = max(VAD_MIN_DB, min(noise_floor + VAD_MARGIN_DB, float(energy_db.max()) - VAD_DYNAMIC_DB))
+    raw = (energy_db > threshold_db) & speech_like(band_ratio, flatness)
+    # Většina z SMOOTH_FRAMES - osamělé lupnutí/klik není řeč
+    votes = np.convolve(raw.astype(np.int8), np.ones(SMOOTH_FRAMES, dtype=np.int8), mode='same')
+    smoothed = votes > SMOOTH_FRAMES // 2
+    pad = max(0, pad_ms // frame_ms)
+    if pad and smoothed.any():
+        smoothed = np.convolve(smoothed.astype(np.int8), np.ones(2 * pad + 1, dtype=np.int8), mode='same') > 0
+    return smoothed
+
+
+# ============================================
+# CELÁ NAHRÁVKA
+# ============================================
+
+class VADResult:
+    __slots__ = ('audio', 'input_s', 'output_s', 'speech', 'processed', 'elapsed_ms')
+
+    def __init__(self, audio, input_s, output_s, speech, processed, elapsed_ms=0.0):
+        self.audio = audio
+        self.input_s = input_s
+        self.output_s = output_s
+        self.speech = speech            # False = tichá nahrávka (pod VAD_DROP_DB), nic neposílat
+        self.processed = processed      # False = formát, který VAD neumí (beze změny)
+        self.elapsed_ms = elapsed_ms
+
+
+def trim_wav(data):
+    """
+    Oříznout ticho na okrajích WAV (PCM 16 bit mono); jiné formáty beze
+    změny. Bez nalezené řeči: tichá nahrávka se zahodí, jinak originál.
+    """
+    started = time.perf_counter()
+    info = parse_wav(data) if NUMPY_AVAILABLE else None
+    if info is None or info[1] != 1 or info[2] != 16:
+        return VADResult(data, 0.0, 0.0, True, False)
+    rate, _, _, offset, length = info
+    samples = np.frombuffer(data, dtype='<i2', count=length // 2, offset=offset)    # bez kopie
+    input_s = len(samples) / rate
+    energy_db, band_ratio, flatness = frame_features(samples, rate)
+    mask = speech_mask(energy_db, band_ratio, flatness)
+    frame_len = rate * VAD_FRAME_MS // 1000
+    if mask.sum() * VAD_FRAME_MS < VAD_MIN_SPEECH_MS:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if not len(energy_db) or float(energy_db.max()) < VAD_DROP_DB:
+            return VADResult(b'', input_s, 0.0, False, True, elapsed_ms)
+        # Heuristika řeč nenašla, ale nahrávka není tichá - rozhodne STT
+        return VADResult(data, input_s, input_s, True, True, elapsed_ms)
+    voiced = np.flatnonzero(mask)
+    start = int(voiced[0]) * frame_len
+    end = min(len(samples), (int(voiced[-1]) + 1) * frame_len)
+    body = memoryview(data)[offset + start * 2:offset + end * 2]
+    audio = wav_header(rate, len(body)) + body
+    return VADResult(audio, input_s, (end - start) / rate, True, True, (time.perf_counter() - started) * 1000)
+
+
+def trim_upload(audio, content_type):
+    """
+    Upload z audio_transport.audio_upload (BodyStream nebo bytes) ->
+    VADResult. WAV se načte do paměti a ořízne, ostatní jde beze změny.
+    """
+    size = len(audio) if isinstance(audio, (bytes, bytearray)) else getattr(audio, 'len', 0)
+    if not (VAD_ENABLED and NUMPY_AVAILABLE) or content_type != 'audio/wav' or size > VAD_MAX_BYTES:
+        result = VADResult(audio, 0.0, 0.0, True, False)
+    else:
+        if not isinstance(audio, (bytes, bytearray)):
+            audio = b''.join(iter(audio.read, b''))
+        result = offload(trim_wav, audio) if len(audio) >= VAD_OFFLOAD_BYTES else trim_wav(audio)
+    VAD_STATS.record(result)
+    return result
+
+
+# ============================================
+# STREAM
+# ============================================
+
+class StreamGate:
+    """
+    Brána pro streamované PCM: před první řečí se drží jen krátký pre-roll
+    (VAD_PAD_MS), ticho po řeči se odkládá a pošle se jen když řeč
+    pokračuje. Práh = šumové dno (klouzavé minimum) + VAD_MARGIN_DB.
+    feed(chunk) -> bytes k přeposlání (může být b'').
+    """
+
+    def __init__(self, rate=16000, header_bytes=0):
+        self.rate = rate
+        self.frame_bytes = rate * VAD_FRAME_MS // 1000 * 2
+        self.header_bytes = header_bytes
+        self.noise_db = None
+        self.active = False
+        self._voiced = 0            # řečové rámce v řadě (i přes hranice kousků)
+        self._remainder = b''
+        self._held = []             # ticho (pre-roll nebo pauza po řeči)
+        self._held_bytes = 0
+        self.pre_roll = self.frame_bytes * max(1, VAD_PAD_MS // VAD_FRAME_MS)
+        self.input_bytes = 0
+        self.forwarded_bytes = 0
+
+    def feed(self, chunk):
+        out = []
+        head = b''
+        if self.header_bytes:
+            head = chunk[:self.header_bytes]
+            self.header_bytes -= len(head)
+            chunk = chunk[len(head):]
+            out.append(head)            # WAV hlavička jde vždy
+        self.input_bytes += len(chunk)
+        data = self._remainder + chunk
+        usable = len(data) - len(data) % self.frame_bytes
+        self._remainder = data[usable:]
+        if usable and NUMPY_AVAILABLE:
+            block = data[:usable]
+            samples = np.frombuffer(block, dtype='<i2')
+            energy_db, band_ratio, flatness = frame_features(samples, self.rate)
+            floor = float(energy_db.min())
+            self.noise_db = floor if self.noise_db is None else min(self.noise_db + 0.5, floor)
+            threshold = max(VAD_MIN_DB, self.noise_db + VAD_MARGIN_DB)
+            voiced = int(((energy_db > threshold) & speech_like(band_ratio, flatness)).sum())
+            self._voiced = self._voiced + voiced if voiced else 0
+            if self._voiced > SMOOTH_FRAMES // 2 or (self.active and voiced):
+                # Řeč: pustit odložené ticho (pre-roll / pauzu) a celý blok
+                out.extend(self._held)
+                out.append(block)
+                self._held, self._held_bytes = [], 0
+                self.active = True
+            else:
+                self._held.append(block)
+                self._held_bytes += len(block)
+                if not self.active:
+                    # Před řečí držet jen pre-roll
+                    while self._held_bytes - len(self._held[0]) >= self.pre_roll:
+                        self._held_bytes -= len(self._held.pop(0))
+        elif usable:
+            out.append(data[:usable])
+        forwarded = b''.join(out)
+        self.forwarded_bytes += len(forwarded) - len(head)
+        return forwarded
+
+
+# ============================================
+# METRIKY
+# ============================================
+
+class VADStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clips = 0
+        self.dropped = 0            # tichá nahrávka - do STT se neposlalo
+        self.skipped = 0            # formát bez VAD (webm/ogg)
+        self.input_s = 0.0
+        self.output_s = 0.0
+        self.streams = 0
+        self.stream_input_s = 0.0
+        self.stream_output_s = 0.0
+        self.trimmed_s = HdrHistogram(scale=1000)
+        self.elapsed_ms = HdrHistogram(scale=1000)
+
+    def record(self, result):
+        with self._lock:
+            if not result.processed:
+                self.skipped += 1
+                return
+            self.clips += 1
+            self.dropped += 0 if result.speech else 1
+            self.input_s += result.input_s
+            self.output_s += result.output_s
+            self.trimmed_s.record(result.input_s - result.output_s)
+            self.elapsed_ms.record(result.elapsed_ms)
+
+    def record_stream(self, gate):
+        """Uzavřený STT stream: kolik audia brána nepustila"""
+        with self._lock:
+            self.streams += 1
+            self.stream_input_s += gate.input_bytes / (gate.rate * 2)
+            self.stream_output_s += gate.forwarded_bytes / (gate.rate * 2)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'enabled': VAD_ENABLED and NUMPY_AVAILABLE,
+                'clips': self.clips,
+                'dropped_no_speech': self.dropped,
+                'skipped_format': self.skipped,
+                'input_s': round(self.input_s, 2),
+                'output_s': round(self.output_s, 2),
+                'trimmed_ratio': round(1 - self.output_s / self.input_s, 3) if self.input_s else 0.0,
+                'trimmed_s': self.trimmed_s.snapshot(),
+                'elapsed_ms': self.elapsed_ms.snapshot(),
+                'streams': self.streams,
+                'stream_input_s': round(self.stream_input_s, 2),
+                'stream_output_s': round(self.stream_output_s, 2)
+            }
+
+
+VAD_STATS = VADStats()
+
+print(f"🔇 VAD loaded - {'NumPy' if NUMPY_AVAILABLE else 'disabled (no NumPy)'}")
@@ -4,12 +4,31 @@
 # Matematický engine pro hlasový runtime
 # C(t), κ(t), α(t) - stavové metriky
 # 5-stavový automat řízení
+# /turn + Socket.IO voice_turn: celý hlasový tah jedním požadavkem
 
-import os
+import re
 import json
 import math
-from datetime import datetime
+import time
+import uuid
+import threading
+from concurrent.futures import Future
 from flask import Blueprint, request, jsonify
+from flask_socketio import emit
+
+from claude_routes import LOCAL_ANSWERS
+from keyword_matcher import CLASSIFIER
+from context_builder import ContextBuilder, summary_block
+from cpu_offload import offload_text
+from session_store import SessionStore, VoiceSession
+from echo_suppression import ECHO_INDEX, ECHO_THRESHOLD
+
+try:
+    import eventlet
+    from eventlet import patcher
+    EVENTLET_AVAILABLE = True
+except ImportError:
+    EVENTLET_AVAILABLE = False
 
 voice_runtime_bp = Blueprint('voice_runtime', __name__, url_prefix='/api/voice')
 
@@ -39,23 +58,50 @@ STATES = {
     'SPEAKING': 'speaking'
 }
 
-# In-memory session storage (pro produkci použít Redis)
-sessions = {}
+# Session s TTL a omezenou konverzací (paměť procesu, nebo Redis pro více workerů)
+SESSIONS = SessionStore()
 
 def get_session(session_id):
-    """Získat nebo vytvořit session"""
-    if session_id not in sessions:
-        sessions[session_id] = {
-            'state': STATES['IDLE'],
-            'C': 5.0,           # Míra zatížení
-            'kappa': 0.8,       # Koherence
-            'alpha': 0.0,       # Regulační zásah
-            'last_tts_text': '',
-            'conversation': [],
-            'wake_count': 0,
-            'created': datetime.now().isoformat()
-        }
-    return sessions[session_id]
+    """Získat nebo vytvořit session (změny uložit přes SESSIONS.save)"""
+    return SESSIONS.get(session_id)
+
+def transition(session, event, event_data=None):
+    """
+    Jeden krok stavového automatu (neplatná událost stav nemění).
+    Vrací (předchozí stav, nový stav); session uložit volající.
+    """
+    current_state = session.state
+    new_state = current_state
+    
+    if current_state == STATES['IDLE']:
+        if event == 'wake_detected':
+            new_state = STATES['WAKE_DETECTED']
+            session.wake_count += 1
+            
+    elif current_state == STATES['WAKE_DETECTED']:
+        if event == 'voice_valid':
+            new_state = STATES['LISTENING']
+        elif event == 'voice_invalid' or event == 'timeout':
+            new_state = STATES['IDLE']
+            
+    elif current_state == STATES['LISTENING']:
+        if event == 'speech_end':
+            new_state = STATES['THINKING']
+        elif event == 'timeout':
+            new_state = STATES['IDLE']
+            
+    elif current_state == STATES['THINKING']:
+        if event == 'response_ready':
+            new_state = STATES['SPEAKING']
+            session.last_tts_text = (event_data or {}).get('text', '')
+            ECHO_INDEX.remember(session.session_id, session.last_tts_text)
+            
+    elif current_state == STATES['SPEAKING']:
+        if event == 'tts_done':
+            new_state = STATES['IDLE']
+    
+    session.state = new_state
+    return current_state, new_state
 
 # ============================================
 # MATEMATICKÝ ENGINE
@@ -200,27 +246,31 @@ IGNORE_PATTERNS = [
     'zprávy dne', 'news of the day'  # TV news
 ]
 
+CLASSIFIER.register('relevance', {
+    'address': ['radim', 'radime'],
+    'keyword': RADIM_KEYWORDS,
+    'ignore': IGNORE_PATTERNS
+})
+
 def compute_relevance(text: str, context: dict = None) -> float:
     """
     Výpočet relevance dotazu pro Radima
     
     Returns: 0.0 - 1.0
     """
-    text_lower = text.lower()
+    hits = CLASSIFIER.hits(text, 'relevance')
     score = 0.0
     
     # Přímé oslovení Radima
-    if 'radim' in text_lower or 'radime' in text_lower:
+    if 'address' in hits:
         score += 0.5
     
     # Klíčová slova
-    keyword_hits = sum(1 for kw in RADIM_KEYWORDS if kw in text_lower)
+    keyword_hits = len(hits.get('keyword', []))
     score += min(keyword_hits * 0.15, 0.4)
     
     # Negativní vzory (TV, reklama)
-    for pattern in IGNORE_PATTERNS:
-        if pattern in text_lower:
-            score -= 0.3
+    score -= 0.3 * len(hits.get('ignore', []))
     
     # Krátké příkazy jsou často relevantní
     words = text.split()
@@ -237,29 +287,57 @@ def compute_relevance(text: str, context: dict = None) -> float:
 # ECHO SIMILARITY (AEC)
 # ============================================
 
-def compute_echo_similarity(text: str, last_tts: str) -> float:
+def compute_echo_similarity(text: str, last_tts: str, session_id: str = None) -> float:
     """
-    Detekce echo - podobnost s posledním TTS výstupem
+    Detekce echo - podobnost s nedávnými TTS výstupy session
+    (echo_suppression: shingly v časovém okně, i útržky dlouhých odpovědí)
     
-    Returns: 0.0 - 1.0 (>0.75 = echo)
+    Returns: 0.0 - 1.0 (>ECHO_THRESHOLD = echo)
     """
-    if not last_tts:
-        return 0.0
-    
-    text_words = set(text.lower().split())
-    tts_words = set(last_tts.lower().split())
-    
-    if not tts_words:
-        return 0.0
-    
-    intersection = text_words & tts_words
-    union = text_words | tts_words
-    
-    # Jaccard similarity
-    if not union:
-        return 0.0
-    
-    return len(intersection) / len(union)
+    return ECHO_INDEX.score(session_id, text, last_tts)
+
+# ============================================
+# BRÁNA ODPOVĚDI
+# ============================================
+
+def evaluate_gate(session, sensors: dict, bio: dict, user_text: str) -> dict:
+    """
+    Metriky C/κ/α + relevance/echo brána (should_respond).
+    Aktualizuje metriky v session, uložit volající.
+    """
+    # Výpočet metrik
+    C = compute_C(sensors, bio)
+    system_state = get_system_state(C)
+    alpha = compute_alpha(system_state, user_text)
+    kappa = compute_kappa(C, alpha, session.kappa)
+    
+    # Relevance
+    relevance = compute_relevance(user_text)
+    
+    # Echo check
+    echo_sim = compute_echo_similarity(user_text, session.last_tts_text, session.session_id)
+    is_echo = echo_sim > ECHO_THRESHOLD
+    
+    # Rozhodnutí o odpovědi
+    should_respond = relevance >= 0.6 and not is_echo
+    
+    # Update session
+    session.C = C
+    session.kappa = kappa
+    session.alpha = alpha
+    
+    return {
+        'C': round(C, 2),
+        'kappa': round(kappa, 3),
+        'alpha': round(alpha, 2),
+        'system_state': system_state,
+        'relevance': round(relevance, 2),
+        'echo_similarity': round(echo_sim, 2),
+        'is_echo': is_echo,
+        'should_respond': should_respond,
+        'tts_params': get_tts_params(system_state),
+        'fibonacci_pause_ms': FIBONACCI[5] * 100  # 500ms base
+    }
 
 # ============================================
 # API ENDPOINTS
@@ -267,7 +345,7 @@ def compute_echo_similarity(text: str, last_tts: str) -> float:
 
 @voice_runtime_bp.route('/health', methods=['GET'])
 def voice_health():
-    """Health check"""
+    """Health check (?count_sessions=1 spočítá i session v Redis)"""
     return jsonify({
         'status': 'healthy',
         'service': 'RADIM Voice Runtime',
@@ -280,7 +358,12 @@ def voice_health():
         'thresholds': {
             'harmony': THRESHOLD_HARMONY,
             'alert': THRESHOLD_ALERT
-        }
+        },
+        'local_answers': LOCAL_ANSWERS.stats(),
+        'context': VOICE_CONTEXT.stats(),
+        'sessions': SESSIONS.stats(count=request.args.get('count_sessions') == '1'),
+        'turns': VOICE_TURN_STATS.snapshot(),
+        'echo': ECHO_INDEX.stats()
     })
 
 @voice_runtime_bp.route('/metrics', methods=['POST'])
@@ -316,43 +399,10 @@ def compute_metrics():
         user_text = data.get('user_text', '')
         
         session = get_session(session_id)
+        metrics = evaluate_gate(session, sensors, bio, user_text)
+        SESSIONS.save(session)
         
-        # Výpočet metrik
-        C = compute_C(sensors, bio)
-        system_state = get_system_state(C)
-        alpha = compute_alpha(system_state, user_text)
-        kappa = compute_kappa(C, alpha, session['kappa'])
-        
-        # Relevance
-        relevance = compute_relevance(user_text)
-        
-        # Echo check
-        echo_sim = compute_echo_similarity(user_text, session['last_tts_text'])
-        is_echo = echo_sim > 0.75
-        
-        # Rozhodnutí o odpovědi
-        should_respond = relevance >= 0.6 and not is_echo
-        
-        # TTS parametry
-        tts_params = get_tts_params(system_state)
-        
-        # Update session
-        session['C'] = C
-        session['kappa'] = kappa
-        session['alpha'] = alpha
-        
-        return jsonify({
-            'C': round(C, 2),
-            'kappa': round(kappa, 3),
-            'alpha': round(alpha, 2),
-            'system_state': system_state,
-            'relevance': round(relevance, 2),
-            'echo_similarity': round(echo_sim, 2),
-            'is_echo': is_echo,
-            'should_respond': should_respond,
-            'tts_params': tts_params,
-            'fibonacci_pause_ms': FIBONACCI[5] * 100  # 500ms base
-        })
+        return jsonify(metrics)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -376,46 +426,17 @@ def update_state():
         event_data = data.get('data', {})
         
         session = get_session(session_id)
-        current_state = session['state']
-        new_state = current_state
-        
-        # Stavový automat přechody
-        if current_state == STATES['IDLE']:
-            if event == 'wake_detected':
-                new_state = STATES['WAKE_DETECTED']
-                session['wake_count'] += 1
-                
-        elif current_state == STATES['WAKE_DETECTED']:
-            if event == 'voice_valid':
-                new_state = STATES['LISTENING']
-            elif event == 'voice_invalid' or event == 'timeout':
-                new_state = STATES['IDLE']
-                
-        elif current_state == STATES['LISTENING']:
-            if event == 'speech_end':
-                new_state = STATES['THINKING']
-            elif event == 'timeout':
-                new_state = STATES['IDLE']
-                
-        elif current_state == STATES['THINKING']:
-            if event == 'response_ready':
-                new_state = STATES['SPEAKING']
-                session['last_tts_text'] = event_data.get('text', '')
-                
-        elif current_state == STATES['SPEAKING']:
-            if event == 'tts_done':
-                new_state = STATES['IDLE']
-        
-        session['state'] = new_state
+        current_state, new_state = transition(session, event, event_data)
+        SESSIONS.save(session)
         
         return jsonify({
             'previous_state': current_state,
             'current_state': new_state,
             'event': event,
             'session': {
-                'C': session['C'],
-                'kappa': session['kappa'],
-                'wake_count': session['wake_count']
+                'C': session.C,
+                'kappa': session.kappa,
+                'wake_count': session.wake_count
             }
         })
         
@@ -424,19 +445,19 @@ def update_state():
 
 @voice_runtime_bp.route('/session/<session_id>', methods=['GET'])
 def get_session_info(session_id):
-    """Získat informace o session"""
-    session = get_session(session_id)
+    """Získat informace o session (neznámou nezakládá - výchozí hodnoty)"""
+    session = SESSIONS.get(session_id, create=False) or VoiceSession(session_id)
     return jsonify({
         'session_id': session_id,
-        'state': session['state'],
+        'state': session.state,
         'metrics': {
-            'C': session['C'],
-            'kappa': session['kappa'],
-            'alpha': session['alpha']
+            'C': session.C,
+            'kappa': session.kappa,
+            'alpha': session.alpha
         },
-        'system_state': get_system_state(session['C']),
-        'wake_count': session['wake_count'],
-        'created': session['created']
+        'system_state': get_system_state(session.C),
+        'wake_count': session.wake_count,
+        'created': session.created
     })
 
 @voice_runtime_bp.route('/prompt', methods=['GET'])
@@ -480,10 +501,11 @@ Pokud speak=false, text prázdný."""
 # HLASOVÝ CHAT - OPTIMALIZOVANÝ PRO TTS
 # ============================================
 
-import requests
-
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
+from llm_gateway import LLM, GEMINI_MODEL, CLAUDE_HAIKU_MODEL
+from llm_scheduler import lane_for_intent
+from llm_metrics import METRICS
+from radim_orchestrator import detect_intent
+from phrase_bank import PHRASE_BANK
 
 # Systémový prompt optimalizovaný pro hlasové odpovědi
 VOICE_SYSTEM_PROMPT = """Jsi Radim, milý a trpělivý hlasový asistent pro české seniory.
@@ -516,7 +538,14 @@ PŘÍKLADY ŠPATNÝCH ODPOVĚDÍ (nepoužívej):
 Dnešní datum: {date}
 Svátek má: {nameday}"""
 
-def get_voice_ai_response(messages, context=None):
+# Hlas: menší rozpočet (rychlejší první token), shrnutí podle session_id
+VOICE_CONTEXT = ContextBuilder('voice', budget=600, summary_budget=150)
+
+# Statický fallback - předrenderovaný v phrase_bank
+VOICE_FALLBACK_RESPONSE = 'Omlouvám se, zkuste to prosím znovu.'
+PHRASE_BANK.add(VOICE_FALLBACK_RESPONSE)
+
+def get_voice_ai_response(messages, context=None, session_id=None):
     """Získat AI odpověď optimalizovanou pro hlasový výstup"""
     from datetime import datetime
     
@@ -528,93 +557,77 @@ def get_voice_ai_response(messages, context=None):
     
     system_prompt = VOICE_SYSTEM_PROMPT.format(date=date_str, nameday=nameday)
     
+    if session_id:
+        summary, messages = VOICE_CONTEXT.prepare(session_id, messages)
+        system_prompt += summary_block(summary)
+    else:
+        messages = VOICE_CONTEXT.trim(messages)
+    
+    last_user = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+    lane = lane_for_intent(detect_intent(last_user))
+    
     # Zkusit Gemini
-    if GEMINI_API_KEY:
-        try:
-            conversation = "\n".join([f"{'Uživatel' if m.get('role') == 'user' else 'Radim'}: {m.get('content', '')}" for m in messages[-6:]])
-            prompt = f"{system_prompt}\n\nKonverzace:\n{conversation}\n\nRadim:"
-            
-            response = requests.post(
-                f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "contents": [{"parts": [{"text": prompt}]}],
-                    "generationConfig": {
-                        "temperature": 0.7,
-                        "maxOutputTokens": 100,
-                        "topP": 0.9
-                    }
-                },
-                timeout=15
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'candidates' in data and data['candidates']:
-                    text = data['candidates'][0]['content']['parts'][0]['text'].strip()
-                    text = clean_for_tts(text)
-                    return {'response': text, 'provider': 'gemini', 'success': True}
-        except Exception as e:
-            print(f"Gemini voice error: {e}")
+    conversation = "\n".join([f"{'Uživatel' if m.get('role') == 'user' else 'Radim'}: {m.get('content', '')}" for m in messages])
+    prompt = f"{system_prompt}\n\nKonverzace:\n{conversation}\n\nRadim:"
+    result = LLM.generate('gemini', GEMINI_MODEL, prompt=prompt, max_tokens=100,
+                          temperature=0.7, top_p=0.9, timeout=15, lane=lane, user_id=session_id)
+    if result and result.text:
+        return {'response': clean_for_tts(result.text), 'provider': 'gemini', 'success': True}
     
     # Fallback na Claude
-    if ANTHROPIC_API_KEY:
-        try:
-            api_messages = [{"role": m.get('role', 'user'), "content": m.get('content', '')} for m in messages[-6:]]
-            
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "Content-Type": "application/json",
-                    "x-api-key": ANTHROPIC_API_KEY,
-                    "anthropic-version": "2023-06-01"
-                },
-                json={
-                    "model": "claude-3-haiku-20240307",
-                    "max_tokens": 100,
-                    "system": system_prompt,
-                    "messages": api_messages
-                },
-                timeout=15
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'content' in data and data['content']:
-                    text = data['content'][0]['text'].strip()
-                    text = clean_for_tts(text)
-                    return {'response': text, 'provider': 'claude', 'success': True}
-        except Exception as e:
-            print(f"Claude voice error: {e}")
-    
-    return {'response': 'Omlouvám se, zkuste to prosím znovu.', 'provider': 'fallback', 'success': False}
+    METRICS.fallback('gemini', 'claude')
+    api_messages = [{"role": m.get('role', 'user'), "content": m.get('content', '')} for m in messages]
+    result = LLM.generate('claude', CLAUDE_HAIKU_MODEL, messages=api_messages, system=system_prompt,
+                          max_tokens=100, timeout=15, lane=lane, user_id=session_id)
+    if result and result.text:
+        return {'response': clean_for_tts(result.text), 'provider': 'claude', 'success': True}
+    
+    METRICS.fallback('claude', 'static')
+    return {'response': VOICE_FALLBACK_RESPONSE, 'provider': 'fallback', 'success': False}
+
+# Předkompilovaný řetěz regexů (dřív re.compile při každém volání)
+_TTS_EMOJI = re.compile("["
+    u"\U0001F600-\U0001F64F"
+    u"\U0001F300-\U0001F5FF"
+    u"\U0001F680-\U0001F6FF"
+    u"\U0001F1E0-\U0001F1FF"
+    u"\U00002702-\U000027B0"
+    u"\U000024C2-\U0001F251"
+    u"\U0001F900-\U0001F9FF"
+    u"\U00002600-\U000026FF"
+    u"\U00002700-\U000027BF"
+    "]+", flags=re.UNICODE)
+_TTS_CLEANUP = [
+    (_TTS_EMOJI, ''),
+    (re.compile(r'\*\*([^*]+)\*\*'), r'\1'),
+    (re.compile(r'\*([^*]+)\*'), r'\1'),
+    (re.compile(r'__([^_]+)__'), r'\1'),
+    (re.compile(r'_([^_]+)_'), r'\1'),
+    (re.compile(r'~~([^~]+)~~'), r'\1'),
+    (re.compile(r'`([^`]+)`'), r'\1'),
+    (re.compile(r'^#{1,6}\s*', re.MULTILINE), ''),
+    (re.compile(r'^[\*\-]\s+', re.MULTILINE), ''),
+    (re.compile(r'^\d+\.\s+', re.MULTILINE), ''),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def _clean_for_tts(text):
+    for pattern, replacement in _TTS_CLEANUP:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
 
 def clean_for_tts(text):
-    """Vyčistit text pro TTS"""
-    import re
-    emoji_pattern = re.compile("["
-        u"\U0001F600-\U0001F64F"
-        u"\U0001F300-\U0001F5FF"
-        u"\U0001F680-\U0001F6FF"
-        u"\U0001F1E0-\U0001F1FF"
-        u"\U00002702-\U000027B0"
-        u"\U000024C2-\U0001F251"
-        u"\U0001F900-\U0001F9FF"
-        u"\U00002600-\U000026FF"
-        u"\U00002700-\U000027BF"
-        "]+", flags=re.UNICODE)
-    text = emoji_pattern.sub('', text)
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)
-    text = re.sub(r'__([^_]+)__', r'\1', text)
-    text = re.sub(r'_([^_]+)_', r'\1', text)
-    text = re.sub(r'~~([^~]+)~~', r'\1', text)
-    text = re.sub(r'`([^`]+)`', r'\1', text)
-    text = re.sub(r'^#{1,6}\s*', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^[\*\-]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\d+\.\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    """Vyčistit text pro TTS (dlouhé texty mimo hub - cpu_offload)"""
+    return offload_text(_clean_for_tts, text)
+
+def voice_answer(messages, session_id=None):
+    """Odpověď na poslední zprávu: lokálně (svátek / datum / čas / pozdrav), jinak Gemini/Claude"""
+    local = LOCAL_ANSWERS.answer(messages[-1].get('content', ''))
+    if local:
+        return {'response': clean_for_tts(local[1]), 'provider': 'local', 'intent': local[0], 'success': True}
+    return get_voice_ai_response(messages, session_id=session_id)
 
 @voice_runtime_bp.route('/chat', methods=['POST'])
 def voice_chat():
@@ -627,16 +640,262 @@ def voice_chat():
         if not messages:
             return jsonify({'success': False, 'error': 'No messages'}), 400
         
-        result = get_voice_ai_response(messages)
+        result = voice_answer(messages, session_id)
         
         session = get_session(session_id)
-        session['last_tts_text'] = result.get('response', '')
-        session['conversation'].append({'role': 'user', 'content': messages[-1].get('content', '')})
-        session['conversation'].append({'role': 'assistant', 'content': result.get('response', '')})
+        session.last_tts_text = result.get('response', '')
+        ECHO_INDEX.remember(session_id, session.last_tts_text)
+        session.add_turn(messages[-1].get('content', ''), result.get('response', ''))
+        SESSIONS.save(session)
         
         return jsonify(result)
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# ============================================
+# HLASOVÝ TAH - JEDEN POŽADAVEK
+# ============================================
+# Klient dřív na jeden dotaz volal /metrics, několikrát /state, /chat a
+# TTS endpoint - na tabletu 100-300 ms za každou cestu. POST /turn
+# (a Socket.IO voice_turn) udělá bránu, přechody automatu, LLM i TTS na
+# serveru a vrátí stopu přechodů + audio. Odpověď se syntetizuje po
+# kusech (první věta, zbytek) souběžně - první věta hraje dřív, než je
+# hotový zbytek. Přes HTTP jde po kusech jen MP3 (rámce jdou spojit),
+# Opus/WebM jako jeden klip; Socket.IO posílá samostatné klipy vždy.
+#
+# Po tahu zůstává session ve stavu speaking - tts_done pošle klient přes
+# /state, jinak ho provede další tah.
+
+from speech_routes import speak_result, AZURE_SPEECH_KEY
+from tts_engine import negotiate_format
+from audio_transport import wants_binary, audio_stream_response, audio_json
+from llm_metrics import HdrHistogram
+
+# Styl z get_tts_params -> emoce speech_routes.EMOTION_STYLES
+VOICE_TURN_EMOTIONS = {'friendly': 'friendly', 'calm': 'calm', 'soothing': 'empathetic'}
+VOICE_TURN_TTS_TIMEOUT = 35      # TTS.synthesize má 30 s
+_SPEECH_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def _spawn(fn):
+    if EVENTLET_AVAILABLE and patcher.is_monkey_patched('socket'):
+        return eventlet.spawn(fn)
+    thread = threading.Thread(target=fn, name='voice-turn-tts', daemon=True)
+    thread.start()
+    return thread
+
+
+def split_speech(text):
+    """První věta zvlášť (hraje co nejdřív), zbytek jedním kusem"""
+    return [part for part in _SPEECH_SPLIT.split(text.strip(), 1) if part]
+
+
+class VoiceTurnStats:
+    def __init__(self):
+        self.turns = 0
+        self.responded = 0
+        self.rejected = 0
+        self.tts_errors = 0
+        self.text_ms = HdrHistogram(scale=1000)          # začátek tahu -> text odpovědi
+        self.first_audio_ms = HdrHistogram(scale=1000)   # začátek tahu -> první kus audia
+
+    def snapshot(self):
+        return {
+            'turns': self.turns,
+            'responded': self.responded,
+            'rejected': self.rejected,
+            'tts_errors': self.tts_errors,
+            'text_ms': self.text_ms.snapshot(),
+            'first_audio_ms': self.first_audio_ms.snapshot()
+        }
+
+
+VOICE_TURN_STATS = VoiceTurnStats()
+
+
+class VoiceTurn:
+    """Jeden hlasový tah: brána -> automat -> odpověď -> audio po kusech"""
+    __slots__ = ('data', 'session', 'started', 'trace', 'metrics', 'respond', 'text', 'provider',
+                 'emotion', 'timings')
+
+    def __init__(self, data):
+        self.data = data
+        self.session = get_session(data.get('session_id', 'default'))
+        self.started = time.perf_counter()
+        self.trace = []
+        self.metrics = None
+        self.respond = False
+        self.text = ''
+        self.provider = None
+        self.emotion = None
+        self.timings = {}
+
+    def _elapsed(self):
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    def _step(self, event, event_data=None):
+        previous, current = transition(self.session, event, event_data)
+        if previous != current:
+            self.trace.append({'event': event, 'from': previous, 'to': current, 'ms': self._elapsed()})
+
+    def run(self):
+        """Brána a automat až po speaking (nebo zpět do idle); session se uloží"""
+        session = self.session
+        user_text = (self.data.get('user_text') or '').strip()
+        VOICE_TURN_STATS.turns += 1
+        self.metrics = evaluate_gate(session, self.data.get('sensors', {}), self.data.get('bio', {}), user_text)
+        self.respond = bool(user_text) and self.metrics['should_respond']
+        self.emotion = self.data.get('emotion') or VOICE_TURN_EMOTIONS.get(self.metrics['tts_params']['style'],
+                                                                           'friendly')
+        self.timings['gate_ms'] = self._elapsed()
+        
+        # Předchozí odpověď dohrála; dotaz prošel wakewordem na klientovi
+        self._step('tts_done')
+        self._step('wake_detected')
+        if not self.respond:
+            self._step('voice_invalid')
+            VOICE_TURN_STATS.rejected += 1
+            SESSIONS.save(session)
+            return self
+        
+        self._step('voice_valid')
+        self._step('speech_end')
+        result = voice_answer(session.history() + [{'role': 'user', 'content': user_text}], session.session_id)
+        self.text = result.get('response', '')
+        self.provider = result.get('provider')
+        self._step('response_ready', {'text': self.text})
+        session.add_turn(user_text, self.text)
+        SESSIONS.save(session)
+        
+        self.timings['text_ms'] = self._elapsed()
+        VOICE_TURN_STATS.responded += 1
+        VOICE_TURN_STATS.text_ms.record(self.timings['text_ms'])
+        return self
+
+    def audio(self, output_format, split=True):
+        """
+        Generátor (text kusu, TTSResult) v pořadí. Všechny kusy se
+        syntetizují hned souběžně, generátor jen čeká na další v řadě.
+        """
+        if not AZURE_SPEECH_KEY:
+            raise RuntimeError('AZURE_SPEECH_KEY není nastaven')
+        chunks = split_speech(self.text) if split else [self.text]
+        futures = []
+        for chunk in chunks:
+            future = Future()
+
+            def synthesize(chunk=chunk, future=future):
+                try:
+                    future.set_result(speak_result(chunk, self.emotion, output_format))
+                except Exception as e:
+                    future.set_exception(e)
+
+            futures.append(future)
+            _spawn(synthesize)
+        for seq, (chunk, future) in enumerate(zip(chunks, futures)):
+            try:
+                result = future.result(timeout=VOICE_TURN_TTS_TIMEOUT)
+            except Exception:
+                VOICE_TURN_STATS.tts_errors += 1
+                raise
+            if seq == 0:
+                self.timings['first_audio_ms'] = self._elapsed()
+                VOICE_TURN_STATS.first_audio_ms.record(self.timings['first_audio_ms'])
+            yield chunk, result
+
+    def summary(self):
+        return {
+            'session_id': self.session.session_id,
+            'respond': self.respond,
+            'text': self.text,
+            'provider': self.provider,
+            'emotion': self.emotion,
+            'state': self.session.state,
+            'trace': self.trace,
+            'metrics': self.metrics,
+            'timings': dict(self.timings)
+        }
+
+
+@voice_runtime_bp.route('/turn', methods=['POST'])
+def voice_turn():
+    """
+    Celý hlasový tah jedním požadavkem
+    
+    Input:
+    {
+        "session_id": "...",
+        "user_text": "Radime, kolik je hodin?",
+        "sensors": {...}, "bio": {...},
+        "format": "mp3",             (volitelné, jinak Accept)
+        "emotion": "calm",           (volitelné, jinak podle stavu)
+        "transport": "binary|json"
+    }
+    
+    Output: audio (chunked, stopa v X-Voice-Trace, stav v X-Voice-State,
+    text v X-Speech-Text), nebo JSON s base64 audiem a stopou. Tah bez
+    odpovědi (brána) -> JSON s respond=false.
+    """
+    try:
+        data = request.json or {}
+        binary = wants_binary(data, default=True)
+        try:
+            fmt = negotiate_format(data.get('format'), request.headers.get('Accept'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        turn = VoiceTurn(data).run()
+        if not turn.respond or not turn.text:
+            return jsonify({'success': True, 'audio': None, **turn.summary()})
+        
+        audio = turn.audio(fmt, split=binary and fmt.startswith('mp3'))
+        try:
+            _, first = next(audio)
+        except Exception as e:
+            # Text je hotový - klient ho může přečíst sám
+            return jsonify({'success': True, 'audio': None, 'tts_error': str(e), **turn.summary()})
+        
+        if binary:
+            return audio_stream_response(first, (result for _, result in audio), format=fmt, emotion=turn.emotion,
+                                         text=turn.text, state=turn.session.state,
+                                         trace=json.dumps(turn.trace, separators=(',', ':')))
+        return jsonify(audio_json(first, format=fmt, content_type=first.content_type, **turn.summary()))
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def init_socketio(socketio):
+    """
+    Zaregistrovat voice_turn: voice_turn_state (stopa + text), pak
+    voice_turn_audio po kusech, nakonec voice_turn_done (ack = totéž)
+    """
+
+    @socketio.on('voice_turn')
+    def handle_voice_turn(data=None):
+        data = data or {}
+        turn_id = data.get('turnId') or uuid.uuid4().hex[:12]
+        try:
+            fmt = negotiate_format(data.get('format'))
+            turn = VoiceTurn(data).run()
+        except Exception as e:
+            return {'turnId': turn_id, 'success': False, 'error': str(e)}
+        emit('voice_turn_state', {'turnId': turn_id, **turn.summary()})
+        
+        done = {'turnId': turn_id, 'success': True, 'chunks': 0}
+        if turn.respond and turn.text:
+            try:
+                for seq, (chunk, result) in enumerate(turn.audio(fmt)):
+                    emit('voice_turn_audio', {'turnId': turn_id, 'seq': seq, 'text': chunk, 'audio': result.audio,
+                                              'format': fmt, 'contentType': result.content_type})
+                    done['chunks'] += 1
+            except Exception as e:
+                done['tts_error'] = str(e)
+        done.update(turn.summary())
+        emit('voice_turn_done', done)
+        return done
+
+    return socketio
+
 print("✅ Voice Runtime routes registered: /api/voice/*")
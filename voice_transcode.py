@@ -0,0 +1,267 @@
+# ============================================
+# 🎙️ RADIM VOICE TRANSCODE
+# ============================================
+# Version: 1.0.2
+# Hlasové zprávy z prohlížeče (webm/ogg/mp4, různé vzorkovací frekvence
+# a datové toky) se ukládaly beze změny a přehrávač stahoval celý
+# originál. Tady se na pozadí převedou na kompaktní Opus (WebM, mono
+# 16 kHz, VOICE_OPUS_KBPS) a spočítá se délka a vrcholy vlny pro UI.
+#
+# - převod běží v ProcessPoolExecutor (ffmpeg + NumPy mimo hlavní
+#   proces) - eventlet hub se neblokuje, volající greenlet jen čeká na
+#   future. Start metoda 'spawn': fork po eventlet monkey patchi by
+#   zdědil rozbitý hub.
+# - jeden průchod ffmpeg: dekódování jednou, výstupy Opus do souboru
+#   + 8 kHz PCM do roury (délka, vrcholy)
+# - ffmpeg: VOICE_FFMPEG, PATH, jinak statický binár z imageio-ffmpeg
+#   (requirements.txt) - Heroku stack ffmpeg nemá a buildpack netřeba
+# - bez ffmpeg se originál nepřevádí, délka a
+#   vrcholy se spočítají jen pro WAV; jiný formát se na pozadí vůbec
+#   neposílá (accepts) a zpráva je hned 'ready' s originálem
+#
+# submit(data, on_done) -> on_done(result, error) po dokončení. Ukládání
+# odvozeného audia a doplnění URL do zprávy řeší app.py.
+
+import os
+import time
+import atexit
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from llm_metrics import HdrHistogram
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import imageio_ffmpeg
+    IMAGEIO_FFMPEG_AVAILABLE = True
+except ImportError:
+    IMAGEIO_FFMPEG_AVAILABLE = False
+
+try:
+    import eventlet
+    from eventlet import patcher
+    EVENTLET_AVAILABLE = True
+except ImportError:
+    EVENTLET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def _find_ffmpeg():
+    """VOICE_FFMPEG, ffmpeg v PATH, jinak binár přibalený k imageio-ffmpeg"""
+    found = os.environ.get('VOICE_FFMPEG') or shutil.which('ffmpeg')
+    if found or not IMAGEIO_FFMPEG_AVAILABLE:
+        return found
+    try:
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except RuntimeError as e:
+        logger.warning(f"🎙️ Voice transcode: imageio-ffmpeg binary missing: {e}")
+        return None
+
+
+FFMPEG = _find_ffmpeg()
+FFMPEG_AVAILABLE = bool(FFMPEG)
+VOICE_TRANSCODE_ENABLED = os.environ.get('VOICE_TRANSCODE_ENABLED', 'true').lower() == 'true'
+VOICE_TRANSCODE_WORKERS = int(os.environ.get('VOICE_TRANSCODE_WORKERS', 2))
+VOICE_TRANSCODE_TIMEOUT = float(os.environ.get('VOICE_TRANSCODE_TIMEOUT', 60))
+VOICE_OPUS_KBPS = int(os.environ.get('VOICE_OPUS_KBPS', 24))
+VOICE_PEAKS = int(os.environ.get('VOICE_PEAKS', 64))
+
+OPUS_CONTENT_TYPE = 'audio/webm; codecs=opus'
+PEAK_RATE = 8000            # PCM pro délku a vrcholy - na obálku stačí
+
+
+class TranscodeError(Exception):
+    pass
+
+
+# ============================================
+# WORKER (běží v procesu poolu)
+# ============================================
+
+def waveform_peaks(pcm, count=VOICE_PEAKS):
+    """int16 PCM -> count vrcholů 0..1 (normalizováno na nejhlasitější)"""
+    samples = np.frombuffer(pcm, dtype='<i2')
+    if not len(samples) or count <= 0:
+        return []
+    buckets = min(count, len(samples))
+    usable = len(samples) - len(samples) % buckets
+    peaks = np.abs(samples[:usable].astype(np.int32)).reshape(buckets, -1).max(axis=1).astype(np.float32)
+    top = peaks.max()
+    if top > 0:
+        peaks /= top
+    return [round(float(p), 3) for p in peaks]
+
+
+def _wav_pcm(data):
+    """(PCM, vzorkovací frekvence) z WAV 16 bit mono, jinak None"""
+    from vad import parse_wav
+    info = parse_wav(data)
+    if info is None or info[1] != 1 or info[2] != 16:
+        return None
+    rate, _, _, offset, length = info
+    return data[offset:offset + length], rate
+
+
+def transcode_voice(data, kbps=VOICE_OPUS_KBPS, peaks=VOICE_PEAKS):
+    """Originál -> {audio (Opus/WebM nebo None), content_type, duration, peaks, ...}"""
+    started = time.perf_counter()
+    if not FFMPEG_AVAILABLE:
+        wav = _wav_pcm(data) if NUMPY_AVAILABLE else None
+        return {
+            'audio': None,
+            'content_type': None,
+            'duration': round(len(wav[0]) / (wav[1] * 2), 2) if wav else None,
+            'peaks': waveform_peaks(wav[0], peaks) if wav else [],
+            'input_bytes': len(data),
+            'output_bytes': 0,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+    with tempfile.TemporaryDirectory(prefix='radim-voice-') as tmp:
+        source = os.path.join(tmp, 'source')
+        target = os.path.join(tmp, 'voice.webm')
+        with open(source, 'wb') as f:
+            f.write(data)
+        command = [FFMPEG, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y', '-i', source, '-vn',
+                   '-ac', '1', '-ar', '16000', '-c:a', 'libopus', '-b:a', f'{kbps}k', '-application', 'voip',
+                   '-f', 'webm', target,
+                   '-ac', '1', '-ar', str(PEAK_RATE), '-f', 's16le', 'pipe:1']
+        try:
+            process = subprocess.run(command, capture_output=True, timeout=VOICE_TRANSCODE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            raise TranscodeError('ffmpeg timeout')
+        if process.returncode != 0:
+            raise TranscodeError(f"ffmpeg: {process.stderr.decode('utf-8', 'replace').strip()[-300:]}")
+        with open(target, 'rb') as f:
+            audio = f.read()
+    pcm = process.stdout
+    return {
+        'audio': audio,
+        'content_type': OPUS_CONTENT_TYPE,
+        'duration': round(len(pcm) / (PEAK_RATE * 2), 2),
+        'peaks': waveform_peaks(pcm, peaks) if NUMPY_AVAILABLE else [],
+        'input_bytes': len(data),
+        'output_bytes': len(audio),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+# ============================================
+# POOL (hlavní proces)
+# ============================================
+
+def _spawn(fn):
+    if EVENTLET_AVAILABLE and patcher.is_monkey_patched('socket'):
+        return eventlet.spawn(fn)
+    thread = threading.Thread(target=fn, name='voice-transcode', daemon=True)
+    thread.start()
+    return thread
+
+
+class VoiceTranscoder:
+    def __init__(self, workers=VOICE_TRANSCODE_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.pending = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.elapsed_ms = HdrHistogram(scale=1000)     # odeslání -> hotovo (včetně fronty)
+
+    @property
+    def enabled(self):
+        return VOICE_TRANSCODE_ENABLED
+
+    def accepts(self, data):
+        """Má smysl převod čekat? Bez ffmpeg jen WAV (délka a vrcholy)"""
+        if not self.enabled:
+            return False
+        return FFMPEG_AVAILABLE or (NUMPY_AVAILABLE and _wav_pcm(data) is not None)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # Procesy vznikají líně - import modulu (i v procesu poolu) nic nespouští
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _reset(self, wait=False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, data, on_done):
+        """Převod na pozadí; on_done(result, error) v greenletu/vlákně"""
+        started = time.perf_counter()
+        self.submitted += 1
+        self.pending += 1
+        future = self._executor().submit(transcode_voice, data)
+
+        def wait():
+            result = error = None
+            try:
+                result = future.result(timeout=VOICE_TRANSCODE_TIMEOUT + 30)
+                self.completed += 1
+                self.input_bytes += result['input_bytes']
+                self.output_bytes += result['output_bytes']
+            except BrokenProcessPool as e:
+                self.failed += 1
+                error = f'transcode pool crashed: {e}'
+                self._reset()
+            except Exception as e:
+                self.failed += 1
+                error = str(e) or type(e).__name__
+            finally:
+                self.pending -= 1
+                self.elapsed_ms.record((time.perf_counter() - started) * 1000)
+            try:
+                on_done(result, error)
+            except Exception as e:
+                logger.error(f"🎙️ Voice transcode callback failed: {e}")
+
+        _spawn(wait)
+        return future
+
+    def shutdown(self):
+        # Bez čekání na ukončení workerů by se proces pod eventletem při exitu zasekl
+        self._reset(wait=True)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'ffmpeg': FFMPEG_AVAILABLE,
+            'workers': self.workers,
+            'opus_kbps': VOICE_OPUS_KBPS,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'pending': self.pending,
+            'input_bytes': self.input_bytes,
+            'output_bytes': self.output_bytes,
+            'size_ratio': round(self.output_bytes / self.input_bytes, 3) if self.output_bytes else None,
+            'elapsed_ms': self.elapsed_ms.snapshot()
+        }
+
+
+VOICE_TRANSCODER = VoiceTranscoder()
+atexit.register(VOICE_TRANSCODER.shutdown)
+
+if multiprocessing.parent_process() is None:
+    print(f"🎙️ Voice transcode loaded - {'ffmpeg Opus' if FFMPEG_AVAILABLE else 'no ffmpeg (WAV metadata only)'}, "
+          f"{VOICE_TRANSCODE_WORKERS} workers")